@@ -0,0 +1,127 @@
+"""Benchmark: per-file download latency with and without a shared keep-alive session.
+
+Starts a local HTTP server standing in for the S3 endpoint, serving many small objects,
+and downloads them with the same thread layout as `dds data get`: once with a new
+connection per file (module-level `requests.get`) and once with the pooled session
+from `dds_cli.utils.create_download_session`.
+
+Run from the repository root, with dds_cli installed (e.g. `pip install -e .`):
+
+    python benchmarks/bench_download_session.py --files 2000 --size 4096 --threads 4
+
+NB! The stand-in uses plain HTTP, so the numbers only include the saved TCP handshakes.
+Against the real (HTTPS) endpoint the saved TLS handshakes come on top of this.
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import concurrent.futures
+import http.server
+import statistics
+import threading
+import time
+
+# Installed
+import requests
+
+# Own modules
+from dds_cli import FileSegment
+import dds_cli.utils
+
+###############################################################################
+# LOCAL SERVER ################################################# LOCAL SERVER #
+###############################################################################
+
+
+class ObjectHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the same payload for every path, keeping the connection alive."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately - avoid Nagle/delayed ACK stalls on reuse
+    disable_nagle_algorithm = True
+    payload = b""
+
+    def do_GET(self):  # noqa: N802
+        """Return the payload."""
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *_):
+        """Do not print a line per request."""
+
+
+def start_server(size):
+    """Start the stand-in server in a background thread and return it."""
+    ObjectHandler.payload = b"x" * size
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ObjectHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def download(getter, url):
+    """Download one object the way DataGetter.get does and return the latency."""
+    start = time.perf_counter()
+    with getter(url, stream=True, timeout=(60, 300)) as req:
+        req.raise_for_status()
+        for _ in req.iter_content(chunk_size=FileSegment.SEGMENT_SIZE_CIPHER):
+            pass
+    return time.perf_counter() - start
+
+
+def run(getter, base_url, files, threads):
+    """Download all objects with a thread pool and return (latencies, wall time)."""
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as texec:
+        latencies = list(
+            texec.map(lambda i: download(getter, f"{base_url}/object_{i}"), range(files))
+        )
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, wall):
+    """Print a summary line."""
+    latencies = sorted(latencies)
+    print(
+        f"{name:<20} files/s: {len(latencies) / wall:>9.1f}  "
+        f"mean: {statistics.mean(latencies) * 1000:>7.3f} ms  "
+        f"p50: {latencies[len(latencies) // 2] * 1000:>7.3f} ms  "
+        f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:>7.3f} ms"
+    )
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000, help="Number of objects.")
+    parser.add_argument("--size", type=int, default=4096, help="Object size in bytes.")
+    parser.add_argument("--threads", type=int, default=4, help="Parallel downloads.")
+    args = parser.parse_args()
+
+    server = start_server(size=args.size)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        report("requests.get", *run(requests.get, base_url, args.files, args.threads))
+
+        session = dds_cli.utils.create_download_session(pool_size=args.threads)
+        try:
+            report("pooled session", *run(session.get, base_url, args.files, args.threads))
+        finally:
+            session.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Benchmark: peak memory of the file and status info for a delivery with many files.
+
+Builds the file info and status of a synthetic upload, with the same fields as
+`dds_cli.file_handler_local.LocalFileHandler`, and runs the steps of `dds data put` which
+touch all files: the copy of the file names to schedule, and the summary at the end, where
+some files have failed. Compared:
+
+- dicts: the previous layout, a dict per file with pathlib.Path objects, a nested dict per
+  step, a copy of the file info dict to iterate and all info rebuilt as strings in the summary.
+- records: `dds_cli.file_records` - fields in slots, paths as strings, interned subpaths, steps
+  as integer codes, a list of file names to iterate and only the failed files as strings.
+
+Each layout is run in a new process, and the peak resident set size (RSS) of that process is
+shown. Run from the repository root, with dds_cli installed (e.g. `pip install -e .`):
+
+    python benchmarks/bench_file_records.py --files 1000000 --per-directory 1000
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import pathlib
+import resource
+import subprocess
+import sys
+import time
+
+# Own modules
+from dds_cli import file_records as frec
+
+###############################################################################
+# SYNTHETIC DELIVERY ######################################### SYNTHETIC DELIVERY #
+###############################################################################
+
+SOURCE = pathlib.Path("/data/sequencing/run_2024_001")
+STAGING = pathlib.Path("/home/user/DataDelivery_2024-01-01_00-00-00_project_upload/files")
+FAILED_EVERY = 1000
+
+
+def synthetic_files(nr_files, per_directory):
+    """Yield (file name, raw path, subpath, processed path, remote name) of the delivery."""
+    folder = None
+    for i in range(nr_files):
+        if i % per_directory == 0:
+            folder = pathlib.Path(f"sample_{i // per_directory:06d}")
+        name = f"reads_{i:09d}_R1.fastq"
+        yield (
+            (folder / name).as_posix(),
+            SOURCE / folder / name,
+            folder,
+            STAGING / folder / f"{name}.zst.ccp",
+            f"{i:020x}_{'0' * 36}{i:036x}",
+        )
+
+
+def build_dicts(files):
+    """The previous layout: a dict per file and per step."""
+    data, status = {}, {}
+    for key, path_raw, subpath, path_processed, path_remote in files:
+        data[key] = {
+            "path_raw": path_raw,
+            "subpath": subpath,
+            "size_raw": 1024,
+            "compressed": False,
+            "path_processed": path_processed,
+            "size_processed": 0,
+            "path_remote": path_remote,
+            "overwrite": False,
+            "checksum": "",
+        }
+        status[key] = {
+            "cancel": False,
+            "started": False,
+            "message": "",
+            "failed_op": None,
+            "put": {"started": False, "done": False},
+            "add_file_db": {"started": False, "done": False},
+        }
+    return data, status
+
+
+def build_records(files):
+    """The new layout: records with slots."""
+    data, status = {}, {}
+    for key, path_raw, subpath, path_processed, path_remote in files:
+        data[key] = frec.UploadRecord(
+            path_raw=path_raw,
+            subpath=subpath,
+            size_raw=1024,
+            compressed=False,
+            path_processed=path_processed,
+            size_processed=0,
+            path_remote=path_remote,
+            overwrite=False,
+            checksum="",
+        )
+        status[key] = frec.FileStatus(steps=("put", "add_file_db"))
+    return data, status
+
+
+def run_dicts(nr_files, per_directory):
+    """Collect, schedule and summarize with the previous layout."""
+    data, status = build_dicts(synthetic_files(nr_files, per_directory))
+    iterator = iter(data.copy())
+    for i, file in enumerate(iterator):
+        status[file]["put"].update({"started": True, "done": True})
+        if i % FAILED_EVERY == 0:
+            status[file].update({"cancel": True, "message": "failed"})
+
+    # Previous DDSBaseClass.__collect_all_failed
+    data = {str(x): {str(k): str(v) for k, v in y.items()} for x, y in list(data.items())}
+    status = {str(x): {str(k): str(v) for k, v in y.items()} for x, y in list(status.items())}
+    return sum(1 for x in status.values() if x["cancel"] == "True")
+
+
+def run_records(nr_files, per_directory):
+    """Collect, schedule and summarize with records."""
+    data, status = build_records(synthetic_files(nr_files, per_directory))
+    iterator = iter(list(data))
+    for i, file in enumerate(iterator):
+        status[file].finish("put")
+        if i % FAILED_EVERY == 0:
+            status[file].update({"cancel": True, "message": "failed"})
+
+    failed = {
+        str(x): {**{str(k): str(v) for k, v in y.items()}, "message": status[x]["message"]}
+        for x, y in data.items()
+        if status[x]["cancel"]
+    }
+    return len(failed)
+
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB (ru_maxrss is in KiB on Linux)."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1_000_000, help="Number of files.")
+    parser.add_argument("--per-directory", type=int, default=1000, help="Files per directory.")
+    parser.add_argument("--layout", choices=["dicts", "records"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Run in this process - started once per layout by the parent
+    if args.layout:
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        nr_failed = {"dicts": run_dicts, "records": run_records}[args.layout](
+            args.files, args.per_directory
+        )
+        wall = time.perf_counter() - start
+        print(f"{nr_failed} {wall} {peak_rss_mb()} {baseline}")
+        return
+
+    print(f"{args.files} files, {args.per_directory} per directory")
+    results = {}
+    for layout in ("dicts", "records"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--files", str(args.files), "--per-directory"]
+            + [str(args.per_directory), "--layout", layout],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        nr_failed, wall, peak, baseline = int(output[0]), *map(float, output[1:])
+        results[layout] = (nr_failed, peak)
+        print(
+            f"{layout:<8} peak RSS: {peak:>8.1f} MiB  (interpreter {baseline:>5.1f} MiB)  "
+            f"time: {wall:>6.2f} s  failed: {nr_failed}"
+        )
+
+    assert results["dicts"][0] == results["records"][0], "Results differ"
+    print(f"peak RSS reduction: {results['dicts'][1] / results['records'][1]:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
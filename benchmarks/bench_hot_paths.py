@@ -0,0 +1,392 @@
+"""Benchmark: throughput and allocations of the crypto, compression and I/O hot paths.
+
+Runs each hot path of uploads and downloads on synthetic datasets and reports the throughput,
+in MB/s of original data, and the peak of the Python allocations while it runs (tracemalloc,
+in a separate run, since tracing slows it down). The hot paths:
+
+- read_file: `LocalFileHandler.read_file`, reading the file in 64 KiB chunks.
+- stream_from_file: `LocalFileHandler.stream_from_file`, read, checksum and compress.
+- compress_file: `Compressor.compress_file`.
+- encrypt_filechunks: `Encryptor.encrypt_filechunks`, from chunks in memory to the file.
+- decrypt_file: `Decryptor.decrypt_file`, from the file to chunks in memory.
+- decompress_filechunks: `Compressor.decompress_filechunks`, from the file to the file.
+
+The datasets are random (incompressible), text (repetitive log lines) and fastq (reads with
+random bases and qualities), each as a few huge files and as many small files. The same seed
+gives the same data.
+
+Save the results as a baseline, and compare later runs on the same machine against it, to find
+regressions without a network connection. Run from the repository root, with dds_cli installed:
+
+    python benchmarks/bench_hot_paths.py --size-mb 64 --save benchmarks/baselines/bench_hot_paths.json
+    python benchmarks/bench_hot_paths.py --size-mb 64 --compare benchmarks/baselines/bench_hot_paths.json
+
+With --compare, the exit code is 1 if a hot path is more than --tolerance slower, or allocates
+more than --tolerance more, than in the baseline. The files are not dropped from the page cache,
+so that the runs measure the hot paths rather than the disk.
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import json
+import logging
+import pathlib
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Installed
+from cryptography.hazmat.primitives import asymmetric, serialization
+
+# Own modules
+import dds_cli
+from dds_cli import FileSegment
+from dds_cli.file_compressor import Compressor
+from dds_cli.file_encryptor import Decryptor, Encryptor
+from dds_cli.file_handler_local import LocalFileHandler
+
+###############################################################################
+# SYNTHETIC DATASETS ######################################### SYNTHETIC DATASETS #
+###############################################################################
+
+DATASETS = ("random", "text", "fastq")
+LAYOUTS = ("huge", "small")
+BLOCK_SIZE = 1024 * 1024
+
+# Bytes to bases and to qualities, for fastq
+BASES = bytes(b"ACGT"[x % 4] for x in range(256))
+QUALITIES = bytes(b"FFFF:::,,#"[x % 10] for x in range(256))
+
+
+def random_blocks(rng):
+    """Incompressible data."""
+    while True:
+        yield rng.randbytes(BLOCK_SIZE)
+
+
+def text_blocks(rng):
+    """Log lines which differ in a few fields, which compress well."""
+    line_number = 0
+    while True:
+        lines = []
+        for _ in range(BLOCK_SIZE // 64):
+            line_number += 1
+            lines.append(
+                f"2024-05-{line_number % 28 + 1:02d}T12:{line_number % 60:02d}:00 INFO "
+                f"sample_{rng.randrange(96):02d} processed read {line_number} ok\n"
+            )
+        yield "".join(lines).encode()
+
+
+def fastq_blocks(rng, read_length=150):
+    """FASTQ records with random bases and qualities, which compress about as well as reads."""
+    read_number = 0
+    while True:
+        records = []
+        for _ in range(BLOCK_SIZE // (2 * read_length + 48)):
+            read_number += 1
+            bases = rng.randbytes(read_length).translate(BASES)
+            qualities = rng.randbytes(read_length).translate(QUALITIES)
+            records.append(b"@A00123:8:H3KL2DSXY:1:1101:%d:1000 1:N:0:ACGT\n" % read_number)
+            records += [bases, b"\n+\n", qualities, b"\n"]
+        yield b"".join(records)
+
+
+def write_dataset(directory, dataset, sizes, seed):
+    """Write files of the sizes with the dataset, in order; return the files."""
+    rng = random.Random(f"{seed}-{dataset}")
+    blocks = {"random": random_blocks, "text": text_blocks, "fastq": fastq_blocks}[dataset](rng)
+    directory.mkdir(parents=True)
+    files, data = ([], b"")
+    for index, size in enumerate(sizes):
+        while len(data) < size:
+            data += next(blocks)
+        file = directory / f"{dataset}_{index:05d}.{'fastq' if dataset == 'fastq' else 'dat'}"
+        file.write_bytes(data[:size])
+        data = data[size:]
+        files.append(file)
+    return files
+
+
+###############################################################################
+# HOT PATHS ####################################################### HOT PATHS #
+###############################################################################
+
+
+class Context:
+    """The files of a dataset, and the files made from them for the later hot paths."""
+
+    def __init__(self, files, work_directory):
+        """Collect the files as for an upload, and keep the start of the data for encryption."""
+        self.files = files
+        self.sizes = {x: x.stat().st_size for x in files}
+        self.work_directory = work_directory
+        self.project_keys = key_pair()
+        self.filehandler = LocalFileHandler(
+            user_input=((files[0].parent,), None),
+            project="bench",
+            temporary_destination=work_directory,
+        )
+
+        # The encryption is the same for all data, so chunks of the first files are reused
+        self.pool = []
+        for file in files:
+            for chunk in LocalFileHandler.read_file(file=file):
+                self.pool.append(bytes(chunk))
+            if len(self.pool) * FileSegment.SEGMENT_SIZE_RAW >= 16 * BLOCK_SIZE:
+                break
+
+        # Compressed files for decompress_filechunks, and keys of the encrypted files
+        self.compressed = {}
+        for file in files:
+            self.compressed[file] = work_directory / f"{file.name}.zst"
+            with self.compressed[file].open(mode="wb") as out_file:
+                for chunk in Compressor.compress_file(file=file):
+                    out_file.write(chunk)
+        self.encrypted = {x: work_directory / f"{x.name}.ccp" for x in files}
+        self.encryption_keys = {}
+
+    def chunks(self, size):
+        """Chunks of the data in memory, size bytes in all."""
+        chunk_size = FileSegment.SEGMENT_SIZE_RAW
+        for index in range(0, size, chunk_size):
+            chunk = self.pool[(index // chunk_size) % len(self.pool)]
+            yield chunk if index + chunk_size <= size else chunk[: size - index]
+
+
+def key_pair():
+    """A Curve 25519 key pair, as the project keys, in hex."""
+    private_key = asymmetric.x25519.X25519PrivateKey.generate()
+    private_bytes = private_key.private_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PrivateFormat.Raw,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    public_bytes = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw
+    )
+    return private_bytes.hex().upper(), public_bytes.hex().upper()
+
+
+def read_file(ctx):
+    """Read all files."""
+    for file in ctx.files:
+        for _ in LocalFileHandler.read_file(file=file):
+            pass
+
+
+def stream_from_file(ctx):
+    """Read, checksum and compress all files, as for an upload."""
+    for file in ctx.filehandler.data:
+        for _ in ctx.filehandler.stream_from_file(file=file):
+            pass
+
+
+def compress_file(ctx):
+    """Compress all files."""
+    for file in ctx.files:
+        for _ in Compressor.compress_file(file=file):
+            pass
+
+
+def encrypt_filechunks(ctx):
+    """Encrypt all files from memory and save them."""
+    for file in ctx.files:
+        with Encryptor(project_keys=ctx.project_keys) as encryptor:
+            saved, message = encryptor.encrypt_filechunks(
+                chunks=ctx.chunks(size=ctx.sizes[file]), outfile=ctx.encrypted[file]
+            )
+            assert saved, message
+            ctx.encryption_keys[file] = (
+                encryptor.get_public_component_hex(private_key=encryptor.my_private),
+                encryptor.salt,
+            )
+
+
+def decrypt_file(ctx):
+    """Decrypt all files encrypted by encrypt_filechunks, to memory."""
+    for file in ctx.files:
+        public_key, salt = ctx.encryption_keys[file]
+        with Decryptor(
+            project_keys=ctx.project_keys,
+            peer_public=public_key,
+            key_salt=salt,
+            files_directory=ctx.work_directory,
+        ) as decryptor:
+            for _ in decryptor.decrypt_file(
+                infile=ctx.encrypted[file], outfile=ctx.work_directory / file.name
+            ):
+                pass
+
+
+def decompress_filechunks(ctx):
+    """Decompress all compressed files and save them."""
+    for file in ctx.files:
+        saved, message = Compressor.decompress_filechunks(
+            chunks=LocalFileHandler.read_file(file=ctx.compressed[file]),
+            outfile=ctx.work_directory / file.name,
+            files_directory=ctx.work_directory,
+            size=ctx.sizes[file],
+        )
+        assert saved, message
+
+
+# In order - decrypt_file needs the files from encrypt_filechunks
+HOT_PATHS = (
+    read_file,
+    stream_from_file,
+    compress_file,
+    encrypt_filechunks,
+    decrypt_file,
+    decompress_filechunks,
+)
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def measure(hot_path, ctx, repeat):
+    """Best wall time of repeat runs, and the peak of the allocations in one more run."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hot_path(ctx)
+        wall = time.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+
+    tracemalloc.start()
+    try:
+        hot_path(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def compare(results, baseline, tolerance):
+    """Print the change from the baseline; return the hot paths which have regressed."""
+    regressions = []
+    for key, result in results.items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        speed = result["mb_per_s"] / before["mb_per_s"]
+        memory = (result["peak_kib"] + 1) / (before["peak_kib"] + 1)
+        regressed = speed < 1 - tolerance or memory > 1 + tolerance
+        if regressed:
+            regressions.append(key)
+        print(
+            f"{key:<36} speed {speed:>5.2f}x  allocations {memory:>5.2f}x"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64, help="MiB of data per dataset/layout.")
+    parser.add_argument("--huge-files", type=int, default=2, help="Files in the huge layout.")
+    parser.add_argument("--small-kb", type=int, default=32, help="KiB per file, small layout.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per hot path, best is shown.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument(
+        "--datasets", nargs="+", choices=DATASETS, default=list(DATASETS), help="Datasets."
+    )
+    parser.add_argument(
+        "--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS), help="Layouts."
+    )
+    parser.add_argument("--directory", type=pathlib.Path, default=None, help="Where to write.")
+    parser.add_argument("--save", type=pathlib.Path, help="Save the results as a baseline.")
+    parser.add_argument("--compare", type=pathlib.Path, help="Compare with a saved baseline.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed change from the baseline."
+    )
+    args = parser.parse_args()
+
+    # The hot paths log every file
+    logging.getLogger("dds_cli").setLevel(logging.WARNING)
+
+    size = args.size_mb * 1024 * 1024
+    layouts = {
+        "huge": [size // args.huge_files] * args.huge_files,
+        "small": [args.small_kb * 1024] * (size // (args.small_kb * 1024)),
+    }
+    print(
+        f"{args.size_mb} MiB per dataset: huge {args.huge_files} files, "
+        f"small {len(layouts['small'])} files of {args.small_kb} KiB"
+    )
+
+    arguments = {
+        "size_mb": args.size_mb,
+        "huge_files": args.huge_files,
+        "small_kb": args.small_kb,
+        "seed": args.seed,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.directory) as tmp_dir:
+        for dataset in args.datasets:
+            for layout in args.layouts:
+                directory = pathlib.Path(tmp_dir) / f"{dataset}_{layout}"
+                files = write_dataset(
+                    directory=directory / "source",
+                    dataset=dataset,
+                    sizes=layouts[layout],
+                    seed=args.seed,
+                )
+                (directory / "work").mkdir()
+                ctx = Context(files=files, work_directory=directory / "work")
+                for hot_path in HOT_PATHS:
+                    wall, peak = measure(hot_path=hot_path, ctx=ctx, repeat=args.repeat)
+                    key = f"{dataset}/{layout}/{hot_path.__name__}"
+                    results[key] = {
+                        "mb_per_s": round(size / wall / 1e6, 1),
+                        "peak_kib": round(peak / 1024, 1),
+                    }
+                    print(
+                        f"{key:<36} {results[key]['mb_per_s']:>8.1f} MB/s  "
+                        f"{results[key]['peak_kib']:>9.1f} KiB allocated at peak"
+                    )
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(
+            json.dumps(
+                {
+                    "dds_cli": dds_cli.__version__,
+                    "python": platform.python_version(),
+                    "machine": " ".join(
+                        filter(None, (platform.system(), platform.machine(), platform.processor()))
+                    ),
+                    "arguments": arguments,
+                    "results": results,
+                },
+                indent=4,
+            )
+            + "\n"
+        )
+        print(f"Baseline saved in '{args.save}'.")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print(
+            f"Compared with the baseline from {baseline['machine']}, Python {baseline['python']}:"
+        )
+        if baseline["arguments"] != arguments:
+            print(f"NB! The baseline was run with other arguments: {baseline['arguments']}")
+        regressions = compare(results=results, baseline=baseline, tolerance=args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} hot path(s) regressed by more than {args.tolerance:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark: time spent logging per file in the transfer threads, for many small files.
+
+Each transfer thread logs the same debug messages per file as `dds data put` does on the way
+through `DataPutter.protect_and_upload`, to a logger with a file handler at DEBUG, as set up for
+the default log file. Between the messages the thread waits, as for the encryption and the
+upload, which release the GIL. Compared:
+
+- sync: the previous setup - a `logging.FileHandler`, written in the transfer thread under the
+  handler lock, with the file names escaped with rich.markup.escape when logged.
+- queue: `dds_cli.utils.setup_logging_to_file` - records put in a queue and written by a
+  background thread, with the file names escaped only when written (`LazyEscape`).
+
+Shown is the time spent in the log calls per file, i.e. the time the transfer threads are held
+up by logging, and the wall time. Run from the repository root, with dds_cli installed:
+
+    python benchmarks/bench_logging.py --files 20000 --threads 8 --wait-ms 1
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import concurrent.futures
+import itertools
+import logging
+import pathlib
+import tempfile
+import time
+
+# Installed
+from rich.markup import escape
+
+# Own modules
+import dds_cli.utils
+from dds_cli.utils import LazyEscape
+
+###############################################################################
+# SYNTHETIC DELIVERY ######################################### SYNTHETIC DELIVERY #
+###############################################################################
+
+LOG = logging.getLogger("dds_cli.bench_logging")
+SOURCE = pathlib.Path("/data/sequencing/run_2024_001")
+
+
+def transfer_eager(file, wait):
+    """Log the messages of one file, with the file names escaped right away.
+
+    Returns the seconds spent logging.
+    """
+    start = time.perf_counter()
+    path_raw = SOURCE / file
+    file_path_raw = escape(str(path_raw))
+    LOG.debug("Starting: '%s'", escape(file))
+    LOG.debug("Step '%s': started file '%s'", "put", file_path_raw)
+    logging_time = time.perf_counter() - start
+    time.sleep(wait)  # Encryption
+
+    start = time.perf_counter()
+    LOG.debug("File successfully encrypted: '%s'", file_path_raw)
+    LOG.debug("Step '%s': started file '%s'", "put", path_raw)
+    logging_time += time.perf_counter() - start
+    time.sleep(wait)  # Upload
+
+    start = time.perf_counter()
+    LOG.debug("File successfully uploaded and added to the database: '%s'", file_path_raw)
+    LOG.debug("Future done for file: '%s'", escape(file))
+    return logging_time + time.perf_counter() - start
+
+
+def transfer_lazy(file, wait):
+    """Log the messages of one file, with the file names escaped when written.
+
+    Returns the seconds spent logging.
+    """
+    start = time.perf_counter()
+    path_raw = SOURCE / file
+    file_path_raw = LazyEscape(path_raw)
+    LOG.debug("Starting: '%s'", LazyEscape(file))
+    LOG.debug("Step '%s': started file '%s'", "put", file_path_raw)
+    logging_time = time.perf_counter() - start
+    time.sleep(wait)  # Encryption
+
+    start = time.perf_counter()
+    LOG.debug("File successfully encrypted: '%s'", file_path_raw)
+    LOG.debug("Step '%s': started file '%s'", "put", path_raw)
+    logging_time += time.perf_counter() - start
+    time.sleep(wait)  # Upload
+
+    start = time.perf_counter()
+    LOG.debug("File successfully uploaded and added to the database: '%s'", file_path_raw)
+    LOG.debug("Future done for file: '%s'", LazyEscape(file))
+    return logging_time + time.perf_counter() - start
+
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def sync_handler(filename):
+    """The previous file handler."""
+    handler = logging.FileHandler(filename=filename, encoding="utf-8")
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(
+        logging.Formatter(
+            fmt="[%(asctime)s] %(name)-15s %(lineno)-5s [%(levelname)-7s]  %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+    )
+    return handler
+
+
+def run(handler, transfer, files, threads, wait):
+    """Log all files from the thread pool; return (seconds logging, wall seconds)."""
+    LOG.addHandler(handler)
+    try:
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as texec:
+            logging_time = sum(texec.map(transfer, files, itertools.repeat(wait)))
+    finally:
+        LOG.removeHandler(handler)
+        handler.close()
+    return logging_time, time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20_000, help="Number of files.")
+    parser.add_argument("--threads", type=int, default=8, help="Transfer threads.")
+    parser.add_argument(
+        "--wait-ms", type=float, default=1.0, help="Wait per transfer step, in milliseconds."
+    )
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.DEBUG)
+    LOG.propagate = False
+    files = [f"sample_{i // 1000:04d}/reads_{i:09d}_R1.fastq" for i in range(args.files)]
+
+    print(
+        f"{args.files} files, {args.threads} threads, 6 debug messages per file, "
+        f"{args.wait_ms} ms per step"
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, make_handler, transfer in (
+            ("sync", sync_handler, transfer_eager),
+            ("queue", dds_cli.utils.setup_logging_to_file, transfer_lazy),
+        ):
+            log_file = pathlib.Path(tmpdir) / f"{name}.log"
+            logging_time, wall = run(
+                make_handler(str(log_file)), transfer, files, args.threads, args.wait_ms / 1000
+            )
+            with log_file.open(encoding="utf-8") as lines:
+                nr_lines = sum(1 for _ in lines)
+            results[name] = (logging_time, nr_lines)
+            print(
+                f"{name:<6} logging per file: {logging_time / args.files * 1e6:>7.1f} us  "
+                f"wall: {wall:>6.2f} s  lines: {nr_lines}"
+            )
+
+    assert results["sync"][1] == results["queue"][1], "Log lines differ"
+    print(f"per-file logging time reduction: {results['sync'][0] / results['queue'][0]:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
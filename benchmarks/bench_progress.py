@@ -0,0 +1,106 @@
+"""Benchmark: cost of the progress display for a delivery with many files.
+
+Each transfer thread does what `dds data put` does with the progress per file: adds a task,
+advances it for every 64 KiB chunk, as `Encryptor.encrypt_filechunks` and the boto3 callback do,
+and removes it. The main thread advances the summary task per file. Compared:
+
+- rich: the previous setup - a rich.progress.Progress, which takes its lock on every update.
+- transfer: `dds_cli.transfer_progress.TransferProgress` - per thread counters, no lock, read
+  when shown.
+- silent: TransferProgress with --silent - the file tasks are not added.
+
+The progress is rendered to memory, at the same refresh rate as in the CLI. Shown is the wall
+time per file. Run from the repository root, with dds_cli installed:
+
+    python benchmarks/bench_progress.py --files 5000 --chunks 64 --threads 8
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import concurrent.futures
+import io
+import time
+
+# Installed
+from rich.console import Console
+from rich.progress import BarColumn, Progress
+
+# Own modules
+from dds_cli import FileSegment
+from dds_cli.transfer_progress import TransferProgress
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def console():
+    """A terminal console rendering to memory."""
+    return Console(file=io.StringIO(), width=120, force_terminal=True)
+
+
+def rich_progress():
+    """The previous progress of dds data put."""
+    return Progress(
+        "{task.description}",
+        BarColumn(bar_width=None),
+        " • ",
+        "[progress.percentage]{task.percentage:>3.1f}%",
+        refresh_per_second=2,
+        console=console(),
+    )
+
+
+def run(progress, files, chunks, threads, silent):
+    """Transfer all files with the progress; return the wall seconds."""
+
+    def transfer(file):
+        task = progress.add_task(
+            description=file,
+            total=chunks * FileSegment.SEGMENT_SIZE_RAW,
+            visible=not silent,
+            file=file,
+            step="put",
+        )
+        for _ in range(chunks):
+            progress.advance(task, FileSegment.SEGMENT_SIZE_RAW)
+        progress.remove_task(task)
+
+    start = time.perf_counter()
+    with progress:
+        summary = progress.add_task(description="Upload", total=len(files))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as texec:
+            for _ in texec.map(transfer, files):
+                progress.advance(summary)
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5_000, help="Number of files.")
+    parser.add_argument("--chunks", type=int, default=64, help="64 KiB chunks per file.")
+    parser.add_argument("--threads", type=int, default=8, help="Transfer threads.")
+    args = parser.parse_args()
+
+    files = [f"sample_{i // 1000:04d}/reads_{i:09d}_R1.fastq" for i in range(args.files)]
+    print(f"{args.files} files, {args.chunks} chunks per file, {args.threads} threads")
+    results = {}
+    for name, make_progress, silent in (
+        ("rich", rich_progress, False),
+        ("transfer", lambda: TransferProgress(console=console()), False),
+        ("silent", lambda: TransferProgress(console=console()), True),
+    ):
+        wall = run(make_progress(), files, args.chunks, args.threads, silent)
+        results[name] = wall
+        print(f"{name:<9} per file: {wall / args.files * 1e6:>7.1f} us  wall: {wall:>6.2f} s")
+
+    print(f"progress overhead reduction: {results['rich'] / results['transfer']:>5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark: reading local files for upload with and without the FileReader.
+
+Creates a synthetic file and compares the previous read path, a generator yielding new 64 KiB
+`bytes` for every `read`, with `dds_cli.file_reader.FileReader`, which reads large blocks into
+a reused buffer and hands memoryviews to the hash and compressor. Measured per file:
+
+- read: only reading, which shows the cost of the read path itself.
+- hash: SHA-256 of the file, as when verifying checksums.
+- upload stream: checksum plus compressed 64 KiB chunks, as in LocalFileHandler.stream_from_file.
+  The previous path read the file twice, once for the checksum and once for compression.
+
+Run from the repository root, with dds_cli installed (e.g. `pip install -e .`):
+
+    python benchmarks/bench_read_path.py --size-mb 1024 --repeat 3
+
+The file is dropped from the page cache before every run (Linux), since the FileReader drops
+what it has read and files to upload are normally not cached.
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import hashlib
+import os
+import pathlib
+import tempfile
+import time
+
+# Installed
+import zstandard as zstd
+
+# Own modules
+from dds_cli import FileSegment
+from dds_cli.file_compressor import Compressor
+from dds_cli.file_reader import FileReader
+
+###############################################################################
+# PREVIOUS READ PATH ######################################### PREVIOUS READ PATH #
+###############################################################################
+
+
+def read_file_generator(file, chunk_size=FileSegment.SEGMENT_SIZE_RAW):
+    """The previous LocalFileHandler.read_file."""
+    with file.open(mode="rb") as infile:
+        yield from iter(lambda: infile.read(chunk_size), b"")
+
+
+def compress_file_generator(file, chunk_size=FileSegment.SEGMENT_SIZE_RAW):
+    """The previous Compressor.compress_file."""
+    with file.open(mode="rb") as infile:
+        cctzx = zstd.ZstdCompressor(write_checksum=True, level=4)
+        with cctzx.stream_reader(infile) as compressor:
+            yield from iter(lambda: compressor.read(chunk_size), b"")
+
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def read_generator(file):
+    """Only read, with the previous read path."""
+    return sum(len(x) for x in read_file_generator(file))
+
+
+def read_reader(file):
+    """Only read, with the FileReader."""
+    return sum(len(x) for x in FileReader(file=file))
+
+
+def hash_generator(file):
+    """Hash with the previous read path."""
+    checksum = hashlib.sha256()
+    for chunk in read_file_generator(file):
+        checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def hash_reader(file):
+    """Hash with the FileReader."""
+    checksum = hashlib.sha256()
+    for block in FileReader(file=file):
+        checksum.update(block)
+    return checksum.hexdigest()
+
+
+def stream_generator(file):
+    """Checksum and compressed chunks with the previous read path."""
+    checksum = hashlib.sha256()
+    for chunk in read_file_generator(file):
+        checksum.update(chunk)
+    for _ in compress_file_generator(file):
+        pass
+    return checksum.hexdigest()
+
+
+def stream_reader(file):
+    """Checksum and compressed chunks with the FileReader, in one read."""
+    checksum = hashlib.sha256()
+
+    def hashed_blocks():
+        for block in FileReader(file=file):
+            checksum.update(block)
+            yield block
+
+    for _ in Compressor.compress_chunks(chunks=hashed_blocks()):
+        pass
+    return checksum.hexdigest()
+
+
+def evict(file):
+    """Drop the file from the page cache, where supported, so that every run reads from disk."""
+    if hasattr(os, "posix_fadvise"):
+        with file.open(mode="rb") as infile:
+            os.posix_fadvise(infile.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def measure(func, file, repeat):
+    """Best wall time of repeat runs, and the result of the function."""
+    best, result = None, None
+    for _ in range(repeat):
+        evict(file)
+        start = time.perf_counter()
+        result = func(file)
+        wall = time.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+    return best, result
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=512, help="Size of the file in MiB.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path, best is shown.")
+    parser.add_argument("--directory", type=pathlib.Path, default=None, help="Where to write.")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory(dir=args.directory) as tmp_dir:
+        file = pathlib.Path(tmp_dir) / "file.bin"
+        # Half random, half repeated - so that compression has something to do
+        with file.open(mode="wb") as outfile:
+            for i in range(size // (1024 * 1024)):
+                outfile.write(os.urandom(1024 * 1024) if i % 2 else b"dds" * 349525 + b"d")
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+        for name, previous, new in (
+            ("read", read_generator, read_reader),
+            ("hash", hash_generator, hash_reader),
+            ("upload stream", stream_generator, stream_reader),
+        ):
+            previous_wall, previous_result = measure(previous, file, args.repeat)
+            new_wall, new_result = measure(new, file, args.repeat)
+            assert previous_result == new_result, "Results differ"
+            print(
+                f"{name:<14} generator: {size / previous_wall / 1e6:>8.1f} MB/s  "
+                f"FileReader: {size / new_wall / 1e6:>8.1f} MB/s  "
+                f"speedup: {previous_wall / new_wall:>5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: writing large downloaded files with and without the OutputWriter.
+
+Writes synthetic files of the given size in the 64 KiB chunks produced by the download and
+decryption, once through a default buffered Python file (as before) and once through
+`dds_cli.output_writer.OutputWriter` with the size known up front. Reports the throughput,
+the number of extents the file ended up in (Linux, if `filefrag` is installed) and how much
+of the written file is still in the page cache (Linux, via mincore in `fincore`, if installed).
+
+Run from the repository root, with dds_cli installed (e.g. `pip install -e .`):
+
+    python benchmarks/bench_write_path.py --size-mb 2048 --files 2 --directory /path/on/target/fs
+
+NB! Use a directory on the filesystem you want to measure - the default temporary directory
+is often tmpfs, where neither allocation nor the page cache hints make a difference.
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import argparse
+import os
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import time
+
+# Own modules
+from dds_cli import FileSegment
+from dds_cli.output_writer import OutputWriter
+
+###############################################################################
+# BENCHMARK ####################################################### BENCHMARK #
+###############################################################################
+
+
+def chunks(size):
+    """Yield size bytes of incompressible data in download sized chunks."""
+    chunk = os.urandom(FileSegment.SEGMENT_SIZE_RAW)
+    for _ in range(size // len(chunk)):
+        yield chunk
+
+
+def write_default(file, size):
+    """Write the file the way it was done before the OutputWriter."""
+    with file.open(mode="wb+") as new_file:
+        for chunk in chunks(size):
+            new_file.write(chunk)
+        new_file.flush()
+        os.fsync(new_file.fileno())
+
+
+def write_output_writer(file, size):
+    """Write the file with the OutputWriter."""
+    with OutputWriter(file=file, size=size) as writer:
+        for chunk in chunks(size):
+            writer.write(chunk)
+        writer.flush()
+        os.fsync(writer._fd)  # pylint: disable=protected-access
+
+
+def command_output(*command):
+    """Output of an optional command line tool, or None if not available."""
+    if not shutil.which(command[0]):
+        return None
+    result = subprocess.run(command, capture_output=True, text=True, check=False)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def run(name, write_func, directory, files, size):
+    """Write the files and print a summary line."""
+    paths = [directory / f"{name}_{i}.bin" for i in range(files)]
+    start = time.perf_counter()
+    for path in paths:
+        write_func(file=path, size=size)
+    wall = time.perf_counter() - start
+
+    extents = command_output("filefrag", str(paths[0]))
+    cached = command_output("fincore", "--noheadings", "--output", "RES", str(paths[0]))
+    print(
+        f"{name:<16} MB/s: {files * size / wall / 1e6:>8.1f}  "
+        f"extents: {extents.rsplit(':', 1)[-1].strip() if extents else 'n/a':<22}  "
+        f"cached: {cached or 'n/a'}"
+    )
+    for path in paths:
+        path.unlink()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=1024, help="Size of each file in MiB.")
+    parser.add_argument("--files", type=int, default=2, help="Number of files per writer.")
+    parser.add_argument("--directory", type=pathlib.Path, default=None, help="Where to write.")
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory(dir=args.directory) as tmp_dir:
+        run("default", write_default, pathlib.Path(tmp_dir), args.files, size)
+        run("OutputWriter", write_output_writer, pathlib.Path(tmp_dir), args.files, size)
+
+
+if __name__ == "__main__":
+    main()
@@ -41,7 +41,7 @@ DDS_METHODS = ["put", "get", "ls", "rm", "create", "add", "delete", "on", "off"]
 DDS_DIR_REQUIRED_METHODS = ["put", "get"]
 
 # Methods which require a project ID
-DDS_KEYS_REQUIRED_METHODS = ["put", "get"]
+DDS_KEYS_REQUIRED_METHODS = ["put", "get", "decrypt", "prepare"]
 
 # Token related variables
 TOKEN_FILE = pathlib.Path.home() / ".dds_cli_token"
@@ -8,6 +8,7 @@
 import concurrent.futures
 import itertools
 import logging
+import os
 import pathlib
 import sys
 
@@ -17,7 +18,6 @@ import questionary
 import rich
 import rich.logging
 import rich.markup
-import rich.progress
 import rich.prompt
 import rich_click as click
 
@@ -25,17 +25,22 @@ import rich_click as click
 import dds_cli
 import dds_cli.account_manager
 import dds_cli.auth
+import dds_cli.data_decryptor
 import dds_cli.data_getter
 import dds_cli.data_lister
+import dds_cli.data_preparer
 import dds_cli.data_putter
 import dds_cli.data_remover
+import dds_cli.data_streamer
 import dds_cli.directory
 import dds_cli.message_helper
 import dds_cli.motd_manager
+import dds_cli.profiling
 import dds_cli.project_creator
 import dds_cli.project_info
 import dds_cli.project_status
 import dds_cli.superadmin_helper
+import dds_cli.transfer_progress
 import dds_cli.unit_manager
 import dds_cli.user
 import dds_cli.utils
@@ -46,6 +51,7 @@ from dds_cli.options import (
     email_option,
     folder_option,
     json_flag,
+    metrics_textfile_option,
     nomail_flag,
     num_threads_option,
     project_option,
@@ -55,6 +61,7 @@ from dds_cli.options import (
     source_option,
     source_path_file_option,
     token_path_option,
+    trace_option,
     tree_flag,
     usage_flag,
     username_option,
@@ -116,6 +123,32 @@ if len(sys.argv) == 1 or (len(sys.argv) > 1 and sys.argv[1] != "motd"):
         LOG.debug("Skipping MOTD display due to DDS error: %s", dds_cli_err)
 
 
+class OptionalValueOption(click.Option):
+    """An option with a value which can be left out, e.g. '--profile' or '--profile=mem'.
+
+    Click takes the next argument as the value, also when it is the command, e.g. in
+    'dds --profile data put'. An argument which is not one of the choices is therefore given back,
+    and the flag_value used.
+    """
+
+    def handle_parse_result(self, ctx, opts, args):
+        """Give back the argument taken as the value if it is not one of the choices."""
+        value = opts.get(self.name)
+        if isinstance(value, str) and value not in self.type.choices:
+            opts = {**opts, self.name: self.flag_value}
+            args = [value, *args]
+        return super().handle_parse_result(ctx, opts, args)
+
+
+def create_staging_dir(path: pathlib.Path, allow_existing: bool = False):
+    """Create the staging directory, exiting with the error if it cannot be created."""
+    try:
+        return dds_cli.directory.DDSDirectory(path=path, allow_existing=allow_existing)
+    except dds_cli.exceptions.DDSCLIException as err:
+        LOG.error(err)
+        sys.exit(1)
+
+
 # -- dds -- #
 @click.group()
 @click.option(
@@ -134,10 +167,31 @@ if len(sys.argv) == 1 or (len(sys.argv) > 1 and sys.argv[1] != "motd"):
     metavar="<filename>",
     required=False,
 )
+@click.option(
+    "--log-format",
+    type=click.Choice(["text", "json"]),
+    default="text",
+    show_default=True,
+    help="Format of the log file: text lines, or one JSON object per line (JSON Lines).",
+)
 @click.option(
     "--no-prompt", is_flag=True, default=False, help="Run without any interactive features."
 )
 @token_path_option()
+@click.option(
+    "--profile",
+    cls=OptionalValueOption,
+    type=click.Choice(["cpu", "mem"]),
+    is_flag=False,
+    flag_value="cpu",
+    default=None,
+    help=(
+        "Profile the command, for a bug report: the CPU time per function with cProfile "
+        "('--profile' or '--profile=cpu'), or the memory allocations with tracemalloc "
+        "('--profile=mem'). Saved in the logs of the staging directory, or in the current "
+        "directory. The time and peak memory of each phase are logged."
+    ),
+)
 @click.version_option(
     version=dds_cli.__version__,
     prog_name=dds_cli.__title__,
@@ -147,7 +201,9 @@ if len(sys.argv) == 1 or (len(sys.argv) > 1 and sys.argv[1] != "motd"):
     help="List the options of any DDS subcommand and its default settings.",
 )
 @click.pass_context
-def dds_main(click_ctx, verbose, force_no_log, log_file, no_prompt, token_path):
+def dds_main(
+    click_ctx, verbose, force_no_log, log_file, log_format, no_prompt, token_path, profile
+):
     """SciLifeLab Data Delivery System (DDS) command line interface.
 
     Access token is saved in a .dds_cli_token file in the home directory.
@@ -156,6 +212,11 @@ def dds_main(click_ctx, verbose, force_no_log, log_file, no_prompt, token_path):
     delivery to finish. To avoid that a delivery fails because of an expired token, we recommend
     reauthenticating yourself before each delivery ('dds data put' / 'get').
     """
+    # Profile the whole command, until its context is closed
+    if profile and "--help" not in sys.argv:
+        dds_cli.profiling.start(mode=profile)
+        click_ctx.call_on_close(dds_cli.profiling.stop)
+
     # Get token metadata
     username = dds_cli.user.User.get_user_name_if_logged_in(token_path=token_path)
 
@@ -171,6 +232,7 @@ def dds_main(click_ctx, verbose, force_no_log, log_file, no_prompt, token_path):
             "TOKEN_PATH": token_path,
             "COMMAND": sys.argv,
             "DEFAULT_LOG": True,
+            "LOG_JSON": log_format == "json",
         }
 
         # Set the base logger to output DEBUG
@@ -197,7 +259,9 @@ def dds_main(click_ctx, verbose, force_no_log, log_file, no_prompt, token_path):
                 )
                 sys.exit(1)
             else:
-                file_handler = dds_cli.utils.setup_logging_to_file(filename=log_file)
+                file_handler = dds_cli.utils.setup_logging_to_file(
+                    filename=log_file, json_lines=log_format == "json"
+                )
                 LOG.addHandler(file_handler)
         elif force_no_log:
             LOG.warning(
@@ -1641,6 +1705,8 @@ def data_group_command(_):
 @source_path_file_option()
 @num_threads_option()
 @destination_option(help_message="Destination of uploaded data.", option_type=str)
+@metrics_textfile_option()
+@trace_option()
 @click.option(
     "--overwrite",
     is_flag=True,
@@ -1648,7 +1714,45 @@ def data_group_command(_):
     show_default=True,
     help="Overwrite files if already uploaded.",
 )
+@click.option(
+    "--prepared",
+    required=False,
+    type=click.Path(
+        exists=True, file_okay=False, dir_okay=True, resolve_path=True, path_type=pathlib.Path
+    ),
+    help="Upload the files in a directory created by 'dds data prepare'.",
+)
+@click.option(
+    "--from-stdin",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Upload data read from stdin, e.g. piped from another program. Requires '--name'.",
+)
+@click.option(
+    "--name",
+    required=False,
+    type=str,
+    help="Path in the project to save the data from stdin as, e.g. 'folder/file.tar'.",
+)
 # Flags
+@click.option(
+    "--seekable",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help=(
+        "Compress the files so that parts of them can be downloaded on their own, "
+        "with 'dds data get --byte-range'."
+    ),
+)
+@click.option(
+    "--dedup",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Upload files with the same contents only once, and copy the others in the cloud.",
+)
 @break_on_fail_flag(help_message="Cancel upload of all files if one fails.")
 @silent_flag(
     help_message="Turn off progress bar for each individual file. Summary bars still visible."
@@ -1663,8 +1767,15 @@ def put_data(
     destination,
     break_on_fail,
     overwrite,
+    prepared,
+    from_stdin,
+    name,
+    seekable,
+    dedup,
     num_threads,
     silent,
+    metrics_textfile,
+    trace_file,
 ):
     """Upload data to a project.
 
@@ -1675,8 +1786,9 @@ def put_data(
     Prior to the upload, the DDS checks if the files are compressed and if not compresses them,
     followed by encryption. After this the files are uploaded to the cloud.
 
-    NB! The current setup requires compression and encryption to be performed locally. Make sure you
-    have enough space. This will be improved on in future releases.
+    NB! The current setup requires compression and encryption to be performed locally. A warning is
+    shown up front if the staging directory does not have enough space, and files are only processed
+    when there is space for them.
     The default number of files to compress, encrypt and upload at a time is four. This can be
     changed by altering the `--num-threads` option, but whether or not it works depends on the
     machine you are running the CLI on.
@@ -1684,20 +1796,79 @@ def put_data(
     The token is valid for 7 days. Make sure your token is valid long enough for the
     delivery to finish. To avoid that a delivery fails because of an expired token, we recommend
     reauthenticating yourself before uploading data.
+
+    To compress and encrypt the files ahead of time, run `dds data prepare` and then upload the
+    prepared directory with `--prepared`. Only the upload is then performed.
+
+    To upload the output of another program without saving it first, pipe it to
+    `dds data put --from-stdin --name <path in project>`. The data is compressed, unless already
+    compressed, and encrypted while it is read, and uploaded in parts.
+
+    With `--seekable`, the files are compressed in independent frames of 1 MiB, so that a part of a
+    file can later be downloaded with `dds data get --byte-range` without the rest of it. This
+    gives slightly larger files. Files which are already compressed are uploaded as they are.
+
+    With `--dedup`, files with the same contents, e.g. links to the same file or copies of a
+    reference file, are compressed, encrypted and uploaded once. The others are copied from it in
+    the cloud. Only files with the same size as another file are read to check this.
+
+    The time, bytes and retries of each stage of the upload, e.g. compression and encryption, the
+    upload and the database update, are saved in the logs of the staging directory, as
+    `dds_metrics.json` and, in the Prometheus text format, `dds_metrics.prom`. They are updated
+    while the upload runs. Use `--metrics-textfile` to save the latter elsewhere, e.g. for the
+    node-exporter textfile collector.
+
+    With `--trace <file>`, a timeline of the upload is saved in the file: when each file was
+    collected, hashed, compressed and encrypted, uploaded and added to the database, and in which
+    thread. Open it in https://ui.perfetto.dev to see how the threads overlap.
     """
-    # Define staging directory path
-    staging_dir_path: pathlib.Path = pathlib.Path(
-        f"DataDelivery_{dds_cli.timestamp.TimeStamp().timestamp}_{project}_upload"
-    )
+    if from_stdin != bool(name):
+        LOG.error("Option '--from-stdin' requires '--name', and '--name' requires '--from-stdin'.")
+        sys.exit(1)
+    if from_stdin and (source or source_path_file or destination or prepared):
+        LOG.error(
+            "Flag '--from-stdin' cannot be used together with options '--source', "
+            "'--source-path-file', '--destination' or '--prepared'."
+        )
+        sys.exit(1)
+
+    if prepared and seekable:
+        LOG.error("Flag '--seekable' is set when preparing, with 'dds data prepare --seekable'.")
+        sys.exit(1)
+    if dedup and (prepared or from_stdin):
+        LOG.error("Flag '--dedup' cannot be used together with '--prepared' or '--from-stdin'.")
+        sys.exit(1)
+
+    if prepared:
+        if source or source_path_file or destination or mount_dir:
+            LOG.error(
+                "Option '--prepared' cannot be used together with options '--source', "
+                "'--source-path-file', '--destination' or '--mount-dir'."
+            )
+            sys.exit(1)
+        if not (prepared / "meta" / dds_cli.data_preparer.PREPARED_MANIFEST_NAME).is_file():
+            LOG.error(
+                "No prepared files in '%s'. Specify the directory created by 'dds data prepare'.",
+                rich.markup.escape(str(prepared)),
+            )
+            sys.exit(1)
 
-    # Staging directory should either be in specified mount dir or in current location
-    if mount_dir:
-        staging_dir_path = mount_dir / staging_dir_path
+        # The prepared directory is the staging directory
+        staging_dir = create_staging_dir(path=prepared, allow_existing=True)
     else:
-        staging_dir_path = pathlib.Path.cwd() / staging_dir_path
+        # Define staging directory path
+        staging_dir_path: pathlib.Path = pathlib.Path(
+            f"DataDelivery_{dds_cli.timestamp.TimeStamp().timestamp}_{project}_upload"
+        )
 
-    # Generate staging directory
-    staging_dir = dds_cli.directory.DDSDirectory(path=staging_dir_path)
+        # Staging directory should either be in specified mount dir or in current location
+        if mount_dir:
+            staging_dir_path = mount_dir / staging_dir_path
+        else:
+            staging_dir_path = pathlib.Path.cwd() / staging_dir_path
+
+        # Generate staging directory
+        staging_dir = create_staging_dir(path=staging_dir_path)
 
     # Setup logging -- needs to be in this file to work
     if click_ctx.get("DEFAULT_LOG"):
@@ -1707,7 +1878,9 @@ def put_data(
         )
 
         # Start logging to file
-        file_handler = dds_cli.utils.setup_logging_to_file(filename=default_log_name)
+        file_handler = dds_cli.utils.setup_logging_to_file(
+            filename=default_log_name, json_lines=click_ctx.get("LOG_JSON", False)
+        )
         LOG.addHandler(file_handler)
 
     # Log command
@@ -1727,8 +1900,121 @@ def put_data(
             token_path=click_ctx.get("TOKEN_PATH"),
             destination=destination,
             staging_dir=staging_dir,
+            prepared=bool(prepared),
+            stream=click.get_binary_stream("stdin") if from_stdin else None,
+            stream_name=name,
+            seekable=seekable,
+            dedup_contents=dedup,
+            metrics_textfile=metrics_textfile,
+            trace_file=trace_file,
+        )
+    except (
+        dds_cli.exceptions.AuthenticationError,
+        dds_cli.exceptions.UploadError,
+        dds_cli.exceptions.ApiResponseError,
+        dds_cli.exceptions.ApiRequestError,
+        dds_cli.exceptions.NoKeyError,
+        dds_cli.exceptions.NoDataError,
+        dds_cli.exceptions.DDSCLIException,
+    ) as err:
+        LOG.error(err)
+        sys.exit(1)
+
+
+# -- dds data prepare -- #
+@data_group_command.command(name="prepare", no_args_is_help=True)
+# Options
+@click.option(
+    "--mount-dir",
+    "-md",
+    required=False,
+    type=click.Path(
+        exists=False, file_okay=False, dir_okay=True, resolve_path=True, path_type=pathlib.Path
+    ),
+    help="New directory where the prepared files will be saved.",
+)
+@project_option(required=True, help_message="Project ID to which you will upload the data.")
+@source_option(
+    help_message="Path to file or directory (local).",
+    option_type=click.Path(exists=True, path_type=pathlib.Path),
+)
+@source_path_file_option()
+@num_threads_option(
+    default=min(32, os.cpu_count() or 1),
+    help_message="Number of files to prepare in parallel. Defaults to the number of CPUs.",
+)
+@destination_option(help_message="Destination of uploaded data.", option_type=str)
+# Flags
+@click.option(
+    "--seekable",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help=(
+        "Compress the files so that parts of them can be downloaded on their own, "
+        "with 'dds data get --byte-range'."
+    ),
+)
+@silent_flag(
+    help_message="Turn off progress bar for each individual file. Summary bars still visible."
+)
+@click.pass_obj
+def prepare_data(
+    click_ctx,
+    mount_dir,
+    project,
+    source,
+    source_path_file,
+    num_threads,
+    destination,
+    seekable,
+    silent,
+):
+    """Compress and encrypt data for a later upload to a project.
+
+    Limited to Unit Admins and Personnel.
+
+    The files are compressed, if not already compressed, and encrypted with the project key, and
+    saved together with a manifest in a new directory. Upload the directory with
+    `dds data put --project <project> --prepared <directory>`, which then only uploads the files.
+
+    The prepared directory needs space for all files. Files are deleted from it once uploaded, and
+    an interrupted upload can be continued by running the same command again.
+    """
+    staging_dir_path: pathlib.Path = pathlib.Path(
+        f"DataDelivery_{dds_cli.timestamp.TimeStamp().timestamp}_{project}_prepared"
+    )
+    staging_dir_path = (mount_dir or pathlib.Path.cwd()) / staging_dir_path
+
+    # Generate staging directory
+    staging_dir = create_staging_dir(path=staging_dir_path)
+
+    # Setup logging -- needs to be in this file to work
+    if click_ctx.get("DEFAULT_LOG"):
+        default_log_name = dds_cli.utils.get_default_log_name(
+            command=click_ctx.get("COMMAND", ["commandnotfound"]),
+            log_directory=staging_dir.directories["LOGS"],
+        )
+        file_handler = dds_cli.utils.setup_logging_to_file(
+            filename=default_log_name, json_lines=click_ctx.get("LOG_JSON", False)
         )
+        LOG.addHandler(file_handler)
+
+    try:
+        with dds_cli.data_preparer.DataPreparer(
+            project=project,
+            staging_dir=staging_dir,
+            source=source,
+            source_path_file=source_path_file,
+            destination=destination,
+            seekable=seekable,
+            silent=silent,
+            no_prompt=click_ctx.get("NO_PROMPT", False),
+            token_path=click_ctx.get("TOKEN_PATH"),
+        ) as preparer:
+            preparer.prepare_all(num_threads=num_threads)
     except (
+        dds_cli.exceptions.InvalidMethodError,
         dds_cli.exceptions.AuthenticationError,
         dds_cli.exceptions.UploadError,
         dds_cli.exceptions.ApiResponseError,
@@ -1741,6 +2027,32 @@ def put_data(
         sys.exit(1)
 
 
+def validate_byte_range(_ctx, _param, value):
+    """Validate the byte range START:END and return it as (start, end), end not included.
+
+    START defaults to the start of the file and END to the end of the file.
+    """
+    if value is None:
+        return None
+
+    start, separator, end = value.partition(":")
+    try:
+        byte_range = (int(start) if start else 0, int(end) if end else None)
+    except ValueError:
+        byte_range = None
+    if (
+        not separator
+        or byte_range is None
+        or byte_range[0] < 0
+        or (byte_range[1] is not None and byte_range[1] <= byte_range[0])
+    ):
+        raise click.BadParameter(
+            "Byte range must be START:END, where END is larger than START and not included, "
+            "e.g. '0:1024'. START or END can be left out to read from the start or to the end."
+        )
+    return byte_range
+
+
 # -- dds data get -- #
 @data_group_command.command(name="get", no_args_is_help=True)
 # Options
@@ -1774,6 +2086,55 @@ def put_data(
     show_default=True,
     help="Perform SHA-256 checksum verification after download (slower).",
 )
+@click.option(
+    "--sync",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help=(
+        "Reuse an existing '--destination' and only download files which are missing or "
+        "differ from the files in the project."
+    ),
+)
+@click.option(
+    "--fetch-only",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Only download the encrypted files. Decrypt them later with 'dds data decrypt'.",
+)
+@click.option(
+    "--dedup",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help=(
+        "Download files with the same contents only once, and save the others as hardlinks to it."
+    ),
+)
+@click.option(
+    "--to-stdout",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Stream one file to stdout instead of saving it. Nothing is saved locally.",
+)
+@click.option(
+    "--tar",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Stream the files as a tar archive to stdout instead of saving them.",
+)
+@click.option(
+    "--byte-range",
+    required=False,
+    type=str,
+    callback=validate_byte_range,
+    help="Stream only the bytes START:END (END not included) of one file to stdout.",
+)
+@metrics_textfile_option()
+@trace_option()
 @click.pass_obj
 def get_data(
     click_ctx,
@@ -1786,17 +2147,48 @@ def get_data(
     num_threads,
     silent,
     verify_checksum,
+    sync,
+    fetch_only,
+    dedup,
+    to_stdout,
+    tar,
+    byte_range,
+    metrics_textfile,
+    trace_file,
 ):
     """Download data from a project.
 
     To download the data to a specific destination, use the `--destination` option. This cannot be
-    an existing directory, for security reasons. This will be improved on in future releases.
+    an existing directory, for security reasons, unless the `--sync` flag is used.
+
+    With `--sync`, files in the destination are compared to the size and checksum of the files in
+    the project, and only missing or changed files are downloaded. Information on the verified
+    files is saved in the destination, so that unchanged files are not checked again next time.
 
     Following to the download, the DDS decrypts the files, checks if the files are compressed and if
     so decompresses them.
 
-    NB! The current setup requires decryption and decompression to be performed locally. Make sure
-    you have enough space. This will be improved on in future releases.
+    With `--fetch-only`, the files are only downloaded, and kept encrypted in the staging directory
+    together with the information needed to decrypt them. Use `dds data decrypt` to decrypt them
+    afterwards, e.g. when the download has finished. Files which fail to be decrypted during a
+    normal download are also kept, and can be decrypted in the same way.
+
+    With `--dedup`, files with the same checksum and size, e.g. a reference file copied into
+    several folders, are downloaded once. The other files are saved as hardlinks to it, or as
+    copies where hardlinks are not supported. Changing one hardlinked file changes them all.
+
+    With `--to-stdout`, one file is streamed to stdout, e.g. to pipe it into another program. With
+    `--tar`, the specified files and folders are streamed to stdout as a tar archive. The files are
+    decrypted and decompressed while downloaded, and nothing is saved locally.
+
+    With `--byte-range START:END`, only those bytes of one file are downloaded and streamed to
+    stdout, e.g. `--byte-range 1048576:2097152`. This is fast for files uploaded with
+    `dds data put --seekable` and for files which were compressed before the upload. Other files
+    are downloaded from the start up to END.
+
+    NB! The current setup requires decryption and decompression to be performed locally. A warning
+    is shown up front if the destination does not have enough space, and files are only downloaded
+    when there is space for both the encrypted and the decrypted file.
     The default number of files to download, decrypt and decompress at a time is four. This can be
     changed by altering the `--num-threads` option, but whether or not it works depends on the
     machine you are running the CLI on.
@@ -1804,6 +2196,15 @@ def get_data(
     The token is valid for 7 days. Make sure your token is valid long enough for the
     delivery to finish. To avoid that a delivery fails because of an expired token, we recommend
     reauthenticating yourself before downloading data.
+
+    The time, bytes and retries of each stage of the download, e.g. the download, decryption and
+    database update, are saved in the logs of the staging directory, as `dds_metrics.json` and, in
+    the Prometheus text format, `dds_metrics.prom`. Use `--metrics-textfile` to save the latter
+    elsewhere, e.g. for the node-exporter textfile collector.
+
+    With `--trace <file>`, a timeline of the download is saved in the file: when each file was
+    downloaded, decrypted and decompressed, and updated in the database, and in which thread.
+    Open it in https://ui.perfetto.dev to see how the threads overlap.
     """
     if get_all and (source or source_path_file):
         LOG.error(
@@ -1816,6 +2217,59 @@ def get_data(
             "or '--get-all' to download all project contents."
         )
         sys.exit(1)
+    elif sync and not destination:
+        LOG.error("Flag '--sync' requires the '--destination' option.")
+        sys.exit(1)
+    elif sync and fetch_only:
+        LOG.error("Flags '--sync' and '--fetch-only' cannot be used together.")
+        sys.exit(1)
+    elif dedup and fetch_only:
+        LOG.error("Flags '--dedup' and '--fetch-only' cannot be used together.")
+        sys.exit(1)
+
+    # Stream to stdout - no staging directory
+    if to_stdout or tar or byte_range:
+        if get_all or destination or sync or fetch_only:
+            LOG.error(
+                "Flags '--to-stdout', '--tar' and '--byte-range' cannot be used together with "
+                "'--get-all', '--destination', '--sync' or '--fetch-only'."
+            )
+            sys.exit(1)
+        if tar and byte_range:
+            LOG.error("Flags '--tar' and '--byte-range' cannot be used together.")
+            sys.exit(1)
+
+        try:
+            with dds_cli.data_streamer.DataStreamer(
+                project=project,
+                source=source,
+                source_path_file=source_path_file,
+                tar=tar,
+                byte_range=byte_range,
+                verify_checksum=verify_checksum,
+                no_prompt=click_ctx.get("NO_PROMPT", False),
+                token_path=click_ctx.get("TOKEN_PATH"),
+            ) as streamer:
+                streamer.stream(output=click.get_binary_stream("stdout"))
+        except BrokenPipeError:
+            # The reading process has exited, e.g. 'head' - stop writing to it
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        except (
+            dds_cli.exceptions.InvalidMethodError,
+            OSError,
+            dds_cli.exceptions.TokenNotFoundError,
+            dds_cli.exceptions.AuthenticationError,
+            dds_cli.exceptions.ApiRequestError,
+            dds_cli.exceptions.ApiResponseError,
+            dds_cli.exceptions.DDSCLIException,
+            dds_cli.exceptions.NoDataError,
+            dds_cli.exceptions.DownloadError,
+            dds_cli.exceptions.NoKeyError,
+        ) as err:
+            LOG.error(err)
+            sys.exit(1)
+        return
 
     # Define staging directory path
     staging_dir_path: pathlib.Path = pathlib.Path.cwd() / pathlib.Path(
@@ -1825,7 +2279,7 @@ def get_data(
         staging_dir_path = destination
 
     # Generate staging directory
-    staging_dir = dds_cli.directory.DDSDirectory(path=staging_dir_path)
+    staging_dir = create_staging_dir(path=staging_dir_path, allow_existing=sync)
 
     # Setup logging -- needs to be in this file to work
     if click_ctx.get("DEFAULT_LOG"):
@@ -1835,7 +2289,9 @@ def get_data(
         )
 
         # Start logging to file
-        file_handler = dds_cli.utils.setup_logging_to_file(filename=default_log_name)
+        file_handler = dds_cli.utils.setup_logging_to_file(
+            filename=default_log_name, json_lines=click_ctx.get("LOG_JSON", False)
+        )
         LOG.addHandler(file_handler)
 
     # Log command
@@ -1854,24 +2310,28 @@ def get_data(
             no_prompt=click_ctx.get("NO_PROMPT", False),
             token_path=click_ctx.get("TOKEN_PATH"),
             staging_dir=staging_dir,
+            num_threads=num_threads,
+            sync=sync,
+            fetch_only=fetch_only,
+            dedup_contents=dedup,
+            metrics_textfile=metrics_textfile,
+            trace_file=trace_file,
         ) as getter:
-            with rich.progress.Progress(
-                "{task.description}",
-                rich.progress.BarColumn(bar_width=None),
-                " • ",
-                "[progress.percentage]{task.percentage:>3.1f}%",
-                refresh_per_second=2,
-                console=dds_cli.utils.stderr_console,
+            dds_cli.profiling.phase(name="transfer")
+            with dds_cli.transfer_progress.TransferProgress(
+                console=dds_cli.utils.stderr_console
             ) as progress:
                 # Keep track of futures
                 download_threads = {}
 
                 # Iterator to keep track of which files have been handled
-                iterator = iter(getter.filehandler.data.copy())
+                # File info is added to getter.filehandler.data as files are scheduled
+                iterator = getter.files_to_download
 
                 with concurrent.futures.ThreadPoolExecutor() as texec:
+                    # Total is unknown until all file info has been streamed from the API
                     task_dwnld = progress.add_task(
-                        "Download", total=len(getter.filehandler.data), step="summary"
+                        "Download", total=getter.nr_files, step="summary"
                     )
 
                     # Schedule the first num_threads futures for upload
@@ -1909,6 +2369,9 @@ def get_data(
                                 )
                                 continue
 
+                            # Finished files no longer need to be kept in memory
+                            getter.release(file=downloaded_file)
+
                             new_tasks += 1
                             progress.advance(task_dwnld)
 
@@ -1922,6 +2385,8 @@ def get_data(
                                     progress=progress,
                                 )
                             ] = next_file
+
+                        progress.update(task_dwnld, total=getter.nr_files)
     except (
         dds_cli.exceptions.InvalidMethodError,
         OSError,
@@ -1939,6 +2404,80 @@ def get_data(
         sys.exit(1)
 
 
+# -- dds data decrypt -- #
+@data_group_command.command(name="decrypt", no_args_is_help=True)
+@click.argument(
+    "staging_dir",
+    type=click.Path(
+        exists=True, file_okay=False, dir_okay=True, resolve_path=True, path_type=pathlib.Path
+    ),
+)
+@num_threads_option(
+    default=min(32, os.cpu_count() or 1),
+    help_message="Number of files to decrypt in parallel. Defaults to the number of CPUs.",
+)
+@click.option(
+    "--verify-checksum",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Perform SHA-256 checksum verification after decryption (slower).",
+)
+@click.pass_obj
+def decrypt_data(click_ctx, staging_dir, num_threads, verify_checksum):
+    """Decrypt files downloaded with `dds data get --fetch-only`.
+
+    STAGING_DIR is the directory created by `dds data get`, or the one specified with
+    `--destination`. Files which could not be decrypted during a normal download can also be
+    decrypted this way.
+
+    Only the project key is requested from the DDS, all files are decrypted locally. The encrypted
+    files are deleted once they have been decrypted.
+    """
+    if not (staging_dir / "meta" / dds_cli.data_decryptor.FETCH_MANIFEST_NAME).is_file():
+        LOG.error(
+            "No files to decrypt in '%s'. Specify the directory created by 'dds data get'.",
+            rich.markup.escape(str(staging_dir)),
+        )
+        sys.exit(1)
+
+    staging_dir = create_staging_dir(path=staging_dir, allow_existing=True)
+
+    # Setup logging -- needs to be in this file to work
+    if click_ctx.get("DEFAULT_LOG"):
+        default_log_name = dds_cli.utils.get_default_log_name(
+            command=click_ctx.get("COMMAND", ["commandnotfound"]),
+            log_directory=staging_dir.directories["LOGS"],
+        )
+        file_handler = dds_cli.utils.setup_logging_to_file(
+            filename=default_log_name, json_lines=click_ctx.get("LOG_JSON", False)
+        )
+        LOG.addHandler(file_handler)
+
+    try:
+        with dds_cli.data_decryptor.DataDecryptor(
+            staging_dir=staging_dir,
+            verify_checksum=verify_checksum,
+            no_prompt=click_ctx.get("NO_PROMPT", False),
+            token_path=click_ctx.get("TOKEN_PATH"),
+        ) as decryptor:
+            decryptor.decrypt_all(num_threads=num_threads)
+    except (
+        dds_cli.exceptions.InvalidMethodError,
+        OSError,
+        dds_cli.exceptions.TokenNotFoundError,
+        dds_cli.exceptions.AuthenticationError,
+        dds_cli.exceptions.ApiRequestError,
+        dds_cli.exceptions.ApiResponseError,
+        dds_cli.exceptions.DDSCLIException,
+        dds_cli.exceptions.NoDataError,
+        dds_cli.exceptions.DownloadError,
+        dds_cli.exceptions.NoKeyError,
+    ) as err:
+        LOG.error(err)
+        sys.exit(1)
+
+
 # -- dds data ls -- #
 @data_group_command.command(name="ls", no_args_is_help=True)
 # Options
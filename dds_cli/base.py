@@ -7,7 +7,6 @@
 # Standard library
 import logging
 import pathlib
-import typing
 
 # Installed
 from rich.progress import Progress, SpinnerColumn
@@ -21,7 +20,12 @@ from dds_cli import (
     DDS_KEYS_REQUIRED_METHODS,
 )
 from dds_cli import DDSEndpoint
+from dds_cli import failure_journal as fj
+from dds_cli import metrics
+from dds_cli import profiling
 from dds_cli import s3_connector as s3
+from dds_cli import status
+from dds_cli import tracing
 from dds_cli import user
 from dds_cli import exceptions
 
@@ -51,20 +55,39 @@ class DDSBaseClass:
         token_path: str = None,
         allow_group: bool = False,
         staging_dir: dds_cli.directory.DDSDirectory = None,
+        token: dict = None,
+        keys: tuple = None,
+        s3connector: s3.S3Connector = None,
+        summary: bool = True,
+        metrics_textfile: pathlib.Path = None,
+        trace_file: pathlib.Path = None,
+        headless: bool = False,
     ):
-        """Initialize Base class for authenticating the user and preparing for DDS action."""
+        """Initialize Base class for authenticating the user and preparing for DDS action.
+
+        A token, project keys and S3 connector from an earlier action can be reused, so that
+        several actions can be run without authenticating or fetching the keys again. Without
+        summary, nothing is printed or raised for failed files when exiting. The metrics of the
+        delivery stages are saved in the staging directory, and in the Prometheus format also in
+        metrics_textfile, if given. With trace_file, a timeline of the stages is saved in it.
+        With headless, e.g. when used as a library, no spinners or progress are rendered.
+        """
         self.project = project
         self.method = method
         self.no_prompt = no_prompt
         self.token_path = token_path
 
         self.totp = totp
+        self.summary = summary
+        self.headless = headless
 
         # Keyboardinterrupt
         self.stop_doing = False
 
         # Authenticate the user and get the token
-        if authenticate:
+        if token is not None:
+            self.token = token
+        elif authenticate:
             dds_user = user.User(
                 force_renew_token=force_renew_token,
                 no_prompt=no_prompt,
@@ -79,19 +102,47 @@ class DDSBaseClass:
         # TODO: Move to DataPutter / DataGetter??
         if self.method in DDS_KEYS_REQUIRED_METHODS:
             # NOTE: Might be something to refactor in the future, but needed for now
+            # No staging directory when nothing is saved locally, e.g. streaming to stdout
             self.dds_directory = staging_dir
-            self.temporary_directory = self.dds_directory.directories["ROOT"]
-            self.failed_delivery_log = self.dds_directory.directories["LOGS"] / pathlib.Path(
-                "dds_failed_delivery.json"
+            self.temporary_directory = None
+            self.failed_delivery_log = None
+            self.failure_journal = None
+            self.metrics = metrics.DeliveryMetrics(
+                labels={"method": self.method, "project": self.project},
+                textfile=metrics_textfile,
+                tracer=(
+                    tracing.Tracer(trace_file=trace_file, process_name=f"dds data {self.method}")
+                    if trace_file is not None
+                    else None
+                ),
             )
+            if staging_dir is not None:
+                self.temporary_directory = self.dds_directory.directories["ROOT"]
+                profiling.set_directory(directory=self.dds_directory.directories["LOGS"])
+                self.failed_delivery_log = self.dds_directory.directories["LOGS"] / pathlib.Path(
+                    "dds_failed_delivery.json"
+                )
+                # Failures are appended here while running, and saved in the log at the end
+                self.failure_journal = fj.FailureJournal(
+                    journal_file=self.dds_directory.directories["LOGS"]
+                    / pathlib.Path("dds_failed_delivery.jsonl")
+                )
+                self.metrics.json_file = self.dds_directory.directories["LOGS"] / pathlib.Path(
+                    "dds_metrics.json"
+                )
+                if metrics_textfile is None:
+                    self.metrics.textfile = self.dds_directory.directories["LOGS"] / pathlib.Path(
+                        "dds_metrics.prom"
+                    )
 
             if self.method == "put":
-                self.s3connector = self.__get_safespring_keys()
+                self.s3connector = s3connector or self.__get_safespring_keys()
 
-            self.keys = self.__get_project_keys()
+            self.keys = keys or self.__get_project_keys()
 
-            self.status: typing.Dict = {}
+            self.status = status.DeliveryStatus()
             self.filehandler = None
+            self.nr_released: int = 0  # Finished files removed from status and file info
 
     def __enter__(self):
         """Return self when using context manager."""
@@ -102,7 +153,16 @@ class DDSBaseClass:
 
         This is not entered if there's an error during __init__.
         """
-        if self.method in ["put", "get", "rm"]:
+        profiling.phase(name="summary")
+
+        if getattr(self, "failure_journal", None) is not None:
+            self.failure_journal.compact(out_file=self.failed_delivery_log)
+        if getattr(self, "metrics", None) is not None:
+            self.metrics.close()
+            if self.metrics.tracer is not None:
+                self.metrics.tracer.write()
+
+        if self.method in ["put", "get", "rm"] and self.summary:
             if self.method != "rm":
                 self.__printout_delivery_summary()
 
@@ -167,15 +227,16 @@ class DDSBaseClass:
         # Project public key required for both put and get
         public = self.__get_key()
 
-        # Project private only required for get
+        # Project private only required for get and decrypt
         private = None
-        if self.method == "get":
+        if self.method in ["get", "decrypt"]:
             # Key derivation on server is slow - display spinner
             information_to_user = "Preparing for download. This may be slow. Please wait..."
             with Progress(
                 SpinnerColumn(spinner_name="dots12", style="blue"),
                 "{task.description}",
                 console=dds_cli.utils.stderr_console,
+                disable=self.headless,
             ) as spinner:
                 # Start spinner
                 task = spinner.add_task(description=information_to_user)
@@ -211,6 +272,8 @@ class DDSBaseClass:
             LOG.info("%s cancelled.\n", "Upload" if self.method == "put" else "Download")
             return
 
+        LOG.debug("Files per state: %s", self.status.counts())
+
         # TODO: Look into a better summary print out - old deleted for now
         any_failed = self.__collect_all_failed()
         true_failed = [entry for entry in any_failed if entry["message"] != "File already uploaded"]
@@ -237,13 +300,13 @@ class DDSBaseClass:
                     f"{log_file_info}"
                 )
 
-            # TODO: --destination should be able to >at least< overwrite the files in the
-            # previously created download location.
             raise exceptions.DownloadError(
                 "Errors occurred during download.\n"
                 "If you wish to retry the download, re-run the `dds data get` command again, "
                 "specifying the same options as you did now. A new directory will "
-                "automatically be created and all files will be downloaded again.\n\n"
+                "automatically be created and all files will be downloaded again. "
+                "To only download the missing files to the same location, specify it with "
+                "'--destination' and add the '--sync' flag.\n\n"
                 f"{log_file_info}"
             )
 
@@ -261,31 +324,21 @@ class DDSBaseClass:
                 f"\n{'Upload' if self.method == 'put' else 'Download'} completed!\n"
             )
 
-        if self.method == "get" and len(self.filehandler.data) > len(any_failed):
+        if self.method == "get" and self.nr_released + len(self.filehandler.data) > len(any_failed):
             LOG.info("Any downloaded files are located at: %s.", self.filehandler.local_destination)
 
     def __collect_all_failed(self, sort: bool = True) -> list:
         """Put cancelled files from status in to failed dict and sort the output."""
-        # Transform all items to string
-        self.filehandler.data = {
-            str(file): {str(x): str(y) for x, y in info.items()}
-            for file, info in list(self.filehandler.data.items())
-        }
-        self.status = {
-            str(file): {str(x): str(y) for x, y in info.items()}
-            for file, info in list(self.status.items())
-        }
-
-        # Get cancelled files
+        # Get cancelled files - only their info is transformed to strings
         self.filehandler.failed.update(
             {
-                file: {
-                    **info,
-                    "message": self.status[file]["message"],
-                    "failed_op": self.status[file]["failed_op"],
+                str(file): {
+                    **{str(x): str(y) for x, y in info.items()},
+                    "message": str(self.status[file]["message"]),
+                    "failed_op": str(self.status[file]["failed_op"]),
                 }
                 for file, info in self.filehandler.data.items()
-                if self.status[file]["cancel"] in [True, "True"]
+                if self.status[file]["cancel"]
             }
         )
 
@@ -0,0 +1,387 @@
+"""Library interface. Runs uploads and downloads from Python, e.g. from a workflow manager.
+
+Example::
+
+    import dds_cli.client
+
+    with dds_cli.client.DDSClient() as client:
+        results = client.put(project="project_1", source=["results/sample_1"])
+        failed = [x for x in results if not x.ok]
+
+Nothing is rendered - progress is passed to an optional callback as ProgressEvents.
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import concurrent.futures
+import dataclasses
+import itertools
+import logging
+import pathlib
+import tempfile
+import threading
+import typing
+
+# Own modules
+import dds_cli.directory
+import dds_cli.exceptions
+import dds_cli.timestamp
+import dds_cli.utils
+from dds_cli import constants
+from dds_cli import data_getter as dg
+from dds_cli import data_putter as dp
+from dds_cli import user
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+@dataclasses.dataclass
+class ProgressEvent:
+    """Progress of one step of a file: encrypt, put, get or decrypt.
+
+    total is None if the size is not known.
+    """
+
+    file: str
+    step: str
+    completed: int
+    total: typing.Optional[int]
+
+
+@dataclasses.dataclass
+class FileResult:
+    """Result of the transfer of one file.
+
+    failed_op is the operation which failed, e.g. 'put' or 'add_file_db', if known.
+    """
+
+    file: str
+    ok: bool
+    message: str = ""
+    failed_op: typing.Optional[str] = None
+
+
+class CallbackProgress:
+    """Stand-in for rich.progress.Progress, which renders nothing.
+
+    Each update of a file task is passed to the callback as a ProgressEvent. The callback is
+    called from the transfer threads, so it should be quick and thread-safe.
+    """
+
+    def __init__(self, callback: typing.Callable[[ProgressEvent], None] = None):
+        """Tasks are kept as {task id: fields}."""
+        self.callback = callback
+        self._tasks = {}
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    # Public methods ###################### Public methods #
+    def add_task(self, description, total=None, completed=0, **fields):
+        """Add a task. Only tasks with a file field give events."""
+        task = next(self._task_ids)
+        with self._lock:
+            self._tasks[task] = {
+                "file": fields.get("file"),
+                "step": fields.get("step"),
+                "completed": completed,
+                "total": total,
+            }
+        LOG.debug("Task %s started: %s", task, description)
+        return task
+
+    def advance(self, task, advance=1):
+        """Advance the task by advance steps, e.g. bytes."""
+        self.update(task, advance=advance)
+
+    def update(self, task, total=None, completed=None, advance=None, **fields):
+        """Update the task, with the same arguments as rich."""
+        with self._lock:
+            info = self._tasks.get(task)
+            if info is None:
+                return
+            if total is not None:
+                info["total"] = total
+            if completed is not None:
+                info["completed"] = completed
+            if advance is not None:
+                info["completed"] += advance
+            if fields.get("step"):
+                info["step"] = fields["step"]
+            event = ProgressEvent(**info) if info["file"] is not None else None
+
+        if event is not None and self.callback is not None:
+            self.callback(event)
+
+    def reset(self, task, total=None, completed=0, **fields):
+        """Start the task again, e.g. for the next step of the file."""
+        self.update(task, total=total, completed=completed, **fields)
+
+    def remove_task(self, task):
+        """Stop tracking the task."""
+        with self._lock:
+            self._tasks.pop(task, None)
+
+    def stop_task(self, task):
+        """Nothing is rendered, so there is nothing to stop."""
+
+
+class DDSClient:
+    """Runs uploads and downloads from one long-lived process.
+
+    The user is authenticated once. The project keys, S3 connection info and download session
+    are fetched or created once and reused by all transfers. Failed files are returned as
+    FileResults instead of being printed; errors which stop the whole transfer, e.g. no access
+    to the project, are raised as the exceptions in dds_cli.exceptions.
+    """
+
+    def __init__(self, token_path: str = None, num_threads: int = constants.DOWNLOAD_POOL_MAXSIZE):
+        """Authenticate with an existing token, from 'dds auth login'.
+
+        Nothing is prompted for - the token needs to be valid. num_threads is the maximum number
+        of files transferred at a time.
+        """
+        self.token_path = token_path
+        self.num_threads = num_threads
+        self.token = user.User(no_prompt=True, token_path=token_path).token_dict
+        self.session = dds_cli.utils.create_download_session(pool_size=num_threads)
+        self._access = {}
+
+    def __enter__(self):
+        """Return self when using context manager."""
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Close the download session."""
+        self.close()
+        return False
+
+    # Public methods ###################### Public methods #
+    def close(self):
+        """Close the download session."""
+        self.session.close()
+
+    def put(
+        self,
+        project: str,
+        source: typing.Iterable,
+        destination: str = None,
+        overwrite: bool = False,
+        dedup: bool = False,
+        staging_dir: pathlib.Path = None,
+        on_progress: typing.Callable[[ProgressEvent], None] = None,
+        on_file: typing.Callable[[FileResult], None] = None,
+    ):
+        """Upload the source files and directories to the project.
+
+        The files are compressed and encrypted in a new directory in staging_dir, by default the
+        current directory, which is deleted if all files were uploaded. on_file is called with
+        each FileResult as soon as the file is finished. With dedup, files with the same contents
+        are uploaded once and copied from it in the cloud.
+
+        Returns a FileResult for each file, including files which had already been uploaded.
+        Raises DDSCLIException if the staging directory cannot be created.
+        """
+        staging_path = pathlib.Path(
+            tempfile.mkdtemp(
+                prefix=f"DataDelivery_{dds_cli.timestamp.TimeStamp().timestamp}_{project}_",
+                suffix="_upload",
+                dir=staging_dir or pathlib.Path.cwd(),
+            )
+        )
+        putter = dp.DataPutter(
+            project=project,
+            source=tuple(pathlib.Path(x) for x in source),
+            destination=destination,
+            overwrite=overwrite,
+            dedup_contents=dedup,
+            staging_dir=dds_cli.directory.DDSDirectory(path=staging_path, allow_existing=True),
+            num_threads=self.num_threads,
+            no_prompt=True,
+            token_path=self.token_path,
+            silent=True,
+            summary=False,
+            headless=True,
+            **self.__access(project=project, method="put"),
+        )
+        with putter:
+            self.__save_access(project=project, transfer=putter)
+            results = self.__run(
+                transfer=putter,
+                files=iter(list(putter.filehandler.data)),
+                func=putter.protect_and_upload,
+                on_progress=on_progress,
+                on_file=on_file,
+            )
+            if putter.failure_journal.nr_entries:
+                try:
+                    putter.retry_add_file_db()
+                except (
+                    dds_cli.exceptions.ApiRequestError,
+                    dds_cli.exceptions.ApiResponseError,
+                    dds_cli.exceptions.DDSCLIException,
+                ) as err:
+                    LOG.warning(err)
+                else:
+                    results = self.__retried(transfer=putter, results=results)
+
+        if all(x.ok for x in results):
+            dds_cli.utils.delete_folder(staging_path)
+        return results + self.__not_transferred(transfer=putter)
+
+    def get(
+        self,
+        project: str,
+        source: typing.Iterable = (),
+        destination: pathlib.Path = None,
+        get_all: bool = False,
+        verify_checksum: bool = False,
+        sync: bool = False,
+        dedup: bool = False,
+        on_progress: typing.Callable[[ProgressEvent], None] = None,
+        on_file: typing.Callable[[FileResult], None] = None,
+    ):
+        """Download the source files and directories, or all with get_all, from the project.
+
+        The destination needs to be a new directory, unless sync is used. By default a new
+        directory is created in the current directory. on_file is called with each FileResult as
+        soon as the file is finished. With dedup, files with the same contents are downloaded once
+        and the others saved as hardlinks to it.
+
+        Returns a FileResult for each file, including files which were not found. Raises
+        DDSCLIException if the destination already exists or cannot be created.
+        """
+        new_directory = destination is None
+        if new_directory:
+            destination = pathlib.Path(
+                tempfile.mkdtemp(
+                    prefix=f"DataDelivery_{dds_cli.timestamp.TimeStamp().timestamp}_{project}_",
+                    suffix="_download",
+                    dir=pathlib.Path.cwd(),
+                )
+            )
+
+        getter = dg.DataGetter(
+            project=project,
+            source=tuple(source),
+            get_all=get_all,
+            verify_checksum=verify_checksum,
+            staging_dir=dds_cli.directory.DDSDirectory(
+                path=destination, allow_existing=sync or new_directory
+            ),
+            num_threads=self.num_threads,
+            sync=sync,
+            dedup_contents=dedup,
+            no_prompt=True,
+            token_path=self.token_path,
+            silent=True,
+            session=self.session,
+            summary=False,
+            headless=True,
+            **self.__access(project=project, method="get"),
+        )
+        with getter:
+            self.__save_access(project=project, transfer=getter)
+            results = self.__run(
+                transfer=getter,
+                files=getter.files_to_download,
+                func=getter.download_and_verify,
+                on_progress=on_progress,
+                on_file=on_file,
+            )
+        results = self.__update_failed(transfer=getter, results=results)
+        return results + self.__not_transferred(transfer=getter)
+
+    # Private methods ###################### Private methods #
+    def __access(self, project, method):
+        """The token, and the keys and S3 connector from an earlier transfer if any."""
+        return {"token": self.token, **self._access.get((project, method), {})}
+
+    def __save_access(self, project, transfer):
+        """Keep the keys and S3 connector of the transfer for the next one to the project."""
+        access = {"keys": transfer.keys}
+        if transfer.method == "put":
+            access["s3connector"] = transfer.s3connector
+        self._access[(project, transfer.method)] = access
+
+    def __run(self, transfer, files, func, on_progress, on_file):
+        """Transfer the files, num_threads at a time, and collect the results."""
+        progress = CallbackProgress(callback=on_progress)
+        results = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_threads) as texec:
+            futures = {
+                texec.submit(func, file=file, progress=progress): file
+                for file in itertools.islice(files, self.num_threads)
+            }
+            while futures:
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    file = futures.pop(future)
+                    status = transfer.status[file]
+                    result = FileResult(
+                        file=file,
+                        ok=bool(future.result()),
+                        message=status["message"],
+                        failed_op=status["failed_op"],
+                    )
+                    results.append(result)
+                    if on_file is not None:
+                        on_file(result)
+
+                    # Finished downloads no longer need to be kept in memory
+                    if transfer.method == "get":
+                        transfer.release(file=file)
+
+                for file in itertools.islice(files, len(done)):
+                    futures[texec.submit(func, file=file, progress=progress)] = file
+
+        return results
+
+    @staticmethod
+    def __retried(transfer, results):
+        """Update the results with the files added to the database by retry_add_file_db."""
+        return [
+            (
+                FileResult(file=x.file, ok=True, message=transfer.status[x.file]["message"])
+                if not x.ok and not transfer.status[x.file]["cancel"]
+                else x
+            )
+            for x in results
+        ]
+
+    @staticmethod
+    def __update_failed(transfer, results):
+        """Update the results with the downloaded files whose database update failed at the end."""
+        return [
+            (
+                FileResult(
+                    file=x.file,
+                    ok=False,
+                    message=transfer.status[x.file]["message"],
+                    failed_op=transfer.status[x.file]["failed_op"],
+                )
+                if x.ok and x.file in transfer.status and transfer.status[x.file]["cancel"]
+                else x
+            )
+            for x in results
+        ]
+
+    @staticmethod
+    def __not_transferred(transfer):
+        """Results for the files which were never transferred, e.g. not found."""
+        return [
+            FileResult(file=str(file), ok=False, message=str(info.get("message", "")))
+            for file, info in transfer.filehandler.failed.items()
+        ]
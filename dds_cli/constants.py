@@ -15,6 +15,56 @@ DOWNLOAD_MAX_RETRIES = 5
 DOWNLOAD_BACKOFF_FACTOR = 2
 DOWNLOAD_INITIAL_WAIT = 1  # seconds
 
+# Connection pool settings for download
+DOWNLOAD_POOL_CONNECTIONS = 1  # Number of hosts to cache pools for, presigned urls share one host
+DOWNLOAD_POOL_MAXSIZE = 4  # Default number of kept-alive connections, normally set to num_threads
+
+# Presigned urls are refreshed before use if older than this, in batches of upcoming files
+URL_REFRESH_AGE = 6 * 60 * 60  # seconds
+URL_REFRESH_BATCH_SIZE = 100
+
+# Size of chunks read from streamed API responses
+STREAM_CHUNK_SIZE = 1024 * 1024
+SPOOL_FLUSH_LINES = 1000  # Streamed file info lines spooled between flushes, unless awaited
+
+# Batching of database updates after download
+UPDATE_BATCH_SIZE = 100  # Flush when this many downloaded files are waiting
+UPDATE_FLUSH_INTERVAL = 5  # seconds, flush at least this often when files are waiting
+UPDATE_MAX_RETRIES = 3  # Attempts for updates that failed, at the end of the delivery
+UPDATE_MAX_WORKERS = 4  # Database updates of a batch sent in parallel
+UPDATE_MAX_PENDING = 4 * UPDATE_BATCH_SIZE  # Finished files awaiting their update before pausing
+
+# Disk space admission control for staging during upload and download
+DISK_SPACE_MARGIN = 100 * 1000**2  # bytes, always kept free on the staging/destination disks
+DISK_SPACE_POLL_INTERVAL = 5  # seconds, how often waiting files check the free space again
+
+# Writing of downloaded and decrypted files
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024  # bytes, chunks are collected and written in blocks this large
+WRITE_CACHE_BUFFERS = 4  # Written blocks advised to be dropped from the page cache on each flush
+
+# Reading of local files for hashing, compression and encryption
+READ_BUFFER_SIZE = 4 * 1024 * 1024  # bytes, must be a multiple of FileSegment.SEGMENT_SIZE_RAW
+READ_BUFFER_POOL_SIZE = 8  # Number of unused read buffers kept for reuse
+
+# Multipart upload of streams of unknown size, e.g. stdin
+UPLOAD_PART_SIZE = 16 * 1024 * 1024  # bytes, size of the first parts - at least 5 MiB for S3
+UPLOAD_PART_SIZE_DOUBLING = 1000  # Parts after which the part size is doubled, S3 allows 10000
+
+# Seekable compression, for reading parts of files without downloading them
+SEEKABLE_FRAME_SIZE = 1024 * 1024  # bytes, raw data compressed into each independent frame
+
+# Progress shown during uploads and downloads
+PROGRESS_REFRESH_PER_SECOND = 2  # Times per second the byte counters are read and shown
+PROGRESS_MAX_FILES = 8  # Files in progress shown below the summary, the longest running first
+PROGRESS_RATE_WINDOW = 10  # seconds, the transfer rate is averaged over this period
+
+# Metrics of the stages of uploads and downloads, e.g. encryption and S3 transfers
+METRICS_EXPORT_INTERVAL = 15  # seconds between writes of the metrics files while running
+METRICS_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)  # seconds
+
+# Timeline of the delivery stages, with '--trace'
+TRACE_MAX_EVENTS = 500_000  # the latest events kept; older ones are dropped
+
 # Import these constants when using '*'
 __all__ = [
     "READ_TIMEOUT",
@@ -22,4 +72,30 @@ __all__ = [
     "DOWNLOAD_MAX_RETRIES",
     "DOWNLOAD_BACKOFF_FACTOR",
     "DOWNLOAD_INITIAL_WAIT",
+    "DOWNLOAD_POOL_CONNECTIONS",
+    "DOWNLOAD_POOL_MAXSIZE",
+    "URL_REFRESH_AGE",
+    "URL_REFRESH_BATCH_SIZE",
+    "STREAM_CHUNK_SIZE",
+    "SPOOL_FLUSH_LINES",
+    "UPDATE_BATCH_SIZE",
+    "UPDATE_FLUSH_INTERVAL",
+    "UPDATE_MAX_RETRIES",
+    "UPDATE_MAX_WORKERS",
+    "UPDATE_MAX_PENDING",
+    "DISK_SPACE_MARGIN",
+    "DISK_SPACE_POLL_INTERVAL",
+    "WRITE_BUFFER_SIZE",
+    "WRITE_CACHE_BUFFERS",
+    "READ_BUFFER_SIZE",
+    "READ_BUFFER_POOL_SIZE",
+    "UPLOAD_PART_SIZE",
+    "UPLOAD_PART_SIZE_DOUBLING",
+    "SEEKABLE_FRAME_SIZE",
+    "PROGRESS_REFRESH_PER_SECOND",
+    "PROGRESS_MAX_FILES",
+    "PROGRESS_RATE_WINDOW",
+    "METRICS_EXPORT_INTERVAL",
+    "METRICS_DURATION_BUCKETS",
+    "TRACE_MAX_EVENTS",
 ]
@@ -17,6 +17,8 @@ from rich.progress import Progress, SpinnerColumn
 import dds_cli
 import dds_cli.utils
 import dds_cli.file_handler
+from dds_cli import metrics
+from dds_cli.utils import LazyEscape
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -44,40 +46,32 @@ def verify_proceed(func):
             LOG.warning(message)
             return False  # Do not proceed
 
-        # Return if file cancelled by another file
-        if self.status[file]["cancel"]:
-            message = f"File already cancelled, stopping file {escape(file)}"
-            LOG.warning(message)
+        # Return if file cancelled by another file, otherwise mark as started
+        if not self.status.begin(file=file):
+            # Not a warning - with '--break-on-fail' this is all files which were not started
+            LOG.debug("File already cancelled, stopping file %s", LazyEscape(file))
             return False
 
-        # Mark as started
-        self.status[file]["started"] = True
-
         # Run function
         ok_to_proceed, message = func(self, file=file, *args, **kwargs)
         # Cancel file(s) if something failed
         if not ok_to_proceed:
             LOG.warning("%s failed: %s", func.__name__, message)
-            self.status[file].update({"cancel": True, "message": message})
-            if self.status[file].get("failed_op") is None:
-                self.status[file]["failed_op"] = "crypto"
+            self.status.cancel_one(file=file, message=message, failed_op="crypto")
 
             if self.break_on_fail:
                 message = f"'--break-on-fail'. File causing failure: '{file}'. "
                 LOG.warning(message)
 
-                _ = [
-                    self.status[x].update({"cancel": True, "message": message})
-                    for x in self.status
-                    if not self.status[x]["cancel"] and not self.status[x]["started"] and x != file
-                ]
-
-            dds_cli.file_handler.FileHandler.append_errors_to_file(
-                log_file=self.failed_delivery_log,
-                file=file,
-                info=self.filehandler.data[file],
-                status=self.status[file],
-            )
+                # Files which have not been started are cancelled when dispatched
+                self.status.cancel_all(message=message)
+
+            if self.failure_journal is not None:
+                self.failure_journal.add(
+                    file=file, info=self.filehandler.data[file], status=self.status[file]
+                )
+        else:
+            self.status.succeed(file=file)
         return ok_to_proceed
 
     return wrapped
@@ -89,7 +83,14 @@ def update_status(func):
     @functools.wraps(func)
     def wrapped(self, file, *args, **kwargs):
         # TODO (ina): add processing?
-        if func.__name__ not in ["put", "add_file_db", "get", "update_db"]:
+        if func.__name__ not in [
+            "put",
+            "put_stream",
+            "put_copy",
+            "add_file_db",
+            "get",
+            "update_db",
+        ]:
             raise dds_cli.exceptions.DDSCLIException(
                 f"The function {func.__name__} cannot be used with this decorator."
             )
@@ -98,11 +99,21 @@ def update_status(func):
                 f"No status found for function {func.__name__}."
             )
 
-        # Update status to started
-        self.status[file][func.__name__].update({"started": True})
+        # A step which has been started before is retried
+        retry = self.status[file][func.__name__]["started"]
 
-        # Run function
-        ok_to_continue, message, *_ = func(self, file=file, *args, **kwargs)
+        # Update status to started
+        self.status[file].start(func.__name__)
+
+        # Run function, recording its time and bytes
+        delivery_metrics = getattr(self, "metrics", None) or metrics.DeliveryMetrics()
+        with delivery_metrics.stage(name=func.__name__, retry=retry, file=file) as timer:
+            ok_to_continue, message, *_ = func(self, file=file, *args, **kwargs)
+            timer.failed = not ok_to_continue
+            if ok_to_continue and func.__name__ in metrics.DeliveryMetrics.BYTES_FIELDS:
+                timer.bytes = self.filehandler.data[file].get(
+                    metrics.DeliveryMetrics.BYTES_FIELDS[func.__name__], 0
+                )
 
         # ok_to_continue = False
         if not ok_to_continue:
@@ -112,7 +123,7 @@ def update_status(func):
 
         else:
             # Update status to done
-            self.status[file][func.__name__].update({"done": True})
+            self.status[file].finish(func.__name__)
 
         return ok_to_continue, message
 
@@ -0,0 +1,289 @@
+"""Data decryptor. Decrypts files which have been downloaded but not decrypted."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import concurrent.futures
+import json
+import logging
+import pathlib
+import threading
+
+# Installed
+from rich.markup import escape
+from rich.progress import BarColumn, Progress
+
+# Own modules
+import dds_cli.directory
+import dds_cli.utils
+from dds_cli import base
+from dds_cli import data_remover as dr
+from dds_cli import exceptions
+from dds_cli import file_compressor as fc
+from dds_cli import file_encryptor as fe
+from dds_cli import file_handler_remote as fhr
+from dds_cli.utils import LazyEscape
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+# Name of the manifest in the META directory of the staging directory
+FETCH_MANIFEST_NAME = "fetched_files.jsonl"
+
+###############################################################################
+# FUNCTIONS ####################################################### FUNCTIONS #
+###############################################################################
+
+
+def decrypt_file(file, info, keys, files_directory, verify_checksum=False):
+    """Decrypt, and decompress if needed, a downloaded file and check the result.
+
+    info is the file info from the API, with the encrypted file in "path_downloaded".
+    The encrypted file is not deleted.
+    """
+    all_ok, message = (False, "")
+    file_name_in_db = LazyEscape(info["name_in_db"])
+
+    LOG.debug("Beginning decryption of file '%s'...", file_name_in_db)
+    file_saved = False
+    with fe.Decryptor(
+        project_keys=keys,
+        peer_public=info["public_key"],
+        key_salt=info["salt"],
+        files_directory=files_directory,
+    ) as decryptor:
+        streamed_chunks = decryptor.decrypt_file(infile=info["path_downloaded"], outfile=file)
+
+        stream_to_file_func = (
+            fc.Compressor.decompress_filechunks
+            if info["compressed"]
+            else fhr.RemoteFileHandler.write_file
+        )
+
+        file_saved, message = stream_to_file_func(
+            chunks=streamed_chunks,
+            outfile=file,
+            files_directory=files_directory,
+            size=info["size_original"],
+        )
+
+    LOG.debug("File '%s' saved? %s", file_name_in_db, file_saved)
+    if file_saved:
+        # Check file size post-decryption and post-decompression
+        expected_size = info["size_original"]
+        actual_size = pathlib.Path(file).stat().st_size
+        if actual_size != expected_size:
+            # Decryption stops at the first error, which leaves the file incomplete
+            message = (
+                f"Decrypted file '{file_name_in_db}' size mismatch: expected {expected_size} "
+                f"bytes, got {actual_size} bytes."
+            )
+            LOG.warning(message)
+            return all_ok, message
+
+        LOG.debug(
+            "Decrypted file '%s' size matches expected size: %s bytes.",
+            file_name_in_db,
+            expected_size,
+        )
+        # TODO (ina): decide on checksum verification method --
+        # this checks original, the other is generated from compressed
+        all_ok, message = (
+            fe.Encryptor.verify_checksum(
+                file=file,
+                correct_checksum=info["checksum"],
+                files_directory=files_directory,
+            )
+            if verify_checksum
+            else (True, "")
+        )
+
+    return all_ok, message
+
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class FetchManifest:
+    """Downloaded files which have not been decrypted, with the info needed to decrypt them.
+
+    Entries are appended as lines of JSON, and the last entry for a file is the valid one. Paths
+    are saved relative to the files directory, so that the staging directory can be moved.
+    """
+
+    # Keys saved from the file info
+    KEYS = ["name_in_db", "public_key", "salt", "checksum", "compressed", "size_original"]
+
+    def __init__(self, manifest_file: pathlib.Path, files_directory: pathlib.Path):
+        """The manifest file is only created when the first file is added."""
+        self.manifest_file = manifest_file
+        self.files_directory = files_directory
+        self.nr_added = 0
+        self._lock = threading.Lock()
+
+    # Public methods ############ Public methods #
+    def add(self, file: pathlib.Path, info: dict, project: str):
+        """Save a downloaded file which is to be decrypted later."""
+        self.__append(
+            entry={
+                **{x: info[x] for x in self.KEYS},
+                "project": project,
+                "file": pathlib.Path(file).relative_to(self.files_directory).as_posix(),
+                "path_downloaded": pathlib.Path(info["path_downloaded"])
+                .relative_to(self.files_directory)
+                .as_posix(),
+                "decrypted": False,
+            }
+        )
+        with self._lock:
+            self.nr_added += 1
+
+    def mark_decrypted(self, name_in_db: str):
+        """Save that a file has been decrypted."""
+        self.__append(entry={"name_in_db": name_in_db, "decrypted": True})
+
+    def pending(self):
+        """Get the files which have not been decrypted: {name_in_db: entry}.
+
+        The paths in the entries are absolute.
+        """
+        entries = {}
+        try:
+            with self.manifest_file.open(mode="r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["name_in_db"]] = entry
+        except FileNotFoundError:
+            return {}
+
+        return {
+            name: {
+                **entry,
+                "file": self.files_directory / entry["file"],
+                "path_downloaded": self.files_directory / entry["path_downloaded"],
+            }
+            for name, entry in entries.items()
+            if not entry["decrypted"]
+        }
+
+    # Private methods ############ Private methods #
+    def __append(self, entry: dict):
+        """Add a line to the manifest."""
+        with self._lock:
+            with self.manifest_file.open(mode="a", encoding="utf-8") as manifest:
+                manifest.write(json.dumps(entry) + "\n")
+
+
+class DataDecryptor(base.DDSBaseClass):
+    """Decrypts files downloaded with 'dds data get --fetch-only'.
+
+    Only the project key is requested from the API - the files are decrypted locally.
+    """
+
+    def __init__(
+        self,
+        staging_dir: dds_cli.directory.DDSDirectory,
+        verify_checksum: bool = False,
+        no_prompt: bool = False,
+        token_path: str = None,
+        method: str = "decrypt",
+    ):
+        """Read the manifest and get the project keys."""
+        self.verify_checksum = verify_checksum
+        self.failed = {}
+
+        self.manifest = FetchManifest(
+            manifest_file=staging_dir.directories["META"] / pathlib.Path(FETCH_MANIFEST_NAME),
+            files_directory=staging_dir.directories["FILES"],
+        )
+        self.pending = self.manifest.pending()
+        if not self.pending:
+            raise exceptions.NoDataError(
+                f"No files to decrypt in '{escape(str(staging_dir.directories['ROOT']))}'."
+            )
+
+        projects = {x["project"] for x in self.pending.values()}
+        if len(projects) > 1:
+            raise exceptions.DDSCLIException(
+                f"Files from more than one project found: {', '.join(sorted(projects))}"
+            )
+
+        # Initiate DDSBaseClass to authenticate user and get the project keys
+        super().__init__(
+            project=projects.pop(),
+            method=method,
+            no_prompt=no_prompt,
+            token_path=token_path,
+            staging_dir=staging_dir,
+        )
+
+        # Only method "decrypt" can use the DataDecryptor class
+        if self.method != "decrypt":
+            raise exceptions.InvalidMethodError(
+                attempted_method=self.method,
+                message="DataDecryptor attempting unauthorized method",
+            )
+
+    # Public methods ############ Public methods #
+    def decrypt_all(self, num_threads: int):
+        """Decrypt all pending files in parallel and print a summary."""
+        with Progress(
+            "{task.description}",
+            BarColumn(bar_width=None),
+            " • ",
+            "[progress.percentage]{task.percentage:>3.1f}%",
+            refresh_per_second=2,
+            console=dds_cli.utils.stderr_console,
+        ) as progress:
+            task = progress.add_task(description="Decrypt", total=len(self.pending))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as texec:
+                futures = {
+                    texec.submit(self.decrypt, entry=entry): name
+                    for name, entry in self.pending.items()
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    decrypted, message = future.result()
+                    if not decrypted:
+                        self.failed[futures[future]] = message
+                    progress.advance(task)
+
+        if self.failed:
+            for name, message in self.failed.items():
+                LOG.warning("Decryption of '%s' failed: %s", LazyEscape(name), message)
+            raise exceptions.DownloadError(
+                f"{len(self.failed)} of {len(self.pending)} file(s) could not be decrypted. "
+                "The encrypted files have been kept - see the log for the errors."
+            )
+
+        dds_cli.utils.console.print("\nDecryption completed!\n")
+        LOG.info("The decrypted files are located at: %s.", self.dds_directory.directories["FILES"])
+
+    def decrypt(self, entry: dict):
+        """Decrypt one file and delete the encrypted file if successful."""
+        with self.metrics.stage(name="decrypt_file", file=entry["file"]) as timer:
+            try:
+                decrypted, message = decrypt_file(
+                    file=entry["file"],
+                    info=entry,
+                    keys=self.keys,
+                    files_directory=self.dds_directory.directories["FILES"],
+                    verify_checksum=self.verify_checksum,
+                )
+            except OSError as err:
+                decrypted, message = (False, str(err))
+            timer.failed = not decrypted
+            timer.bytes = entry["size_original"] if decrypted else 0
+
+        if decrypted:
+            dr.DataRemover.delete_tempfile(file=entry["path_downloaded"])
+            self.manifest.mark_decrypted(name_in_db=entry["name_in_db"])
+
+        return decrypted, message
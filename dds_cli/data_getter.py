@@ -5,8 +5,13 @@
 ###############################################################################
 
 # Standard library
+import collections
+import itertools
 import logging
+import os
 import pathlib
+import shutil
+import threading
 import time
 
 # Installed
@@ -18,14 +23,20 @@ from rich.progress import Progress, SpinnerColumn
 from dds_cli import constants
 from dds_cli import DDSEndpoint, FileSegment
 from dds_cli import file_handler_remote as fhr
+from dds_cli import data_decryptor as dd
 from dds_cli import data_remover as dr
-from dds_cli import file_compressor as fc
-from dds_cli import file_encryptor as fe
+from dds_cli import dedup
+from dds_cli import disk_budget as db
+from dds_cli import output_writer as ow
+from dds_cli import profiling
+from dds_cli import sync_index as si
+from dds_cli import update_queue as uq
 from dds_cli import text_handler as txt
 from dds_cli.custom_decorators import verify_proceed, update_status, subpath_required
 from dds_cli import base
 import dds_cli.utils
 import dds_cli.exceptions
+from dds_cli.utils import LazyEscape
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -54,8 +65,25 @@ class DataGetter(base.DDSBaseClass):
         no_prompt: bool = False,
         token_path: str = None,
         staging_dir: dds_cli.directory.DDSDirectory = None,
+        num_threads: int = constants.DOWNLOAD_POOL_MAXSIZE,
+        sync: bool = False,
+        fetch_only: bool = False,
+        dedup_contents: bool = False,
+        token: dict = None,
+        keys: tuple = None,
+        session: requests.Session = None,
+        summary: bool = True,
+        metrics_textfile: pathlib.Path = None,
+        trace_file: pathlib.Path = None,
+        headless: bool = False,
     ):
-        """Handle actions regarding downloading data."""
+        """Handle actions regarding downloading data.
+
+        With dedup_contents, files with the same checksum and size are only downloaded once, and
+        the others are saved as hardlinks to it. The token, keys, summary, metrics_textfile,
+        trace_file and headless are passed on to DDSBaseClass. A download session from an earlier DataGetter can be
+        reused, and is then not closed when finished.
+        """
         # Initiate DDSBaseClass to authenticate user
         super().__init__(
             project=project,
@@ -63,13 +91,14 @@ class DataGetter(base.DDSBaseClass):
             no_prompt=no_prompt,
             token_path=token_path,
             staging_dir=staging_dir,
+            token=token,
+            keys=keys,
+            summary=summary,
+            metrics_textfile=metrics_textfile,
+            trace_file=trace_file,
+            headless=headless,
         )
-
-        # Initiate DataGetter specific attributes
-        self.break_on_fail = break_on_fail
-        self.verify_checksum = verify_checksum
-        self.silent = silent
-        self.filehandler = None
+        profiling.phase(name="discovery")
 
         # Only method "get" can use the DataGetter class
         if self.method != "get":
@@ -78,55 +107,109 @@ class DataGetter(base.DDSBaseClass):
                 message="DataGetter attempting unauthorized method",
             )
 
-        # Start file prep progress
-        with Progress(
-            "[bold]{task.description}",
-            SpinnerColumn(spinner_name="dots12", style="white"),
-            console=dds_cli.utils.stderr_console,
-        ) as progress:
-            wait_task = progress.add_task("Collecting and preparing data", step="prepare")
-            self.filehandler = fhr.RemoteFileHandler(
-                get_all=get_all,
-                user_input=(source, source_path_file),
-                token=self.token,
-                project=self.project,
-                destination=self.dds_directory.directories["FILES"],
-            )
+        # Initiate DataGetter specific attributes
+        self.break_on_fail = break_on_fail
+        self.verify_checksum = verify_checksum
+        self.silent = silent
+        self.sync = sync
+        self.sync_index = None
+        self.fetch_only = fetch_only
+        self.filehandler = None
 
-            if self.filehandler.failed and self.break_on_fail:
-                raise dds_cli.exceptions.DownloadError(
-                    ":warning-emoji: Some specified files were not found in the system "
-                    "and '--break-on-fail' flag used. :warning-emoji:"
-                    f"Files not found: {self.filehandler.failed}"
-                )
+        # Encrypted files are not decrypted with '--fetch-only', so there is nothing to link
+        self.deduplicator = (
+            dedup.DownloadDeduplicator() if dedup_contents and not fetch_only else None
+        )
 
-            if not self.filehandler.data:
-                if self.temporary_directory and self.temporary_directory.is_dir():
-                    LOG.debug("Deleting staging directory '%s'.", self.temporary_directory)
-                    try:
-                        dds_cli.utils.delete_folder(self.temporary_directory)
-                    except OSError as err:
-                        # Folder deletion may fail if log file is still being written to
-                        # This is not critical - the important thing is to show the error message
-                        LOG.error(
-                            "Could not delete staging directory %s: %s",
-                            self.temporary_directory,
-                            err,
-                        )
-                raise dds_cli.exceptions.DownloadError("No files to download.")
+        # Shared keep-alive session for all downloads within this delivery
+        self.own_session = session is None
+        self.session = session or dds_cli.utils.create_download_session(pool_size=num_threads)
 
-            self.status = self.filehandler.create_download_status_dict()
+        # Database updates are sent in batches from a background thread
+        self.api_session = requests.Session()
+        self.update_queue = uq.UpdateQueue(update_func=self.__update_and_release)
 
-            progress.remove_task(wait_task)
+        # Finished files are kept until their database update is done
+        self.awaiting_update = set()
+        self.release_lock = threading.Condition()
+
+        # Files are only downloaded when there is space for both the encrypted and decrypted file
+        self.disk_budget = db.DiskBudget()
+
+        # Encrypted files which are not decrypted now are kept, with the info needed to decrypt
+        self.fetch_manifest = dd.FetchManifest(
+            manifest_file=self.dds_directory.directories["META"]
+            / pathlib.Path(dd.FETCH_MANIFEST_NAME),
+            files_directory=self.dds_directory.directories["FILES"],
+        )
+
+        # The sessions and the update queue are not closed by __exit__ if __init__ fails
+        try:
+            self.__collect_files(get_all=get_all, source=source, source_path_file=source_path_file)
+        except BaseException:
+            self.__close()
+            raise
+
+    def __exit__(self, exception_type, exception_value, traceback, max_fileerrs: int = 40):
+        """Flush the database updates, close the sessions and finish the delivery."""
+        self.__close()
+        if self.sync_index:
+            self.sync_index.save()
+        if self.deduplicator and self.deduplicator.nr_saved:
+            LOG.info(
+                "%s file(s) had the same contents as other files and were linked to them instead "
+                "of downloaded, saving %s.",
+                self.deduplicator.nr_saved,
+                dds_cli.utils.format_api_response(self.deduplicator.size_saved, "Size"),
+            )
+        if self.fetch_manifest.nr_added:
+            LOG.info(
+                "%s file(s) have been downloaded but not decrypted. To decrypt them, run: "
+                "dds data decrypt %s",
+                self.fetch_manifest.nr_added,
+                self.dds_directory.directories["ROOT"],
+            )
+        return super().__exit__(exception_type, exception_value, traceback, max_fileerrs)
 
     # Public methods ############ Public methods #
     @verify_proceed
     @subpath_required
     def download_and_verify(self, file, progress):
-        """Download the file, reveals the original data and verifies the integrity."""
+        """Download the file, reveals the original data and verifies the integrity.
+
+        Waits until there is disk space for the file before starting. Files with the same contents
+        as another file are linked to it instead, once it has been downloaded.
+        """
+        source = self.deduplicator.wait(file=file) if self.deduplicator else None
+        if source is not None:
+            return self.__link_duplicate(file=file, source=source)
+
+        admitted, message = self.disk_budget.acquire(
+            key=file,
+            needs=self.disk_footprint(
+                file=file, info=self.filehandler.data[file], fetch_only=self.fetch_only
+            ),
+        )
+        if not admitted:
+            return False, message
+
+        try:
+            return self.__download_and_verify(file=file, progress=progress)
+        finally:
+            self.disk_budget.release(key=file)
+
+    @staticmethod
+    def disk_footprint(file, info, fetch_only: bool = False):
+        """Disk space needed while downloading a file: the encrypted and the decrypted file."""
+        if fetch_only:
+            return {info["path_downloaded"]: info["size_stored"]}
+        return {info["path_downloaded"]: info["size_stored"], file: info["size_original"]}
+
+    def __download_and_verify(self, file, progress):
+        """Download, decrypt, decompress and verify a file which has been admitted."""
         all_ok, message = (False, "")
         file_info = self.filehandler.data[file]
-        file_name_in_db = escape(str(file_info["name_in_db"]))
+        file_name_in_db = LazyEscape(file_info["name_in_db"])
 
         LOG.debug("Step 'download_and_verify': started file '%s'", file_name_in_db)
         # File task for downloading
@@ -134,6 +217,8 @@ class DataGetter(base.DDSBaseClass):
             description=txt.TextHandler.task_name(file=escape(str(file)), step="get"),
             total=file_info["size_stored"],
             visible=not self.silent,
+            file=file,
+            step="get",
         )
 
         # Perform download
@@ -144,6 +229,7 @@ class DataGetter(base.DDSBaseClass):
             task,
             description=txt.TextHandler.task_name(file=escape(str(file)), step="decrypt"),
             total=file_info["size_original"],
+            step="decrypt",
         )
 
         LOG.debug("File '%s' downloaded: %s", file_name_in_db, file_downloaded)
@@ -171,68 +257,31 @@ class DataGetter(base.DDSBaseClass):
                 )
 
         if file_size_verified:
-            db_updated, message = self.update_db(file=file)
-            LOG.debug(
-                "API call: database updated for file '%s': %s",
-                file_name_in_db,
-                db_updated,
-            )
-
-            LOG.debug("Beginning decryption of file '%s'...", file_name_in_db)
-            file_saved = False
-            with fe.Decryptor(
-                project_keys=self.keys,
-                peer_public=file_info["public_key"],
-                key_salt=file_info["salt"],
-                files_directory=self.dds_directory.directories["FILES"],
-            ) as decryptor:
-                streamed_chunks = decryptor.decrypt_file(
-                    infile=file_info["path_downloaded"], outfile=file
-                )
-
-                stream_to_file_func = (
-                    fc.Compressor.decompress_filechunks
-                    if file_info["compressed"]
-                    else self.filehandler.write_file
-                )
+            # Database is updated in the background, outside of the download thread
+            self.update_queue.add(file)
 
-                file_saved, message = stream_to_file_func(
-                    chunks=streamed_chunks,
-                    outfile=file,
-                    files_directory=self.dds_directory.directories["FILES"],
-                )
-
-            LOG.debug("File '%s' saved? %s", file_name_in_db, file_saved)
-            if file_saved:
-                # Check file size post-decryption and post-decompression
-                expected_size = file_info["size_original"]
-                actual_size = pathlib.Path(file).stat().st_size
-                if actual_size == expected_size:
-                    LOG.debug(
-                        "Decrypted file '%s' size matches expected size: %s bytes.",
-                        file_name_in_db,
-                        expected_size,
-                    )
-                else:
-                    LOG.debug(
-                        "Decrypted file '%s' size mismatch: expected %s bytes, got %s bytes",
-                        file_name_in_db,
-                        expected_size,
-                        actual_size,
-                    )
-                # TODO (ina): decide on checksum verification method --
-                # this checks original, the other is generated from compressed
-                all_ok, message = (
-                    fe.Encryptor.verify_checksum(
+            if self.fetch_only:
+                all_ok, message = (True, "")
+            else:
+                with self.metrics.stage(name="decrypt_file", file=file) as timer:
+                    all_ok, message = dd.decrypt_file(
                         file=file,
-                        correct_checksum=file_info["checksum"],
+                        info=file_info,
+                        keys=self.keys,
                         files_directory=self.dds_directory.directories["FILES"],
+                        verify_checksum=self.verify_checksum,
                     )
-                    if self.verify_checksum
-                    else (True, "")
-                )
+                    timer.failed = not all_ok
+                    timer.bytes = file_info["size_original"] if all_ok else 0
+
+            if all_ok and not self.fetch_only:
+                dr.DataRemover.delete_tempfile(file=file_info["path_downloaded"])
+            else:
+                # Keep the encrypted file, it can be decrypted with 'dds data decrypt'
+                self.fetch_manifest.add(file=file, info=file_info, project=self.project)
 
-            dr.DataRemover.delete_tempfile(file=file_info["path_downloaded"])
+        if all_ok and self.sync_index and not self.fetch_only:
+            self.sync_index.record(file=pathlib.Path(file), info=file_info)
 
         progress.remove_task(task)
         return all_ok, message
@@ -244,7 +293,7 @@ class DataGetter(base.DDSBaseClass):
         error = ""
         file_local = self.filehandler.data[file]["path_downloaded"]
         file_remote = self.filehandler.data[file]["url"]
-        file_name_in_db = escape(str(self.filehandler.data[file]["name_in_db"]))
+        file_name_in_db = LazyEscape(self.filehandler.data[file]["name_in_db"])
 
         retryable_exceptions = (
             requests.exceptions.ConnectTimeout,
@@ -257,20 +306,24 @@ class DataGetter(base.DDSBaseClass):
         backoff_factor = constants.DOWNLOAD_BACKOFF_FACTOR
         wait = constants.DOWNLOAD_INITIAL_WAIT
         retry_messages = []
+        url_refreshed = False
 
         for attempt in range(1, max_retries + 1):
             error = ""
             if attempt > 1:
                 progress.reset(task, completed=0)
+                self.metrics.retry(name="get")
 
             try:
-                with requests.get(
+                with self.session.get(
                     file_remote,
                     stream=True,
                     timeout=(constants.CONNECT_TIMEOUT, constants.READ_TIMEOUT),
                 ) as req:
                     req.raise_for_status()
-                    with file_local.open(mode="wb") as new_file:
+                    with ow.OutputWriter(
+                        file=file_local, size=self.filehandler.data[file]["size_stored"]
+                    ) as new_file:
                         for chunk in req.iter_content(chunk_size=FileSegment.SEGMENT_SIZE_CIPHER):
                             progress.update(task, advance=len(chunk))
                             new_file.write(chunk)
@@ -284,6 +337,20 @@ class DataGetter(base.DDSBaseClass):
                     error = "File not found! Please contact support."
                     break
                 error = str(err)
+
+                # Presigned url has probably expired - get a new one and retry directly
+                if (
+                    isinstance(err, requests.exceptions.HTTPError)
+                    and getattr(err.response, "status_code", None) == 403
+                    and not url_refreshed
+                ):
+                    url_refreshed = True
+                    new_url = self.__refresh_url(file=file)
+                    if new_url:
+                        LOG.debug("Download link refreshed for '%s'.", file_name_in_db)
+                        file_remote = new_url
+                        continue
+
                 if attempt < max_retries:
                     retry_msg = (
                         f"Download attempt {attempt}/{max_retries} failed for "
@@ -328,6 +395,7 @@ class DataGetter(base.DDSBaseClass):
                 json=filename,
                 headers=self.token,
                 error_message="Failed to update file information",
+                session=self.api_session,
             )
         except dds_cli.exceptions.ApiRequestError as err:
             updated_in_db = False
@@ -337,3 +405,288 @@ class DataGetter(base.DDSBaseClass):
             message = response_json["message"]
 
         return updated_in_db, message
+
+    def release(self, file):
+        """Remove a successfully finished file from the file and status info to save memory.
+
+        The database is updated from a background thread, which needs the info. A file whose
+        update is not done is removed when it is. A file whose update failed is kept, to retry it.
+        """
+        if self.deduplicator:
+            self.deduplicator.finish(file=file, ok=not self.status[file]["cancel"])
+        if self.status[file]["cancel"]:
+            return
+        with self.release_lock:
+            if self.status[file]["update_db"]["done"]:
+                self.__drop(file=file)
+            elif self.status[file]["failed_op"] != "update_db":
+                self.awaiting_update.add(file)
+
+    # Private methods ############ Private methods #
+    def __close(self):
+        """Flush the database updates and close the sessions.
+
+        Files whose database update still fails are cancelled, so that they count as failed.
+        """
+        for file, message in self.update_queue.close().items():
+            # Files which failed in another step are already saved as failed
+            if self.status[file]["cancel"]:
+                continue
+            self.status.cancel_one(file=file, message=message, failed_op="update_db")
+            if self.failure_journal is not None:
+                self.failure_journal.add(
+                    file=file, info=self.filehandler.data[file], status=self.status[file]
+                )
+        self.api_session.close()
+        if self.own_session:
+            self.session.close()
+
+    def __collect_files(self, get_all, source, source_path_file):
+        """Collect the files to download, and get the first one.
+
+        Raises DownloadError if there is nothing to download.
+        """
+        # Start file prep progress
+        with Progress(
+            "[bold]{task.description}",
+            SpinnerColumn(spinner_name="dots12", style="white"),
+            console=dds_cli.utils.stderr_console,
+            disable=self.headless,
+        ) as progress:
+            wait_task = progress.add_task("Collecting and preparing data", step="prepare")
+            with self.metrics.stage(name="discover"):
+                self.filehandler = fhr.RemoteFileHandler(
+                    get_all=get_all,
+                    user_input=(source, source_path_file),
+                    token=self.token,
+                    project=self.project,
+                    destination=self.dds_directory.directories["FILES"],
+                )
+
+            if self.filehandler.failed and self.break_on_fail:
+                raise dds_cli.exceptions.DownloadError(
+                    ":warning-emoji: Some specified files were not found in the system "
+                    "and '--break-on-fail' flag used. :warning-emoji:"
+                    f"Files not found: {self.filehandler.failed}"
+                )
+
+            # Only download missing or changed files to an existing destination
+            if self.sync:
+                self.sync_index = si.SyncIndex(
+                    index_file=self.dds_directory.directories["META"]
+                    / pathlib.Path("sync_index.json")
+                )
+
+            # Files are added to the file and status info when scheduled for download
+            self.nr_up_to_date = 0
+            self.nr_files = None if self.filehandler.streamed else len(self.filehandler.data)
+            remote_files = (
+                self.filehandler.iter_file_info_all(
+                    spool_file=self.dds_directory.directories["META"]
+                    / pathlib.Path("file_info_all.jsonl")
+                )
+                if self.filehandler.streamed
+                else list(self.filehandler.data.items())
+            )
+            self.filehandler.data = {}
+            self.files_to_download = self.__iter_files(remote_files=remote_files)
+
+            # Get the first file to download, to know if there is anything to do
+            first_file = next(self.files_to_download, None)
+            if first_file is None and not self.nr_up_to_date:
+                # Never delete an existing destination which is being synced
+                if not self.sync and self.temporary_directory and self.temporary_directory.is_dir():
+                    LOG.debug("Deleting staging directory '%s'.", self.temporary_directory)
+                    try:
+                        dds_cli.utils.delete_folder(self.temporary_directory)
+                    except OSError as err:
+                        # Folder deletion may fail if log file is still being written to
+                        # This is not critical - the important thing is to show the error message
+                        LOG.error(
+                            "Could not delete staging directory %s: %s",
+                            self.temporary_directory,
+                            err,
+                        )
+                raise dds_cli.exceptions.DownloadError("No files to download.")
+
+            if first_file is not None:
+                self.files_to_download = itertools.chain([first_file], self.files_to_download)
+
+            # Warn up front if the delivery will not fit - if streamed, when all info is received
+            if not self.filehandler.streamed and remote_files:
+                self.__preflight_disk_space(
+                    size_stored=sum(x["size_stored"] for _, x in remote_files),
+                    size_original=sum(x["size_original"] for _, x in remote_files),
+                    largest=max((x for _, x in remote_files), key=lambda x: x["size_stored"]),
+                )
+
+            progress.remove_task(wait_task)
+
+    def __drop(self, file):
+        """Remove the file and status info of a finished file. Needs the release lock."""
+        self.filehandler.data.pop(file)
+        self.status.pop(file)
+        self.nr_released += 1
+
+    def __update_and_release(self, file):
+        """Update the file in the database, and remove its info if it has been released.
+
+        A released file whose update failed no longer awaits it, but its info is kept.
+        """
+        updated, message = self.update_db(file=file)
+        with self.release_lock:
+            if file in self.awaiting_update:
+                self.awaiting_update.discard(file)
+                if updated:
+                    self.__drop(file=file)
+                self.release_lock.notify_all()
+        return updated, message
+
+    def __preflight_disk_space(self, size_stored, size_original, largest):
+        """Warn if the files to download, and the largest file in progress, will not fit on disk.
+
+        size_stored and size_original are the total sizes of the files, and largest is the info
+        of the file with the largest encrypted size.
+        """
+        # Encrypted files are kept with '--fetch-only', otherwise only the decrypted files
+        needs = {
+            self.filehandler.local_destination: size_stored if self.fetch_only else size_original
+        }
+        if not self.fetch_only:
+            needs[largest["path_downloaded"]] = largest["size_stored"]
+
+        fits, message = self.disk_budget.preflight(needs=needs, description="The download")
+        if not fits:
+            LOG.warning(message)
+
+    def __iter_files(self, remote_files):
+        """Yield the files to download, adding their file and status info as they come in."""
+        scheduled = {"size_stored": 0, "size_original": 0}
+        preflight_pending = self.filehandler.streamed
+        for file, info in self.__refresh_expiring_urls(
+            remote_files=self.__skip_up_to_date(remote_files)
+        ):
+            # Do not schedule any more files if one has failed and '--break-on-fail'
+            if self.break_on_fail and self.status.any_cancelled:
+                break
+
+            # Streamed files are checked when the info on all of them has been received
+            if preflight_pending and self.filehandler.collected is not None:
+                preflight_pending = False
+                self.__preflight_disk_space(
+                    size_stored=self.filehandler.collected["size_stored"]
+                    - scheduled["size_stored"],
+                    size_original=self.filehandler.collected["size_original"]
+                    - scheduled["size_original"],
+                    largest=self.filehandler.collected["largest"],
+                )
+            elif preflight_pending:
+                scheduled["size_stored"] += info["size_stored"]
+                scheduled["size_original"] += info["size_original"]
+
+            # Wait for the database updates to catch up, so that the finished files kept are bounded
+            with self.release_lock:
+                self.release_lock.wait_for(
+                    lambda: len(self.awaiting_update) < constants.UPDATE_MAX_PENDING
+                )
+
+            self.filehandler.data[file] = info
+            self.status[file] = self.filehandler.create_download_status()
+            if self.deduplicator:
+                # Files held back for their source are scheduled when the source is done
+                yield from self.deduplicator.ready()
+                if not self.deduplicator.add(
+                    file=file, content=(info["checksum"], info["size_original"])
+                ):
+                    continue
+            yield file
+
+        if self.deduplicator:
+            yield from self.deduplicator.remaining()
+
+        if self.sync:
+            LOG.info(
+                "%s file(s) were already up to date in '%s'.",
+                self.nr_up_to_date,
+                self.filehandler.local_destination,
+            )
+        self.nr_files = self.nr_released + len(self.filehandler.data)
+
+    def __link_duplicate(self, file, source):
+        """Save a file as a hardlink to a downloaded file with the same contents.
+
+        The file is copied if it cannot be linked, e.g. if links are not supported.
+        """
+        info = self.filehandler.data[file]
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            file.unlink(missing_ok=True)
+            try:
+                os.link(source, file)
+            except OSError as err:
+                LOG.debug("Could not link '%s', copying instead: %s", LazyEscape(file), err)
+                shutil.copyfile(source, file)
+        except OSError as err:
+            return False, f"Could not save '{escape(str(file))}' as a copy of '{source}': {err}"
+
+        LOG.debug("File '%s' linked to '%s'", LazyEscape(file), LazyEscape(source))
+        self.deduplicator.saved(size=info["size_original"])
+        self.update_queue.add(file)
+        if self.sync_index:
+            self.sync_index.record(file=pathlib.Path(file), info=info)
+        return True, ""
+
+    def __refresh_url(self, file):
+        """Get a new presigned url for one file, returns None if not possible."""
+        old_url = self.filehandler.data[file]["url"]
+        try:
+            self.filehandler.refresh_urls(files=[self.filehandler.data[file]])
+        except (
+            dds_cli.exceptions.ApiRequestError,
+            dds_cli.exceptions.ApiResponseError,
+            dds_cli.exceptions.DDSCLIException,
+        ) as err:
+            LOG.warning(err)
+            return None
+
+        new_url = self.filehandler.data[file]["url"]
+        return new_url if new_url != old_url else None
+
+    def __skip_up_to_date(self, remote_files):
+        """Skip files which already exist in the destination, if '--sync'."""
+        for file, info in remote_files:
+            if self.sync_index and self.sync_index.is_up_to_date(file=file, info=info):
+                self.nr_up_to_date += 1
+                continue
+            yield file, info
+
+    def __refresh_expiring_urls(self, remote_files):
+        """Refresh old presigned urls shortly before the files are scheduled.
+
+        A batch of upcoming files is kept, and when the next file has an old url, all old urls
+        in the batch are refreshed in one request.
+        """
+        remote_files = iter(remote_files)
+        upcoming = collections.deque()
+        while True:
+            upcoming.extend(
+                itertools.islice(remote_files, constants.URL_REFRESH_BATCH_SIZE - len(upcoming))
+            )
+            if not upcoming:
+                return
+
+            refresh_before = time.time() - constants.URL_REFRESH_AGE
+            if upcoming[0][1]["url_fetched"] < refresh_before:
+                try:
+                    self.filehandler.refresh_urls(
+                        files=[x for _, x in upcoming if x["url_fetched"] < refresh_before]
+                    )
+                except (
+                    dds_cli.exceptions.ApiRequestError,
+                    dds_cli.exceptions.ApiResponseError,
+                    dds_cli.exceptions.DDSCLIException,
+                ) as err:
+                    # Expired urls are also refreshed when the download is denied
+                    LOG.warning(err)
+
+            yield upcoming.popleft()
@@ -0,0 +1,357 @@
+"""Data preparer. Compresses and encrypts files ahead of an upload."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import concurrent.futures
+import json
+import logging
+import pathlib
+import threading
+
+# Installed
+from rich.markup import escape
+
+# Own modules
+import dds_cli.directory
+import dds_cli.utils
+from dds_cli import base
+from dds_cli import data_remover as dr
+from dds_cli import disk_budget as db
+from dds_cli import exceptions
+from dds_cli import file_encryptor as fe
+from dds_cli import file_handler as fh
+from dds_cli import file_handler_local as fhl
+from dds_cli import file_records as frec
+from dds_cli import metrics
+from dds_cli import profiling
+from dds_cli import text_handler as txt
+from dds_cli import transfer_progress as tp
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+# Name of the manifest in the META directory of the prepared directory
+PREPARED_MANIFEST_NAME = "prepared_files.jsonl"
+
+###############################################################################
+# FUNCTIONS ####################################################### FUNCTIONS #
+###############################################################################
+
+
+def protect_file(filehandler, file, keys, progress, task, delivery_metrics=None):
+    """Compress, if needed, and encrypt a file to its processed path.
+
+    The file info in the file handler is updated with the checksum, size, public key and salt.
+    The time of reading and compressing the file, and of encrypting it, are recorded in
+    delivery_metrics, if given.
+    """
+    file_info = filehandler.data[file]
+    delivery_metrics = delivery_metrics or metrics.DeliveryMetrics()
+
+    # Stream chunks from file into the encryptor to save the encrypted chunks
+    streamed_chunks = delivery_metrics.chunks(
+        name="stream_from_file", chunks=filehandler.stream_from_file(file=file), file=file
+    )
+    with fe.Encryptor(project_keys=keys) as encryptor:
+        LOG.debug("Encrypting file '%s'", escape(str(file_info["path_raw"])))
+        with delivery_metrics.stage(name="encrypt_filechunks", file=file) as timer:
+            saved, message = encryptor.encrypt_filechunks(
+                chunks=streamed_chunks,
+                outfile=file_info["path_processed"],
+                progress=(progress, task),
+            )
+            timer.failed = not saved
+            timer.bytes = file_info["size_raw"] if saved else 0
+
+        # Get hex version of public key -- saved in db
+        file_info["public_key"] = encryptor.get_public_component_hex(
+            private_key=encryptor.my_private
+        )
+        file_info["salt"] = encryptor.salt
+
+    file_info["size_processed"] = (
+        file_info["path_processed"].stat().st_size if file_info["path_processed"].exists() else 0
+    )
+    LOG.debug(
+        "File '%s' processed size: %s",
+        escape(str(file_info["path_raw"])),
+        file_info["size_processed"],
+    )
+
+    return saved, message
+
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class PreparedManifest:
+    """Files which have been prepared for upload, with the info needed to upload them.
+
+    Entries are appended as lines of JSON, and the last entry for a file is the valid one. Paths
+    are saved relative to the files directory, so that the prepared directory can be moved.
+    """
+
+    # Keys saved from the file info
+    KEYS = [
+        "size_raw",
+        "compressed",
+        "size_processed",
+        "path_remote",
+        "checksum",
+        "public_key",
+        "salt",
+    ]
+
+    def __init__(self, manifest_file: pathlib.Path, files_directory: pathlib.Path):
+        """The manifest file is only created when the first file is added."""
+        self.manifest_file = manifest_file
+        self.files_directory = files_directory
+        self._lock = threading.Lock()
+
+    # Public methods ############ Public methods #
+    def add(self, file: str, info: dict, project: str):
+        """Save a prepared file."""
+        self.__append(
+            entry={
+                **{x: info[x] for x in self.KEYS},
+                "file": file,
+                "project": project,
+                "path_raw": str(info["path_raw"]),
+                "subpath": pathlib.Path(info["subpath"]).as_posix(),
+                "path_processed": pathlib.Path(info["path_processed"])
+                .relative_to(self.files_directory)
+                .as_posix(),
+                "uploaded": False,
+            }
+        )
+
+    def mark_uploaded(self, file: str):
+        """Save that a file has been uploaded."""
+        self.__append(entry={"file": file, "uploaded": True})
+
+    def pending(self):
+        """Get the files which have not been uploaded: {file: entry}.
+
+        The entries are in the format of the LocalFileHandler file info.
+        """
+        entries = {}
+        try:
+            with self.manifest_file.open(mode="r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["file"]] = entry
+        except FileNotFoundError:
+            return {}
+
+        return {
+            file: frec.UploadRecord(
+                {x: entry[x] for x in self.KEYS},
+                project=entry["project"],
+                path_raw=pathlib.Path(entry["path_raw"]),
+                subpath=pathlib.Path(entry["subpath"]),
+                path_processed=self.files_directory / entry["path_processed"],
+                overwrite=False,
+            )
+            for file, entry in entries.items()
+            if not entry["uploaded"]
+        }
+
+    # Private methods ############ Private methods #
+    def __append(self, entry: dict):
+        """Add a line to the manifest."""
+        with self._lock:
+            with self.manifest_file.open(mode="a", encoding="utf-8") as manifest:
+                manifest.write(json.dumps(entry) + "\n")
+
+
+class PreparedFileHandler(fhl.LocalFileHandler):
+    """Collects the files in a directory created by 'dds data prepare'.
+
+    Files which are missing or have changed since they were prepared are added to failed.
+    """
+
+    def __init__(self, staging_dir: dds_cli.directory.DDSDirectory, project: str):
+        """Read the manifest instead of the local files."""
+        fh.FileHandler.__init__(
+            self,
+            user_input=((), None),
+            local_destination=staging_dir.directories["FILES"],
+            project=project,
+        )
+        self.data_list = None
+
+        self.manifest = PreparedManifest(
+            manifest_file=staging_dir.directories["META"] / PREPARED_MANIFEST_NAME,
+            files_directory=self.local_destination,
+        )
+        self.data = self.manifest.pending()
+        if not self.data:
+            raise exceptions.NoDataError(
+                f"No prepared files to upload in '{escape(str(staging_dir.directories['ROOT']))}'."
+            )
+
+        projects = {x.pop("project") for x in self.data.values()}
+        if projects != {project}:
+            raise exceptions.UploadError(
+                f"The files were prepared for project(s) {', '.join(sorted(projects))}, "
+                f"not '{project}'. Prepare the files again for this project."
+            )
+
+        for file, info in list(self.data.items()):
+            path_processed = info["path_processed"]
+            if (
+                not path_processed.is_file()
+                or path_processed.stat().st_size != info["size_processed"]
+            ):
+                self.failed[file] = {
+                    **self.data.pop(file),
+                    "message": "Prepared file is missing or has changed",
+                }
+        LOG.debug("Prepared file info collected: %s files", len(self.data))
+
+
+class DataPreparer(base.DDSBaseClass):
+    """Compresses and encrypts files for a later 'dds data put --prepared'.
+
+    Only the project public key is requested from the API - nothing is uploaded.
+    """
+
+    def __init__(
+        self,
+        project: str,
+        staging_dir: dds_cli.directory.DDSDirectory,
+        source: tuple = (),
+        source_path_file: pathlib.Path = None,
+        destination: str = None,
+        seekable: bool = False,
+        silent: bool = False,
+        no_prompt: bool = False,
+        token_path: str = None,
+        method: str = "prepare",
+    ):
+        """Collect the files and get the project keys."""
+        # Initiate DDSBaseClass to authenticate user and get the project keys
+        super().__init__(
+            project=project,
+            method=method,
+            no_prompt=no_prompt,
+            token_path=token_path,
+            staging_dir=staging_dir,
+        )
+
+        # Only method "prepare" can use the DataPreparer class
+        if self.method != "prepare":
+            raise exceptions.InvalidMethodError(
+                attempted_method=self.method,
+                message="DataPreparer attempting unauthorized method",
+            )
+
+        self.silent = silent
+        self.failed = {}
+        self.disk_budget = db.DiskBudget()
+        profiling.phase(name="discovery")
+        self.filehandler = fhl.LocalFileHandler(
+            user_input=(source, source_path_file),
+            project=self.project,
+            temporary_destination=self.dds_directory.directories["FILES"],
+            remote_destination=destination,
+            seekable=seekable,
+        )
+        self.manifest = PreparedManifest(
+            manifest_file=self.dds_directory.directories["META"] / PREPARED_MANIFEST_NAME,
+            files_directory=self.dds_directory.directories["FILES"],
+        )
+
+        # All prepared files are kept until uploaded, so all need to fit
+        fits, message = self.disk_budget.preflight(
+            needs={
+                x["path_processed"]: db.processed_size(size=x["size_raw"])
+                for x in self.filehandler.data.values()
+            },
+            description="The prepared files",
+        )
+        if not fits:
+            LOG.warning(message)
+
+    # Public methods ############ Public methods #
+    def prepare_all(self, num_threads: int):
+        """Prepare all files in parallel and print a summary."""
+        profiling.phase(name="transfer")
+        with tp.TransferProgress(console=dds_cli.utils.stderr_console) as progress:
+            task = progress.add_task(description="Prepare", total=len(self.filehandler.data))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as texec:
+                futures = {
+                    texec.submit(self.prepare, file=file, progress=progress): file
+                    for file in self.filehandler.data
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    prepared, message = future.result()
+                    if not prepared:
+                        self.failed[futures[future]] = message
+                    progress.advance(task)
+
+        if self.failed:
+            for file, message in self.failed.items():
+                LOG.warning("Preparation of '%s' failed: %s", escape(file), message)
+            raise exceptions.UploadError(
+                f"{len(self.failed)} of {len(self.filehandler.data)} file(s) could not be "
+                "prepared. The other files can still be uploaded - see the log for the errors."
+            )
+
+        dds_cli.utils.console.print("\nPreparation completed!\n")
+        LOG.info(
+            "Upload the files with: dds data put --project %s --prepared %s",
+            self.project,
+            self.dds_directory.directories["ROOT"],
+        )
+
+    def prepare(self, file, progress):
+        """Compress and encrypt one file and add it to the manifest if successful.
+
+        The processed file is kept, so the disk space is only reserved while it is written.
+        """
+        info = self.filehandler.data[file]
+        admitted, message = self.disk_budget.acquire(
+            key=file, needs={info["path_processed"]: db.processed_size(size=info["size_raw"])}
+        )
+        if not admitted:
+            return False, message
+
+        task = progress.add_task(
+            description=txt.TextHandler.task_name(file=escape(file), step="encrypt"),
+            total=info["size_raw"],
+            visible=not self.silent,
+            file=file,
+            step="encrypt",
+        )
+        try:
+            info["path_processed"].parent.mkdir(parents=True, exist_ok=True)
+            prepared, message = protect_file(
+                filehandler=self.filehandler,
+                file=file,
+                keys=self.keys,
+                progress=progress,
+                task=task,
+                delivery_metrics=self.metrics,
+            )
+        except OSError as err:
+            prepared, message = (False, str(err))
+        finally:
+            progress.remove_task(task)
+            self.disk_budget.release(key=file)
+
+        if prepared:
+            self.manifest.add(file=file, info=info, project=self.project)
+        elif info["path_processed"].exists():
+            dr.DataRemover.delete_tempfile(file=info["path_processed"])
+
+        return prepared, message
@@ -7,28 +7,38 @@
 # Standard library
 import concurrent.futures
 import itertools
-import json
 import logging
 import pathlib
+import typing
 
 # Installed
 import boto3
 import botocore
+import nacl.exceptions
+import zstandard as zstd
 from rich.markup import escape
-from rich.progress import BarColumn, Progress, SpinnerColumn
+from rich.progress import Progress, SpinnerColumn
 
 # Own modules
 import dds_cli
 import dds_cli.directory
 import dds_cli.utils
 from dds_cli import DDSEndpoint, base
+from dds_cli import constants
+from dds_cli import data_preparer as dp
 from dds_cli import data_remover as dr
-from dds_cli import exceptions
+from dds_cli import dedup
+from dds_cli import disk_budget as db
 from dds_cli import file_encryptor as fe
+from dds_cli import exceptions
 from dds_cli import file_handler_local as fhl
+from dds_cli import file_records as frec
+from dds_cli import profiling
 from dds_cli import status
 from dds_cli import text_handler as txt
+from dds_cli import transfer_progress as tp
 from dds_cli.custom_decorators import subpath_required, update_status, verify_proceed
+from dds_cli.utils import LazyEscape
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -53,8 +63,22 @@ def put(
     token_path,
     destination,
     staging_dir,
+    prepared=False,
+    stream=None,
+    stream_name=None,
+    seekable=False,
+    dedup_contents=False,
+    metrics_textfile=None,
+    trace_file=None,
 ):
-    """Handle upload of data."""
+    """Handle upload of data.
+
+    If a stream is given, e.g. stdin, it is uploaded as stream_name instead of local files. With
+    seekable, files are compressed so that parts of them can be downloaded on their own. With
+    dedup_contents, files with the same contents are uploaded once and copied in the cloud.
+    The metrics of the upload stages are also saved in metrics_textfile, and a timeline of them
+    in trace_file, if given.
+    """
     # Initialize delivery - check user access etc
     with DataPutter(
         project=project,
@@ -67,21 +91,23 @@ def put(
         token_path=token_path,
         destination=destination,
         staging_dir=staging_dir,
+        num_threads=num_threads,
+        prepared=prepared,
+        stream=stream,
+        stream_name=stream_name,
+        seekable=seekable,
+        dedup_contents=dedup_contents,
+        metrics_textfile=metrics_textfile,
+        trace_file=trace_file,
     ) as putter:
         # Progress object to keep track of progress tasks
-        with Progress(
-            "{task.description}",
-            BarColumn(bar_width=None),
-            " • ",
-            "[progress.percentage]{task.percentage:>3.1f}%",
-            refresh_per_second=2,
-            console=dds_cli.utils.stderr_console,
-        ) as progress:
+        profiling.phase(name="transfer")
+        with tp.TransferProgress(console=dds_cli.utils.stderr_console) as progress:
             # Keep track of futures
             upload_threads = {}
 
             # Iterator to keep track of which files have been handled
-            iterator = iter(putter.filehandler.data.copy())
+            iterator = iter(list(putter.filehandler.data))
 
             with concurrent.futures.ThreadPoolExecutor() as texec:
                 # Start main progress bar - total uploaded files
@@ -115,14 +141,14 @@ def put(
                         # Get result from future and schedule database update
                         for fut in done:
                             uploaded_file = upload_threads.pop(fut)
-                            LOG.debug("Future done for file: '%s'", escape(uploaded_file))
+                            LOG.debug("Future done for file: '%s'", LazyEscape(uploaded_file))
 
                             # Get result
                             try:
                                 file_uploaded = fut.result()
                                 LOG.debug(
                                     "Upload of '%s' successful: %s",
-                                    escape(str(uploaded_file)),
+                                    LazyEscape(uploaded_file),
                                     file_uploaded,
                                 )
                             except concurrent.futures.BrokenExecutor as err:
@@ -141,7 +167,7 @@ def put(
 
                         # Schedule the next set of futures for upload
                         for next_file in itertools.islice(iterator, new_tasks):
-                            LOG.debug("Starting: '%s'", escape(next_file))
+                            LOG.debug("Starting: '%s'", LazyEscape(next_file))
                             upload_threads[
                                 texec.submit(
                                     putter.protect_and_upload,
@@ -170,9 +196,10 @@ def put(
 
         # Make a single database update for files that have failed
         # Json file for failed files should only be created if there has been an error
-        if putter.failed_delivery_log.is_file():
+        if putter.failure_journal.nr_entries:
             LOG.warning(
-                "Some file uploads experienced issues. The errors have been saved to the following file: %s.\n"
+                "Some file uploads experienced issues. The errors will be saved to the following "
+                "file when the upload has finished: %s.\n"
                 "Investigating possible automatic solutions. Do not cancel the upload.",
                 str(putter.failed_delivery_log),
             )
@@ -209,8 +236,32 @@ class DataPutter(base.DDSBaseClass):
         no_prompt: bool = False,
         token_path: str = None,
         destination: str = None,
+        num_threads: int = 4,
+        prepared: bool = False,
+        stream: typing.BinaryIO = None,
+        stream_name: str = None,
+        seekable: bool = False,
+        dedup_contents: bool = False,
+        token: dict = None,
+        keys: tuple = None,
+        s3connector=None,
+        summary: bool = True,
+        metrics_textfile: pathlib.Path = None,
+        trace_file: pathlib.Path = None,
+        headless: bool = False,
     ):
-        """Handle actions regarding upload of data."""
+        """Handle actions regarding upload of data.
+
+        If prepared, the staging directory is one created by 'dds data prepare' and the files in
+        it are uploaded as they are. If a stream is given, e.g. stdin, it is uploaded as
+        stream_name while it is read, without saving anything locally. With seekable, files are
+        compressed in independent frames with a seek table, for 'dds data get --byte-range'.
+        With dedup_contents, local files with the same contents are only uploaded once, and the
+        others are copied from it in the cloud.
+
+        The token, keys, s3connector, summary, metrics_textfile, trace_file and headless are
+        passed on to DDSBaseClass.
+        """
         # Initiate DDSBaseClass to authenticate user
         super().__init__(
             project=project,
@@ -218,13 +269,27 @@ class DataPutter(base.DDSBaseClass):
             no_prompt=no_prompt,
             token_path=token_path,
             staging_dir=staging_dir,
+            token=token,
+            keys=keys,
+            s3connector=s3connector,
+            summary=summary,
+            metrics_textfile=metrics_textfile,
+            trace_file=trace_file,
+            headless=headless,
         )
+        profiling.phase(name="discovery")
 
         # Initiate DataPutter specific attributes
         self.break_on_fail = break_on_fail
         self.overwrite = overwrite
         self.silent = silent
+        self.prepared = prepared
+        self.stream = stream
         self.filehandler = None
+        self.deduplicator = None
+
+        # Files are only encrypted when there is space for them in the staging directory
+        self.disk_budget = db.DiskBudget()
 
         # Only method "put" can use the DataPutter class
         if self.method != "put":
@@ -235,17 +300,33 @@ class DataPutter(base.DDSBaseClass):
             "[bold]{task.description}",
             SpinnerColumn(spinner_name="dots12", style="white"),
             console=dds_cli.utils.stderr_console,
+            disable=self.headless,
         ) as progress:
             # Spinner while collecting file info
             wait_task = progress.add_task("Collecting and preparing data", step="prepare")
 
             # Get file info
-            self.filehandler = fhl.LocalFileHandler(
-                user_input=(source, source_path_file),
-                project=self.project,
-                temporary_destination=self.dds_directory.directories["FILES"],
-                remote_destination=destination,
-            )
+            with self.metrics.stage(name="discover"):
+                if self.prepared:
+                    self.filehandler = dp.PreparedFileHandler(
+                        staging_dir=self.dds_directory, project=self.project
+                    )
+                elif self.stream is not None:
+                    self.filehandler = fhl.StreamFileHandler(
+                        stream=self.stream,
+                        name=stream_name,
+                        temporary_destination=self.dds_directory.directories["FILES"],
+                        project=self.project,
+                        seekable=seekable,
+                    )
+                else:
+                    self.filehandler = fhl.LocalFileHandler(
+                        user_input=(source, source_path_file),
+                        project=self.project,
+                        temporary_destination=self.dds_directory.directories["FILES"],
+                        remote_destination=destination,
+                        seekable=seekable,
+                    )
 
             # Verify that the Safespring S3 bucket exists
             # self.verify_bucket_exist()
@@ -262,14 +343,21 @@ class DataPutter(base.DDSBaseClass):
                 )
 
             # Generate status dict
-            self.status = self.filehandler.create_upload_status_dict(
-                existing_files=files_in_db, overwrite=self.overwrite
+            self.status = status.DeliveryStatus(
+                self.filehandler.create_upload_status_dict(
+                    existing_files=files_in_db, overwrite=self.overwrite
+                )
             )
 
+            # Prepared files are already encrypted, and a stream has no other files
+            if dedup_contents and not self.prepared and self.stream is None:
+                self.__find_duplicates()
+
             # Remove spinner
             progress.remove_task(wait_task)
         if not self.filehandler.data:
-            if self.temporary_directory and self.temporary_directory.is_dir():
+            # A prepared directory is kept, it may hold files which failed
+            if not self.prepared and self.temporary_directory and self.temporary_directory.is_dir():
                 LOG.debug("Deleting temporary folder %s.", self.temporary_directory)
                 try:
                     dds_cli.utils.delete_folder(self.temporary_directory)
@@ -287,16 +375,71 @@ class DataPutter(base.DDSBaseClass):
                 "with matching file paths will be overwritten."
             )
 
+        # Warn up front if the files being processed at the same time will not fit
+        if not self.prepared and self.stream is None:
+            self.__preflight_disk_space(num_threads=num_threads)
+
+    def __exit__(self, exception_type, exception_value, traceback, max_fileerrs: int = 40):
+        """Log the files which were copied instead of uploaded, and finish the delivery."""
+        if self.deduplicator and self.deduplicator.nr_saved:
+            LOG.info(
+                "%s file(s) had the same contents as other files and were copied in the cloud "
+                "instead of uploaded, saving %s.",
+                self.deduplicator.nr_saved,
+                dds_cli.utils.format_api_response(self.deduplicator.size_saved, "Size"),
+            )
+        return super().__exit__(exception_type, exception_value, traceback, max_fileerrs)
+
     # Public methods ###################### Public methods #
     @verify_proceed
     @subpath_required
     def protect_and_upload(self, file, progress):
-        """Process and upload the file while handling the progress bars."""
+        """Process and upload the file while handling the progress bars.
+
+        Waits until there is disk space for the processed file before starting. Files with the
+        same contents as another file are copied from it in the cloud once it has been uploaded.
+        """
+        all_ok = False
+        try:
+            source = self.deduplicator.wait(file=file) if self.deduplicator else None
+            if source is not None:
+                all_ok, message = self.__copy_and_add(file=file, source=source)
+                return all_ok, message
+
+            admitted, message = self.disk_budget.acquire(
+                key=file, needs=self.disk_footprint(info=self.filehandler.data[file])
+            )
+            if not admitted:
+                return False, message
+
+            try:
+                if self.stream is not None:
+                    all_ok, message = self.__protect_and_upload_stream(file=file, progress=progress)
+                else:
+                    all_ok, message = self.__protect_and_upload(file=file, progress=progress)
+                return all_ok, message
+            finally:
+                self.disk_budget.release(key=file)
+        finally:
+            # Files waiting for this one are copied from it, or the next one is uploaded instead
+            if self.deduplicator:
+                self.deduplicator.finish(file=file, ok=all_ok)
+
+    def disk_footprint(self, info):
+        """Disk space needed while uploading a file: the compressed and encrypted file.
+
+        Prepared files are already on disk, and streams are not saved.
+        """
+        if self.prepared or self.stream is not None:
+            return {}
+        return {info["path_processed"]: db.processed_size(size=info["size_raw"])}
+
+    def __protect_and_upload(self, file, progress):
+        """Process and upload a file which has been admitted."""
         # Variables
         all_ok, saved, message = (False, False, "")  # Error catching
         file_info = self.filehandler.data[file]  # Info on current file
-        file_public_key, salt = ("", "")  # Crypto info
-        file_path_raw = escape(str(file_info["path_raw"]))
+        file_path_raw = LazyEscape(file_info["path_raw"])
         LOG.debug("Step '%s': started file '%s'", self.method, file_path_raw)
 
         # Progress bar for processing
@@ -304,36 +447,23 @@ class DataPutter(base.DDSBaseClass):
             description=txt.TextHandler.task_name(file=escape(file), step="encrypt"),
             total=file_info["size_raw"],
             visible=not self.silent,
+            file=file,
+            step="encrypt",
         )
 
-        # Stream chunks from file
-        streamed_chunks = self.filehandler.stream_from_file(file=file)
-
-        # Stream the chunks into the encryptor to save the encrypted chunks
-        with fe.Encryptor(project_keys=self.keys) as encryptor:
-            # Encrypt and save chunks
-            LOG.debug("Encrypting file '%s'", file_path_raw)
-            saved, message = encryptor.encrypt_filechunks(
-                chunks=streamed_chunks,
-                outfile=file_info["path_processed"],
-                progress=(progress, task),
+        if self.prepared:
+            # Compressed and encrypted by 'dds data prepare'
+            saved, message = (True, "")
+        else:
+            saved, message = dp.protect_file(
+                filehandler=self.filehandler,
+                file=file,
+                keys=self.keys,
+                progress=progress,
+                task=task,
+                delivery_metrics=self.metrics,
             )
 
-            # Get hex version of public key -- saved in db
-            file_public_key = encryptor.get_public_component_hex(private_key=encryptor.my_private)
-            salt = encryptor.salt
-
-        # Update file info incl size, public key, salt
-        self.filehandler.data[file]["public_key"] = file_public_key
-        self.filehandler.data[file]["salt"] = salt
-        self.filehandler.data[file]["size_processed"] = file_info["path_processed"].stat().st_size
-
-        LOG.debug(
-            "File '%s' processed size: %s",
-            file_path_raw,
-            file_info["path_processed"].stat().st_size,
-        )
-
         if saved:
             LOG.debug(
                 "File successfully encrypted: '%s'",
@@ -356,6 +486,8 @@ class DataPutter(base.DDSBaseClass):
 
                 if db_updated:
                     all_ok = True
+                    if self.prepared:
+                        self.filehandler.manifest.mark_uploaded(file=file)
                     LOG.debug(
                         "File successfully uploaded and added to the database: '%s'",
                         file_path_raw,
@@ -365,7 +497,7 @@ class DataPutter(base.DDSBaseClass):
             # Delete temporary processed file locally
             LOG.debug(
                 "Deleting file '%s' - exists: %s",
-                escape(str(file_info["path_processed"])),
+                LazyEscape(file_info["path_processed"]),
                 file_info["path_processed"].exists(),
             )
             dr.DataRemover.delete_tempfile(file=file_info["path_processed"])
@@ -375,6 +507,162 @@ class DataPutter(base.DDSBaseClass):
 
         return all_ok, message
 
+    def __protect_and_upload_stream(self, file, progress):
+        """Compress, encrypt and upload a stream while it is read."""
+        all_ok, message = (False, "")
+        file_info = self.filehandler.data[file]
+        LOG.debug("Step '%s': started stream '%s'", self.method, LazyEscape(file))
+
+        # The size is not known - the progress bar shows the uploaded bytes
+        task = progress.add_task(
+            description=txt.TextHandler.task_name(file=escape(file), step="put"),
+            total=None,
+            visible=not self.silent,
+            file=file,
+            step="put",
+        )
+
+        with fe.Encryptor(project_keys=self.keys) as encryptor:
+            file_uploaded, message = self.put_stream(
+                file=file,
+                chunks=encryptor.encrypt_chunks(
+                    chunks=self.metrics.chunks(
+                        name="stream_from_file",
+                        chunks=self.filehandler.stream_from_file(file=file),
+                        file=file,
+                    )
+                ),
+                progress=progress,
+                task=task,
+            )
+            file_info["public_key"] = encryptor.get_public_component_hex(
+                private_key=encryptor.my_private
+            )
+            file_info["salt"] = encryptor.salt
+
+        if file_uploaded:
+            LOG.debug(
+                "Stream '%s' uploaded: %s bytes read, %s bytes uploaded",
+                LazyEscape(file),
+                file_info["size_raw"],
+                file_info["size_processed"],
+            )
+            all_ok, message = self.add_file_db(file=file)
+
+        progress.remove_task(task)
+        return all_ok, message
+
+    @update_status
+    def put_stream(self, file, chunks, progress, task):
+        """Upload encrypted chunks of unknown total size to the cloud as a multipart upload."""
+        uploaded, error = (False, "")
+        file_remote = self.filehandler.data[file]["path_remote"]
+
+        try:
+            with self.s3connector as conn:
+                client = conn.resource.meta.client
+                upload_id = client.create_multipart_upload(
+                    Bucket=conn.bucketname,
+                    Key=file_remote,
+                    ACL="private",  # Access control list
+                    CacheControl="no-store",  # Don't store cache
+                )["UploadId"]
+                try:
+                    parts = []
+                    size_processed = 0
+                    for number, part in enumerate(self.__parts(chunks=chunks), start=1):
+                        response = client.upload_part(
+                            Bucket=conn.bucketname,
+                            Key=file_remote,
+                            PartNumber=number,
+                            UploadId=upload_id,
+                            Body=part,
+                        )
+                        parts.append({"ETag": response["ETag"], "PartNumber": number})
+                        size_processed += len(part)
+                        progress.advance(task, len(part))
+
+                    client.complete_multipart_upload(
+                        Bucket=conn.bucketname,
+                        Key=file_remote,
+                        UploadId=upload_id,
+                        MultipartUpload={"Parts": parts},
+                    )
+                except BaseException:
+                    # Do not leave uploaded parts in the bucket
+                    client.abort_multipart_upload(
+                        Bucket=conn.bucketname, Key=file_remote, UploadId=upload_id
+                    )
+                    raise
+        except (
+            botocore.client.ClientError,
+            boto3.exceptions.Boto3Error,
+            botocore.exceptions.BotoCoreError,
+            OSError,
+            zstd.ZstdError,
+            nacl.exceptions.CryptoError,
+            TypeError,
+            ValueError,
+        ) as err:
+            error = f"S3 upload of stream '{escape(file)}' failed: {err}"
+            LOG.exception("'%s': %s", escape(file), err)
+        else:
+            uploaded = True
+            self.filehandler.data[file]["size_processed"] = size_processed
+
+        return uploaded, error
+
+    def __copy_and_add(self, file, source):
+        """Copy an uploaded file with the same contents, and add the copy to the database.
+
+        The copy is saved with the same salt and public key, since it has the same encrypted data.
+        """
+        file_info = self.filehandler.data[file]
+        source_info = self.filehandler.data[source]
+        for key in ["compressed", "size_processed", "checksum", "public_key", "salt"]:
+            file_info[key] = source_info[key]
+
+        copied, message = self.put_copy(file=file, source=source)
+        if not copied:
+            return False, message
+
+        added, message = self.add_file_db(file=file)
+        if added:
+            self.deduplicator.saved(size=file_info["size_processed"])
+            LOG.debug("File '%s' copied from '%s'", LazyEscape(file), LazyEscape(source))
+        return added, message
+
+    @update_status
+    def put_copy(self, file, source):
+        """Copy the uploaded source file in the cloud, without uploading it again."""
+        copied, error = (False, "")
+        try:
+            with self.s3connector as conn:
+                # Managed copy - large objects are copied in parts
+                conn.resource.meta.client.copy(
+                    CopySource={
+                        "Bucket": conn.bucketname,
+                        "Key": self.filehandler.data[source]["path_remote"],
+                    },
+                    Bucket=conn.bucketname,
+                    Key=self.filehandler.data[file]["path_remote"],
+                    ExtraArgs={
+                        "ACL": "private",  # Access control list
+                        "CacheControl": "no-store",  # Don't store cache
+                    },
+                )
+        except (
+            botocore.client.ClientError,
+            boto3.exceptions.Boto3Error,
+            botocore.exceptions.BotoCoreError,
+        ) as err:
+            error = f"S3 copy of file '{escape(file)}' failed: {err}"
+            LOG.exception("'%s': %s", escape(file), err)
+        else:
+            copied = True
+
+        return copied, error
+
     @update_status
     def put(self, file, progress, task):
         """Upload files to the cloud."""
@@ -474,23 +762,23 @@ class DataPutter(base.DDSBaseClass):
         """
         LOG.info("Attempting to add the file to the database.")
 
-        # Load json from file
+        # Read the journal as a stream, only keeping 'add_file_db' as failed operation
         try:
-            with self.failed_delivery_log.open(mode="r", encoding="utf-8") as json_f:
-                failed = json.load(json_f)
-        except Exception as err:
+            failed = {
+                file: values
+                for file, values in self.failure_journal.entries()
+                if values.get("status", {}).get("failed_op") == "add_file_db"
+            }
+        except OSError as err:
             raise dds_cli.exceptions.DDSCLIException(message=f"Failed to load file info: {err}")
 
-        # Only keep 'add_file_db' as failed operation
-        for file, values in failed.copy().items():
-            if values.get("status", {}).get("failed_op") != "add_file_db":
-                failed.pop(file)
         if len(failed) == 0:
             raise dds_cli.exceptions.DDSCLIException(
                 message="No files failed due to 'add_file_db'."
             )
 
         # Send failed file info to API endpoint
+        self.metrics.retry(name="add_file_db", count=len(failed))
         response, _ = dds_cli.utils.perform_request(
             DDSEndpoint.FILE_ADD_FAILED,
             method="put",
@@ -516,10 +804,60 @@ class DataPutter(base.DDSBaseClass):
 
         # Update status
         for file in files_added:
-            self.status[file].update(
-                {
-                    "cancel": False,
-                    "failed_op": None,
-                    "message": "Added with 'retry_add_file_db'",
-                }
-            )
+            if file in self.status:
+                self.status.restore(file=file, message="Added with 'retry_add_file_db'")
+
+    # Private methods ###################### Private methods #
+    @staticmethod
+    def __parts(chunks):
+        """Collect chunks into parts for a multipart upload.
+
+        The part size is doubled regularly, so that large streams fit in the number of parts
+        allowed. Only the last part can be smaller. The same buffer is yielded for each part,
+        without copying it, so a part needs to be uploaded before the next one is collected.
+        """
+        part = bytearray()
+        part_size = constants.UPLOAD_PART_SIZE
+        number = 1
+        for chunk in chunks:
+            part += chunk
+            if len(part) >= part_size:
+                yield part
+                part.clear()
+                number += 1
+                if number % constants.UPLOAD_PART_SIZE_DOUBLING == 1:
+                    part_size *= 2
+
+        if part or number == 1:
+            yield part
+
+    def __find_duplicates(self):
+        """Find the files with the same contents as another file, and upload them last.
+
+        The copies then usually do not have to wait for the file they are copied from.
+        """
+        self.deduplicator = dedup.UploadDeduplicator()
+        for file in self.deduplicator.add_files(
+            data=self.filehandler.data, delivery_metrics=self.metrics
+        ):
+            self.filehandler.data[file] = self.filehandler.data.pop(file)
+            self.status[file]["put_copy"] = frec.FileStatus.NOT_STARTED
+
+    def __preflight_disk_space(self, num_threads):
+        """Warn if the largest files, which may be processed at the same time, will not fit."""
+        largest = sorted(self.filehandler.data.values(), key=lambda x: x["size_raw"], reverse=True)[
+            :num_threads
+        ]
+        if not largest:
+            return
+
+        # If the largest file does not fit it will fail, otherwise fewer files are run in parallel
+        for files, description in (
+            (largest[:1], "The largest file"),
+            (largest, f"Processing {len(largest)} files in parallel"),
+        ):
+            needs = {x["path_processed"]: db.processed_size(size=x["size_raw"]) for x in files}
+            fits, message = self.disk_budget.preflight(needs=needs, description=description)
+            if not fits:
+                LOG.warning(message)
+                break
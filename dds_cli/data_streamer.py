@@ -0,0 +1,346 @@
+"""Data streamer. Streams downloaded files to stdout without saving them locally."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import hashlib
+import io
+import logging
+import tarfile
+import time
+
+# Installed
+import requests
+import zstandard as zstd
+from rich.markup import escape
+from rich.progress import BarColumn, Progress
+
+# Own modules
+import dds_cli.utils
+from dds_cli import DDSEndpoint, FileSegment
+from dds_cli import base
+from dds_cli import constants
+from dds_cli import exceptions
+from dds_cli import file_compressor as fc
+from dds_cli import file_encryptor as fe
+from dds_cli import file_handler_remote as fhr
+from dds_cli import range_reader as rr
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of chunks, e.g. for adding to a tar archive."""
+
+    def __init__(self, chunks):
+        """Nothing is read until the stream is read."""
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._rest = memoryview(b"")
+
+    def readable(self):
+        """The stream can be read."""
+        return True
+
+    def readinto(self, buffer):
+        """Read the next chunk, or what is left of it, into the buffer."""
+        while not self._rest:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._rest = memoryview(chunk)
+
+        size = min(len(buffer), len(self._rest))
+        buffer[:size] = self._rest[:size]
+        self._rest = self._rest[size:]
+        return size
+
+
+class DataStreamer(base.DDSBaseClass):
+    """Streams files from a project to an output, without saving anything locally.
+
+    One file is streamed as it is, several files as a tar archive. The files are decrypted and
+    decompressed while they are downloaded. With a byte range, only that part of one file is
+    downloaded and streamed.
+    """
+
+    def __init__(
+        self,
+        project: str,
+        source: tuple = (),
+        source_path_file=None,
+        tar: bool = False,
+        byte_range: tuple = None,
+        verify_checksum: bool = False,
+        no_prompt: bool = False,
+        token_path: str = None,
+        method: str = "get",
+    ):
+        """Collect info on the files to stream."""
+        # Initiate DDSBaseClass to authenticate user and get the project keys
+        super().__init__(
+            project=project,
+            method=method,
+            no_prompt=no_prompt,
+            token_path=token_path,
+        )
+
+        # Only method "get" can use the DataStreamer class
+        if self.method != "get":
+            raise exceptions.InvalidMethodError(
+                attempted_method=self.method,
+                message="DataStreamer attempting unauthorized method",
+            )
+
+        self.tar = tar
+        self.byte_range = byte_range
+        self.verify_checksum = verify_checksum
+        self.session = dds_cli.utils.create_download_session(pool_size=1)
+        self.api_session = requests.Session()
+
+        self.filehandler = fhr.RemoteFileHandler(
+            get_all=False,
+            user_input=(source, source_path_file),
+            token=self.token,
+            project=self.project,
+        )
+        if self.filehandler.failed:
+            raise exceptions.DownloadError(
+                f"Files not found: {', '.join(escape(str(x)) for x in self.filehandler.failed)}"
+            )
+        if not self.filehandler.data:
+            raise exceptions.NoDataError("No files to download.")
+        if not self.tar and len(self.filehandler.data) != 1:
+            raise exceptions.DownloadError(
+                f"{len(self.filehandler.data)} files specified, but only one file can be streamed "
+                "to stdout. Use '--tar' to stream several files as a tar archive."
+            )
+        if self.tar and self.byte_range:
+            raise exceptions.DownloadError("A byte range can only be read from one file.")
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Close the sessions. There is no delivery summary, stdout is the data."""
+        self.api_session.close()
+        self.session.close()
+        if exception_type is not None:
+            LOG.debug("Exception: %s with value %s", exception_type, exception_value)
+            return False
+        return True
+
+    # Public methods ############ Public methods #
+    def stream(self, output):
+        """Write the file, or a tar archive of all files, to output, a binary file object."""
+        files = sorted(self.filehandler.data.values(), key=lambda x: x["name_in_db"])
+        with Progress(
+            "{task.description}",
+            BarColumn(bar_width=None),
+            " • ",
+            "[progress.percentage]{task.percentage:>3.1f}%",
+            refresh_per_second=2,
+            console=dds_cli.utils.stderr_console,
+        ) as progress:
+            if self.byte_range:
+                for chunk in self.range_chunks(info=files[0]):
+                    output.write(chunk)
+                output.flush()
+                return
+
+            if not self.tar:
+                for chunk in self.file_chunks(info=files[0], progress=progress):
+                    output.write(chunk)
+                output.flush()
+                return
+
+            with tarfile.open(fileobj=output, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+                for info in files:
+                    tarinfo = tarfile.TarInfo(name=info["name_in_db"])
+                    tarinfo.size = info["size_original"]
+                    tarinfo.mtime = int(time.time())
+                    tarinfo.mode = 0o644
+
+                    contents = ChunkStream(self.file_chunks(info=info, progress=progress))
+                    archive.addfile(tarinfo, fileobj=contents)
+
+                    # Only the expected size is added - read the rest to run the checks
+                    if contents.read():
+                        raise exceptions.DownloadError(
+                            f"File '{escape(info['name_in_db'])}' is larger than expected."
+                        )
+            output.flush()
+
+    def file_chunks(self, info, progress):
+        """Download, decrypt and decompress a file, yielding the original data.
+
+        Raises DownloadError if the file could not be downloaded or verified, which may be
+        after some of the data has been yielded.
+        """
+        file_name_in_db = escape(info["name_in_db"])
+        task = progress.add_task(description=file_name_in_db, total=info["size_stored"])
+
+        def downloaded():
+            """Count the downloaded bytes."""
+            for chunk in self.__download_chunks(info=info):
+                progress.advance(task, len(chunk))
+                yield chunk
+
+        size, checksum = (0, hashlib.sha256())
+        try:
+            with fe.Decryptor(
+                project_keys=self.keys, peer_public=info["public_key"], key_salt=info["salt"]
+            ) as decryptor:
+                chunks = decryptor.decrypt_stream(chunks=downloaded())
+                if info["compressed"]:
+                    chunks = fc.Compressor.decompress_chunks(chunks=chunks)
+
+                for chunk in chunks:
+                    size += len(chunk)
+                    if self.verify_checksum:
+                        checksum.update(chunk)
+                    yield chunk
+        except ValueError as err:
+            raise exceptions.DownloadError(f"File '{file_name_in_db}': {err}") from err
+        finally:
+            progress.remove_task(task)
+
+        if size != info["size_original"]:
+            raise exceptions.DownloadError(
+                f"File '{file_name_in_db}' size mismatch: expected {info['size_original']} "
+                f"bytes, got {size} bytes."
+            )
+        if self.verify_checksum and checksum.hexdigest() != info["checksum"]:
+            raise exceptions.DownloadError(
+                f"Checksum verification failed. File '{file_name_in_db}' compromised."
+            )
+
+        self.__update_db(info=info)
+
+    def range_chunks(self, info):
+        """Download and decrypt only the byte range of a file, yielding the original data.
+
+        The checksum cannot be verified for a part of a file, and the file is not marked as
+        downloaded.
+        """
+        start, end = self.byte_range
+        reader = rr.RangeReader(
+            info=info,
+            decryptor=fe.Decryptor(
+                project_keys=self.keys, peer_public=info["public_key"], key_salt=info["salt"]
+            ),
+            fetch=lambda start, end: self.__fetch_range(info=info, start=start, end=end),
+        )
+        try:
+            yield from reader.read(start=start, end=info["size_original"] if end is None else end)
+        except (ValueError, zstd.ZstdError) as err:
+            raise exceptions.DownloadError(f"File '{escape(info['name_in_db'])}': {err}") from err
+
+    # Private methods ############ Private methods #
+    def __fetch_range(self, info, start, end):
+        """Download the bytes between start and end (not included) of the encrypted file."""
+        url_refreshed = False
+        while True:
+            try:
+                response = self.session.get(
+                    info["url"],
+                    headers={"Range": f"bytes={start}-{end - 1}"},
+                    stream=True,
+                    timeout=(constants.CONNECT_TIMEOUT, constants.READ_TIMEOUT),
+                )
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as err:
+                # Presigned url has probably expired - get a new one and retry
+                if getattr(err.response, "status_code", None) == 403 and not url_refreshed:
+                    url_refreshed = True
+                    self.filehandler.refresh_urls(files=[info])
+                    continue
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: {err}"
+                ) from err
+            except requests.exceptions.RequestException as err:
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: {err}"
+                ) from err
+            break
+
+        with response:
+            # The whole file would be sent if ranges are not supported - it is not read
+            if response.status_code != 206:
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: the server does not "
+                    "support range requests."
+                )
+            try:
+                data = response.content
+            except requests.exceptions.RequestException as err:
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: {err}"
+                ) from err
+
+        if len(data) != end - start:
+            raise exceptions.DownloadError(
+                f"Download of '{escape(info['name_in_db'])}' failed: expected {end - start} "
+                f"bytes, got {len(data)} bytes."
+            )
+        return data
+
+    def __download_chunks(self, info):
+        """Yield the encrypted file as it is downloaded.
+
+        The download link is refreshed once if it has expired. There are no retries once data
+        has been yielded, since it cannot be taken back.
+        """
+        url_refreshed = False
+        while True:
+            try:
+                response = self.session.get(
+                    info["url"],
+                    stream=True,
+                    timeout=(constants.CONNECT_TIMEOUT, constants.READ_TIMEOUT),
+                )
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as err:
+                # Presigned url has probably expired - get a new one and retry
+                if getattr(err.response, "status_code", None) == 403 and not url_refreshed:
+                    url_refreshed = True
+                    self.filehandler.refresh_urls(files=[info])
+                    continue
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: {err}"
+                ) from err
+            except requests.exceptions.RequestException as err:
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: {err}"
+                ) from err
+            break
+
+        with response:
+            try:
+                yield from response.iter_content(chunk_size=FileSegment.SEGMENT_SIZE_CIPHER)
+            except requests.exceptions.RequestException as err:
+                raise exceptions.DownloadError(
+                    f"Download of '{escape(info['name_in_db'])}' failed: {err}"
+                ) from err
+
+    def __update_db(self, info):
+        """Save that the file has been downloaded."""
+        try:
+            dds_cli.utils.perform_request(
+                DDSEndpoint.FILE_UPDATE,
+                method="put",
+                params={"project": self.project},
+                json={"name": info["name_in_db"]},
+                headers=self.token,
+                error_message="Failed to update file information",
+                session=self.api_session,
+            )
+        except exceptions.ApiRequestError as err:
+            LOG.warning(err)
@@ -0,0 +1,220 @@
+"""Deduplication module. Transfers files with the same contents only once."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import collections
+import hashlib
+import logging
+import threading
+
+# Own modules
+from dds_cli import file_reader as fr
+from dds_cli import metrics
+from dds_cli.utils import LazyEscape
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class Deduplicator:
+    """Keeps track of which file is transferred for each content.
+
+    The first file added with a content is its source, which is transferred. The other files with
+    the content wait for the source in wait() and are then created from it. If the source fails,
+    the next file with the content is transferred instead.
+    """
+
+    def __init__(self):
+        """Nothing is known until the files are added."""
+        self.nr_saved = 0
+        self.size_saved = 0
+
+        self._condition = threading.Condition()
+        self._contents = {}  # content: {"source": file, "ok": None if in progress, "members": []}
+        self._file_contents = {}  # file: content
+
+    # Public methods ############ Public methods #
+    def add(self, file, content):
+        """Add a file with a content, e.g. (checksum, size).
+
+        Returns True if the file is the source, or if the source has already finished.
+        """
+        with self._condition:
+            self._file_contents[file] = content
+            entry = self._contents.get(content)
+            if entry is None:
+                self._contents[content] = {"source": file, "ok": None, "members": []}
+                return True
+
+            entry["members"].append(file)
+            return entry["ok"] is not None
+
+    def wait(self, file):
+        """Wait for the source of the file to finish.
+
+        Returns the source to create the file from, or None if the file should be transferred.
+        """
+        with self._condition:
+            while True:
+                content = self._file_contents.get(file)
+                if content is None:
+                    return None
+                entry = self._contents[content]
+                if entry["source"] == file:
+                    return None
+                if entry["ok"]:
+                    return entry["source"]
+                self._condition.wait()
+
+    def finish(self, file, ok: bool):
+        """Save that a file has finished, transferred or created from its source if ok.
+
+        Returns the files which no longer wait for the source: all files with the content if the
+        source was transferred, or the new source if it failed.
+        """
+        released = []
+        with self._condition:
+            content = self._file_contents.pop(file, None)
+            if content is None:
+                return released
+            entry = self._contents[content]
+            if entry["source"] != file:
+                if file in entry["members"]:
+                    entry["members"].remove(file)
+                return released
+
+            if ok:
+                entry["ok"] = True
+                released = list(entry["members"])
+            elif entry["members"]:
+                # Transfer the next file with the content instead
+                entry["source"] = entry["members"].pop(0)
+                released = [entry["source"]]
+            else:
+                self._contents.pop(content)
+            self._condition.notify_all()
+        return released
+
+    def saved(self, size: int):
+        """Count a file which was created from its source instead of transferred."""
+        with self._condition:
+            self.nr_saved += 1
+            self.size_saved += size
+
+
+class DownloadDeduplicator(Deduplicator):
+    """Downloads each unique file content once, and links the other files with it to that file.
+
+    Files are grouped by checksum and size as they are scheduled. Files waiting for their source
+    are held back, so that they do not take up a download thread, until the source is done.
+    """
+
+    def __init__(self):
+        """No files are held back to begin with."""
+        super().__init__()
+        self._held = set()
+        self._ready = collections.deque()
+
+    # Public methods ############ Public methods #
+    def add(self, file, content):
+        """Add a file to download. Returns False if it is held back until its source is done."""
+        scheduled = super().add(file=file, content=content)
+        if not scheduled:
+            with self._condition:
+                self._held.add(file)
+        return scheduled
+
+    def finish(self, file, ok: bool):
+        """Save that a file has finished, and release the files held back for it."""
+        released = super().finish(file=file, ok=ok)
+        with self._condition:
+            self._ready.extend(x for x in released if x in self._held)
+            self._held.difference_update(released)
+        return released
+
+    def ready(self):
+        """Get the held files which can now be scheduled."""
+        with self._condition:
+            files = list(self._ready)
+            self._ready.clear()
+            return files
+
+    def remaining(self):
+        """Get all files which are still held, e.g. when there are no other files to schedule.
+
+        The files then wait for their source in wait().
+        """
+        with self._condition:
+            files = list(self._ready) + sorted(self._held, key=str)
+            self._ready.clear()
+            self._held.clear()
+            return files
+
+
+class UploadDeduplicator(Deduplicator):
+    """Uploads each unique local file content once, and copies the other files in the cloud.
+
+    Files are grouped when collected: first hardlinks and symlinks to the same file, then files
+    with the same size and checksum. Only files with the same size as another file are read.
+    """
+
+    # Public methods ############ Public methods #
+    def add_files(self, data: dict, delivery_metrics=None):
+        """Group the files in the file info, saving the checksum of the files which are read.
+
+        Returns the files which are copies of another file. The reading of each file is recorded
+        as the stage 'hash' in delivery_metrics, if given.
+        """
+        delivery_metrics = delivery_metrics or metrics.DeliveryMetrics()
+        by_size = collections.defaultdict(dict)
+        for file, info in data.items():
+            try:
+                stat = info["path_raw"].stat()
+            except OSError as err:
+                # Uploaded on its own, and fails as usual if the file is gone
+                LOG.debug("Could not check '%s': %s", LazyEscape(info["path_raw"]), err)
+                continue
+            by_size[info["size_raw"]].setdefault((stat.st_dev, stat.st_ino), []).append(file)
+
+        copies = []
+        for size, inodes in by_size.items():
+            for inode, files in inodes.items():
+                # Files of a unique size are only the same as the other links to them
+                checksum = None
+                if len(inodes) > 1:
+                    with delivery_metrics.stage(name="hash", file=files[0]) as timer:
+                        checksum = self.__checksum(info=data[files[0]])
+                        timer.failed = checksum is None
+                        timer.bytes = size if checksum is not None else 0
+                content = (checksum or inode, size)
+                for file in files:
+                    if not self.add(file=file, content=content):
+                        copies.append(file)
+
+        LOG.debug("%s file(s) have the same contents as another file.", len(copies))
+        return copies
+
+    # Private methods ############ Private methods #
+    @staticmethod
+    def __checksum(info):
+        """Checksum of a file, saved in the file info. None if the file could not be read."""
+        checksum = hashlib.sha256()
+        LOG.debug("Checking if '%s' is a duplicate", LazyEscape(info["path_raw"]))
+        try:
+            for block in fr.FileReader(file=info["path_raw"]):
+                checksum.update(block)
+        except OSError as err:
+            LOG.debug("Could not read '%s': %s", LazyEscape(info["path_raw"]), err)
+            return None
+        info["checksum"] = checksum.hexdigest()
+        return info["checksum"]
@@ -8,12 +8,12 @@
 import errno
 import logging
 import pathlib
-import sys
 
 # Installed
 import rich.markup
 
 # Own modules
+import dds_cli.exceptions
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -27,12 +27,16 @@ LOG = logging.getLogger(__name__)
 
 
 class DDSDirectory:
-    """Data Delivery System directory class."""
+    """Data Delivery System directory class.
+
+    Raises DDSCLIException if the directory exists, unless allow_existing, or cannot be created.
+    """
 
     def __init__(
         self,
         path=pathlib.Path,
         add_file_dir: bool = True,
+        allow_existing: bool = False,
     ):
         # The following subdirs should be included in staging directory
         dirs = {
@@ -48,16 +52,15 @@ class DDSDirectory:
         # Create staging directory and subdirectories
         for directory in dirs.values():
             try:
-                directory.mkdir(parents=True, exist_ok=False)
+                directory.mkdir(parents=True, exist_ok=allow_existing)
             except OSError as err:
                 if err.errno == errno.EEXIST:
-                    sys.exit(
+                    raise dds_cli.exceptions.DDSCLIException(
                         f"Directory '{rich.markup.escape(str(directory))}' already exists. "
                         "Please specify a path where a new folder can be created."
-                    )
-                else:
-                    sys.exit(
-                        f"The temporary directory '{rich.markup.escape(str(directory))}' could not be created: {err}"
-                    )
+                    ) from err
+                raise dds_cli.exceptions.DDSCLIException(
+                    f"The temporary directory '{rich.markup.escape(str(directory))}' could not be created: {err}"
+                ) from err
 
         self.directories = dirs
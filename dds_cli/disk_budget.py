@@ -0,0 +1,182 @@
+"""Disk budget module. Keeps transfers from filling up the staging and destination disks."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import logging
+import os
+import pathlib
+import shutil
+import stat
+import threading
+
+# Installed
+from rich.markup import escape
+
+# Own modules
+from dds_cli import constants
+from dds_cli import FileSegment
+import dds_cli.utils
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# FUNCTIONS ####################################################### FUNCTIONS #
+###############################################################################
+
+
+def processed_size(size: int):
+    """Worst-case size of a file after compression and encryption.
+
+    Each segment gets a 16 byte tag, the first and last nonce are saved in the file, and
+    compressing data which cannot be compressed can make it slightly larger.
+    """
+    segments = size // FileSegment.SEGMENT_SIZE_RAW + 1
+    tags = segments * (FileSegment.SEGMENT_SIZE_CIPHER - FileSegment.SEGMENT_SIZE_RAW)
+    return size + size // 100 + tags + 2 * 12
+
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class DiskBudget:
+    """Admits files for transfer only when the disk space they need is available.
+
+    The space a file needs is given per path, e.g. {staging directory: bytes}. Paths on the
+    same filesystem share the free space reported by `shutil.disk_usage`, minus the space
+    reserved for the files which are already being transferred and a safety margin. What has
+    grown of the reserved files since they were admitted is already used, and so no longer
+    reserved. Space reserved for a directory stays reserved until the file is released.
+    """
+
+    def __init__(
+        self,
+        margin: int = constants.DISK_SPACE_MARGIN,
+        poll_interval: float = constants.DISK_SPACE_POLL_INTERVAL,
+    ):
+        """Nothing is reserved from start."""
+        self.margin = margin
+        self.poll_interval = poll_interval
+
+        self.reservations = {}  # key: {device: bytes}
+        self._reserved = {}  # device: bytes
+        self._paths = {}  # key: [(device, path, size when reserved)]
+        self._condition = threading.Condition()
+
+    # Static methods ############ Static methods #
+    @staticmethod
+    def filesystem(path: pathlib.Path):
+        """Get the device of the filesystem a path is (or will be) on, and an existing path on it."""
+        path = pathlib.Path(path).absolute()
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        return os.stat(path).st_dev, path
+
+    # Public methods ############ Public methods #
+    def preflight(self, needs: dict, description: str):
+        """Check if the whole delivery fits on disk, regardless of what is reserved.
+
+        Returns (True, "") or (False, message) with a warning which can be shown up front.
+        """
+        messages = []
+        for path, needed in self.__per_filesystem(needs=needs).values():
+            free = shutil.disk_usage(path).free - self.margin
+            if needed > free:
+                messages.append(
+                    f"{description} needs up to {dds_cli.utils.format_api_response(needed, 'Size')}"
+                    f" on the disk of '{escape(str(path))}', but only "
+                    f"{dds_cli.utils.format_api_response(max(free, 0), 'Size')} is available."
+                )
+
+        return (not messages, " ".join(messages))
+
+    def acquire(self, key, needs: dict):
+        """Reserve the disk space needed for a file, waiting for other files to finish if needed.
+
+        Returns (False, message) if the file does not fit even when nothing else is reserved.
+        """
+        per_filesystem = self.__per_filesystem(needs=needs)
+        with self._condition:
+            while True:
+                missing = {
+                    path: needed - self.__available(device=device, path=path)
+                    for device, (path, needed) in per_filesystem.items()
+                }
+                missing = {path: short for path, short in missing.items() if short > 0}
+                if not missing:
+                    break
+
+                # Nothing to wait for - the file will never fit
+                if not any(self._reserved.values()):
+                    path, short = next(iter(missing.items()))
+                    return (
+                        False,
+                        f"Not enough disk space for file '{escape(str(key))}' on the disk of "
+                        f"'{escape(str(path))}': "
+                        f"{dds_cli.utils.format_api_response(short, 'Size')} more is needed.",
+                    )
+
+                LOG.debug("Waiting for disk space for file '%s'", escape(str(key)))
+                self._condition.wait(timeout=self.poll_interval)
+
+            self.reservations[key] = {}
+            for device, (_, needed) in per_filesystem.items():
+                self.reservations[key][device] = needed
+                self._reserved[device] = self._reserved.get(device, 0) + needed
+            self._paths[key] = [
+                (self.filesystem(path=path)[0], path, self.__size(path=path)) for path in needs
+            ]
+
+        return True, ""
+
+    def release(self, key):
+        """Give back the disk space reserved for a file."""
+        with self._condition:
+            for device, needed in self.reservations.pop(key, {}).items():
+                self._reserved[device] -= needed
+            self._paths.pop(key, None)
+            self._condition.notify_all()
+
+    # Private methods ############ Private methods #
+    def __available(self, device, path):
+        """Free space on a filesystem which is not reserved for other files. Needs the lock."""
+        to_write = self._reserved.get(device, 0) - self.__written(device=device)
+        return shutil.disk_usage(path).free - self.margin - to_write
+
+    def __written(self, device):
+        """Bytes the files with reservations on a filesystem have written to it. Needs the lock."""
+        written = 0
+        for key, paths in self._paths.items():
+            grown = sum(
+                max(self.__size(path=path) - initial, 0)
+                for path_device, path, initial in paths
+                if path_device == device
+            )
+            written += min(grown, self.reservations[key].get(device, 0))
+        return written
+
+    @staticmethod
+    def __size(path):
+        """Size of a file, 0 if it is not a file (yet)."""
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            return 0
+        return path_stat.st_size if stat.S_ISREG(path_stat.st_mode) else 0
+
+    def __per_filesystem(self, needs: dict):
+        """Sum the space needed per filesystem: {device: (existing path, bytes)}."""
+        per_filesystem = {}
+        for path, needed in needs.items():
+            device, existing_path = self.filesystem(path=path)
+            _, previous = per_filesystem.get(device, (existing_path, 0))
+            per_filesystem[device] = (existing_path, previous + needed)
+        return per_filesystem
@@ -0,0 +1,161 @@
+"""Failure journal module. Saves the files which failed during a delivery."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import json
+import logging
+import pathlib
+import queue
+import threading
+
+# Installed
+from rich.markup import escape
+
+# Own modules
+from dds_cli import file_handler as fh
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class FailureJournal:
+    """Appends the failed files to a JSON Lines file, one line per failure.
+
+    Failures are added by the transfer threads, which return immediately. A single background
+    thread, started at the first failure, appends them to the journal. The journal is read as a
+    stream, e.g. when retrying the database updates, and compacted to one JSON file, with the
+    last entry for each file, when the delivery is done.
+    """
+
+    _STOP = object()
+
+    def __init__(self, journal_file: pathlib.Path):
+        """Nothing is written, and no thread started, until a file fails."""
+        self.journal_file = journal_file
+        self.nr_entries = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Return self when using context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceb):
+        """Write the waiting failures and stop the background thread."""
+        self.close()
+        return False
+
+    # Public methods ############ Public methods #
+    def add(self, file, info, status):
+        """Save a failed file, with its file info and status at the time of the failure."""
+        entry = {
+            "file": str(file),
+            **fh.FileHandler.make_json_serializable(non_json=info),
+            "status": fh.FileHandler.make_json_serializable(non_json=status),
+        }
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.__run, name="dds-failure-journal", daemon=True
+                )
+                self._thread.start()
+            self.nr_entries += 1
+        self._queue.put(entry)
+
+    def flush(self):
+        """Wait until all added failures have been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write the waiting failures and stop the background thread."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(self._STOP)
+                self._thread.join()
+            self._thread = None
+
+    def entries(self):
+        """Yield (file, entry) for each failure in the journal, oldest first."""
+        self.flush()
+        if not self.journal_file.is_file():
+            return
+
+        with self.journal_file.open(mode="r", encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # E.g. the last line, if the CLI was stopped while writing it
+                    LOG.debug("Skipping incomplete line in '%s'", escape(str(self.journal_file)))
+                    continue
+                yield entry.pop("file"), entry
+
+    def compact(self, out_file: pathlib.Path):
+        """Save the last entry for each failed file in out_file, as {file: entry}.
+
+        The journal is removed once saved. Files saved in out_file by an earlier delivery to the
+        same directory are kept. Returns the number of failed files in the journal.
+        """
+        self.close()
+        failed = dict(self.entries())
+        nr_failed = len(failed)
+        if not failed:
+            return 0
+
+        try:
+            if out_file.is_file():
+                with out_file.open(mode="r", encoding="utf-8") as previous:
+                    failed = {**json.load(previous), **failed}
+            with out_file.open(mode="w", encoding="utf-8") as compacted:
+                json.dump(failed, compacted, indent=4)
+        except (OSError, ValueError) as err:
+            LOG.warning(
+                "Failed to save the failed files in '%s': %s. They are listed in '%s'.",
+                escape(str(out_file)),
+                err,
+                escape(str(self.journal_file)),
+            )
+        else:
+            self.journal_file.unlink(missing_ok=True)
+        return nr_failed
+
+    # Private methods ############ Private methods #
+    def __run(self):
+        """Append the failures from the queue to the journal."""
+        try:
+            journal = self.journal_file.open(mode="a", encoding="utf-8")
+        except OSError as err:
+            LOG.warning("Failed to save failed files in '%s': %s", self.journal_file, err)
+            journal = None
+
+        try:
+            while True:
+                entry = self._queue.get()
+                try:
+                    if entry is self._STOP:
+                        return
+                    if journal is not None:
+                        journal.write(json.dumps(entry) + "\n")
+                        # Written when there are no more failures waiting
+                        if self._queue.empty():
+                            journal.flush()
+                except (OSError, TypeError, ValueError) as err:  # Never let the thread die
+                    LOG.warning(str(err))
+                finally:
+                    self._queue.task_done()
+        finally:
+            if journal is not None:
+                journal.close()
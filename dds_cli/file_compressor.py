@@ -8,6 +8,7 @@
 import dataclasses
 import logging
 import pathlib
+import struct
 import traceback
 
 # Installed
@@ -16,6 +17,9 @@ from rich.markup import escape
 
 # Own modules
 from dds_cli import FileSegment
+from dds_cli import constants
+from dds_cli import file_reader as fr
+from dds_cli import output_writer as ow
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -28,6 +32,90 @@ LOG = logging.getLogger(__name__)
 ###############################################################################
 
 
+class SeekTable:
+    """Index of the independent frames in data compressed with the zstd seekable format.
+
+    The table is saved in a skippable frame after the compressed frames, so that the data can
+    still be decompressed as a whole by any zstd decompressor. See
+    https://github.com/facebook/zstd/blob/dev/contrib/seekable_format/zstd_seekable_compression_format.md
+    """
+
+    SKIPPABLE_MAGIC = 0x184D2A5E
+    SEEKABLE_MAGIC = 0x8F92EAB1
+    FOOTER_SIZE = 9  # Number of frames, descriptor and magic
+    ENTRY_SIZE = 8  # Compressed and decompressed size, without checksums
+
+    def __init__(self, frames: list):
+        """frames: list of (compressed size, decompressed size)."""
+        self.frames = frames
+
+    # Public methods ###################### Public methods #
+    def to_bytes(self):
+        """The skippable frame holding the table."""
+        entries = b"".join(struct.pack("<II", *frame) for frame in self.frames)
+        return (
+            struct.pack("<II", self.SKIPPABLE_MAGIC, len(entries) + self.FOOTER_SIZE)
+            + entries
+            + struct.pack("<IBI", len(self.frames), 0, self.SEEKABLE_MAGIC)
+        )
+
+    def frames_in_range(self, start: int, end: int):
+        """Frames holding decompressed bytes start to end (not included).
+
+        Returns (compressed offset, decompressed offset, compressed size) of each frame.
+        """
+        compressed_offset, decompressed_offset = (0, 0)
+        for compressed_size, decompressed_size in self.frames:
+            if decompressed_offset >= end:
+                break
+            if decompressed_offset + decompressed_size > start:
+                yield compressed_offset, decompressed_offset, compressed_size
+            compressed_offset += compressed_size
+            decompressed_offset += decompressed_size
+
+    # Static methods ###################### Static methods #
+    @staticmethod
+    def table_size(footer: bytes):
+        """Size of the skippable frame with the table, from its last FOOTER_SIZE bytes.
+
+        Returns None if the data is not in the seekable format.
+        """
+        if len(footer) < SeekTable.FOOTER_SIZE:
+            return None
+        nr_frames, descriptor, magic = struct.unpack("<IBI", footer[-SeekTable.FOOTER_SIZE :])
+        if magic != SeekTable.SEEKABLE_MAGIC:
+            return None
+        return 8 + nr_frames * SeekTable.__entry_size(descriptor) + SeekTable.FOOTER_SIZE
+
+    @staticmethod
+    def from_bytes(data: bytes):
+        """Read the table from the end of the compressed data. Returns None if there is none."""
+        size = SeekTable.table_size(footer=data)
+        if size is None or len(data) < size:
+            return None
+
+        table = data[-size:]
+        magic, frame_size = struct.unpack("<II", table[:8])
+        if magic != SeekTable.SKIPPABLE_MAGIC or frame_size != size - 8:
+            return None
+
+        # Any frame checksums are not needed, zstd checks the frames
+        entry_size = SeekTable.__entry_size(table[-5])
+        entries = table[8 : -SeekTable.FOOTER_SIZE]
+        return SeekTable(
+            frames=[
+                struct.unpack_from("<II", entries, offset)
+                for offset in range(0, len(entries), entry_size)
+            ]
+        )
+
+    # Private methods ###################### Private methods #
+    @staticmethod
+    def __entry_size(descriptor: int):
+        """Size of each entry in the table, with the checksum if the descriptor flag is set."""
+        return SeekTable.ENTRY_SIZE + (4 if descriptor & 0x80 else 0)
+
+
 class CompressionMagic:
     """Compression format signatures"""
 
@@ -90,28 +178,92 @@ class Compressor:
         """Compresses file by reading it chunk by chunk."""
 
         try:
-            with file.open(mode="rb") as infile:
-                # Initiate a Zstandard compressor
-                cctzx = zstd.ZstdCompressor(write_checksum=True, level=4)
-
-                # total_read = 0.0
-                # Compress file chunk by chunk while reading
-                with cctzx.stream_reader(infile) as compressor:
-                    # while True:
-                    #     chunk = compressor.read(chunk_size)
-                    #     LOG.debug(type(chunk))
-                    #     if not chunk:
-                    #         break
-                    #     yield
-                    yield from iter(lambda: compressor.read(chunk_size), b"")
+            yield from Compressor.compress_chunks(
+                chunks=fr.FileReader(file=file), chunk_size=chunk_size
+            )
         except Exception as err:
             LOG.warning(str(err))
         else:
             LOG.debug("Compression of '%s' finished.", file)
 
     @staticmethod
-    def decompress_filechunks(chunks, outfile: pathlib.Path, files_directory=None, **_):
-        """Decompress file chunks"""
+    def compress_chunks(chunks, chunk_size: int = FileSegment.SEGMENT_SIZE_RAW):
+        """Compress chunks of any size, e.g. memoryviews, into chunks of exactly chunk_size.
+
+        Only the last chunk can be smaller, which is required by the encryption.
+        """
+        # Initiate a Zstandard compressor
+        chunker = zstd.ZstdCompressor(write_checksum=True, level=4).chunker(chunk_size=chunk_size)
+        for chunk in chunks:
+            yield from chunker.compress(chunk)
+        yield from chunker.finish()
+
+    @staticmethod
+    def compress_chunks_seekable(
+        chunks,
+        chunk_size: int = FileSegment.SEGMENT_SIZE_RAW,
+        frame_size: int = constants.SEEKABLE_FRAME_SIZE,
+    ):
+        """Compress chunks into independent frames of frame_size raw bytes, with a seek table.
+
+        Gives chunks of exactly chunk_size like compress_chunks, so that a part of the file can
+        later be decompressed from the segments holding its frames.
+        """
+        cctzx = zstd.ZstdCompressor(write_checksum=True, level=4)
+        frames = []
+        raw, compressed = (bytearray(), bytearray())
+
+        def compress_frame(data):
+            """Compress the raw data as one frame."""
+            frame = cctzx.compress(data)
+            frames.append((len(frame), len(data)))
+            compressed.extend(frame)
+
+        for chunk in chunks:
+            raw.extend(chunk)
+
+            # The frames are compressed from views of the raw data, which is trimmed once
+            start = 0
+            with memoryview(raw) as view:
+                while len(raw) - start >= frame_size:
+                    compress_frame(data=view[start : start + frame_size])
+                    start += frame_size
+            del raw[:start]
+
+            while len(compressed) >= chunk_size:
+                yield bytes(compressed[:chunk_size])
+                del compressed[:chunk_size]
+
+        if raw or not frames:
+            compress_frame(data=raw)
+        compressed.extend(SeekTable(frames=frames).to_bytes())
+        for start in range(0, len(compressed), chunk_size):
+            yield bytes(compressed[start : start + chunk_size])
+
+    @staticmethod
+    def decompress_chunks(chunks):
+        """Decompress chunks as they come in, without writing to file.
+
+        The data can consist of several frames.
+        """
+        dobj = zstd.ZstdDecompressor().decompressobj()
+        for chunk in chunks:
+            data = chunk
+            while data:
+                if dobj.eof:
+                    dobj = zstd.ZstdDecompressor().decompressobj()
+                decompressed = dobj.decompress(data)
+                if decompressed:
+                    yield decompressed
+                data = dobj.unused_data if dobj.eof else b""
+        if not dobj.eof:
+            raise ValueError("Compressed data is incomplete.")
+
+    @staticmethod
+    def decompress_filechunks(
+        chunks, outfile: pathlib.Path, files_directory=None, size: int = None, **_
+    ):
+        """Decompress file chunks, allocating size bytes for the decompressed file up front."""
 
         saved, message = (False, "")
         outfile_path = escape(str(pathlib.Path(outfile).relative_to(files_directory)))
@@ -120,7 +272,7 @@ class Compressor:
         LOG.debug("Decompressing file '%s'...", outfile_path)
 
         try:
-            with outfile.open(mode="wb+") as file:
+            with ow.OutputWriter(file=outfile, size=size) as file:
                 dctx = zstd.ZstdDecompressor()
                 with dctx.stream_writer(file) as decompressor:
                     for chunk in chunks:
@@ -142,10 +294,12 @@ class Compressor:
         compressed, error = (False, "")
         try:
             with file.open(mode="rb") as file_obj:
-                file_start = file_obj.read(self.max_magic_len)
-                if file_start.startswith(tuple(x for x in self.fmt_magic)):
-                    compressed = True
+                compressed = self.is_compressed_data(data=file_obj.read(self.max_magic_len))
         except OSError as err:
             error = str(err)
 
         return compressed, error
+
+    def is_compressed_data(self, data: bytes):
+        """Checks if data, the start of a file or stream, is compressed."""
+        return data.startswith(tuple(self.fmt_magic))
@@ -19,11 +19,12 @@ from cryptography.hazmat.primitives.asymmetric import x25519
 from cryptography.hazmat.primitives.kdf import hkdf
 from nacl.bindings import crypto_aead_chacha20poly1305_ietf_decrypt
 from nacl.bindings import crypto_aead_chacha20poly1305_ietf_encrypt
+from nacl.exceptions import CryptoError
 from rich.markup import escape
 
 # Own modules
 from dds_cli import FileSegment
-from dds_cli.file_handler_local import LocalFileHandler as fh
+from dds_cli import file_reader as fr
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -124,8 +125,8 @@ class Encryptor(ECDHKeyHandler):
         checksum = hashlib.sha256()
 
         try:
-            for chunk in fh.read_file(file=file):
-                checksum.update(chunk)
+            for block in fr.FileReader(file=file):
+                checksum.update(block)
         except OSError as err:
             error = str(err)
         else:
@@ -149,44 +150,23 @@ class Encryptor(ECDHKeyHandler):
 
     # Public methods ###################### Public methods #
     def encrypt_filechunks(self, chunks, outfile: pathlib.Path, progress: tuple = None):
-        """Encrypts the file in chunks.
-
-        Encrypts the file in chunks using the IETF ratified ChaCha20-Poly1305
-        construction described in RFC8439 (obsoletes 7539).
-        """
+        """Encrypts the file in chunks and saves it to outfile."""
 
         encrypted_and_saved, message = (False, "")
 
-        # Additional data
-        aad = None
+        def advance():
+            """Advance the progress bar when each chunk has been encrypted."""
+            for chunk in chunks:
+                yield chunk
+                progress[0].advance(progress[1], FileSegment.SEGMENT_SIZE_RAW)
 
         try:
-            # Save encryption output to file
+            # Save encryption output to file - without a shown task, e.g. --silent, nothing to do
             with outfile.open(mode="wb") as out:
-                # Create and save first IV/nonce
-                iv_bytes = os.urandom(12)
-                out.write(iv_bytes)
-
-                # Get first iv/nonce as integer
-                iv_int = int.from_bytes(iv_bytes, "little")
-                nonce = b""  # Catch last nonce
-                for chunk in chunks:
-                    # Restart at 0 if nonce number at maximum number of chunks per key
-                    nonce = (
-                        iv_int if iv_int < self.max_nonce else iv_int % self.max_nonce
-                    ).to_bytes(length=12, byteorder="little")
-
-                    # Encrypt chunk
-                    encrypted_chunk = crypto_aead_chacha20poly1305_ietf_encrypt(
-                        message=chunk, aad=aad, nonce=nonce, key=self.key
-                    )
-                    out.write(encrypted_chunk)
-
-                    progress[0].advance(progress[1], FileSegment.SEGMENT_SIZE_RAW)
-                    iv_int += 1  # Increment nonce
-
-                # Save last nonce
-                out.write(nonce)
+                for encrypted in self.encrypt_chunks(
+                    chunks=advance() if progress is not None and progress[1] is not None else chunks
+                ):
+                    out.write(encrypted)
         except (OSError, TypeError, FileExistsError, InterruptedError) as err:
             message = str(err)
             LOG.exception(message)
@@ -196,6 +176,38 @@ class Encryptor(ECDHKeyHandler):
 
         return encrypted_and_saved, message
 
+    def encrypt_chunks(self, chunks):
+        """Encrypts chunks, yielding the encrypted file piece by piece.
+
+        Encrypts the chunks using the IETF ratified ChaCha20-Poly1305
+        construction described in RFC8439 (obsoletes 7539). The first nonce is yielded first and
+        the last nonce last.
+        """
+        # Additional data
+        aad = None
+
+        # Create and save first IV/nonce
+        iv_bytes = os.urandom(12)
+        yield iv_bytes
+
+        # Get first iv/nonce as integer
+        iv_int = int.from_bytes(iv_bytes, "little")
+        nonce = b""  # Catch last nonce
+        for chunk in chunks:
+            # Restart at 0 if nonce number at maximum number of chunks per key
+            nonce = (iv_int if iv_int < self.max_nonce else iv_int % self.max_nonce).to_bytes(
+                length=12, byteorder="little"
+            )
+
+            # Encrypt chunk
+            yield crypto_aead_chacha20poly1305_ietf_encrypt(
+                message=chunk, aad=aad, nonce=nonce, key=self.key
+            )
+            iv_int += 1  # Increment nonce
+
+        # Save last nonce
+        yield nonce
+
 
 class Decryptor(ECDHKeyHandler):
     """Handles the decryption of the files."""
@@ -228,19 +240,79 @@ class Decryptor(ECDHKeyHandler):
         return True
 
     # Public methods ###################### Public methods #
+    def decrypt_segment(self, segment: bytes, first_nonce: bytes, index: int):
+        """Decrypt one segment of an encrypted file on its own, e.g. from a byte range.
+
+        index is the number of the segment in the file, starting at 0. Raises ValueError if the
+        segment has been altered or is not at index.
+        """
+        iv_int = int.from_bytes(first_nonce, "little") + index
+        try:
+            return crypto_aead_chacha20poly1305_ietf_decrypt(
+                ciphertext=segment,
+                aad=None,
+                nonce=(iv_int % self.max_nonce).to_bytes(length=12, byteorder="little"),
+                key=self.key,
+            )
+        except CryptoError as err:
+            raise ValueError(f"Decryption of segment {index} failed: {err}") from err
+
+    def decrypt_stream(self, chunks):
+        """Decrypt an encrypted file while it is being received, e.g. downloaded.
+
+        The chunks can be of any size. Raises ValueError if the file is incomplete or has been
+        altered, which may be after some of the data has been yielded.
+        """
+        buffer = bytearray()
+        iv_int = None
+        nonce = b""
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                if iv_int is None:
+                    if len(buffer) < 12:
+                        continue
+                    iv_int = int.from_bytes(buffer[:12], "little")
+                    del buffer[:12]
+
+                # The last segment is only known once the last nonce has been received
+                while len(buffer) > FileSegment.SEGMENT_SIZE_CIPHER + 12:
+                    nonce = (iv_int % self.max_nonce).to_bytes(length=12, byteorder="little")
+                    iv_int += 1
+                    yield crypto_aead_chacha20poly1305_ietf_decrypt(
+                        ciphertext=bytes(buffer[: FileSegment.SEGMENT_SIZE_CIPHER]),
+                        aad=None,
+                        nonce=nonce,
+                        key=self.key,
+                    )
+                    del buffer[: FileSegment.SEGMENT_SIZE_CIPHER]
+
+            if iv_int is None or 0 < len(buffer) <= 12:
+                raise ValueError("Encrypted file is incomplete.")
+            if not buffer:
+                # No chunks were encrypted - nothing saved after the first nonce
+                return
+
+            last_nonce = bytes(buffer[-12:])
+            nonce = (iv_int % self.max_nonce).to_bytes(length=12, byteorder="little")
+            yield crypto_aead_chacha20poly1305_ietf_decrypt(
+                ciphertext=bytes(buffer[:-12]), aad=None, nonce=nonce, key=self.key
+            )
+        except CryptoError as err:
+            raise ValueError(f"Decryption failed: {err}") from err
+
+        if last_nonce != nonce:
+            raise ValueError("Nonces do not match!!")
+
     def decrypt_file(self, infile: pathlib.Path, outfile: pathlib.Path):
-        """Decrypts the file"""
+        """Decrypts the file. The encrypted file is not changed."""
 
         try:
-            with infile.open(mode="rb+") as file:
-                # Get last nonce
-                file.seek(-12, os.SEEK_END)
+            with infile.open(mode="rb") as file:
+                # Get last nonce - the encrypted data ends where it starts
+                data_end = file.seek(-12, os.SEEK_END)
                 last_nonce = file.read(12)
 
-                # Remove last nonce from file
-                file.seek(-12, os.SEEK_END)
-                file.truncate()
-
                 # Jump back to beginning and get first nonce
                 file.seek(0)
                 first_nonce = file.read(12)
@@ -253,7 +325,10 @@ class Decryptor(ECDHKeyHandler):
                 aad = None
                 nonce = b""
 
-                for chunk in iter(lambda: file.read(FileSegment.SEGMENT_SIZE_CIPHER), b""):
+                for chunk in iter(
+                    lambda: file.read(min(FileSegment.SEGMENT_SIZE_CIPHER, data_end - file.tell())),
+                    b"",
+                ):
                     # Get nonce as bytes for decryption: if the nonce is larger than the
                     # max number of chunks allowed - wrap to 0 again
                     nonce = (
@@ -5,10 +5,8 @@
 ###############################################################################
 
 # Standard library
-import json
 import logging
 import pathlib
-import threading
 
 # Installed
 
@@ -21,7 +19,6 @@ import dds_cli.exceptions
 ###############################################################################
 
 LOG = logging.getLogger(__name__)
-lock = threading.Lock()
 
 ###############################################################################
 # CLASSES ########################################################### CLASSES #
@@ -53,29 +50,6 @@ class FileHandler:
         self.failed = {}
 
     # Static methods ############ Static methods #
-    @staticmethod
-    def append_errors_to_file(log_file: pathlib.Path, file, info, status):
-        """Save errors to specific json file."""
-        try:
-            with lock:
-                # Create file if it doesn't exist
-                if not log_file.exists():
-                    with log_file.open(mode="w+") as file_obj:
-                        json.dump({}, file_obj)
-
-                # Keep file as correct json by loading and "appending"
-                with log_file.open(mode="r+") as json_file:
-                    file_data = json.load(json_file)
-                    file_data[str(file)] = {
-                        **FileHandler.make_json_serializable(non_json=info),
-                        "status": FileHandler.make_json_serializable(non_json=status),
-                    }
-                    json_file.seek(0)
-                    json.dump(file_data, json_file, indent=4)
-
-        except (OSError, TypeError) as err:
-            LOG.warning(str(err))
-
     @staticmethod
     def make_json_serializable(non_json):
         """Convert pathlib.Path instances in dict to string."""
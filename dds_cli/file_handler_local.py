@@ -18,9 +18,13 @@ from rich.markup import escape
 from dds_cli import DDSEndpoint
 from dds_cli import file_compressor as fc
 from dds_cli import file_handler as fh
+from dds_cli import file_records as frec
+from dds_cli import file_reader as fr
+from dds_cli import constants
 from dds_cli import FileSegment
 from dds_cli import exceptions
 import dds_cli.utils
+from dds_cli.utils import LazyEscape
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -34,11 +38,26 @@ LOG = logging.getLogger(__name__)
 
 
 class LocalFileHandler(fh.FileHandler):
-    """Collects the files specified by the user."""
+    """Collects the files specified by the user.
+
+    With seekable, files are compressed in independent frames with a seek table, so that parts
+    of them can be downloaded on their own.
+    """
+
+    # Steps of the upload of each file, tracked in the status
+    UPLOAD_STEPS = ("put", "add_file_db")
 
     # Magic methods ################ Magic methods #
-    def __init__(self, user_input, temporary_destination, project, remote_destination: str = None):
+    def __init__(
+        self,
+        user_input,
+        temporary_destination,
+        project,
+        remote_destination: str = None,
+        seekable: bool = False,
+    ):
         LOG.debug("Collecting file info...")
+        self.seekable = seekable
 
         # Initiate FileHandler from inheritance
         super().__init__(
@@ -90,13 +109,23 @@ class LocalFileHandler(fh.FileHandler):
     def read_file(file, chunk_size: int = FileSegment.SEGMENT_SIZE_RAW):
         """Read file in chunk_size sized chunks."""
 
+        # Read in large blocks, a multiple of the chunk size
+        read_size = chunk_size * max(1, constants.READ_BUFFER_SIZE // chunk_size)
         try:
-            with file.open(mode="rb") as infile:
-                yield from iter(lambda: infile.read(chunk_size), b"")
+            yield from fr.FileReader.segments(
+                views=fr.FileReader(file=file, read_size=read_size), size=chunk_size
+            )
         except OSError as err:
             LOG.warning(str(err))
 
     # Private methods ############ Private methods #
+    @staticmethod
+    def __hash_blocks(blocks, checksum):
+        """Update the checksum with each block before passing it on."""
+        for block in blocks:
+            checksum.update(block)
+            yield block
+
     def __collect_file_info_local(self, all_paths, folder=pathlib.Path(""), task_name=""):
         """Get info on each file in each path specified."""
         # Variables
@@ -126,19 +155,19 @@ class LocalFileHandler(fh.FileHandler):
                 )
 
                 # Add file info to dict
-                file_info[path_key.as_posix()] = {
-                    "path_raw": path,
-                    "subpath": folder,
-                    "size_raw": path.stat().st_size,
-                    "compressed": is_compressed,
-                    "path_processed": path_processed,
-                    "size_processed": 0,
-                    "path_remote": self.generate_bucket_filepath(
+                file_info[path_key.as_posix()] = frec.UploadRecord(
+                    path_raw=path,
+                    subpath=folder,
+                    size_raw=path.stat().st_size,
+                    compressed=is_compressed,
+                    path_processed=path_processed,
+                    size_processed=0,
+                    path_remote=self.generate_bucket_filepath(
                         filename=path_processed.name, folder=folder
                     ),
-                    "overwrite": False,
-                    "checksum": "",
-                }
+                    overwrite=False,
+                    checksum="",
+                )
 
             elif path.is_dir():
                 # Loop back to same function to get file into in dir
@@ -193,19 +222,7 @@ class LocalFileHandler(fh.FileHandler):
                             }
                         )
 
-                # filestream_funcname = (
-                #     "read_file" if self.data[x]["compressed"] else "compress_file"
-                # )
-                status_dict[item] = {
-                    "cancel": False,
-                    "started": False,
-                    "message": "",
-                    "failed_op": None,
-                    # filestream_funcname: {"started": False, "done": False},
-                    "put": {"started": False, "done": False},
-                    "add_file_db": {"started": False, "done": False},
-                    # "task": None,
-                }
+                status_dict[item] = frec.FileStatus(steps=self.UPLOAD_STEPS)
 
         LOG.debug("Initial statuses created.")
 
@@ -247,40 +264,96 @@ class LocalFileHandler(fh.FileHandler):
 
         return new_file_name
 
+    def read_blocks(self, file):
+        """Read the raw file in large blocks."""
+        return fr.FileReader(file=self.data[file]["path_raw"])
+
     def stream_from_file(self, file):
         """Read raw or compress file depending on if compressed already or not."""
 
         file_info = self.data[file]
 
         # LOG.debug("Streaming file '%s'", escape(str(pathlib.Path(file))))
-        LOG.debug("Streaming file '%s'", escape(str(file_info["path_raw"])))
-        # Generate checksum
+        LOG.debug("Streaming file '%s'", LazyEscape(file_info["path_raw"]))
+        # Generate checksum while reading - the file is only read once
         checksum = hashlib.sha256()
+        blocks = self.__hash_blocks(blocks=self.read_blocks(file=file), checksum=checksum)
         if file_info["compressed"]:
-            for chunk in self.read_file(file=file_info["path_raw"]):
-                checksum.update(chunk)
-                yield chunk
+            yield from fr.FileReader.segments(views=blocks, size=FileSegment.SEGMENT_SIZE_RAW)
         else:
             LOG.debug(
                 "File '%s' not compressed -- starting compressing",
-                escape(str(file_info["path_raw"])),
+                LazyEscape(file_info["path_raw"]),
+            )
+            yield from (
+                fc.Compressor.compress_chunks_seekable(chunks=blocks)
+                if self.seekable
+                else fc.Compressor.compress_chunks(chunks=blocks)
             )
-            # Generate checksum first
-            # total_read = 0
-            for chunk in self.read_file(file=file_info["path_raw"]):
-                checksum.update(chunk)
-                # total_read += len(chunk)
-                # LOG.debug(total_read)
-
-            # Then stream file chunks
-            # LOG.debug(
-            #     "Test: %s",
-            # )
-            yield from fc.Compressor.compress_file(file=file_info["path_raw"])
-            # LOG.debug("Chunk type: %s", type(chunk))
-            # checksum.update(chunk)
-            # break
 
         # LOG.debug("Streaming file finished.")
         # Add checksum to file info
         self.data[file]["checksum"] = checksum.hexdigest()
+
+
+class StreamFileHandler(LocalFileHandler):
+    """Handles one file read from a stream of unknown size, e.g. stdin.
+
+    Nothing is read before the upload. The size, checksum and whether the data is compressed
+    are saved in the file info while the stream is read.
+    """
+
+    UPLOAD_STEPS = ("put_stream", "add_file_db")
+
+    def __init__(self, stream, name: str, temporary_destination, project, seekable: bool = False):
+        """Create the file info for the stream, to be saved as name in the project."""
+        self.seekable = seekable
+        fh.FileHandler.__init__(
+            self, user_input=((), None), local_destination=temporary_destination, project=project
+        )
+        self.stream = stream
+        self.data_list = None
+        self._first_block = b""
+
+        path = pathlib.PurePosixPath(name)
+        if name.endswith("/") or not path.name or path.is_absolute() or ".." in path.parts:
+            raise exceptions.UploadError(
+                f"Invalid name for the uploaded data: '{escape(name)}'. "
+                "Specify a relative path, e.g. 'folder/file.tar'."
+            )
+
+        self.data = {
+            path.as_posix(): frec.UploadRecord(
+                path_raw=pathlib.Path("<stdin>"),
+                subpath=pathlib.Path(path.parent),
+                size_raw=0,
+                compressed=False,
+                path_processed=None,
+                size_processed=0,
+                path_remote=self.generate_bucket_filepath(
+                    filename=path.name, folder=pathlib.Path(path.parent)
+                ),
+                overwrite=False,
+                checksum="",
+            )
+        }
+
+    def stream_from_file(self, file):
+        """Read and compress the stream, unless it starts as a compressed file."""
+        self._first_block = self.stream.read(constants.READ_BUFFER_SIZE)
+        with fc.Compressor() as compressor:
+            self.data[file]["compressed"] = compressor.is_compressed_data(data=self._first_block)
+
+        yield from super().stream_from_file(file=file)
+
+    def read_blocks(self, file):
+        """Read the stream in large blocks, counting its size.
+
+        Reads of a buffered stream only return less than asked for at the end of the stream.
+        """
+        block = self._first_block
+        self._first_block = b""
+        while block:
+            self.data[file]["size_raw"] += len(block)
+            yield block
+            block = self.stream.read(constants.READ_BUFFER_SIZE)
@@ -5,14 +5,20 @@
 ###############################################################################
 
 # Standard library
+import json
 import logging
 import pathlib
+import threading
+import time
 
 # Installed
 
 # Own modules
+from dds_cli import constants
 from dds_cli import DDSEndpoint
 from dds_cli import file_handler as fh
+from dds_cli import file_records as frec
+from dds_cli import output_writer as ow
 import dds_cli.utils
 
 ###############################################################################
@@ -44,18 +50,26 @@ class RemoteFileHandler(fh.FileHandler):
                 "\n:warning-emoji: No data specified. :warning-emoji:\n"
             )
 
-        self.data = self.__collect_file_info_remote(all_paths=self.data_list, token=token)
+        # All project files are streamed from the API while downloading, see iter_file_info_all
+        self.streamed = get_all and not self.data_list
+        self.collected = None
+        self.token = token
+        self.data = (
+            {}
+            if self.streamed
+            else self.__collect_file_info_remote(all_paths=self.data_list, token=token)
+        )
         self.data_list = None
 
     # Static methods ############ Static methods #
     @staticmethod
-    def write_file(chunks, outfile: pathlib.Path, **_):
-        """Write file chunks to file."""
+    def write_file(chunks, outfile: pathlib.Path, size: int = None, **_):
+        """Write file chunks to file, allocating size bytes up front if known."""
         saved, message = (False, "")
 
         LOG.debug("Saving file...")
         try:
-            with outfile.open(mode="wb+") as new_file:
+            with ow.OutputWriter(file=outfile, size=size) as new_file:
                 for chunk in chunks:
                     new_file.write(chunk)
         except OSError as err:
@@ -71,6 +85,7 @@ class RemoteFileHandler(fh.FileHandler):
     def __collect_file_info_remote(self, all_paths, token):
         """Get information on files in db."""
         # Get file info from db via API
+        url_fetched = time.time()
         file_info, _ = dds_cli.utils.perform_request(
             DDSEndpoint.FILE_INFO_ALL if self.get_all else DDSEndpoint.FILE_INFO,
             method="get",
@@ -99,45 +114,152 @@ class RemoteFileHandler(fh.FileHandler):
         LOG.debug("API call: files not found in DB: %s", self.failed)
 
         # Save info on files in dict and return
-        data = {
-            self.local_destination / pathlib.Path(x): {
-                **y,
-                "name_in_db": x,
-                "path_downloaded": self.local_destination
-                / pathlib.Path(y["subpath"])
-                / pathlib.Path(y["name_in_bucket"]),
-            }
-            for x, y in files.items()
-        }
+        data = dict(
+            self.__file_entry(name=x, info=y, url_fetched=url_fetched) for x, y in files.items()
+        )
 
         # Save info on files in a specific folder and return
         for _, folder_item in folder_contents.items():
             data.update(
-                {
-                    self.local_destination / pathlib.Path(j): {
-                        **k,
-                        "name_in_db": j,
-                        "path_downloaded": self.local_destination
-                        / pathlib.Path(k["subpath"])
-                        / pathlib.Path(k["name_in_bucket"]),
-                    }
-                    for j, k in folder_item.items()
-                }
+                self.__file_entry(name=j, info=k, url_fetched=url_fetched)
+                for j, k in folder_item.items()
             )
 
         return data
 
+    def __file_entry(self, name, info, url_fetched):
+        """Create the local path and file info for a file in the db."""
+        return self.local_destination / pathlib.Path(name), frec.DownloadRecord(
+            info,
+            name_in_db=name,
+            url_fetched=url_fetched,
+            path_downloaded=self.local_destination
+            / pathlib.Path(info["subpath"])
+            / pathlib.Path(info["name_in_bucket"]),
+        )
+
     # Public methods ############ Public methods #
+    def iter_file_info_all(self, spool_file: pathlib.Path):
+        """Stream info on all files in the project from the API.
+
+        The response is parsed while it is downloaded, and a background thread writes one line
+        per file to the spool file as fast as the API sends it. Yields (local path, file info)
+        from the spool file as soon as each file has been received, so memory use does not
+        depend on the number of files and the API connection is not kept open while the
+        files are downloaded. The spool file is removed when the iteration ends or is stopped.
+
+        When the info on all files has been received, collected is set to their total
+        size_stored and size_original, and the info of the file with the largest size_stored.
+        """
+        state = {"written": 0, "done": False, "stop": False, "waiting": False, "error": None}
+        condition = threading.Condition()
+
+        def spool():
+            """Write the streamed file info to the spool file, flushing it in batches."""
+            totals = {"size_stored": 0, "size_original": 0}
+            largest = None
+            try:
+                with spool_file.open(mode="w", encoding="utf-8") as spool_out:
+                    pending = 0
+                    for name, info in dds_cli.utils.stream_json_items(
+                        DDSEndpoint.FILE_INFO_ALL,
+                        key="files",
+                        params={"project": self.project},
+                        headers=self.token,
+                        error_message="Failed to collect file information",
+                    ):
+                        if state["stop"]:
+                            break
+                        spool_out.write(json.dumps([name, info, time.time()]) + "\n")
+                        pending += 1
+                        totals["size_stored"] += info["size_stored"]
+                        totals["size_original"] += info["size_original"]
+                        if largest is None or info["size_stored"] > largest[1]["size_stored"]:
+                            largest = (name, info)
+                        # Flush at once if the files are awaited, to start the downloads
+                        if pending >= constants.SPOOL_FLUSH_LINES or state["waiting"]:
+                            spool_out.flush()
+                            with condition:
+                                state["written"] += pending
+                                condition.notify()
+                            pending = 0
+                    # Set before the last files are available, so that they can be checked
+                    if largest is not None and not state["stop"]:
+                        _, totals["largest"] = self.__file_entry(
+                            name=largest[0], info=largest[1], url_fetched=time.time()
+                        )
+                        self.collected = totals
+                    spool_out.flush()
+                    with condition:
+                        state["written"] += pending
+            except Exception as err:  # Raised in the reading thread instead
+                state["error"] = err
+            finally:
+                with condition:
+                    state["done"] = True
+                    condition.notify()
+
+        spool_thread = threading.Thread(target=spool, name="dds-file-info", daemon=True)
+        spool_thread.start()
+
+        spool_in = None
+        read = 0
+        try:
+            while True:
+                with condition:
+                    state["waiting"] = True
+                    condition.wait_for(lambda: state["written"] > read or state["done"])
+                    state["waiting"] = False
+                    available = state["written"]
+                if available == read:
+                    break
+
+                if spool_in is None:
+                    spool_in = spool_file.open(mode="r", encoding="utf-8")
+                for _ in range(available - read):
+                    name, info, url_fetched = json.loads(spool_in.readline())
+                    read += 1
+                    yield self.__file_entry(name=name, info=info, url_fetched=url_fetched)
+
+            if state["error"] is not None:
+                raise state["error"]
+            LOG.debug("File info for %s files collected.", read)
+        finally:
+            # Also when stopped early, e.g. with '--break-on-fail'
+            state["stop"] = True
+            spool_thread.join()
+            if spool_in is not None:
+                spool_in.close()
+            spool_file.unlink(missing_ok=True)
+
+    def refresh_urls(self, files):
+        """Get new presigned urls for several files in one request.
+
+        files is a list of file info dicts, which are updated in place.
+        """
+        url_fetched = time.time()
+        file_info, _ = dds_cli.utils.perform_request(
+            DDSEndpoint.FILE_INFO,
+            method="get",
+            params={"project": self.project},
+            headers=self.token,
+            json=[x["name_in_db"] for x in files],
+            error_message="Failed to refresh download links",
+        )
+
+        new_info = file_info.get("files") or {}
+        for info in files:
+            url = new_info.get(info["name_in_db"], {}).get("url")
+            if url:
+                info.update({"url": url, "url_fetched": url_fetched})
+
+        LOG.debug("Download links refreshed for %s file(s).", len(new_info))
+
+    @staticmethod
+    def create_download_status():
+        """Create the status of the download of one file."""
+        return frec.FileStatus(steps=("get", "update_db"))
+
     def create_download_status_dict(self):
         """Create dict for tracking file download status."""
-        return {
-            x: {
-                "cancel": False,
-                "started": False,
-                "message": "",
-                "failed_op": None,
-                "get": {"started": False, "done": False},
-                "update_db": {"started": False, "done": False},
-            }
-            for x in self.data
-        }
+        return {x: self.create_download_status() for x in self.data}
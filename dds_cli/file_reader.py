@@ -0,0 +1,149 @@
+"""File reader module. Reads local files for hashing, compression and encryption."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import logging
+import os
+import pathlib
+import threading
+
+# Own modules
+from dds_cli import constants
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class BufferPool:
+    """Reusable read buffers, shared by the files which are read at the same time.
+
+    Buffers are created when needed and kept when given back, at most `max_idle` of each size.
+    """
+
+    def __init__(self, max_idle: int = constants.READ_BUFFER_POOL_SIZE):
+        """No buffers are created up front."""
+        self.max_idle = max_idle
+        self._idle = {}  # size: [buffers]
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int):
+        """Get a buffer of size bytes."""
+        with self._lock:
+            idle = self._idle.get(size)
+            if idle:
+                return idle.pop()
+        return bytearray(size)
+
+    def release(self, buffer: bytearray):
+        """Give back a buffer when done with it."""
+        with self._lock:
+            idle = self._idle.setdefault(len(buffer), [])
+            if len(idle) < self.max_idle:
+                idle.append(buffer)
+
+
+# Shared by all readers unless given their own
+BUFFER_POOL = BufferPool()
+
+
+class FileReader:
+    """Read a file in large blocks into a reused buffer.
+
+    Iterating gives memoryviews of the buffer, which are only valid until the next block is read.
+    Consumers which keep the data, e.g. the encryptor, need to copy it. The last block is given as
+    bytes instead, since it can be kept after the file has been read and the buffer reused for the
+    next file. All blocks except the last one are `read_size` bytes. The OS is told that the file is read sequentially, and the
+    blocks which have been handed off are dropped from the page cache, since the file is only
+    read once. Cache hints are skipped where the OS does not support them.
+    """
+
+    def __init__(
+        self,
+        file: pathlib.Path,
+        read_size: int = constants.READ_BUFFER_SIZE,
+        pool: BufferPool = None,
+    ):
+        """Nothing is read until iterated over."""
+        self.file = file
+        self.read_size = read_size
+        self.pool = pool or BUFFER_POOL
+
+    def __iter__(self):
+        """Yield the contents of the file in blocks.
+
+        The buffer is only given back to the pool if no view of it is still held, i.e. not if
+        the iteration is stopped while the consumer has a block.
+        """
+        buffer = self.pool.acquire(size=self.read_size)
+        view = memoryview(buffer)
+        reusable = True
+        try:
+            with pathlib.Path(self.file).open(mode="rb", buffering=0) as infile:
+                self.__advise(infile=infile, offset=0, length=0, advice="POSIX_FADV_SEQUENTIAL")
+                size = os.fstat(infile.fileno()).st_size
+                offset = 0
+                while True:
+                    filled = self.__fill(infile=infile, view=view)
+                    if not filled:
+                        break
+
+                    if filled < self.read_size or offset + filled >= size:
+                        yield bytes(view[:filled])
+                    else:
+                        reusable = False
+                        yield view[:filled]
+                        reusable = True
+
+                    self.__advise(
+                        infile=infile, offset=offset, length=filled, advice="POSIX_FADV_DONTNEED"
+                    )
+                    offset += filled
+                    if filled < self.read_size:
+                        break
+        finally:
+            view.release()
+            if reusable:
+                self.pool.release(buffer=buffer)
+
+    # Static methods ############ Static methods #
+    @staticmethod
+    def segments(views, size: int):
+        """Split blocks from the reader into bytes of exactly size bytes, except the last one.
+
+        The read size needs to be a multiple of size.
+        """
+        for view in views:
+            for start in range(0, len(view), size):
+                yield bytes(view[start : start + size])
+
+    # Private methods ############ Private methods #
+    @staticmethod
+    def __fill(infile, view):
+        """Read into the buffer until it is full or the file has ended."""
+        filled = 0
+        while filled < len(view):
+            read = infile.readinto(view[filled:])
+            if not read:
+                break
+            filled += read
+        return filled
+
+    def __advise(self, infile, offset, length, advice):
+        """Give the OS a hint on how the file is read."""
+        if not hasattr(os, "posix_fadvise"):
+            return
+
+        try:
+            os.posix_fadvise(infile.fileno(), offset, length, getattr(os, advice))
+        except OSError as err:
+            LOG.debug("Could not give read hint for '%s': %s", self.file, err)
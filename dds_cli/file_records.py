@@ -0,0 +1,222 @@
+"""File records module. Compact info and status for each file in a delivery.
+
+Deliveries can have millions of files. A dict per file, with a nested dict per step and
+pathlib.Path objects, takes several kilobytes per file. The records here keep the same fields
+in slots: paths are saved as strings, subpaths are interned so that all files in a directory
+share one string, and the steps of a file are saved as integer codes.
+"""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import collections.abc
+import logging
+import pathlib
+import sys
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class Record(collections.abc.MutableMapping):
+    """Fields saved in slots, used like a dict.
+
+    The keys in FIELDS are saved in slots. Keys in PATHS are saved as strings and returned as
+    pathlib.Path objects, and keys in INTERNED are saved as interned strings. Other keys are kept
+    in a dict which is only created when needed.
+    """
+
+    FIELDS = ()
+    PATHS = frozenset()
+    INTERNED = frozenset()
+    _field_set = frozenset()
+
+    __slots__ = ("_extra",)
+
+    def __init__(self, *args, **fields):
+        """Create the record from a dict and/or keyword arguments, as dict()."""
+        self._extra = None
+        self.update(*args, **fields)
+
+    def __init_subclass__(cls, **kwargs):
+        """Look up the fields in a set."""
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    def __getitem__(self, key):
+        """The value of the key. Paths are returned as pathlib.Path objects."""
+        if key in self._field_set:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            if key in self.PATHS and value is not None:
+                return pathlib.Path(value)
+            return value
+
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        """Save the value, as a string if it is a path."""
+        if key in self._field_set:
+            if value is not None and (key in self.PATHS or key in self.INTERNED):
+                value = sys.intern(str(value)) if key in self.INTERNED else str(value)
+            setattr(self, key, value)
+            return
+
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        """Remove the key."""
+        if key in self._field_set:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return
+
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        """The keys which are set, fields first."""
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        """The number of keys which are set."""
+        return sum(hasattr(self, x) for x in self.FIELDS) + len(self._extra or ())
+
+    def __repr__(self):
+        """Show the record as a dict."""
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class UploadRecord(Record):
+    """Info on a local file to upload."""
+
+    FIELDS = (
+        "path_raw",
+        "subpath",
+        "size_raw",
+        "compressed",
+        "path_processed",
+        "size_processed",
+        "path_remote",
+        "overwrite",
+        "checksum",
+        "public_key",
+        "salt",
+    )
+    PATHS = frozenset({"path_raw", "subpath", "path_processed"})
+    INTERNED = frozenset({"subpath"})
+
+    __slots__ = FIELDS
+
+
+class DownloadRecord(Record):
+    """Info on a file in the project to download, as returned by the API."""
+
+    FIELDS = (
+        "name_in_db",
+        "name_in_bucket",
+        "subpath",
+        "size_original",
+        "size_stored",
+        "compressed",
+        "public_key",
+        "salt",
+        "checksum",
+        "url",
+        "url_fetched",
+        "path_downloaded",
+    )
+    PATHS = frozenset({"path_downloaded"})
+    INTERNED = frozenset({"subpath"})
+
+    __slots__ = FIELDS
+
+
+class FileStatus(Record):
+    """Status of the delivery of one file.
+
+    Each step of the delivery, e.g. 'put' and 'add_file_db', is saved as an integer code:
+    NOT_STARTED, STARTED or DONE, or None if the file does not go through the step. As a dict,
+    a step is returned as {"started": bool, "done": bool}.
+
+    The state of the whole file, PENDING, RUNNING, SUCCEEDED or CANCELLED, is only changed by
+    status.DeliveryStatus, which counts the files in each state.
+    """
+
+    NOT_STARTED, STARTED, DONE = range(3)
+    PENDING, RUNNING, SUCCEEDED, CANCELLED = range(4)
+    STEPS = ("put", "put_stream", "put_copy", "add_file_db", "get", "update_db")
+    FIELDS = ("cancel", "started", "message", "failed_op") + STEPS
+
+    __slots__ = FIELDS + ("state",)
+
+    def __init__(self, steps=(), **fields):
+        """Create the status of a file which has not been started, going through the steps."""
+        self.state = self.PENDING
+        self.cancel = False
+        self.started = False
+        self.message = ""
+        self.failed_op = None
+        super().__init__({x: self.NOT_STARTED for x in steps}, **fields)
+
+    def __getitem__(self, key):
+        """The value of the key. A step is returned as a dict."""
+        value = super().__getitem__(key)
+        if key in self.STEPS:
+            if value is None:
+                raise KeyError(key)
+            return {"started": value >= self.STARTED, "done": value == self.DONE}
+        return value
+
+    def __setitem__(self, key, value):
+        """Save the value. A step can be set to a code or to a dict."""
+        if key in self.STEPS and isinstance(value, collections.abc.Mapping):
+            value = (
+                self.DONE
+                if value.get("done")
+                else self.STARTED
+                if value.get("started")
+                else self.NOT_STARTED
+            )
+        super().__setitem__(key, value)
+
+    def __iter__(self):
+        """The keys which are set, without the steps the file does not go through."""
+        for key in super().__iter__():
+            if key not in self.STEPS or getattr(self, key) is not None:
+                yield key
+
+    def __len__(self):
+        """The number of keys which are set."""
+        return sum(1 for _ in self)
+
+    # Public methods ############ Public methods #
+    def start(self, step):
+        """Save that a step has started."""
+        setattr(self, step, self.STARTED)
+
+    def finish(self, step):
+        """Save that a step is done."""
+        setattr(self, step, self.DONE)
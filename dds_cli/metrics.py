@@ -0,0 +1,343 @@
+"""Metrics module. Records the time, bytes and retries of each stage of a delivery."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import bisect
+import contextlib
+import datetime
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+
+# Own modules
+from dds_cli import constants
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class StageTimer:
+    """A running stage. Set bytes, and failed if the stage did not succeed."""
+
+    __slots__ = ("bytes", "failed", "nested")
+
+    def __init__(self):
+        """Nothing done yet."""
+        self.bytes = 0
+        self.failed = False
+        self.nested = 0.0  # Seconds in stages run within this one
+
+
+class StageStats:
+    """The totals of a stage, with the durations counted per histogram bucket."""
+
+    __slots__ = ("calls", "failures", "retries", "bytes", "seconds", "buckets")
+
+    def __init__(self, nr_buckets):
+        """No calls yet."""
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (nr_buckets + 1)  # The last is +Inf
+
+
+class DeliveryMetrics:
+    """Counts the calls, failures, retries, bytes and seconds of each stage of a delivery.
+
+    The stages are e.g. stream_from_file, encrypt_filechunks, put, add_file_db, get,
+    decrypt_file and update_db. The seconds of a stage do not include stages run within it in the
+    same thread, e.g. reading the file while encrypting it, so that the slow stage can be found.
+
+    With a json_file or textfile, a background thread, started at the first stage, writes the
+    metrics every interval seconds, and they are written a last time when closed: as a JSON
+    summary, and in the Prometheus text format, e.g. for the node-exporter textfile collector.
+
+    With a tracer, each stage is also added to the timeline of the delivery, with the file.
+    """
+
+    # File info with the bytes of a stage, when it has succeeded
+    BYTES_FIELDS = {
+        "put": "size_processed",
+        "put_stream": "size_processed",
+        "put_copy": "size_processed",
+        "get": "size_stored",
+        "decrypt_file": "size_original",
+    }
+
+    def __init__(
+        self,
+        labels: dict = None,
+        json_file: pathlib.Path = None,
+        textfile: pathlib.Path = None,
+        interval: float = constants.METRICS_EXPORT_INTERVAL,
+        buckets: tuple = constants.METRICS_DURATION_BUCKETS,
+        tracer=None,
+    ):
+        """Nothing is written, and no thread started, until a stage is recorded."""
+        self.labels = {x: str(y) for x, y in (labels or {}).items() if y is not None}
+        self.json_file = json_file
+        self.textfile = textfile
+        self.interval = interval
+        self.buckets = tuple(buckets)
+        self.tracer = tracer
+        self.started = time.time()
+
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        self._export_failed = False
+
+    def __enter__(self):
+        """Return self when using context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceb):
+        """Write the metrics and stop the background thread."""
+        self.close()
+        return False
+
+    # Public methods ############ Public methods #
+    @contextlib.contextmanager
+    def stage(self, name: str, retry: bool = False, file=None):
+        """Time a stage. Yields a StageTimer, on which to set the bytes and if the stage failed.
+
+        The file is only used in the trace.
+        """
+        timer = StageTimer()
+        running = self.__running()
+        running.append(timer)
+        start = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            timer.failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            running.pop()
+            if running:
+                running[-1].nested += seconds
+            if self.tracer is not None:
+                self.tracer.complete(
+                    name=name, start=start, seconds=seconds, file=file, failed=timer.failed
+                )
+            self.record(
+                name=name,
+                seconds=seconds - timer.nested,
+                nr_bytes=timer.bytes,
+                failed=timer.failed,
+                retries=int(retry),
+            )
+
+    def chunks(self, name: str, chunks, file=None):
+        """Yield the chunks, recording the time taken to produce them as the stage name.
+
+        E.g. reading and compressing a file, while it is encrypted. The bytes are those of the
+        chunks, and the stage is recorded when the chunks are finished. In the trace, the stage
+        runs from the first chunk to the last.
+        """
+        seconds, nr_bytes, failed = (0.0, 0, False)
+        first = None
+        iterator = iter(chunks)
+        try:
+            while True:
+                start = time.perf_counter()
+                first = first or start
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                except BaseException:
+                    failed = True
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - start
+                    seconds += elapsed
+                    running = self.__running()
+                    if running:
+                        running[-1].nested += elapsed
+                nr_bytes += len(chunk)
+                yield chunk
+        finally:
+            if self.tracer is not None and first is not None:
+                self.tracer.complete(
+                    name=name,
+                    start=first,
+                    seconds=time.perf_counter() - first,
+                    file=file,
+                    failed=failed,
+                )
+            self.record(name=name, seconds=seconds, nr_bytes=nr_bytes, failed=failed)
+
+    def retry(self, name: str, count: int = 1):
+        """Count retries of a stage, e.g. download attempts, which are not separate calls."""
+        with self._lock:
+            self.__stats(name=name).retries += count
+
+    def record(self, name: str, seconds: float, nr_bytes: int = 0, failed=False, retries=0):
+        """Add one call of a stage."""
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            stats = self.__stats(name=name)
+            stats.calls += 1
+            stats.failures += int(failed)
+            stats.retries += retries
+            stats.bytes += nr_bytes or 0
+            stats.seconds += seconds
+            stats.buckets[bucket] += 1
+
+            if self._thread is None and (self.json_file or self.textfile):
+                self._thread = threading.Thread(
+                    target=self.__run, name="dds-metrics-export", daemon=True
+                )
+                self._thread.start()
+
+    def summary(self):
+        """The metrics as a dict: the labels, the times and the totals per stage."""
+        with self._lock:
+            stages = {
+                name: {
+                    "calls": x.calls,
+                    "failures": x.failures,
+                    "retries": x.retries,
+                    "bytes": x.bytes,
+                    "seconds": round(x.seconds, 6),
+                    "bytes_per_second": round(x.bytes / x.seconds, 1) if x.seconds else None,
+                }
+                for name, x in self._stages.items()
+            }
+        now = time.time()
+        return {
+            "labels": self.labels,
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(),
+            "updated": datetime.datetime.fromtimestamp(now).isoformat(),
+            "elapsed_seconds": round(now - self.started, 3),
+            "stages": stages,
+        }
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            stages = [(name, self.__copy(x)) for name, x in sorted(self._stages.items())]
+
+        lines = []
+        for metric, kind, helptext, value in (
+            ("dds_stage_calls_total", "counter", "Calls of the stage.", "calls"),
+            ("dds_stage_failures_total", "counter", "Failed calls of the stage.", "failures"),
+            ("dds_stage_retries_total", "counter", "Retries within the stage.", "retries"),
+            ("dds_stage_bytes_total", "counter", "Bytes handled by the stage.", "bytes"),
+        ):
+            lines += [f"# HELP {metric} {helptext}", f"# TYPE {metric} {kind}"]
+            lines += [
+                f"{metric}{self.__labels(stage=name)} {getattr(x, value)}" for name, x in stages
+            ]
+
+        metric = "dds_stage_duration_seconds"
+        lines += [
+            f"# HELP {metric} Time spent in the stage, excluding stages run within it.",
+            f"# TYPE {metric} histogram",
+        ]
+        for name, x in stages:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), x.buckets):
+                cumulative += count
+                lines.append(f"{metric}_bucket{self.__labels(stage=name, le=bound)} {cumulative}")
+            lines.append(f"{metric}_sum{self.__labels(stage=name)} {x.seconds}")
+            lines.append(f"{metric}_count{self.__labels(stage=name)} {x.calls}")
+
+        metric = "dds_delivery_start_time_seconds"
+        lines += [
+            f"# HELP {metric} Start time of the delivery, in seconds since the epoch.",
+            f"# TYPE {metric} gauge",
+            f"{metric}{self.__labels()} {self.started}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Write the JSON summary and the Prometheus textfile, replacing the previous ones.
+
+        Each file is written next to the old one and renamed, so that it is never read half
+        written.
+        """
+        for target, contents in (
+            (self.json_file, lambda: json.dumps(self.summary(), indent=4)),
+            (self.textfile, self.prometheus),
+        ):
+            if target is None:
+                continue
+            out_file = pathlib.Path(target)
+            temporary = out_file.with_name(f".{out_file.name}.{os.getpid()}.tmp")
+            try:
+                temporary.write_text(contents(), encoding="utf-8")
+                os.replace(temporary, out_file)
+            except OSError as err:
+                # Warn once, the metrics should not disturb the delivery
+                (LOG.debug if self._export_failed else LOG.warning)(
+                    "Failed to save the delivery metrics in '%s': %s", out_file, err
+                )
+                self._export_failed = True
+
+    def close(self):
+        """Stop the background thread and write the metrics a last time."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.export()
+
+    # Private methods ############ Private methods #
+    def __running(self):
+        """The stages running in this thread, innermost last."""
+        running = getattr(self._local, "running", None)
+        if running is None:
+            running = self._local.running = []
+        return running
+
+    def __stats(self, name):
+        """The totals of the stage. Needs the lock."""
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = StageStats(nr_buckets=len(self.buckets))
+        return stats
+
+    @staticmethod
+    def __copy(stats):
+        """A copy of the totals, to format without the lock. Needs the lock."""
+        copied = StageStats(nr_buckets=len(stats.buckets) - 1)
+        for field in StageStats.__slots__:
+            value = getattr(stats, field)
+            setattr(copied, field, list(value) if isinstance(value, list) else value)
+        return copied
+
+    def __labels(self, **extra):
+        """The labels of a sample, e.g. {method="put",stage="put"}."""
+        labels = {**self.labels, **{x: str(y) for x, y in extra.items()}}
+        if not labels:
+            return ""
+        escaped = (
+            (x, y.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for x, y in labels.items()
+        )
+        return "{" + ",".join(f'{x}="{y}"' for x, y in escaped) + "}"
+
+    def __run(self):
+        """Write the metrics every interval seconds until closed."""
+        while not self._stop.wait(timeout=self.interval):
+            self.export()
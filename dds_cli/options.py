@@ -74,6 +74,30 @@ def folder_option(
     )
 
 
+def metrics_textfile_option(
+    long="--metrics-textfile",
+    name="metrics_textfile",
+    required=False,
+    help_message=(
+        "File to save the metrics of the delivery stages in, in the Prometheus text format, "
+        "e.g. in the directory of the node-exporter textfile collector. "
+        "By default saved in the logs of the staging directory."
+    ),
+):
+    """
+    Metrics textfile option standard definition.
+
+    Use as decorator for commands.
+    """
+    return click.option(
+        long,
+        name,
+        required=required,
+        type=click.Path(file_okay=True, dir_okay=False, path_type=pathlib.Path),
+        help=help_message,
+    )
+
+
 def num_threads_option(
     long="--num-threads",
     short="-nt",
@@ -212,6 +236,29 @@ def token_path_option(
     )
 
 
+def trace_option(
+    long="--trace",
+    name="trace_file",
+    required=False,
+    help_message=(
+        "File to save a timeline of the delivery in: when each stage of each file ran, and in "
+        "which thread. Open it in https://ui.perfetto.dev or chrome://tracing."
+    ),
+):
+    """
+    Trace option standard definition.
+
+    Use as decorator for commands.
+    """
+    return click.option(
+        long,
+        name,
+        required=required,
+        type=click.Path(file_okay=True, dir_okay=False, path_type=pathlib.Path),
+        help=help_message,
+    )
+
+
 def username_option(help_message, long="--username", short="-u", name="username", required=False):
     """
     Username option standard definition.
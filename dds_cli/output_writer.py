@@ -0,0 +1,142 @@
+"""Output writer module. Writes downloaded and decrypted files to disk."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import errno
+import logging
+import os
+import pathlib
+
+# Own modules
+from dds_cli import constants
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class OutputWriter:
+    """Write a file in large blocks, with the disk space allocated up front.
+
+    Small chunks are collected in a buffer of `buffer_size` bytes which is written in one go.
+    If the size of the file is known, the space is allocated when the file is opened, which keeps
+    the file in one piece on disk and fails directly if there is not enough space. Written data
+    is dropped from the page cache behind the write position, since it will not be read again.
+    Allocation and cache hints are skipped where the OS does not support them. An existing file
+    is replaced by a new one instead of overwritten, so that files linked to it are not changed.
+    """
+
+    def __init__(
+        self,
+        file: pathlib.Path,
+        size: int = None,
+        buffer_size: int = constants.WRITE_BUFFER_SIZE,
+    ):
+        """Open the file for writing and allocate the space."""
+        self.file = file
+        self.size = size
+        self.buffer_size = buffer_size
+
+        self.written = 0
+        self._buffer = bytearray()
+        self._dropped = 0  # Data before this has been dropped from the page cache
+
+        # A hardlink, e.g. from '--dedup', would otherwise change all the files linked to it
+        pathlib.Path(file).unlink(missing_ok=True)
+        self._fd = os.open(file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0))
+        try:
+            self.__allocate()
+        except OSError:
+            os.close(self._fd)
+            self._fd = None
+            raise
+
+    def __enter__(self):
+        """Return self when using context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceb):
+        """Write the remaining data and close the file."""
+        self.close()
+        return False
+
+    # Public methods ############ Public methods #
+    @property
+    def closed(self):
+        """True if the file has been closed."""
+        return self._fd is None
+
+    def write(self, data):
+        """Add data to the buffer, writing it to file when the buffer is full."""
+        self._buffer += data
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        """Write the buffered data to file."""
+        view = memoryview(self._buffer)
+        try:
+            while view:
+                view = view[os.write(self._fd, view) :]
+        finally:
+            view.release()
+
+        self.written += len(self._buffer)
+        self._buffer.clear()
+
+        # Blocks which were still being written back are advised again on the next flushes
+        self.__drop_cache(start=self._dropped, end=self.written)
+        self._dropped = max(
+            self._dropped, self.written - constants.WRITE_CACHE_BUFFERS * self.buffer_size
+        )
+
+    def close(self):
+        """Flush the buffer and close the file, removing space allocated but not written."""
+        if self.closed:
+            return
+
+        try:
+            self.flush()
+            if self.size and self.written < self.size:
+                os.ftruncate(self._fd, self.written)
+            self.__drop_cache(start=0, end=self.written)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    # Private methods ############ Private methods #
+    def __allocate(self):
+        """Allocate the disk space for the whole file, if the size is known."""
+        if not self.size or not hasattr(os, "posix_fallocate"):
+            return
+
+        try:
+            os.posix_fallocate(self._fd, 0, self.size)
+        except OSError as err:
+            # Not supported by all filesystems - only running out of space is an error
+            if err.errno == errno.ENOSPC:
+                raise
+            LOG.debug("Could not allocate space for '%s': %s", self.file, err)
+
+    def __drop_cache(self, start, end):
+        """Tell the OS that the file between start and end will not be read again.
+
+        Data which is not on disk yet stays in the cache, but is scheduled to be written.
+        """
+        if end <= start or not hasattr(os, "posix_fadvise"):
+            return
+
+        try:
+            os.posix_fadvise(self._fd, start, end - start, os.POSIX_FADV_DONTNEED)
+        except OSError as err:
+            LOG.debug("Could not drop '%s' from page cache: %s", self.file, err)
@@ -0,0 +1,199 @@
+"""Profiling module. Profiles a whole dds command, for 'dds --profile'."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import cProfile
+import logging
+import pathlib
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Own modules
+import dds_cli.timestamp
+import dds_cli.utils
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class Profiler:
+    """Profiles the CPU time or the memory allocations of a command, per phase.
+
+    With mode 'cpu', the functions are profiled with cProfile, also in the transfer threads,
+    and the statistics are saved as a .pstats file, e.g. for 'python -m pstats' or snakeviz.
+    With mode 'mem', the Python allocations are traced with tracemalloc, and a snapshot is saved
+    as a .tracemalloc file, for tracemalloc.Snapshot.load.
+
+    The command is split in the phases init/auth, discovery, transfer and summary. The time of
+    each phase is logged, with the peak RSS of the process at its end and, with 'mem', the peak
+    of the traced allocations within the phase.
+    """
+
+    PHASES = ("init/auth", "discovery", "transfer", "summary")
+    TRACEBACK_FRAMES = 10  # Frames saved per allocation
+
+    current = None  # The profiler of the command, with 'dds --profile'
+
+    def __init__(self, mode: str = "cpu", directory: pathlib.Path = None):
+        """Nothing is profiled until started. The files are saved in directory, or cwd."""
+        if mode not in ("cpu", "mem"):
+            raise ValueError(f"Unknown profiling mode: '{mode}'")
+        self.mode = mode
+        self.directory = directory
+        self.phases = []  # [name, seconds, peak RSS, peak traced]
+
+        self._profiles = []
+        self._phase_start = None
+        self._running = False
+
+    # Public methods ############ Public methods #
+    def start(self):
+        """Start profiling, in the phase init/auth."""
+        if self.mode == "cpu":
+            profile = cProfile.Profile()
+            self._profiles.append(profile)
+            # Before 3.12 a profile only sees its own thread, so each new thread gets one
+            if sys.version_info < (3, 12):
+                threading.setprofile(self.__profile_thread)
+            profile.enable()
+        else:
+            tracemalloc.start(self.TRACEBACK_FRAMES)
+        self._running = True
+        self.__begin_phase(name=self.PHASES[0])
+
+    def phase(self, name: str):
+        """End the current phase and begin the next one, e.g. 'transfer'."""
+        if not self._running or (self.phases and self.phases[-1][0] == name):
+            return
+        self.__end_phase()
+        self.__begin_phase(name=name)
+
+    def stop(self):
+        """Stop profiling, save the profile and log the phases. Returns the saved file."""
+        if not self._running:
+            return None
+        self.__end_phase()
+        self._running = False
+
+        out_file = pathlib.Path(self.directory or pathlib.Path.cwd()) / pathlib.Path(
+            f"dds_profile_{dds_cli.timestamp.TimeStamp().timestamp}"
+            + (".pstats" if self.mode == "cpu" else ".tracemalloc")
+        )
+        try:
+            if self.mode == "cpu":
+                self.__save_cpu(out_file=out_file)
+            else:
+                self.__save_mem(out_file=out_file)
+        except OSError as err:
+            LOG.warning("Failed to save the profile in '%s': %s", out_file, err)
+            out_file = None
+        else:
+            LOG.info("Profile saved in '%s'.", out_file)
+
+        for name, seconds, peak_rss, peak_traced in self.phases:
+            details = [f"{seconds:.2f} s"]
+            if peak_rss is not None:
+                details.append(f"peak RSS {dds_cli.utils.HumanBytes.format(peak_rss)}")
+            if peak_traced is not None:
+                details.append(f"peak allocated {dds_cli.utils.HumanBytes.format(peak_traced)}")
+            LOG.info("Phase '%s': %s", name, ", ".join(details))
+        return out_file
+
+    @staticmethod
+    def peak_rss():
+        """The peak resident set size of the process so far, in bytes. None if unknown."""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, KiB on Linux
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    # Private methods ############ Private methods #
+    def __begin_phase(self, name):
+        """Start timing the phase, and the peak of the allocations within it."""
+        self.phases.append([name, None, None, None])
+        self._phase_start = time.perf_counter()
+        if self.mode == "mem":
+            tracemalloc.reset_peak()
+
+    def __end_phase(self):
+        """Save the time and the peaks of the current phase."""
+        phase = self.phases[-1]
+        phase[1] = time.perf_counter() - self._phase_start
+        phase[2] = self.peak_rss()
+        if self.mode == "mem":
+            phase[3] = tracemalloc.get_traced_memory()[1]
+
+    def __profile_thread(self, *_):
+        """Profile a new thread with a profile of its own. Set as the profile of new threads."""
+        sys.setprofile(None)
+        if not self._running:
+            return
+        profile = cProfile.Profile()
+        self._profiles.append(profile)
+        profile.enable()
+
+    def __save_cpu(self, out_file):
+        """Stop the profiles of all threads and save them together."""
+        threading.setprofile(None)
+        self._profiles[0].disable()
+        stats = pstats.Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(out_file)
+
+    def __save_mem(self, out_file):
+        """Save a snapshot of the allocations and stop tracing."""
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        snapshot.dump(str(out_file))
+        for line in snapshot.statistics("lineno")[:10]:
+            LOG.debug("Allocated: %s", line)
+
+
+###############################################################################
+# FUNCTIONS ####################################################### FUNCTIONS #
+###############################################################################
+
+
+def start(mode: str):
+    """Start profiling the command."""
+    Profiler.current = Profiler(mode=mode)
+    Profiler.current.start()
+    return Profiler.current
+
+
+def phase(name: str):
+    """Begin the next phase of the command, if profiled."""
+    if Profiler.current is not None:
+        Profiler.current.phase(name=name)
+
+
+def set_directory(directory: pathlib.Path):
+    """Save the profile in the directory, e.g. the logs of the staging directory, if profiled."""
+    if Profiler.current is not None:
+        Profiler.current.directory = directory
+
+
+def stop():
+    """Stop profiling the command, and save the profile. Returns the saved file, if any."""
+    profiler, Profiler.current = (Profiler.current, None)
+    return profiler.stop() if profiler is not None else None
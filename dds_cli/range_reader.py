@@ -0,0 +1,156 @@
+"""Range reader module. Reads parts of files in a project without downloading the whole files."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import logging
+
+# Installed
+import zstandard as zstd
+from rich.markup import escape
+
+# Own modules
+from dds_cli import FileSegment
+from dds_cli import constants
+from dds_cli import file_compressor as fc
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class RangeReader:
+    """Reads a byte range of a file, downloading and decrypting only the segments holding it.
+
+    Encrypted files consist of the first nonce, segments which can be decrypted on their own and
+    the last nonce. Files which were not compressed by the DDS are read directly from the segments
+    holding the range. Files compressed with the seekable layout ('dds data put --seekable') are
+    read from the frames holding the range. Other compressed files need to be decompressed from
+    the start, so everything up to the end of the range is downloaded.
+    """
+
+    NONCE_SIZE = 12
+
+    def __init__(self, info: dict, decryptor, fetch):
+        """info is the file info from the API.
+
+        fetch(start, end) returns the bytes between start and end (not included) of the
+        encrypted file, e.g. with an HTTP range request.
+        """
+        self.info = info
+        self.decryptor = decryptor
+        self.fetch = fetch
+        self._first_nonce = None
+
+        # Size of the data which was encrypted - compressed if compressed by the DDS
+        payload = info["size_stored"] - 2 * self.NONCE_SIZE
+        nr_segments = -(-payload // FileSegment.SEGMENT_SIZE_CIPHER)
+        self.size_encrypted = payload - nr_segments * (
+            FileSegment.SEGMENT_SIZE_CIPHER - FileSegment.SEGMENT_SIZE_RAW
+        )
+
+    # Public methods ############ Public methods #
+    def read(self, start: int, end: int):
+        """Yield the bytes between start and end (not included) of the original file."""
+        end = min(end, self.info["size_original"])
+        if end <= start:
+            return
+
+        if not self.info["compressed"]:
+            yield from self.__read_windows(start=start, end=end)
+            return
+
+        seek_table = self.seek_table()
+        if seek_table is None:
+            LOG.warning(
+                "File '%s' was not uploaded with '--seekable' - downloading it from the start "
+                "up to the end of the range.",
+                escape(self.info["name_in_db"]),
+            )
+            yield from self.__read_sequential(start=start, end=end)
+            return
+
+        for compressed_offset, decompressed_offset, compressed_size in seek_table.frames_in_range(
+            start=start, end=end
+        ):
+            frame = self.read_encrypted(
+                start=compressed_offset, end=compressed_offset + compressed_size
+            )
+            decompressed = zstd.ZstdDecompressor().decompressobj().decompress(frame)
+            yield decompressed[max(0, start - decompressed_offset) : end - decompressed_offset]
+
+    def read_encrypted(self, start: int, end: int):
+        """The data which was encrypted, e.g. the compressed file, between start and end."""
+        first_segment = start // FileSegment.SEGMENT_SIZE_RAW
+        last_segment = (end - 1) // FileSegment.SEGMENT_SIZE_RAW
+        encrypted_start = self.NONCE_SIZE + first_segment * FileSegment.SEGMENT_SIZE_CIPHER
+        encrypted = self.fetch(
+            start=encrypted_start,
+            end=min(
+                self.NONCE_SIZE + (last_segment + 1) * FileSegment.SEGMENT_SIZE_CIPHER,
+                self.info["size_stored"] - self.NONCE_SIZE,
+            ),
+        )
+
+        decrypted = b"".join(
+            self.decryptor.decrypt_segment(
+                segment=encrypted[offset : offset + FileSegment.SEGMENT_SIZE_CIPHER],
+                first_nonce=self.first_nonce(),
+                index=first_segment + offset // FileSegment.SEGMENT_SIZE_CIPHER,
+            )
+            for offset in range(0, len(encrypted), FileSegment.SEGMENT_SIZE_CIPHER)
+        )
+        offset = first_segment * FileSegment.SEGMENT_SIZE_RAW
+        return decrypted[start - offset : end - offset]
+
+    def first_nonce(self):
+        """The first nonce, from the start of the encrypted file."""
+        if self._first_nonce is None:
+            self._first_nonce = self.fetch(start=0, end=self.NONCE_SIZE)
+        return self._first_nonce
+
+    def seek_table(self):
+        """The seek table at the end of the compressed file, or None if not seekable."""
+        footer_start = self.size_encrypted - fc.SeekTable.FOOTER_SIZE
+        if footer_start < 0:
+            return None
+
+        table_size = fc.SeekTable.table_size(
+            footer=self.read_encrypted(start=footer_start, end=self.size_encrypted)
+        )
+        if table_size is None or table_size > self.size_encrypted:
+            return None
+
+        return fc.SeekTable.from_bytes(
+            data=self.read_encrypted(
+                start=self.size_encrypted - table_size, end=self.size_encrypted
+            )
+        )
+
+    # Private methods ############ Private methods #
+    def __read_windows(self, start, end):
+        """Read the data which was encrypted in windows, to limit the memory used."""
+        for window_start in range(start, end, constants.READ_BUFFER_SIZE):
+            yield self.read_encrypted(
+                start=window_start, end=min(end, window_start + constants.READ_BUFFER_SIZE)
+            )
+
+    def __read_sequential(self, start, end):
+        """Decompress the file from the start and keep the range."""
+        position = 0
+        for decompressed in fc.Compressor.decompress_chunks(
+            chunks=self.__read_windows(start=0, end=self.size_encrypted)
+        ):
+            if position + len(decompressed) > start:
+                yield decompressed[max(0, start - position) : end - position]
+            position += len(decompressed)
+            if position >= end:
+                return
@@ -5,12 +5,14 @@
 ###############################################################################
 
 # Standard library
+import collections.abc
 import logging
+import threading
 
 # Installed
 
-
 # Own modules
+from dds_cli import file_records as frec
 
 ###############################################################################
 # START LOGGING CONFIG ################################# START LOGGING CONFIG #
@@ -23,23 +25,135 @@ LOG = logging.getLogger(__name__)
 ###############################################################################
 
 
-class DeliveryStatus:
-    """Delivery status class."""
+class DeliveryStatus(collections.abc.MutableMapping):
+    """Status of all files in a delivery, as {file: file_records.FileStatus}.
 
-    UPLOAD_STATUS = {
-        "upload": {"in_progress": False, "finished": False},
-        "processing": {"in_progress": False, "finished": False},
-        "database": {"in_progress": False, "finished": False},
-    }
+    The state of a file is changed with begin, succeed, cancel_one and restore, which are atomic,
+    and the number of files in each state is kept up to date. cancel_all, for '--break-on-fail',
+    only saves the cancellation: files which have not been started are cancelled when they are
+    next looked at, e.g. when dispatched, so it takes the same time for any number of files.
+    Files removed to save memory, e.g. downloaded files, are still counted.
+    """
 
-    # Class methods ############ Class methods #
-    @classmethod
-    def cancel_all(cls):
-        """Cancel upload all files."""
+    STATE_NAMES = {
+        frec.FileStatus.PENDING: "pending",
+        frec.FileStatus.RUNNING: "running",
+        frec.FileStatus.SUCCEEDED: "succeeded",
+        frec.FileStatus.CANCELLED: "cancelled",
+    }
 
-    @classmethod
-    def cancel_one(cls):
-        """Cancel the failed file."""
+    def __init__(self, statuses: dict = None):
+        """Track the statuses, if any, and more files as they are added."""
+        self.cancel_message = None
+        self._files = {}
+        self._counts = [0] * len(self.STATE_NAMES)
+        self._lock = threading.Lock()
+        self.update(statuses or {})
+
+    def __getitem__(self, file):
+        """The status of the file, cancelled if all files have been cancelled before it started."""
+        with self._lock:
+            return self.__get(file=file)
+
+    def __setitem__(self, file, file_status):
+        """Track the status of a file."""
+        with self._lock:
+            previous = self._files.get(file)
+            if previous is not None:
+                self._counts[previous.state] -= 1
+            self._files[file] = file_status
+            self._counts[file_status.state] += 1
+
+    def __delitem__(self, file):
+        """Stop tracking the file, e.g. when it is done. It is still counted."""
+        with self._lock:
+            del self._files[file]
+
+    def __iter__(self):
+        """The files which are tracked."""
+        return iter(list(self._files))
+
+    def __len__(self):
+        """The number of files which are tracked."""
+        return len(self._files)
+
+    def __contains__(self, file):
+        """Whether the file is tracked."""
+        return file in self._files
+
+    # Public methods ############ Public methods #
+    def begin(self, file) -> bool:
+        """Mark the file as started. Returns False if it has been cancelled."""
+        with self._lock:
+            file_status = self.__get(file=file)
+            if file_status.cancel:
+                return False
+            file_status.started = True
+            self.__move(file_status=file_status, state=frec.FileStatus.RUNNING)
+            return True
+
+    def succeed(self, file):
+        """Mark a started file as done."""
+        with self._lock:
+            file_status = self._files[file]
+            if not file_status.cancel:
+                self.__move(file_status=file_status, state=frec.FileStatus.SUCCEEDED)
+
+    def cancel_one(self, file, message: str, failed_op: str = None):
+        """Cancel the failed file. failed_op is saved if no failed operation has been saved."""
+        with self._lock:
+            file_status = self._files[file]
+            file_status.cancel = True
+            file_status.message = message
+            if file_status.failed_op is None:
+                file_status.failed_op = failed_op
+            self.__move(file_status=file_status, state=frec.FileStatus.CANCELLED)
+
+    def cancel_all(self, message: str):
+        """Cancel all files which have not been started, with the message."""
+        with self._lock:
+            if self.cancel_message is None:
+                self.cancel_message = message
+
+    def restore(self, file, message: str):
+        """Mark a cancelled file as done after all, e.g. when added to the database on retry."""
+        with self._lock:
+            file_status = self._files[file]
+            file_status.cancel = False
+            file_status.failed_op = None
+            file_status.message = message
+            self.__move(file_status=file_status, state=frec.FileStatus.SUCCEEDED)
+
+    @property
+    def any_cancelled(self) -> bool:
+        """Whether any file has been cancelled."""
+        return self.cancel_message is not None or self._counts[frec.FileStatus.CANCELLED] > 0
+
+    def counts(self) -> dict:
+        """The number of files in each state, by state name."""
+        with self._lock:
+            counts = list(self._counts)
+        if self.cancel_message is not None:
+            # Pending files are cancelled when looked at
+            counts[frec.FileStatus.CANCELLED] += counts[frec.FileStatus.PENDING]
+            counts[frec.FileStatus.PENDING] = 0
+        return {name: counts[state] for state, name in self.STATE_NAMES.items()}
+
+    # Private methods ############ Private methods #
+    def __get(self, file):
+        """The status of the file, with any cancellation of all files applied. Needs the lock."""
+        file_status = self._files[file]
+        if self.cancel_message is not None and file_status.state == frec.FileStatus.PENDING:
+            file_status.cancel = True
+            file_status.message = self.cancel_message
+            self.__move(file_status=file_status, state=frec.FileStatus.CANCELLED)
+        return file_status
+
+    def __move(self, file_status, state):
+        """Change the state of a file and the counts. Needs the lock."""
+        self._counts[file_status.state] -= 1
+        self._counts[state] += 1
+        file_status.state = state
 
 
 class ProgressPercentage:
@@ -0,0 +1,119 @@
+"""Sync index module. Keeps track of files already downloaded to an existing destination."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import hashlib
+import json
+import logging
+import pathlib
+import threading
+
+# Installed
+from rich.markup import escape
+
+# Own modules
+from dds_cli.file_reader import FileReader
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class SyncIndex:
+    """Local index of downloaded files, used by 'dds data get --sync'.
+
+    Each entry maps the file name in the DDS to the size and modification time of the local
+    file, together with the checksum it was verified against. If the local file has not been
+    touched since then, it does not need to be hashed again on the next sync.
+    """
+
+    def __init__(self, index_file: pathlib.Path):
+        """Load the index from file, if there is one."""
+        self.index_file = index_file
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if self.index_file.is_file():
+            try:
+                with self.index_file.open(mode="r", encoding="utf-8") as index:
+                    self.entries = json.load(index)
+            except (OSError, ValueError) as err:
+                LOG.warning("Could not read sync index '%s', ignoring it: %s", index_file, err)
+                self.entries = {}
+
+    # Static methods ############ Static methods #
+    @staticmethod
+    def generate_checksum(file: pathlib.Path):
+        """Generate the SHA-256 checksum of a local file."""
+        checksum = hashlib.sha256()
+        for block in FileReader(file=file):
+            checksum.update(block)
+        return checksum.hexdigest()
+
+    # Public methods ############ Public methods #
+    def is_up_to_date(self, file: pathlib.Path, info: dict):
+        """Check if the local file matches the remote size and checksum.
+
+        The file is only hashed if the index does not have an entry for the
+        current size and modification time of the file.
+        """
+        try:
+            stat = file.stat()
+        except OSError:
+            return False
+
+        if stat.st_size != info["size_original"]:
+            return False
+
+        entry = self.entries.get(str(info["name_in_db"]))
+        if (
+            entry
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+            and entry.get("checksum") == info["checksum"]
+        ):
+            return True
+
+        LOG.debug("Generating checksum for existing file '%s'", escape(str(file)))
+        try:
+            if self.generate_checksum(file=file) != info["checksum"]:
+                return False
+        except OSError as err:
+            LOG.warning("Could not check existing file '%s': %s", escape(str(file)), err)
+            return False
+
+        self.record(file=file, info=info)
+        return True
+
+    def record(self, file: pathlib.Path, info: dict):
+        """Add the local file to the index."""
+        try:
+            stat = file.stat()
+        except OSError as err:
+            LOG.warning("Could not add '%s' to sync index: %s", escape(str(file)), err)
+            return
+
+        with self._lock:
+            self.entries[str(info["name_in_db"])] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "checksum": info["checksum"],
+            }
+
+    def save(self):
+        """Write the index to file."""
+        with self._lock:
+            try:
+                with self.index_file.open(mode="w", encoding="utf-8") as index:
+                    json.dump(self.entries, index)
+            except OSError as err:
+                LOG.warning("Could not save sync index '%s': %s", self.index_file, err)
@@ -0,0 +1,137 @@
+"""Tracing module. Saves a timeline of the stages of a delivery, per file and thread."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import collections
+import itertools
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+
+# Own modules
+from dds_cli import constants
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class Tracer:
+    """Records when each stage of each file ran, and in which thread.
+
+    The events are saved in the Chrome trace event format, which can be opened in Perfetto
+    (https://ui.perfetto.dev) or chrome://tracing, with one row per thread. Each stage is one
+    complete event, with its begin time and duration, so that an event can not lose its end.
+
+    Only the latest max_events are kept, in a ring buffer, so that the memory and the time to
+    save the trace are bounded also for deliveries with millions of files. Adding an event is an
+    append to a deque, which takes no lock.
+    """
+
+    def __init__(
+        self,
+        trace_file: pathlib.Path,
+        process_name: str = "dds",
+        max_events: int = constants.TRACE_MAX_EVENTS,
+    ):
+        """Nothing is saved until written."""
+        self.trace_file = pathlib.Path(trace_file)
+        self.process_name = process_name
+        self.max_events = max_events
+        self.started = time.perf_counter()
+
+        self._events = collections.deque(maxlen=max_events)
+        self._nr_events = itertools.count()
+        self._threads = {}
+
+    # Public methods ############ Public methods #
+    def complete(self, name: str, start: float, seconds: float, file=None, failed=False):
+        """Add a stage which began at start, a time.perf_counter(), and ran for seconds."""
+        thread_id = threading.get_native_id()
+        if thread_id not in self._threads:
+            self._threads[thread_id] = threading.current_thread().name
+        self._events.append((next(self._nr_events), name, thread_id, start, seconds, file, failed))
+
+    @property
+    def dropped(self):
+        """The number of events which have been dropped to keep the latest max_events."""
+        try:
+            return self._events[0][0]  # The events are numbered from 0
+        except IndexError:
+            return 0
+
+    def events(self):
+        """The trace events: the names of the process and threads, and the stages."""
+        process_id = os.getpid()
+        trace_events = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": process_id,
+                "tid": 0,
+                "args": {"name": self.process_name},
+            }
+        ]
+        trace_events += [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": process_id,
+                "tid": thread_id,
+                "args": {"name": thread_name},
+            }
+            for thread_id, thread_name in list(self._threads.items())
+        ]
+        for _, name, thread_id, start, seconds, file, failed in list(self._events):
+            args = {"file": str(file)} if file is not None else {}
+            if failed:
+                args["failed"] = True
+            trace_events.append(
+                {
+                    "name": name,
+                    "cat": "stage",
+                    "ph": "X",
+                    "ts": round((start - self.started) * 1e6, 1),
+                    "dur": round(seconds * 1e6, 1),
+                    "pid": process_id,
+                    "tid": thread_id,
+                    "args": args,
+                }
+            )
+        return trace_events
+
+    def write(self):
+        """Save the trace file. Returns False, with a warning, if it could not be saved."""
+        dropped = self.dropped
+        if dropped:
+            LOG.warning(
+                "The trace only has the last %s stages, %s earlier ones were dropped.",
+                self.max_events,
+                dropped,
+            )
+        trace = {
+            "traceEvents": self.events(),
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped_events": dropped},
+        }
+        try:
+            with self.trace_file.open(mode="w", encoding="utf-8") as out_file:
+                json.dump(trace, out_file)
+        except OSError as err:
+            LOG.warning("Failed to save the trace in '%s': %s", self.trace_file, err)
+            return False
+
+        LOG.info("Trace of the delivery saved in '%s'.", self.trace_file)
+        return True
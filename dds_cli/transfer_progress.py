@@ -0,0 +1,258 @@
+"""Transfer progress module. Shows the progress of deliveries with many files."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import collections
+import datetime
+import itertools
+import logging
+import threading
+import time
+
+# Installed
+from rich.live import Live
+from rich.progress_bar import ProgressBar
+from rich.table import Table
+
+# Own modules
+import dds_cli.utils
+from dds_cli import constants
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class ProgressTask:
+    """A task: one file, or a summary of all files, e.g. the files done.
+
+    The count is kept in one cell per thread, which only that thread adds to.
+    """
+
+    __slots__ = ("id", "description", "total", "visible", "fields", "started", "cells")
+
+    def __init__(self, task_id, description, total, completed, visible, fields):
+        """The completed count starts in the cell of the thread adding the task."""
+        self.id = task_id
+        self.description = description
+        self.total = total
+        self.visible = visible
+        self.fields = fields
+        self.started = time.monotonic()
+        self.cells = {threading.get_ident(): [completed]}
+
+    @property
+    def completed(self):
+        """The count of all threads."""
+        return sum(cell[0] for cell in list(self.cells.values()))
+
+
+class TransferProgress:
+    """Stand-in for rich.progress.Progress, for deliveries with many files.
+
+    Advancing a task takes no lock: each thread adds to its own cell of the task, and the cells
+    are only summed when the progress is shown, refresh_per_second times per second. Adding and
+    removing tasks are single dict operations, which are atomic with the GIL.
+
+    The progress shown is the files done, with the transfer rate and the time left, and the
+    longest running of the files in progress. Bytes are counted in the transfer steps, e.g.
+    'put' and 'get'. Tasks which are not visible, e.g. the files with --silent, are not added,
+    and advancing them costs nothing.
+    """
+
+    TRANSFER_STEPS = ("put", "get")
+
+    def __init__(
+        self,
+        console=None,
+        refresh_per_second: float = constants.PROGRESS_REFRESH_PER_SECOND,
+        max_files: int = constants.PROGRESS_MAX_FILES,
+        rate_window: float = constants.PROGRESS_RATE_WINDOW,
+    ):
+        """Nothing is shown until started."""
+        self.max_files = max_files
+        self.rate_window = rate_window
+
+        self._tasks = {}
+        self._task_ids = itertools.count()
+        self._done_bytes = {}  # Bytes of finished transfer steps, one cell per thread
+        self._samples = collections.deque()  # (time, bytes, files done)
+        self._live = Live(
+            get_renderable=self.__render,
+            console=console or dds_cli.utils.stderr_console,
+            refresh_per_second=refresh_per_second,
+        )
+
+    def __enter__(self):
+        """Start showing the progress."""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceb):
+        """Show the final progress and stop."""
+        self.stop()
+        return False
+
+    # Public methods ###################### Public methods #
+    def start(self):
+        """Start showing the progress."""
+        self._live.start(refresh=True)
+
+    def stop(self):
+        """Show the final progress and stop."""
+        self._live.stop()
+
+    @property
+    def tasks(self):
+        """The current tasks."""
+        return list(self._tasks.values())
+
+    def add_task(self, description, total=None, completed=0, visible=True, **fields):
+        """Add a task and return its id, or None if not visible."""
+        if not visible:
+            return None
+        task = ProgressTask(
+            task_id=next(self._task_ids),
+            description=description,
+            total=total,
+            completed=completed,
+            visible=visible,
+            fields=fields,
+        )
+        self._tasks[task.id] = task
+        return task.id
+
+    def advance(self, task, advance=1):
+        """Advance the task by advance steps, e.g. bytes."""
+        info = self._tasks.get(task)
+        if info is None:
+            return
+        self.__cell(cells=info.cells)[0] += advance
+
+    def update(self, task, total=None, completed=None, advance=None, description=None, **fields):
+        """Update the task, with the same arguments as rich."""
+        info = self._tasks.get(task)
+        if info is None:
+            return
+        if total is not None:
+            info.total = total
+        if completed is not None:
+            # Only the cell of this thread is set, so that advances from other threads are kept
+            ident = threading.get_ident()
+            others = sum(cell[0] for x, cell in list(info.cells.items()) if x != ident)
+            self.__cell(cells=info.cells)[0] = completed - others
+        if advance is not None:
+            self.advance(task, advance=advance)
+        if description is not None:
+            info.description = description
+        info.fields.update(fields)
+
+    def reset(self, task, total=None, completed=0, description=None, **fields):
+        """Start the task again, e.g. for the next step of the file, or a retry of the step."""
+        info = self._tasks.get(task)
+        if info is None:
+            return
+        if fields.get("step", info.fields.get("step")) != info.fields.get("step"):
+            self.__count_done(task=info)
+        self.update(task, total=total, completed=completed, description=description, **fields)
+
+    def remove_task(self, task):
+        """Stop tracking the task."""
+        info = self._tasks.pop(task, None)
+        if info is not None:
+            self.__count_done(task=info)
+
+    def stop_task(self, task):
+        """Stop showing the task."""
+        info = self._tasks.get(task)
+        if info is not None:
+            info.visible = False
+
+    def transferred(self):
+        """Total bytes of the transfer steps, finished and in progress."""
+        return sum(cell[0] for cell in list(self._done_bytes.values())) + sum(
+            x.completed
+            for x in list(self._tasks.values())
+            if x.fields.get("step") in self.TRANSFER_STEPS
+        )
+
+    # Private methods ############ Private methods #
+    def __count_done(self, task):
+        """Add the bytes of a finished transfer step to the total."""
+        if task.fields.get("step") not in self.TRANSFER_STEPS:
+            return
+        self.__cell(cells=self._done_bytes)[0] += task.completed
+
+    @staticmethod
+    def __cell(cells):
+        """The cell of the current thread, added if missing."""
+        cell = cells.get(threading.get_ident())
+        if cell is None:
+            cell = cells.setdefault(threading.get_ident(), [0])
+        return cell
+
+    def __rates(self, now, nr_bytes, nr_files):
+        """Bytes and files per second, over the last rate_window seconds."""
+        self._samples.append((now, nr_bytes, nr_files))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.rate_window:
+            self._samples.popleft()
+        then, bytes_then, files_then = self._samples[0]
+        if now - then <= 0:
+            return 0.0, 0.0
+        return (nr_bytes - bytes_then) / (now - then), (nr_files - files_then) / (now - then)
+
+    def __render(self):
+        """The summaries, e.g. files done, and the longest running files."""
+        now = time.monotonic()
+        tasks = list(self._tasks.values())
+        summaries = [x for x in tasks if "file" not in x.fields and x.visible]
+        files = sorted(
+            (x for x in tasks if "file" in x.fields and x.visible), key=lambda x: x.started
+        )
+        nr_done = sum(x.completed for x in summaries)
+        byte_rate, file_rate = self.__rates(now=now, nr_bytes=self.transferred(), nr_files=nr_done)
+
+        grid = Table.grid(padding=(0, 1), expand=True)
+        grid.add_column(no_wrap=True)
+        grid.add_column(ratio=1)
+        grid.add_column(no_wrap=True, justify="right")
+
+        for summary in summaries:
+            done, total = (summary.completed, summary.total)
+            details = [f"{done}/{total} files" if total is not None else f"{done} files"]
+            if files:
+                details.append(f"{dds_cli.utils.HumanBytes.format(byte_rate)}/s")
+            else:
+                details.append(f"{file_rate:.1f} files/s")
+            if total is not None and done < total:
+                details.append(
+                    f"{datetime.timedelta(seconds=round((total - done) / file_rate))} left"
+                    if file_rate > 0
+                    else "-:--:-- left"
+                )
+            grid.add_row(
+                summary.description,
+                ProgressBar(total=total, completed=done, width=None, animation_time=now),
+                " • ".join(details),
+            )
+
+        for file in files[: self.max_files]:
+            completed = file.completed
+            grid.add_row(
+                file.description,
+                ProgressBar(total=file.total, completed=completed, width=None, animation_time=now),
+                f"{100 * completed / file.total:>5.1f}%" if file.total else "",
+            )
+        if len(files) > self.max_files:
+            grid.add_row(f"[dim]+ {len(files) - self.max_files} more files", "", "")
+
+        return grid
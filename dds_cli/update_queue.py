@@ -0,0 +1,149 @@
+"""Update queue module. Reports finished files to the API in the background."""
+
+###############################################################################
+# IMPORTS ########################################################### IMPORTS #
+###############################################################################
+
+# Standard library
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+
+# Installed
+from rich.markup import escape
+
+# Own modules
+from dds_cli import constants
+
+###############################################################################
+# START LOGGING CONFIG ################################# START LOGGING CONFIG #
+###############################################################################
+
+LOG = logging.getLogger(__name__)
+
+###############################################################################
+# CLASSES ########################################################### CLASSES #
+###############################################################################
+
+
+class UpdateQueue:
+    """Collects finished files and flushes their database updates in batches.
+
+    Files are added by the transfer threads, which return immediately. A single background
+    thread flushes the waiting files when there are `batch_size` of them, or when the oldest
+    has waited `flush_interval` seconds. The API updates one file per request, so the updates
+    of a batch are sent by `max_workers` threads. Updates which fail are retried when the queue
+    is closed.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        update_func,
+        batch_size: int = constants.UPDATE_BATCH_SIZE,
+        flush_interval: float = constants.UPDATE_FLUSH_INTERVAL,
+        max_retries: int = constants.UPDATE_MAX_RETRIES,
+        max_workers: int = constants.UPDATE_MAX_WORKERS,
+    ):
+        """Start the background thread.
+
+        update_func is called with file=<file> and should return (ok, message).
+        """
+        self.update_func = update_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self.failed = {}
+        self._queue = queue.Queue()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="dds-update"
+        )
+        self._thread = threading.Thread(target=self.__run, name="dds-update-queue", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        """Return self when using context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceb):
+        """Flush and retry outstanding updates."""
+        self.close()
+        return False
+
+    # Public methods ############ Public methods #
+    def add(self, file):
+        """Schedule the database update for a finished file."""
+        self._queue.put(file)
+
+    def close(self):
+        """Flush all waiting files, retry the failed ones and stop the background thread.
+
+        Returns the files which could not be updated, with the last error message.
+        """
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+        wait = constants.DOWNLOAD_INITIAL_WAIT
+        for attempt in range(1, self.max_retries + 1):
+            if not self.failed:
+                break
+            LOG.debug(
+                "Retrying database update for %s file(s), attempt %s/%s",
+                len(self.failed),
+                attempt,
+                self.max_retries,
+            )
+            time.sleep(wait)
+            wait *= constants.DOWNLOAD_BACKOFF_FACTOR
+            self.__flush(batch=list(self.failed))
+        self._executor.shutdown()
+
+        for file, message in self.failed.items():
+            LOG.warning("Database update failed for file '%s': %s", escape(str(file)), message)
+
+        return self.failed
+
+    # Private methods ############ Private methods #
+    def __run(self):
+        """Collect files from the queue and flush them in batches."""
+        batch = []
+        deadline = None
+        stop = False
+        while not stop:
+            timeout = max(0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                stop = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self.__flush(batch=batch)
+                batch = []
+
+    def __flush(self, batch):
+        """Send the database updates for a batch of files, in parallel."""
+        LOG.debug("Flushing database updates for %s file(s)", len(batch))
+        for file, (updated, message) in zip(batch, self._executor.map(self.__update, batch)):
+            if updated:
+                self.failed.pop(file, None)
+            else:
+                self.failed[file] = message
+
+    def __update(self, file):
+        """Send the database update for one file. Returns (ok, message)."""
+        try:
+            return self.update_func(file=file)
+        except Exception as err:  # Never let the background thread die
+            return False, str(err)
@@ -1,15 +1,21 @@
 """DDS CLI utils module."""
 
+import codecs
+import json
 import numbers
 import pathlib
 import typing
 import http
 from typing import Dict, List, Union
 import logging
+import logging.handlers
+import queue
 from datetime import datetime
 
 import requests
+import requests.adapters
 import rich.console
+import rich.markup
 import simplejson
 from jwcrypto.common import InvalidJWEOperation
 from jwcrypto.jwe import InvalidJWEData
@@ -19,6 +25,7 @@ from rich.table import Table
 
 import dds_cli.exceptions
 from dds_cli import __version__, DDSEndpoint
+from dds_cli import constants
 
 console = rich.console.Console()
 stderr_console = rich.console.Console(stderr=True)
@@ -81,20 +88,121 @@ class HumanBytes:
         return HumanBytes.PRECISION_FORMATS[precision].format("-" if is_negative else "", num, unit)
 
 
+class LazyEscape:
+    """Log argument which escapes rich markup in a file name only if the message is written.
+
+    Use instead of escape(str(...)) in log calls on the transfer path, e.g.
+    LOG.debug("Started '%s'", LazyEscape(file)).
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        """Nothing is done until the message is formatted."""
+        self.value = value
+
+    def __str__(self):
+        """The escaped value."""
+        return rich.markup.escape(str(self.value))
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each log record as a JSON object on one line."""
+
+    def format(self, record):
+        """The record as JSON."""
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """Passes log records to a background thread, which writes them with another handler.
+
+    The logging threads only put the records in a queue. Messages with only immutable
+    arguments, e.g. strings and paths, are also formatted in the background thread; others are
+    formatted right away, since the arguments could change before they are written.
+    """
+
+    IMMUTABLE_ARGS = (str, int, float, bool, type(None), pathlib.PurePath, LazyEscape)
+
+    def __init__(self, handler: logging.Handler):
+        """Start the background thread writing to the handler."""
+        super().__init__(queue.SimpleQueue())
+        self.setLevel(handler.level)
+        self.handler = handler
+        self.listener = logging.handlers.QueueListener(
+            self.queue, handler, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def prepare(self, record):
+        """Format the message now if any argument is mutable, otherwise when written."""
+        if record.args and not (
+            isinstance(record.args, tuple)
+            and all(isinstance(x, self.IMMUTABLE_ARGS) for x in record.args)
+        ):
+            record.msg, record.args = (record.getMessage(), None)
+        return record
+
+    def close(self):
+        """Write the waiting records and stop the background thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.handler.close()
+        super().close()
+
+
 # Functions
 
 
-def setup_logging_to_file(filename: str) -> logging.FileHandler:
-    """Setup logging to specific file."""
+def setup_logging_to_file(filename: str, json_lines: bool = False) -> logging.Handler:
+    """Setup logging to specific file, written in a background thread.
+
+    With json_lines, each record is saved as a JSON object on one line.
+    """
     log_fh = logging.FileHandler(filename=filename, encoding="utf-8")
     log_fh.setLevel(logging.DEBUG)
     log_fh.setFormatter(
-        logging.Formatter(
+        JsonLinesFormatter(datefmt="%Y-%m-%d %H:%M:%S")
+        if json_lines
+        else logging.Formatter(
             fmt="[%(asctime)s] %(name)-15s %(lineno)-5s [%(levelname)-7s]  %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S",
         )
     )
-    return log_fh
+    return QueueLogHandler(handler=log_fh)
+
+
+def create_download_session(
+    pool_size: int = constants.DOWNLOAD_POOL_MAXSIZE,
+) -> requests.Session:
+    """Create a keep-alive session for downloading files via presigned urls.
+
+    The connection pool is sized to the number of parallel downloads so that each
+    thread can reuse an open (and already TLS-negotiated) connection to the S3 endpoint
+    instead of performing a new DNS lookup, TCP- and TLS handshake for every file.
+    The underlying urllib3 pool is thread safe and blocks instead of opening additional
+    throwaway connections if more threads than expected use the session.
+    """
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=constants.DOWNLOAD_POOL_CONNECTIONS,
+        pool_maxsize=pool_size,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 def get_default_log_name(command: list, log_directory: pathlib.Path):
@@ -197,22 +305,27 @@ def perform_request(
     json=None,
     error_message="API Request failed.",
     timeout=DDSEndpoint.TIMEOUT,
+    session: requests.Session = None,
 ):
-    """Execute request to API."""
+    """Execute request to API.
+
+    Pass a session to reuse its open connection(s) for repeated requests.
+    """
     if not headers:
         headers = {}
     version_header_name: str = "X-CLI-Version"
+    requester = session or requests
     request_method = None
     if method == "get":
-        request_method = requests.get
+        request_method = requester.get
     elif method == "put":
-        request_method = requests.put
+        request_method = requester.put
     elif method == "post":
-        request_method = requests.post
+        request_method = requester.post
     elif method == "delete":
-        request_method = requests.delete
+        request_method = requester.delete
     elif method == "patch":
-        request_method = requests.patch
+        request_method = requester.patch
 
     def transform_paths(json_input):
         """Make paths serializable."""
@@ -260,40 +373,69 @@ def perform_request(
 
     # Check if response is ok.
     if not response.ok:
-        message = error_message
-        show_warning = True  # Show emojis or not - may look weird in some cases
-
-        # Handle 400 Bad Request
-        if response.status_code == http.HTTPStatus.BAD_REQUEST:
-            # Parse messages and additional errors returned from the API
-            if (
-                any(ep in endpoint for ep in [DDSEndpoint.USER_ADD, DDSEndpoint.PROJ_ACCESS])
-                and additional_errors
-            ):
-                message += f"\n{additional_errors}"
-                show_warning = False
-            elif DDSEndpoint.CREATE_PROJ in endpoint:
-                message += f": {__project_creation_error(response_json)}"
-            else:
-                message += f": {response_json.get('message')}"
+        __raise_for_response(
+            response=response,
+            response_json=response_json,
+            endpoint=endpoint,
+            error_message=error_message,
+            additional_errors=additional_errors,
+        )
+
+    return response_json, additional_errors
 
-            raise dds_cli.exceptions.DDSCLIException(message=message, show_emojis=show_warning)
 
-        # Handle 403
-        if response.status_code == http.HTTPStatus.FORBIDDEN:
-            message += f": {response_json.get('message')}"
-            raise dds_cli.exceptions.DDSCLIException(message=message)
+def stream_json_items(
+    endpoint,
+    key,
+    headers: typing.Dict = None,
+    params=None,
+    error_message="API Request failed.",
+    timeout=DDSEndpoint.TIMEOUT,
+    session: requests.Session = None,
+    chunk_size: int = constants.STREAM_CHUNK_SIZE,
+):
+    """Execute GET request to API and yield the items of an object in the JSON response.
 
-        # Handle 500
-        if response.status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR:
-            message += f": {response_json.get('message', response.reason)}"
-            raise dds_cli.exceptions.ApiResponseError(message=message)
+    Yields (name, value) for each item in response_json[key]. The response is parsed while
+    it is being downloaded, so the memory use is bounded by the chunk size and the largest
+    single item, not by the size of the response.
+    """
+    headers = {**(headers or {}), "X-CLI-Version": __version__}
+    requester = session or requests
+    try:
+        with requester.get(
+            url=endpoint, headers=headers, params=params, timeout=timeout, stream=True
+        ) as response:
+            if not response.ok:
+                try:
+                    response_json = response.json()
+                except (simplejson.JSONDecodeError, ValueError):
+                    response_json = {}
+                __raise_for_response(
+                    response=response,
+                    response_json=response_json,
+                    endpoint=endpoint,
+                    error_message=error_message,
+                    additional_errors=parse_project_errors(errors=response_json.get("errors")),
+                )
 
-        raise dds_cli.exceptions.DDSCLIException(
-            message=f"{message}: {response_json.get('message', 'Unexpected error!')}"
+            yield from __iter_json_object_items(
+                chunks=response.iter_content(chunk_size=chunk_size), key=key
+            )
+    except ValueError as err:
+        raise dds_cli.exceptions.ApiResponseError(
+            message=(
+                f"{error_message}: The request did not return a valid JSON response. Details: {err}"
+            )
         )
-
-    return response_json, additional_errors
+    except requests.exceptions.RequestException as err:
+        if isinstance(err, requests.exceptions.ConnectionError):
+            error_message += f": The database seems to be down -- \n{err}"
+        elif isinstance(err, requests.exceptions.Timeout):
+            error_message += ": The request timed out."
+        else:
+            error_message += f": Unknown request error -- \n{err}"
+        raise dds_cli.exceptions.ApiRequestError(message=error_message)
 
 
 def parse_project_errors(errors):
@@ -429,6 +571,130 @@ def delete_folder(folder):
     folder.rmdir()
 
 
+def __raise_for_response(response, response_json, endpoint, error_message, additional_errors):
+    """Raise the exception matching a failed API response."""
+    message = error_message
+    show_warning = True  # Show emojis or not - may look weird in some cases
+
+    # Handle 400 Bad Request
+    if response.status_code == http.HTTPStatus.BAD_REQUEST:
+        # Parse messages and additional errors returned from the API
+        if (
+            any(ep in endpoint for ep in [DDSEndpoint.USER_ADD, DDSEndpoint.PROJ_ACCESS])
+            and additional_errors
+        ):
+            message += f"\n{additional_errors}"
+            show_warning = False
+        elif DDSEndpoint.CREATE_PROJ in endpoint:
+            message += f": {__project_creation_error(response_json)}"
+        else:
+            message += f": {response_json.get('message')}"
+
+        raise dds_cli.exceptions.DDSCLIException(message=message, show_emojis=show_warning)
+
+    # Handle 403
+    if response.status_code == http.HTTPStatus.FORBIDDEN:
+        message += f": {response_json.get('message')}"
+        raise dds_cli.exceptions.DDSCLIException(message=message)
+
+    # Handle 500
+    if response.status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR:
+        message += f": {response_json.get('message', response.reason)}"
+        raise dds_cli.exceptions.ApiResponseError(message=message)
+
+    raise dds_cli.exceptions.DDSCLIException(
+        message=f"{message}: {response_json.get('message', 'Unexpected error!')}"
+    )
+
+
+def __iter_json_object_items(chunks, key):
+    """Incrementally parse a JSON object and yield the items of the object at 'key'.
+
+    Only the top level of the document is walked. Other top level values are parsed and
+    discarded, and each item of the requested object is decoded on its own as soon as all of
+    its bytes have arrived.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer, pos, exhausted = ("", 0, False)
+
+    def more():
+        """Read the next chunk into the buffer, dropping what has already been parsed."""
+        nonlocal buffer, pos, exhausted
+        if exhausted:
+            raise ValueError("Unexpected end of JSON response")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[pos:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
+
+    def next_token():
+        """Skip whitespace and return the next character, without consuming it."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            more()
+
+    def expect(char):
+        """Consume the expected character."""
+        nonlocal pos
+        if next_token() != char:
+            raise ValueError(f"Expected '{char}' at position {pos} of JSON response chunk")
+        pos += 1
+
+    def value():
+        """Decode the next complete JSON value."""
+        nonlocal pos
+        next_token()
+        while True:
+            try:
+                decoded, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The value may be split between chunks - numbers also need a delimiter
+                more()
+                continue
+            if end == len(buffer) and not exhausted and not isinstance(decoded, (dict, list, str)):
+                more()
+                continue
+            pos = end
+            return decoded
+
+    def members(descend_into=None):
+        """Yield the (name, value) pairs of the object starting at the current position.
+
+        The value of the member named 'descend_into' is not decoded, instead its own
+        members are yielded.
+        """
+        nonlocal pos
+        expect("{")
+        if next_token() == "}":
+            pos += 1
+            return
+        while True:
+            name = value()
+            expect(":")
+            if descend_into is not None and name == descend_into and next_token() == "{":
+                yield from members()
+            else:
+                item = value()
+                if descend_into is None:
+                    yield name, item
+            if next_token() == ",":
+                pos += 1
+                continue
+            expect("}")
+            return
+
+    yield from members(descend_into=key)
+
+
 def __project_creation_error(response_json: Dict) -> str:
     """Parse response from project creation endpoint."""
     message, title, description, principal_investigator, email = (
@@ -0,0 +1,139 @@
+"""Tests for the client module."""
+
+# IMPORTS ######################################################################
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dds_cli.client import CallbackProgress, DDSClient, FileResult, ProgressEvent
+from dds_cli.exceptions import DDSCLIException
+
+# HELPERS ######################################################################
+
+
+def _fake_putter(files, failed_files=()):
+    """A DataPutter which uploads files, except failed_files, without any API calls."""
+
+    def create(**kwargs):
+        putter = MagicMock()
+        putter.method = "put"
+        putter.keys = ("private", "public")
+        putter.s3connector = "s3"
+        putter.filehandler.data = {x: {} for x in files}
+        putter.filehandler.failed = {"old.txt": {"message": "File already uploaded"}}
+        putter.status = {x: {"message": "", "failed_op": None, "cancel": False} for x in files}
+        putter.failure_journal.nr_entries = 0
+        putter.__enter__.return_value = putter
+
+        def protect_and_upload(file, progress):
+            task = progress.add_task("", total=10, file=file, step="encrypt")
+            progress.advance(task, 10)
+            progress.reset(task, total=20, step="put")
+            progress.remove_task(task)
+            if file in failed_files:
+                putter.status[file].update({"message": "failed", "failed_op": "put"})
+                return False
+            return True
+
+        putter.protect_and_upload.side_effect = protect_and_upload
+        return putter
+
+    return MagicMock(side_effect=create)
+
+
+# TESTS ########################################################################
+
+
+def test_callback_progress():
+    """Updates of file tasks should be passed to the callback."""
+    events = []
+    progress = CallbackProgress(callback=events.append)
+
+    summary = progress.add_task("Upload", total=2)
+    progress.advance(summary)
+    task = progress.add_task("file", total=100, file="a.txt", step="get")
+    progress.update(task, advance=60)
+    progress.reset(task, total=50, step="decrypt")
+    progress.remove_task(task)
+    progress.advance(task, 10)
+
+    assert events == [
+        ProgressEvent(file="a.txt", step="get", completed=60, total=100),
+        ProgressEvent(file="a.txt", step="decrypt", completed=0, total=50),
+    ]
+
+
+@patch("dds_cli.client.user.User")
+def test_put_results_and_reused_access(_, tmp_path):
+    """Each file should get a result, and the keys should be fetched only once per project."""
+    failed_files = ["b.txt"]
+    fake_putter = _fake_putter(files=["a.txt", "b.txt", "c.txt"], failed_files=failed_files)
+    events, finished = ([], [])
+    with patch("dds_cli.client.dp.DataPutter", fake_putter):
+        with DDSClient(num_threads=2) as client:
+            results = client.put(
+                project="proj",
+                source=["a.txt"],
+                staging_dir=tmp_path,
+                on_progress=events.append,
+                on_file=finished.append,
+            )
+            failed_files.clear()
+            client.put(project="proj", source=["a.txt"], staging_dir=tmp_path)
+
+    assert sorted(results, key=lambda x: x.file) == [
+        FileResult(file="a.txt", ok=True),
+        FileResult(file="b.txt", ok=False, message="failed", failed_op="put"),
+        FileResult(file="c.txt", ok=True),
+        FileResult(file="old.txt", ok=False, message="File already uploaded"),
+    ]
+    assert len(finished) == 3
+    assert ProgressEvent(file="c.txt", step="put", completed=0, total=20) in events
+
+    first, second = (x.kwargs for x in fake_putter.call_args_list)
+    assert "keys" not in first and first["headless"]
+    assert second["keys"] == ("private", "public") and second["s3connector"] == "s3"
+
+    # Only the staging directory with a failed file is kept
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@patch("dds_cli.client.user.User")
+def test_get_existing_destination_raises(_, tmp_path):
+    """An existing destination should raise an exception and not exit the process."""
+    with patch("dds_cli.client.dg.DataGetter") as fake_getter:
+        with DDSClient() as client:
+            with pytest.raises(DDSCLIException, match="already exists"):
+                client.get(project="proj", get_all=True, destination=tmp_path)
+
+    fake_getter.assert_not_called()
+
+
+@patch("dds_cli.client.user.User")
+def test_get_reports_failed_database_updates(_, tmp_path):
+    """Files whose database update fails when the download finishes should not be ok."""
+    getter = MagicMock()
+    getter.method = "get"
+    files = ["a.txt", "b.txt"]
+    getter.files_to_download = iter(files)
+    getter.filehandler.failed = {}
+    getter.status = {x: {"message": "", "failed_op": None, "cancel": False} for x in files}
+    getter.download_and_verify.return_value = True
+    # Only a.txt is still waiting for its database update when released
+    getter.release.side_effect = lambda file: file != "a.txt" and getter.status.pop(file)
+    getter.__enter__.return_value = getter
+
+    def close(*_):
+        getter.status["a.txt"].update({"message": "API down", "failed_op": "update_db"})
+        getter.status["a.txt"]["cancel"] = True
+
+    getter.__exit__.side_effect = close
+    with patch("dds_cli.client.dg.DataGetter", return_value=getter):
+        with DDSClient() as client:
+            results = client.get(project="proj", get_all=True, destination=tmp_path / "new")
+
+    assert sorted(results, key=lambda x: x.file) == [
+        FileResult(file="a.txt", ok=False, message="API down", failed_op="update_db"),
+        FileResult(file="b.txt", ok=True),
+    ]
@@ -9,6 +9,43 @@ import dds_cli.exceptions
 from dds_cli.__main__ import dds_main
 
 
+#### MAIN OPTIONS #####
+
+
+@pytest.mark.parametrize(
+    "profile_args, expected_mode",
+    [
+        ([], None),
+        (["--profile"], "cpu"),
+        (["--profile=mem"], "mem"),
+        (["--profile", "cpu"], "cpu"),
+        (["--profile", "--no-prompt"], "cpu"),
+    ],
+)
+def test_profile_option(profile_args, expected_mode):
+    """--profile should profile the command, also when its value is left out before it."""
+
+    runner = CliRunner()
+    with (
+        patch("dds_cli.__main__.questionary.select") as mock_select,
+        patch("dds_cli.auth.Auth") as mock_auth,
+        patch("dds_cli.profiling.start") as mock_start,
+        patch("dds_cli.profiling.stop") as mock_stop,
+    ):
+        mock_select.return_value.ask.return_value = "Cancel"
+
+        result = runner.invoke(dds_main, [*profile_args, "auth", "twofactor", "configure"])
+
+        assert result.exit_code == 0
+        mock_auth.return_value.__enter__.return_value.twofactor.assert_not_called()
+        if expected_mode is None:
+            mock_start.assert_not_called()
+            mock_stop.assert_not_called()
+        else:
+            mock_start.assert_called_once_with(mode=expected_mode)
+            mock_stop.assert_called_once()
+
+
 #### AUTH COMMANDS #####
 
 ## TWOFACTOR subcommands ##
@@ -0,0 +1,129 @@
+"""Tests for the data_decryptor module."""
+
+# IMPORTS ######################################################################
+
+import hashlib
+import os
+import pathlib
+from unittest.mock import MagicMock
+
+import pytest
+
+from dds_cli import FileSegment
+from dds_cli import exceptions
+from dds_cli import file_encryptor
+from dds_cli.data_decryptor import FETCH_MANIFEST_NAME, DataDecryptor, FetchManifest
+from dds_cli.metrics import DeliveryMetrics
+from dds_cli.directory import DDSDirectory
+from tests.test_file_encryptor import key_pair
+
+# HELPERS ######################################################################
+
+
+def _fetched_file(tmp_path, content, name="folder/file.txt"):
+    """Encrypt content as a downloaded file in a staging directory, with its file info."""
+    staging_dir = DDSDirectory(path=tmp_path / "staging", allow_existing=True)
+    files_directory = staging_dir.directories["FILES"]
+    project_keys = key_pair()
+
+    path_downloaded = files_directory / pathlib.Path(name).parent / "bucket_name.ccp"
+    path_downloaded.parent.mkdir(parents=True, exist_ok=True)
+    with file_encryptor.Encryptor(project_keys=project_keys) as encryptor:
+        chunks = [
+            content[i : i + FileSegment.SEGMENT_SIZE_RAW]
+            for i in range(0, len(content), FileSegment.SEGMENT_SIZE_RAW)
+        ]
+        saved, _ = encryptor.encrypt_filechunks(
+            chunks=chunks, outfile=path_downloaded, progress=(MagicMock(), 1)
+        )
+        assert saved
+        info = {
+            "name_in_db": name,
+            "public_key": encryptor.get_public_component_hex(private_key=encryptor.my_private),
+            "salt": encryptor.salt,
+            "checksum": hashlib.sha256(content).hexdigest(),
+            "compressed": False,
+            "size_original": len(content),
+            "path_downloaded": path_downloaded,
+        }
+
+    return staging_dir, project_keys, files_directory / name, info
+
+
+def _prepare_decryptor(staging_dir, project_keys):
+    """Mock a DataDecryptor without authenticating."""
+    decryptor = DataDecryptor.__new__(DataDecryptor)
+    decryptor.metrics = DeliveryMetrics()
+    decryptor.verify_checksum = True
+    decryptor.failed = {}
+    decryptor.keys = project_keys
+    decryptor.dds_directory = staging_dir
+    decryptor.manifest = FetchManifest(
+        manifest_file=staging_dir.directories["META"] / FETCH_MANIFEST_NAME,
+        files_directory=staging_dir.directories["FILES"],
+    )
+    decryptor.pending = decryptor.manifest.pending()
+    return decryptor
+
+
+# TESTS ########################################################################
+
+
+def test_manifest_pending(tmp_path):
+    """Files should be pending until marked as decrypted, with absolute paths."""
+    staging_dir, _, file, info = _fetched_file(tmp_path=tmp_path, content=b"data")
+    manifest = FetchManifest(
+        manifest_file=staging_dir.directories["META"] / FETCH_MANIFEST_NAME,
+        files_directory=staging_dir.directories["FILES"],
+    )
+    assert manifest.pending() == {}
+
+    manifest.add(file=file, info=info, project="proj")
+    pending = manifest.pending()
+    assert pending[info["name_in_db"]]["file"] == file
+    assert pending[info["name_in_db"]]["path_downloaded"] == info["path_downloaded"]
+    assert pending[info["name_in_db"]]["project"] == "proj"
+    assert manifest.nr_added == 1
+
+    manifest.mark_decrypted(name_in_db=info["name_in_db"])
+    assert manifest.pending() == {}
+
+
+def test_decrypt_all(tmp_path):
+    """All pending files should be decrypted and the encrypted files deleted."""
+    content = os.urandom(3 * FileSegment.SEGMENT_SIZE_RAW + 10)
+    staging_dir, project_keys, file, info = _fetched_file(tmp_path=tmp_path, content=content)
+    FetchManifest(
+        manifest_file=staging_dir.directories["META"] / FETCH_MANIFEST_NAME,
+        files_directory=staging_dir.directories["FILES"],
+    ).add(file=file, info=info, project="proj")
+
+    decryptor = _prepare_decryptor(staging_dir=staging_dir, project_keys=project_keys)
+    decryptor.decrypt_all(num_threads=2)
+
+    assert file.read_bytes() == content
+    assert not info["path_downloaded"].exists()
+    assert decryptor.manifest.pending() == {}
+
+
+def test_decrypt_failure_keeps_encrypted_file(tmp_path):
+    """A file which cannot be decrypted should be kept, unchanged, and stay pending."""
+    staging_dir, project_keys, file, info = _fetched_file(tmp_path=tmp_path, content=b"data" * 10)
+    encrypted = info["path_downloaded"].read_bytes()
+    FetchManifest(
+        manifest_file=staging_dir.directories["META"] / FETCH_MANIFEST_NAME,
+        files_directory=staging_dir.directories["FILES"],
+    ).add(file=file, info=info, project="proj")
+
+    # Wrong project keys
+    decryptor = _prepare_decryptor(staging_dir=staging_dir, project_keys=key_pair())
+    with pytest.raises(exceptions.DownloadError):
+        decryptor.decrypt_all(num_threads=1)
+
+    assert info["path_downloaded"].read_bytes() == encrypted
+    assert list(decryptor.manifest.pending()) == [info["name_in_db"]]
+
+    # Can be decrypted later with the right keys
+    decryptor = _prepare_decryptor(staging_dir=staging_dir, project_keys=project_keys)
+    decryptor.decrypt_all(num_threads=1)
+    assert file.read_bytes() == b"data" * 10
@@ -3,12 +3,22 @@
 # IMPORTS ######################################################################
 
 import pathlib
+import threading
+import time
 import requests
 from types import SimpleNamespace
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
+import pytest
+
+from dds_cli import base
 from dds_cli.data_getter import DataGetter
+from dds_cli.dedup import DownloadDeduplicator
+from dds_cli.file_handler_remote import RemoteFileHandler
+from dds_cli.metrics import DeliveryMetrics
+from dds_cli.status import DeliveryStatus
 from dds_cli import constants
+from dds_cli.exceptions import DownloadError, InvalidMethodError
 
 
 # HELPERS ######################################################################
@@ -18,6 +28,7 @@ def _prepare_data_getter(file_name, download_path=None):
     """Mock a DataGetter instance with a filehandler containing a single file entry."""
     # Create DataGetter instance without running __init__
     dg = DataGetter.__new__(DataGetter)
+    dg.metrics = DeliveryMetrics()
 
     # Mock filehandler with necessary data
     # Using SimpleNamespace because it allows you to create simple objects
@@ -25,12 +36,14 @@ def _prepare_data_getter(file_name, download_path=None):
     # Here we use it to mock the filehandler instead of initializing
     # the full FileHandler class which requires more inputs etc
     # Could technically also use Filehandler.__new__(FileHandler) but this is cleaner
+    dg.session = requests.Session()
     dg.filehandler = SimpleNamespace(
         data={
             file_name: {
                 "path_downloaded": pathlib.Path(download_path or file_name),
                 "url": "https://example.com/file",
                 "name_in_db": file_name,
+                "size_stored": 4,
             }
         }
     )
@@ -62,15 +75,15 @@ def test_get_uses_timeout(monkeypatch, tmp_path):
     mock_response.iter_content.return_value = [b"data"]  # Simulate content chunks
     mock_response.raise_for_status.return_value = None  # Used in download to check for HTTP errors
 
-    # Mock the requests.get method to return the mock_response
+    # Mock the session get method to return the mock_response
     mock_get = MagicMock(return_value=mock_response)
-    monkeypatch.setattr("dds_cli.data_getter.requests.get", mock_get)
+    monkeypatch.setattr(getter.session, "get", mock_get)
 
     # Call the DataGetter.get method
     # __wrapped__ is used to call the original method without any decorators
     DataGetter.get.__wrapped__(getter, file="file.bin", progress=progress, task=1)
 
-    # Verify that requests.get was called with the correct timeout values
+    # Verify that the session was called with the correct timeout values
     mock_get.assert_called_once_with(
         "https://example.com/file",
         stream=True,
@@ -90,12 +103,12 @@ def test_get_connect_timeout(monkeypatch):
 
     err = requests.exceptions.ConnectTimeout("connect timeout")
 
-    # Helper function to replace requests.get and raise a timeout error
+    # Helper function to replace session.get and raise a timeout error
     def fake_get(*_, **__):
         raise err
 
-    # Use monkeypatch to replace requests.get with our fake_get function
-    monkeypatch.setattr(requests, "get", fake_get)
+    # Use monkeypatch to replace session.get with our fake_get function
+    monkeypatch.setattr(getter.session, "get", fake_get)
 
     # Call the DataGetter.get method
     # __wrapped__ is used to call the original method without any decorators
@@ -120,12 +133,12 @@ def test_get_read_timeout(monkeypatch):
 
     err = requests.exceptions.ReadTimeout("read timeout")
 
-    # Helper function to replace requests.get and raise a timeout error
+    # Helper function to replace session.get and raise a timeout error
     def fake_get(*_, **__):
         raise err
 
-    # Use monkeypatch to replace requests.get with our fake_get function
-    monkeypatch.setattr(requests, "get", fake_get)
+    # Use monkeypatch to replace session.get with our fake_get function
+    monkeypatch.setattr(getter.session, "get", fake_get)
 
     # Call the DataGetter.get method
     # __wrapped__ is used to call the original method without any decorators
@@ -162,7 +175,7 @@ def test_get_retries_on_connection_error(monkeypatch, tmp_path):
             raise requests.exceptions.ConnectionError("connection reset")
         return mock_response
 
-    monkeypatch.setattr("dds_cli.data_getter.requests.get", fake_get)
+    monkeypatch.setattr(getter.session, "get", fake_get)
 
     downloaded, message = DataGetter.get.__wrapped__(
         getter, file=file_name, progress=MagicMock(), task=1
@@ -182,7 +195,7 @@ def test_get_fails_after_max_retries(monkeypatch):
     monkeypatch.setattr(constants, "DOWNLOAD_INITIAL_WAIT", 0)
 
     err = requests.exceptions.ConnectionError("connection reset")
-    monkeypatch.setattr(requests, "get", lambda *_, **__: (_ for _ in ()).throw(err))
+    monkeypatch.setattr(getter.session, "get", lambda *_, **__: (_ for _ in ()).throw(err))
 
     downloaded, message = DataGetter.get.__wrapped__(
         getter, file=file_name, progress=MagicMock(), task=None
@@ -212,7 +225,7 @@ def test_get_no_retry_on_404(monkeypatch):
         call_count += 1
         raise err
 
-    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(getter.session, "get", fake_get)
 
     downloaded, message = DataGetter.get.__wrapped__(
         getter, file=file_name, progress=MagicMock(), task=None
@@ -250,7 +263,7 @@ def test_get_retries_on_http_500(monkeypatch, tmp_path):
             raise requests.exceptions.HTTPError(response=mock_500_response)
         return mock_ok_response
 
-    monkeypatch.setattr("dds_cli.data_getter.requests.get", fake_get)
+    monkeypatch.setattr(getter.session, "get", fake_get)
 
     downloaded, message = DataGetter.get.__wrapped__(
         getter, file=file_name, progress=MagicMock(), task=1
@@ -270,7 +283,7 @@ def test_get_retry_uses_exponential_backoff(monkeypatch):
     monkeypatch.setattr(constants, "DOWNLOAD_BACKOFF_FACTOR", 2)
 
     err = requests.exceptions.ConnectionError("reset")
-    monkeypatch.setattr(requests, "get", lambda *_, **__: (_ for _ in ()).throw(err))
+    monkeypatch.setattr(getter.session, "get", lambda *_, **__: (_ for _ in ()).throw(err))
 
     sleep_calls = []
     monkeypatch.setattr("dds_cli.data_getter.time.sleep", lambda s: sleep_calls.append(s))
@@ -304,7 +317,7 @@ def test_get_progress_reset_only_on_retry(monkeypatch, tmp_path):
             raise requests.exceptions.ConnectionError("reset")
         return mock_response
 
-    monkeypatch.setattr("dds_cli.data_getter.requests.get", fake_get)
+    monkeypatch.setattr(getter.session, "get", fake_get)
 
     progress = MagicMock()
     task = 1
@@ -312,3 +325,324 @@ def test_get_progress_reset_only_on_retry(monkeypatch, tmp_path):
     DataGetter.get.__wrapped__(getter, file=file_name, progress=progress, task=task)
 
     assert progress.reset.call_count == 2
+
+
+def _prepare_iterating_data_getter(break_on_fail=False):
+    """Mock a DataGetter instance with empty file and status info, ready to iterate files."""
+    dg = DataGetter.__new__(DataGetter)
+    dg.metrics = DeliveryMetrics()
+    dg.break_on_fail = break_on_fail
+    dg.sync = False
+    dg.sync_index = None
+    dg.status = DeliveryStatus()
+    dg.nr_up_to_date = 0
+    dg.nr_released = 0
+    dg.awaiting_update = set()
+    dg.release_lock = threading.Condition()
+    dg.deduplicator = None
+    dg.filehandler = SimpleNamespace(
+        data={},
+        local_destination=pathlib.Path("files"),
+        create_download_status=RemoteFileHandler.create_download_status,
+        streamed=False,
+    )
+    return dg
+
+
+def test_iter_files_adds_and_releases_file_info():
+    """Test that file info is only kept from scheduling until the file is finished."""
+    getter = _prepare_iterating_data_getter()
+    remote_files = [
+        (pathlib.Path(f"files/file_{i}"), {"name_in_db": f"file_{i}", "url_fetched": time.time()})
+        for i in range(3)
+    ]
+
+    files = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+
+    first = next(files)
+    assert list(getter.filehandler.data) == [first]
+    assert getter.status[first]["cancel"] is False
+
+    getter.status[first].finish("update_db")
+    getter.release(file=first)
+    assert getter.filehandler.data == {} and getter.status == {}
+
+    assert list(files) == [pathlib.Path("files/file_1"), pathlib.Path("files/file_2")]
+    assert getter.nr_files == 3
+
+
+def test_release_waits_for_database_update():
+    """Test that a released file's info is kept until its database update is done."""
+    getter = _prepare_iterating_data_getter()
+    getter.project = "project"
+    getter.token = {}
+    getter.api_session = None
+    remote_files = [
+        (pathlib.Path("files/file_0"), {"name_in_db": "file_0", "url_fetched": time.time()})
+    ]
+    file = next(getter._DataGetter__iter_files(remote_files=iter(remote_files)))
+
+    getter.release(file=file)
+    assert file in getter.filehandler.data and getter.nr_released == 0
+
+    with patch(
+        "dds_cli.data_getter.dds_cli.utils.perform_request", return_value=({"message": ""}, None)
+    ):
+        assert getter._DataGetter__update_and_release(file=file) == (True, "")
+    assert getter.filehandler.data == {} and getter.status == {}
+    assert getter.nr_released == 1
+
+
+def test_iter_files_waits_for_database_updates(monkeypatch):
+    """Test that no more files are scheduled while too many await their database update."""
+    monkeypatch.setattr(constants, "UPDATE_MAX_PENDING", 1)
+    getter = _prepare_iterating_data_getter()
+    remote_files = [
+        (pathlib.Path(f"files/file_{i}"), {"name_in_db": f"file_{i}", "url_fetched": time.time()})
+        for i in range(2)
+    ]
+    files = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+    first = next(files)
+    getter.release(file=first)
+    assert getter.awaiting_update == {first}
+
+    scheduled = []
+    scheduler = threading.Thread(target=lambda: scheduled.append(next(files)))
+    scheduler.start()
+    scheduler.join(timeout=0.2)
+    assert scheduler.is_alive() and not scheduled
+
+    # A failed update no longer awaits, but the file info is kept to retry it
+    getter.update_db = MagicMock(return_value=(False, "API down"))
+    getter._DataGetter__update_and_release(file=first)
+    scheduler.join(timeout=5)
+    assert scheduled == [pathlib.Path("files/file_1")]
+    assert getter.awaiting_update == set() and first in getter.filehandler.data
+
+
+def test_close_cancels_files_whose_database_update_failed():
+    """Test that files whose database update failed after all retries are saved as failed."""
+    getter = _prepare_iterating_data_getter()
+    getter.api_session = MagicMock()
+    getter.own_session = False
+    getter.failure_journal = MagicMock()
+    remote_files = [
+        (pathlib.Path(f"files/file_{i}"), {"name_in_db": f"file_{i}", "url_fetched": time.time()})
+        for i in range(2)
+    ]
+    update_failed, crypto_failed = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+    getter.status.cancel_one(file=crypto_failed, message="bad key", failed_op="crypto")
+    getter.update_queue = MagicMock()
+    getter.update_queue.close.return_value = {update_failed: "API down", crypto_failed: "API down"}
+
+    getter._DataGetter__close()
+
+    assert getter.status[update_failed]["cancel"] is True
+    assert getter.status[update_failed]["failed_op"] == "update_db"
+    assert getter.status[update_failed]["message"] == "API down"
+    assert getter.status[crypto_failed]["message"] == "bad key"
+    getter.failure_journal.add.assert_called_once()
+    assert getter.failure_journal.add.call_args.kwargs["file"] == update_failed
+
+
+def test_iter_files_checks_disk_space_when_all_streamed_info_is_received():
+    """Test that streamed files are checked against the disk once their sizes are all known."""
+    getter = _prepare_iterating_data_getter()
+    getter.fetch_only = False
+    getter.disk_budget = MagicMock()
+    getter.disk_budget.preflight.return_value = (False, "Too large")
+    getter.filehandler.streamed = True
+    getter.filehandler.collected = None
+    remote_files = [
+        (
+            pathlib.Path(f"files/file_{i}"),
+            {
+                "name_in_db": f"file_{i}",
+                "url_fetched": time.time(),
+                "size_stored": 10,
+                "size_original": 20,
+                "path_downloaded": pathlib.Path(f"files/file_{i}.ccp"),
+            },
+        )
+        for i in range(3)
+    ]
+    files = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+
+    next(files)
+    getter.disk_budget.preflight.assert_not_called()
+
+    getter.filehandler.collected = {
+        "size_stored": 30,
+        "size_original": 60,
+        "largest": remote_files[0][1],
+    }
+    assert len(list(files)) == 2
+
+    # Only the files which have not been scheduled yet need space
+    getter.disk_budget.preflight.assert_called_once_with(
+        needs={pathlib.Path("files"): 40, pathlib.Path("files/file_0.ccp"): 10},
+        description="The download",
+    )
+
+
+def test_iter_files_stops_on_break_on_fail():
+    """Test that no more files are scheduled after a failure with '--break-on-fail'."""
+    getter = _prepare_iterating_data_getter(break_on_fail=True)
+    remote_files = [
+        (pathlib.Path(f"files/file_{i}"), {"name_in_db": f"file_{i}", "url_fetched": time.time()})
+        for i in range(3)
+    ]
+
+    files = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+
+    first = next(files)
+    getter.status.cancel_one(file=first, message="failed")
+    getter.release(file=first)
+
+    assert list(files) == []
+    assert first in getter.filehandler.data
+
+
+def test_get_refreshes_url_on_403(monkeypatch, tmp_path):
+    """Test that a denied (expired) presigned url is refreshed and retried without waiting."""
+    file_name = "file.bin"
+    getter = _prepare_data_getter(file_name=file_name, download_path=tmp_path / file_name)
+
+    def refresh_urls(files):
+        for info in files:
+            info["url"] = "https://example.com/file?new"
+
+    getter.filehandler.refresh_urls = refresh_urls
+
+    mock_403_response = MagicMock()
+    mock_403_response.status_code = 403
+
+    mock_ok_response = MagicMock()
+    mock_ok_response.__enter__.return_value = mock_ok_response
+    mock_ok_response.__exit__.return_value = False
+    mock_ok_response.iter_content.return_value = [b"data"]
+    mock_ok_response.raise_for_status.return_value = None
+
+    urls = []
+
+    def fake_get(url, *_, **__):
+        urls.append(url)
+        if len(urls) == 1:
+            raise requests.exceptions.HTTPError(response=mock_403_response)
+        return mock_ok_response
+
+    monkeypatch.setattr(getter.session, "get", fake_get)
+    sleep_calls = []
+    monkeypatch.setattr("dds_cli.data_getter.time.sleep", lambda s: sleep_calls.append(s))
+
+    downloaded, message = DataGetter.get.__wrapped__(
+        getter, file=file_name, progress=MagicMock(), task=1
+    )
+
+    assert (downloaded, message) == (True, "")
+    assert urls == ["https://example.com/file", "https://example.com/file?new"]
+    assert sleep_calls == []
+
+
+def test_iter_files_refreshes_old_urls_in_batches(monkeypatch):
+    """Test that old urls of upcoming files are refreshed in one request before scheduling."""
+    monkeypatch.setattr(constants, "URL_REFRESH_BATCH_SIZE", 3)
+    getter = _prepare_iterating_data_getter()
+    refreshed = []
+
+    def refresh_urls(files):
+        refreshed.append([x["name_in_db"] for x in files])
+        for info in files:
+            info["url_fetched"] = time.time()
+
+    getter.filehandler.refresh_urls = refresh_urls
+
+    old = time.time() - constants.URL_REFRESH_AGE - 1
+    remote_files = [
+        (pathlib.Path(f"files/file_{i}"), {"name_in_db": f"file_{i}", "url_fetched": old})
+        for i in range(4)
+    ]
+
+    files = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+
+    assert next(files) == pathlib.Path("files/file_0")
+    assert refreshed == [["file_0", "file_1", "file_2"]]
+    assert list(files) == [pathlib.Path(f"files/file_{i}") for i in range(1, 4)]
+    assert refreshed == [["file_0", "file_1", "file_2"], ["file_3"]]
+
+
+def test_iter_files_holds_duplicates_until_source_is_done(tmp_path):
+    """Test that files with the same contents are scheduled after their source and linked."""
+    getter = _prepare_iterating_data_getter()
+    getter.deduplicator = DownloadDeduplicator()
+    getter.update_queue = MagicMock()
+    getter.filehandler.local_destination = tmp_path
+    remote_files = [
+        (
+            tmp_path / name,
+            {
+                "name_in_db": name,
+                "url_fetched": time.time(),
+                "checksum": checksum,
+                "size_original": 4,
+            },
+        )
+        for name, checksum in [("ref_a", "x"), ("ref_b", "x"), ("other", "y"), ("sub/ref_c", "x")]
+    ]
+
+    files = getter._DataGetter__iter_files(remote_files=iter(remote_files))
+    assert [next(files), next(files)] == [tmp_path / "ref_a", tmp_path / "other"]
+
+    # The source is downloaded, and the held files can be linked to it
+    (tmp_path / "ref_a").write_bytes(b"data")
+    getter.release(file=tmp_path / "ref_a")
+    assert list(files) == [tmp_path / "ref_b", tmp_path / "sub/ref_c"]
+
+    for file in [tmp_path / "ref_b", tmp_path / "sub/ref_c"]:
+        assert DataGetter.download_and_verify.__wrapped__.__wrapped__(
+            getter, file=file, progress=None
+        )
+        assert file.read_bytes() == b"data"
+        assert file.stat().st_ino == (tmp_path / "ref_a").stat().st_ino
+    assert getter.deduplicator.nr_saved == 2 and getter.deduplicator.size_saved == 8
+
+
+def _fake_base_init(tmp_path):
+    """Mock DDSBaseClass.__init__, setting what DataGetter.__init__ uses."""
+
+    def init(self, method, headless=False, **_):
+        self.method = method
+        self.headless = headless
+        self.project = "project"
+        self.token = {}
+        self.dds_directory = SimpleNamespace(directories={"META": tmp_path, "FILES": tmp_path})
+        self.metrics = DeliveryMetrics()
+
+    return init
+
+
+def test_init_checks_method_before_opening_sessions(tmp_path):
+    """Test that no session is opened for a method other than 'get'."""
+    with (
+        patch.object(base.DDSBaseClass, "__init__", _fake_base_init(tmp_path)),
+        patch("dds_cli.data_getter.dds_cli.utils.create_download_session") as create_session,
+    ):
+        with pytest.raises(InvalidMethodError):
+            DataGetter(method="put")
+    create_session.assert_not_called()
+
+
+def test_init_closes_sessions_on_failure(tmp_path):
+    """Test that the sessions and the update queue are closed if there is nothing to download."""
+    session = MagicMock()
+    with (
+        patch.object(base.DDSBaseClass, "__init__", _fake_base_init(tmp_path)),
+        patch("dds_cli.data_getter.dds_cli.utils.create_download_session", return_value=session),
+        patch("dds_cli.data_getter.fhr.RemoteFileHandler", side_effect=DownloadError("No files.")),
+        patch("dds_cli.data_getter.uq.UpdateQueue") as update_queue,
+    ):
+        with pytest.raises(DownloadError):
+            DataGetter(get_all=True)
+
+    session.close.assert_called_once()
+    update_queue.return_value.close.assert_called_once()
@@ -0,0 +1,130 @@
+"""Tests for the data_preparer module."""
+
+# IMPORTS ######################################################################
+
+import os
+import pathlib
+
+import pytest
+
+from dds_cli import exceptions
+from dds_cli import file_handler_local as fhl
+from dds_cli.data_decryptor import decrypt_file
+from dds_cli.data_preparer import (
+    PREPARED_MANIFEST_NAME,
+    DataPreparer,
+    PreparedFileHandler,
+    PreparedManifest,
+)
+from dds_cli.directory import DDSDirectory
+from dds_cli.disk_budget import DiskBudget
+from dds_cli.metrics import DeliveryMetrics
+from tests.test_file_encryptor import key_pair
+
+# HELPERS ######################################################################
+
+
+def _prepare(tmp_path, files):
+    """Prepare files with a mocked DataPreparer, without authenticating."""
+    source = tmp_path / "source"
+    for name, content in files.items():
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(content)
+
+    staging_dir = DDSDirectory(path=tmp_path / "prepared")
+    project_keys = key_pair()
+
+    preparer = DataPreparer.__new__(DataPreparer)
+    preparer.metrics = DeliveryMetrics()
+    preparer.project = "proj"
+    preparer.keys = project_keys
+    preparer.silent = True
+    preparer.failed = {}
+    preparer.disk_budget = DiskBudget(margin=0)
+    preparer.dds_directory = staging_dir
+    preparer.filehandler = fhl.LocalFileHandler(
+        user_input=((source,), None),
+        project="proj",
+        temporary_destination=staging_dir.directories["FILES"],
+    )
+    preparer.manifest = PreparedManifest(
+        manifest_file=staging_dir.directories["META"] / PREPARED_MANIFEST_NAME,
+        files_directory=staging_dir.directories["FILES"],
+    )
+    preparer.prepare_all(num_threads=2)
+
+    return staging_dir, project_keys
+
+
+# TESTS ########################################################################
+
+
+def test_prepare_and_upload_info(tmp_path):
+    """Prepared files should be listed with all info needed to upload and decrypt them."""
+    content = os.urandom(200 * 1024)
+    staging_dir, project_keys = _prepare(
+        tmp_path=tmp_path, files={"a.bin": content, "folder/b.txt": b"text" * 1000}
+    )
+
+    filehandler = PreparedFileHandler(staging_dir=staging_dir, project="proj")
+    assert set(filehandler.data) == {"source/a.bin", "source/folder/b.txt"}
+    assert not filehandler.failed
+    assert filehandler.project == "proj" and filehandler.data_list is None
+
+    info = filehandler.data["source/a.bin"]
+    assert info["subpath"] == pathlib.Path("source")
+    assert info["size_raw"] == len(content)
+    assert info["size_processed"] == info["path_processed"].stat().st_size
+
+    # The prepared file can be decrypted with the saved info
+    decrypted = tmp_path / "decrypted.bin"
+    decrypted_ok, message = decrypt_file(
+        file=decrypted,
+        info={
+            "name_in_db": "source/a.bin",
+            "public_key": info["public_key"],
+            "salt": info["salt"],
+            "checksum": info["checksum"],
+            "compressed": not info["compressed"],
+            "size_original": info["size_raw"],
+            "path_downloaded": info["path_processed"],
+        },
+        keys=project_keys,
+        files_directory=tmp_path,
+        verify_checksum=True,
+    )
+    assert decrypted_ok, message
+    assert decrypted.read_bytes() == content
+
+    # Uploaded files are not listed again
+    filehandler.manifest.mark_uploaded(file="source/a.bin")
+    filehandler = PreparedFileHandler(staging_dir=staging_dir, project="proj")
+    assert set(filehandler.data) == {"source/folder/b.txt"}
+
+
+def test_prepared_file_changed(tmp_path):
+    """Prepared files which are missing or have changed should fail."""
+    staging_dir, _ = _prepare(tmp_path=tmp_path, files={"a.txt": b"a" * 100, "b.txt": b"b" * 100})
+    filehandler = PreparedFileHandler(staging_dir=staging_dir, project="proj")
+    filehandler.data["source/a.txt"]["path_processed"].unlink()
+    with filehandler.data["source/b.txt"]["path_processed"].open(mode="ab") as processed:
+        processed.write(b"more")
+
+    filehandler = PreparedFileHandler(staging_dir=staging_dir, project="proj")
+    assert not filehandler.data
+    assert set(filehandler.failed) == {"source/a.txt", "source/b.txt"}
+
+
+def test_prepared_for_other_project(tmp_path):
+    """Files prepared for one project should not be uploaded to another."""
+    staging_dir, _ = _prepare(tmp_path=tmp_path, files={"a.txt": b"a"})
+    with pytest.raises(exceptions.UploadError) as err:
+        PreparedFileHandler(staging_dir=staging_dir, project="other")
+    assert "proj" in str(err.value)
+
+
+def test_nothing_prepared(tmp_path):
+    """A directory without prepared files should raise NoDataError."""
+    staging_dir = DDSDirectory(path=tmp_path / "prepared")
+    with pytest.raises(exceptions.NoDataError):
+        PreparedFileHandler(staging_dir=staging_dir, project="proj")
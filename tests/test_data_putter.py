@@ -2,12 +2,27 @@
 
 # IMPORTS ######################################################################
 
+import hashlib
+import io
+import os
+import pathlib
 from unittest.mock import MagicMock, patch
 
 import pytest
+from nacl.exceptions import CryptoError
 
+from dds_cli import FileSegment
+from dds_cli import dedup
 from dds_cli import exceptions
+from dds_cli import file_encryptor
 from dds_cli.data_putter import DataPutter
+from dds_cli.failure_journal import FailureJournal
+from dds_cli.file_compressor import Compressor
+from dds_cli.file_handler_local import StreamFileHandler
+from dds_cli.metrics import DeliveryMetrics
+from dds_cli.file_records import FileStatus
+from dds_cli.status import DeliveryStatus
+from tests.test_file_encryptor import key_pair
 
 # TESTS ########################################################################
 
@@ -83,3 +98,158 @@ def test_init_data_putter_all_files_already_uploaded_deletion_fails(
 
     # Verify delete_folder was called (even though it failed)
     mock_delete_folder.assert_called_once_with(mock_temp_dir)
+
+
+def test_protect_and_upload_stream(monkeypatch):
+    """A stream should be compressed, encrypted and uploaded in parts, with its sizes saved."""
+    monkeypatch.setattr("dds_cli.data_putter.constants.UPLOAD_PART_SIZE", 100 * 1024)
+    monkeypatch.setattr("dds_cli.data_putter.constants.UPLOAD_PART_SIZE_DOUBLING", 2)
+    content = os.urandom(800 * 1024) + b"dds" * 200000
+    project_keys = key_pair()
+
+    putter = DataPutter.__new__(DataPutter)
+    putter.metrics = DeliveryMetrics()
+    putter.method = "put"
+    putter.silent = True
+    putter.keys = project_keys
+    putter.project = "proj"
+    putter.filehandler = StreamFileHandler(
+        stream=io.BytesIO(content),
+        name="folder/dump.sql",
+        temporary_destination=pathlib.Path("files"),
+        project="proj",
+    )
+    putter.status = putter.filehandler.create_upload_status_dict(existing_files={})
+
+    # Fake bucket collecting the parts - the part buffer is reused after each upload
+    parts = {}
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "id"}
+    client.upload_part.side_effect = lambda PartNumber, Body, **_: (
+        parts.update({PartNumber: bytes(Body)}) or {"ETag": str(PartNumber)}
+    )
+    putter.s3connector = MagicMock()
+    putter.s3connector.__enter__.return_value.resource.meta.client = client
+
+    with patch.object(DataPutter, "add_file_db", return_value=(True, "")) as mock_add:
+        uploaded, _ = DataPutter._DataPutter__protect_and_upload_stream(
+            putter, file="folder/dump.sql", progress=MagicMock()
+        )
+    assert uploaded
+    mock_add.assert_called_once()
+    client.complete_multipart_upload.assert_called_once()
+
+    # Part sizes are doubled, only the last part is smaller
+    sizes = [len(parts[x]) for x in sorted(parts)]
+    assert len(sizes) == 5
+    for size, minimum in zip(sizes[:-1], [100, 100, 200, 200]):
+        assert minimum * 1024 <= size < minimum * 1024 + FileSegment.SEGMENT_SIZE_CIPHER
+
+    info = putter.filehandler.data["folder/dump.sql"]
+    assert info["size_raw"] == len(content)
+    assert info["size_processed"] == sum(sizes)
+    assert info["checksum"] == hashlib.sha256(content).hexdigest()
+    assert not info["compressed"]
+
+    decryptor = file_encryptor.Decryptor(
+        project_keys=project_keys, peer_public=info["public_key"], key_salt=info["salt"]
+    )
+    decrypted = Compressor.decompress_chunks(
+        chunks=decryptor.decrypt_stream(chunks=[parts[x] for x in sorted(parts)])
+    )
+    assert b"".join(decrypted) == content
+
+
+def test_put_stream_encryption_error():
+    """An error while encrypting a stream should fail the file and abort the upload."""
+    putter = DataPutter.__new__(DataPutter)
+    putter.metrics = DeliveryMetrics()
+    putter.filehandler = MagicMock()
+    putter.filehandler.data = {"dump.sql": {"path_remote": "remote/dump.sql"}}
+    putter.status = {"dump.sql": FileStatus(steps=("put_stream",))}
+    client = MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "id"}
+    putter.s3connector = MagicMock()
+    putter.s3connector.__enter__.return_value.resource.meta.client = client
+
+    def failing_chunks():
+        yield b"first"
+        raise CryptoError("Encryption failed")
+
+    uploaded, error = putter.put_stream(
+        file="dump.sql", chunks=failing_chunks(), progress=MagicMock(), task=None
+    )
+
+    assert not uploaded
+    assert "Encryption failed" in error
+    client.abort_multipart_upload.assert_called_once()
+
+
+def test_protect_and_upload_copy(tmp_path):
+    """A file with the same contents as an uploaded file should be copied in the cloud."""
+    putter = DataPutter.__new__(DataPutter)
+    putter.metrics = DeliveryMetrics()
+    putter.method = "put"
+    putter.silent = True
+    putter.stop_doing = False
+    putter.stream = None
+    putter.filehandler = MagicMock()
+    putter.filehandler.local_destination = tmp_path
+    putter.filehandler.data = {
+        "a.txt": {
+            "path_remote": "files/a.txt",
+            "subpath": ".",
+            "compressed": True,
+            "size_processed": 100,
+            "checksum": "abc",
+            "public_key": "key",
+            "salt": "salt",
+        },
+        "b.txt": {"path_remote": "files/b.txt", "subpath": "."},
+    }
+    putter.status = DeliveryStatus(
+        {x: FileStatus(steps=("put", "put_copy", "add_file_db")) for x in putter.filehandler.data}
+    )
+    putter.deduplicator = dedup.UploadDeduplicator()
+    putter.deduplicator.add(file="a.txt", content=("abc", 10))
+    putter.deduplicator.add(file="b.txt", content=("abc", 10))
+    putter.deduplicator.finish(file="a.txt", ok=True)
+    putter.s3connector = MagicMock()
+    conn = putter.s3connector.__enter__.return_value
+    conn.bucketname = "bucket"
+
+    with patch.object(DataPutter, "add_file_db", return_value=(True, "")) as mock_add:
+        assert putter.protect_and_upload(file="b.txt", progress=MagicMock())
+    mock_add.assert_called_once_with(file="b.txt")
+    conn.resource.meta.client.copy.assert_called_once()
+    assert conn.resource.meta.client.copy.call_args.kwargs["CopySource"] == {
+        "Bucket": "bucket",
+        "Key": "files/a.txt",
+    }
+    assert putter.filehandler.data["b.txt"]["salt"] == "salt"
+    assert putter.filehandler.data["b.txt"]["public_key"] == "key"
+    assert putter.deduplicator.nr_saved == 1
+    assert putter.status["b.txt"]["put_copy"] == {"started": True, "done": True}
+
+
+@patch("dds_cli.data_putter.dds_cli.utils.perform_request")
+def test_retry_add_file_db_from_journal(mock_request, tmp_path):
+    """Only files which failed to be added to the database should be retried."""
+    putter = DataPutter.__new__(DataPutter)
+    putter.metrics = DeliveryMetrics()
+    putter.project = "proj"
+    putter.token = {}
+    putter.failure_journal = FailureJournal(journal_file=tmp_path / "failed.jsonl")
+    putter.status = DeliveryStatus(
+        {x: FileStatus(steps=("put", "add_file_db")) for x in ["a.txt", "b.txt"]}
+    )
+    for file, failed_op in [("a.txt", "add_file_db"), ("b.txt", "put")]:
+        putter.status.cancel_one(file=file, message="failed", failed_op=failed_op)
+        putter.failure_journal.add(file=file, info={"size_raw": 1}, status=putter.status[file])
+    mock_request.return_value = ({"message": {}, "files_added": ["a.txt"]}, None)
+
+    putter.retry_add_file_db()
+    assert list(mock_request.call_args.kwargs["json"]) == ["a.txt"]
+    assert not putter.status["a.txt"]["cancel"]
+    assert putter.status["b.txt"]["cancel"]
+    putter.failure_journal.close()
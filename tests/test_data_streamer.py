@@ -0,0 +1,185 @@
+"""Tests for the data_streamer module."""
+
+# IMPORTS ######################################################################
+
+import hashlib
+import io
+import os
+import tarfile
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pytest
+
+from dds_cli import FileSegment
+from dds_cli import exceptions
+from dds_cli import file_encryptor
+from dds_cli.data_streamer import DataStreamer
+from dds_cli.file_compressor import Compressor
+from tests.test_file_encryptor import key_pair
+
+# HELPERS ######################################################################
+
+
+def _encrypt(tmp_path, content, project_keys, compress=False):
+    """Encrypt content as uploaded, returning the encrypted bytes and the file info."""
+    chunks = (
+        Compressor.compress_chunks(chunks=[content])
+        if compress
+        else [
+            content[i : i + FileSegment.SEGMENT_SIZE_RAW]
+            for i in range(0, len(content), FileSegment.SEGMENT_SIZE_RAW)
+        ]
+    )
+    outfile = tmp_path / "encrypted.ccp"
+    with file_encryptor.Encryptor(project_keys=project_keys) as encryptor:
+        saved, _ = encryptor.encrypt_filechunks(
+            chunks=chunks, outfile=outfile, progress=(MagicMock(), 1)
+        )
+        assert saved
+        info = {
+            "public_key": encryptor.get_public_component_hex(private_key=encryptor.my_private),
+            "salt": encryptor.salt,
+        }
+    encrypted = outfile.read_bytes()
+    return encrypted, {
+        **info,
+        "checksum": hashlib.sha256(content).hexdigest(),
+        "compressed": compress,
+        "size_original": len(content),
+        "size_stored": len(encrypted),
+    }
+
+
+def _prepare_streamer(files, project_keys, tar=False):
+    """Mock a DataStreamer without authenticating, serving files: {name: encrypted}."""
+    streamer = DataStreamer.__new__(DataStreamer)
+    streamer.project = "proj"
+    streamer.token = {}
+    streamer.keys = project_keys
+    streamer.tar = tar
+    streamer.byte_range = None
+    streamer.verify_checksum = True
+    streamer.api_session = MagicMock()
+    streamer.filehandler = MagicMock()
+    streamer.filehandler.data = {
+        name: {**info, "name_in_db": name, "url": name} for name, (_, info) in files.items()
+    }
+
+    def get(url, **_):
+        response = MagicMock()
+        response.__enter__.return_value = response
+        encrypted = files[url][0]
+        # Chunks of odd sizes, as from the network
+        response.iter_content.return_value = [
+            encrypted[i : i + 1000] for i in range(0, len(encrypted), 1000)
+        ]
+        return response
+
+    streamer.session = MagicMock()
+    streamer.session.get.side_effect = get
+    return streamer
+
+
+# TESTS ########################################################################
+
+
+@patch("dds_cli.data_streamer.dds_cli.utils.perform_request")
+def test_stream_one_file(mock_request, tmp_path):
+    """One file should be streamed decrypted and decompressed."""
+    project_keys = key_pair()
+    content = os.urandom(2 * FileSegment.SEGMENT_SIZE_RAW) + b"dds" * 50000
+    streamer = _prepare_streamer(
+        files={"folder/file.bin": _encrypt(tmp_path, content, project_keys, compress=True)},
+        project_keys=project_keys,
+    )
+
+    output = io.BytesIO()
+    streamer.stream(output=output)
+    assert output.getvalue() == content
+    mock_request.assert_called_once()
+
+
+@patch("dds_cli.data_streamer.dds_cli.utils.perform_request")
+def test_stream_tar(_, tmp_path):
+    """Several files should be streamed as a tar archive."""
+    project_keys = key_pair()
+    contents = {
+        "folder/a.txt": b"a" * 10,
+        "folder/b.bin": os.urandom(FileSegment.SEGMENT_SIZE_RAW),
+        "c.bin": b"",
+    }
+    streamer = _prepare_streamer(
+        files={
+            name: _encrypt(tmp_path, content, project_keys) for name, content in contents.items()
+        },
+        project_keys=project_keys,
+        tar=True,
+    )
+
+    output = io.BytesIO()
+    streamer.stream(output=output)
+    output.seek(0)
+    with tarfile.open(fileobj=output, mode="r:") as archive:
+        assert sorted(archive.getnames()) == sorted(contents)
+        for name, content in contents.items():
+            assert archive.extractfile(name).read() == content
+
+
+def test_stream_tampered_file(tmp_path):
+    """A file which has been altered should fail."""
+    project_keys = key_pair()
+    encrypted, info = _encrypt(tmp_path, b"data" * 1000, project_keys)
+    encrypted = encrypted[:20] + bytes([encrypted[20] ^ 1]) + encrypted[21:]
+    streamer = _prepare_streamer(files={"file": (encrypted, info)}, project_keys=project_keys)
+
+    with pytest.raises(exceptions.DownloadError):
+        streamer.stream(output=io.BytesIO())
+
+
+def test_stream_truncated_file(tmp_path):
+    """A file which is incomplete should fail."""
+    project_keys = key_pair()
+    encrypted, info = _encrypt(tmp_path, os.urandom(3 * FileSegment.SEGMENT_SIZE_RAW), project_keys)
+    streamer = _prepare_streamer(
+        files={"file": (encrypted[: -FileSegment.SEGMENT_SIZE_CIPHER], info)},
+        project_keys=project_keys,
+    )
+
+    with pytest.raises(exceptions.DownloadError):
+        streamer.stream(output=io.BytesIO())
+
+
+def test_stream_byte_range(tmp_path):
+    """Only the byte range should be streamed, fetched with range requests."""
+    project_keys = key_pair()
+    content = os.urandom(3 * FileSegment.SEGMENT_SIZE_RAW)
+    encrypted, info = _encrypt(tmp_path, content, project_keys)
+    streamer = _prepare_streamer(files={"file": (encrypted, info)}, project_keys=project_keys)
+    streamer.byte_range = (70000, 140000)
+
+    def get(url, headers, **_):
+        assert url == "file"
+        start, end = (int(x) for x in headers["Range"][len("bytes=") :].split("-"))
+        return MagicMock(status_code=206, content=encrypted[start : end + 1])
+
+    streamer.session.get.side_effect = get
+
+    output = io.BytesIO()
+    streamer.stream(output=output)
+    assert output.getvalue() == content[70000:140000]
+
+
+def test_stream_byte_range_not_supported(tmp_path):
+    """A server which ignores the range should fail, without the whole file being read."""
+    project_keys = key_pair()
+    encrypted, info = _encrypt(tmp_path, os.urandom(FileSegment.SEGMENT_SIZE_RAW), project_keys)
+    streamer = _prepare_streamer(files={"file": (encrypted, info)}, project_keys=project_keys)
+    streamer.byte_range = (0, 100)
+    response = MagicMock(status_code=200)
+    type(response).content = content = PropertyMock(return_value=encrypted)
+    streamer.session.get.side_effect = lambda *_, **__: response
+
+    with pytest.raises(exceptions.DownloadError, match="range requests"):
+        streamer.stream(output=io.BytesIO())
+    content.assert_not_called()
+    response.__exit__.assert_called_once()
@@ -0,0 +1,73 @@
+"""Tests for the dedup module."""
+
+# IMPORTS ######################################################################
+
+import hashlib
+import os
+import threading
+
+from dds_cli.dedup import DownloadDeduplicator, UploadDeduplicator
+
+# TESTS ########################################################################
+
+
+def test_same_contents_held_until_source_done():
+    """Files with the same checksum and size should wait for the first file."""
+    dedup = DownloadDeduplicator()
+    assert dedup.add(file="a", content=("x", 10))
+    assert not dedup.add(file="b", content=("x", 10))
+    assert dedup.add(file="c", content=("x", 11))
+    assert dedup.ready() == []
+
+    dedup.finish(file="a", ok=True)
+    assert dedup.ready() == ["b"]
+    assert dedup.wait(file="b") == "a"
+
+    # Files added later are linked directly
+    assert dedup.add(file="d", content=("x", 10))
+    assert dedup.wait(file="d") == "a"
+
+
+def test_next_file_downloaded_if_source_fails():
+    """If the source fails, the next file with the same contents should be downloaded."""
+    dedup = DownloadDeduplicator()
+    dedup.add(file="a", content=("x", 10))
+    dedup.add(file="b", content=("x", 10))
+    dedup.add(file="c", content=("x", 10))
+
+    dedup.finish(file="a", ok=False)
+    assert dedup.ready() == ["b"]
+    assert dedup.wait(file="b") is None
+
+    # The remaining file waits for the new source
+    assert dedup.remaining() == ["c"]
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(dedup.wait(file="c")))
+    waiter.start()
+    dedup.finish(file="b", ok=True)
+    waiter.join(timeout=5)
+    assert waited == ["b"]
+
+
+def test_upload_duplicates_found(tmp_path):
+    """Copies and links should be found, reading only files of the same size."""
+    (tmp_path / "a.txt").write_bytes(b"reference")
+    (tmp_path / "b.txt").write_bytes(b"reference")
+    (tmp_path / "c.txt").write_bytes(b"different")
+    (tmp_path / "unique.txt").write_bytes(b"unique size")
+    os.link(tmp_path / "unique.txt", tmp_path / "link.txt")
+    data = {
+        name: {"path_raw": tmp_path / name, "size_raw": (tmp_path / name).stat().st_size}
+        for name in ["a.txt", "b.txt", "c.txt", "unique.txt", "link.txt"]
+    }
+    data["gone.txt"] = {"path_raw": tmp_path / "gone.txt", "size_raw": 9}
+
+    dedup = UploadDeduplicator()
+    assert dedup.add_files(data=data) == ["b.txt", "link.txt"]
+    assert data["a.txt"]["checksum"] == hashlib.sha256(b"reference").hexdigest()
+    assert "checksum" not in data["unique.txt"]
+
+    # Copies are made once the source has been uploaded
+    dedup.finish(file="a.txt", ok=True)
+    assert dedup.wait(file="b.txt") == "a.txt"
+    assert dedup.wait(file="c.txt") is None
@@ -0,0 +1,118 @@
+"""Tests for the disk_budget module."""
+
+# IMPORTS ######################################################################
+
+import collections
+import threading
+
+import pytest
+
+from dds_cli import disk_budget
+from dds_cli.disk_budget import DiskBudget
+
+# HELPERS ######################################################################
+
+DiskUsage = collections.namedtuple("DiskUsage", ["total", "used", "free"])
+
+
+@pytest.fixture
+def free_space(monkeypatch):
+    """Report a fixed amount of free space, changeable by the test."""
+    free = {"bytes": 1000}
+    monkeypatch.setattr(
+        disk_budget.shutil, "disk_usage", lambda _: DiskUsage(10000, 0, free["bytes"])
+    )
+    return free
+
+
+# TESTS ########################################################################
+
+
+def test_processed_size_is_larger():
+    """The worst-case processed size should include tags, nonces and compression overhead."""
+    assert disk_budget.processed_size(size=0) > 0
+    assert disk_budget.processed_size(size=10**9) > 10**9
+
+
+def test_filesystem_of_missing_path(tmp_path):
+    """A path which does not exist yet should be on the filesystem of its closest parent."""
+    device, existing = DiskBudget.filesystem(path=tmp_path / "not" / "yet" / "created.txt")
+    assert existing == tmp_path
+    assert device == tmp_path.stat().st_dev
+
+
+def test_preflight(tmp_path, free_space):
+    """The needs on one filesystem should be summed and compared to the free space."""
+    budget = DiskBudget(margin=100)
+
+    assert budget.preflight(needs={tmp_path / "a": 400, tmp_path / "b": 500}, description="X")[0]
+
+    fits, message = budget.preflight(
+        needs={tmp_path / "a": 400, tmp_path / "b": 600}, description="The download"
+    )
+    assert not fits
+    assert message.startswith("The download needs up to 1.0 KB")
+
+
+def test_acquire_and_release(tmp_path, free_space):
+    """Reserved space should not be available to other files until released."""
+    budget = DiskBudget(margin=0, poll_interval=0.01)
+    assert budget.acquire(key="a", needs={tmp_path / "a": 600}) == (True, "")
+
+    admitted = threading.Event()
+
+    def acquire_b():
+        if budget.acquire(key="b", needs={tmp_path / "b": 600})[0]:
+            admitted.set()
+
+    thread = threading.Thread(target=acquire_b)
+    thread.start()
+    assert not admitted.wait(timeout=0.1)
+
+    budget.release(key="a")
+    assert admitted.wait(timeout=5)
+    thread.join()
+    assert budget.reservations == {"b": {tmp_path.stat().st_dev: 600}}
+
+
+def test_acquire_never_fits(tmp_path, free_space):
+    """A file larger than the free space should fail directly if nothing else is reserved."""
+    budget = DiskBudget(margin=0)
+
+    admitted, message = budget.acquire(key="big.txt", needs={tmp_path / "big.txt": 2000})
+
+    assert not admitted
+    assert "Not enough disk space for file 'big.txt'" in message
+    assert budget.reservations == {}
+
+
+def test_acquire_waits_for_external_space(tmp_path, free_space):
+    """A waiting file should be admitted when space is freed by others than the budget."""
+    budget = DiskBudget(margin=0, poll_interval=0.01)
+    budget.acquire(key="a", needs={tmp_path / "a": 500})
+    free_space["bytes"] = 500
+
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.append(budget.acquire(key="b", needs={tmp_path / "b": 500}))
+    )
+    thread.start()
+    free_space["bytes"] = 1000
+    thread.join(timeout=5)
+
+    assert result == [(True, "")]
+
+
+def test_written_bytes_are_not_reserved_twice(tmp_path, free_space):
+    """What a reserved file has written is in the used space, and no longer reserved."""
+    budget = DiskBudget(margin=0)
+    existing = tmp_path / "a"
+    existing.write_bytes(b"x" * 100)
+    assert budget.acquire(key="a", needs={existing: 600}) == (True, "")
+
+    # The file was already 100 bytes: 400 of the 600 bytes have been written
+    existing.write_bytes(b"x" * 500)
+    free_space["bytes"] = 600
+
+    # Without counting what was written, only 600 - 600 bytes would be available
+    assert budget.acquire(key="b", needs={tmp_path / "b": 400}) == (True, "")
@@ -0,0 +1,62 @@
+"""Tests for the failure_journal module."""
+
+# IMPORTS ######################################################################
+
+import concurrent.futures
+import json
+import pathlib
+
+from dds_cli.failure_journal import FailureJournal
+from dds_cli.file_records import FileStatus, UploadRecord
+
+# TESTS ########################################################################
+
+
+def test_concurrent_failures_appended(tmp_path):
+    """Failures from many threads should each be written as one line."""
+    journal = FailureJournal(journal_file=tmp_path / "failed.jsonl")
+
+    def fail(i):
+        journal.add(
+            file=f"file_{i}",
+            info=UploadRecord(path_raw=pathlib.Path(f"/data/file_{i}"), size_raw=i),
+            status=FileStatus(steps=("put",), cancel=True, message=f"error {i}"),
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as texec:
+        list(texec.map(fail, range(2000)))
+
+    entries = dict(journal.entries())
+    assert journal.nr_entries == len(entries) == 2000
+    assert entries["file_7"]["path_raw"] == "/data/file_7"
+    assert entries["file_7"]["status"]["message"] == "error 7"
+    assert entries["file_7"]["status"]["put"] == {"started": False, "done": False}
+    journal.close()
+
+
+def test_compact_keeps_last_entry(tmp_path):
+    """Compacting should save the last entry per file, keeping earlier deliveries."""
+    out_file = tmp_path / "failed.json"
+    out_file.write_text(json.dumps({"old.txt": {"status": {"failed_op": "put"}}}))
+    journal = FailureJournal(journal_file=tmp_path / "failed.jsonl")
+    journal.add(file="a.txt", info={}, status={"failed_op": "put"})
+    journal.add(file="a.txt", info={}, status={"failed_op": "add_file_db"})
+    journal.close()
+
+    # A line which was not completely written is skipped
+    with journal.journal_file.open(mode="a") as lines:
+        lines.write('{"file": "b.txt", "sta')
+
+    assert journal.compact(out_file=out_file) == 1
+    assert json.loads(out_file.read_text()) == {
+        "old.txt": {"status": {"failed_op": "put"}},
+        "a.txt": {"status": {"failed_op": "add_file_db"}},
+    }
+    assert not journal.journal_file.exists()
+
+
+def test_no_failures_no_files(tmp_path):
+    """Without failures, nothing should be written."""
+    journal = FailureJournal(journal_file=tmp_path / "failed.jsonl")
+    assert journal.compact(out_file=tmp_path / "failed.json") == 0
+    assert list(tmp_path.iterdir()) == []
@@ -168,3 +168,60 @@ def test_compress_and_decompress_file_csv(fs: FakeFilesystem, caplog: LogCapture
         file=decompressed_file, correct_checksum=checksum_new_file.hexdigest()
     )
     assert verified and message == "File integrity verified."
+
+
+def test_compress_chunks_exact_chunk_size():
+    """Chunks of any size should be compressed into chunks of exactly the chunk size."""
+    data = os.urandom(300000)
+    views = [memoryview(data)[i : i + 70000] for i in range(0, len(data), 70000)]
+
+    chunks = list(file_compressor.Compressor.compress_chunks(chunks=views, chunk_size=65536))
+
+    assert all(len(x) == 65536 for x in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= 65536
+    decompressor = file_compressor.zstd.ZstdDecompressor().decompressobj()
+    assert decompressor.decompress(b"".join(chunks)) == data
+
+
+def test_compress_chunks_seekable():
+    """Seekable data should decompress as a whole, and each frame on its own."""
+    data = os.urandom(100000) + b"dds" * 200000
+    chunks = list(
+        file_compressor.Compressor.compress_chunks_seekable(
+            chunks=[data], chunk_size=65536, frame_size=150000
+        )
+    )
+    assert all(len(x) == 65536 for x in chunks[:-1])
+    compressed = b"".join(chunks)
+    assert b"".join(file_compressor.Compressor.decompress_chunks(chunks=[compressed])) == data
+
+    seek_table = file_compressor.SeekTable.from_bytes(data=compressed)
+    assert [x[1] for x in seek_table.frames] == [150000, 150000, 150000, 150000, 100000]
+
+    frames = list(seek_table.frames_in_range(start=160000, end=300001))
+    assert [x[1] for x in frames] == [150000, 300000]
+    for compressed_offset, decompressed_offset, compressed_size in frames:
+        frame = compressed[compressed_offset : compressed_offset + compressed_size]
+        decompressed = file_compressor.zstd.ZstdDecompressor().decompressobj().decompress(frame)
+        assert decompressed == data[decompressed_offset : decompressed_offset + 150000]
+
+
+def test_compress_chunks_seekable_small_chunks():
+    """Chunks which do not line up with the frames should give the same frames."""
+    data = os.urandom(50000) + b"dds" * 50000
+    chunks = [data[x : x + 7000] for x in range(0, len(data), 7000)]
+    compressed = b"".join(
+        file_compressor.Compressor.compress_chunks_seekable(
+            chunks=chunks, chunk_size=65536, frame_size=30000
+        )
+    )
+    assert b"".join(file_compressor.Compressor.decompress_chunks(chunks=[compressed])) == data
+
+    seek_table = file_compressor.SeekTable.from_bytes(data=compressed)
+    assert [x[1] for x in seek_table.frames] == [30000] * 6 + [20000]
+
+
+def test_seek_table_not_seekable():
+    """Data compressed without a seek table should not give one."""
+    compressed = b"".join(file_compressor.Compressor.compress_chunks(chunks=[b"dds" * 1000]))
+    assert file_compressor.SeekTable.from_bytes(data=compressed) is None
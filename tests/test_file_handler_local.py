@@ -3,8 +3,10 @@ from pyfakefs.fake_filesystem import FakeFilesystem
 from unittest.mock import MagicMock, patch
 import pytest
 import hashlib
+import io
 
-from dds_cli.file_handler_local import LocalFileHandler
+from dds_cli.exceptions import UploadError
+from dds_cli.file_handler_local import LocalFileHandler, StreamFileHandler
 
 
 # ---------- Helper Functions ----------
@@ -192,7 +194,7 @@ def test_stream_from_file_compressed(fs: FakeFilesystem):
 
 
 def test_stream_from_file_uncompressed(fs: FakeFilesystem):
-    """When compressed=False, it should first read file for checksum then compress."""
+    """When compressed=False, the file should be hashed and compressed in one read."""
 
     test_file = create_test_file(fs, "parentdir", "uncompressed.bin", b"abc123")
 
@@ -212,11 +214,53 @@ def test_stream_from_file_uncompressed(fs: FakeFilesystem):
     }
 
     fake_chunks = [b"zzz", b"yyy"]
-    with patch("dds_cli.file_handler_local.fc.Compressor.compress_file", return_value=fake_chunks):
+    compressed = []
+
+    def compress_chunks(chunks):
+        compressed.extend(bytes(x) for x in chunks)
+        yield from fake_chunks
+
+    with patch(
+        "dds_cli.file_handler_local.fc.Compressor.compress_chunks", side_effect=compress_chunks
+    ):
         chunks = list(filehandler.stream_from_file("file1"))
 
     assert chunks == fake_chunks
+    assert compressed == [b"abc123"]
 
     # Checksum must match original file (pre-compression)
     expected = hashlib.sha256(b"abc123").hexdigest()
     assert filehandler.data["file1"]["checksum"] == expected
+
+
+def test_stream_file_handler_compressed():
+    """A compressed stream should be passed on as it is, with its size and checksum saved."""
+    content = b"\x1f\x8b" + b"gzipped" * 20000
+    handler = StreamFileHandler(
+        stream=io.BytesIO(content),
+        name="folder/data.gz",
+        temporary_destination=pathlib.Path("files"),
+        project="proj",
+    )
+    assert handler.data["folder/data.gz"]["subpath"] == pathlib.Path("folder")
+
+    chunks = list(handler.stream_from_file(file="folder/data.gz"))
+    assert b"".join(chunks) == content
+    assert all(len(x) == 65536 for x in chunks[:-1])
+
+    info = handler.data["folder/data.gz"]
+    assert info["compressed"]
+    assert info["size_raw"] == len(content)
+    assert info["checksum"] == hashlib.sha256(content).hexdigest()
+
+
+@pytest.mark.parametrize("name", ["", "folder/", "/abs/file", "../file"])
+def test_stream_file_handler_invalid_name(name):
+    """Names which are not relative file paths should not be accepted."""
+    with pytest.raises(UploadError):
+        StreamFileHandler(
+            stream=io.BytesIO(b""),
+            name=name,
+            temporary_destination=pathlib.Path("files"),
+            project="proj",
+        )
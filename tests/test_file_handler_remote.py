@@ -0,0 +1,126 @@
+"""Tests for the file_handler_remote module."""
+
+# IMPORTS ######################################################################
+
+import itertools
+import pathlib
+import threading
+import time
+
+import pytest
+from requests_mock.mocker import Mocker
+
+from dds_cli import constants
+from dds_cli import DDSEndpoint
+from dds_cli import exceptions
+from dds_cli.file_handler_remote import RemoteFileHandler
+
+# HELPERS ######################################################################
+
+
+def _file_info(name):
+    """File info as returned by the API."""
+    return {
+        "subpath": str(pathlib.Path(name).parent),
+        "name_in_bucket": f"bucket_{name}",
+        "size_stored": len(name),
+        "size_original": 2 * len(name),
+    }
+
+
+# TESTS ########################################################################
+
+
+def test_get_all_does_not_collect_file_info_upfront(tmp_path):
+    """File info for '--get-all' should only be requested when iterated."""
+    with Mocker() as mock:
+        filehandler = RemoteFileHandler(
+            get_all=True, user_input=((), None), token={}, project="proj", destination=tmp_path
+        )
+        assert filehandler.streamed
+        assert filehandler.data == {}
+        assert not mock.called
+
+
+def test_iter_file_info_all(tmp_path):
+    """All files should be yielded with local paths, and the spool file removed."""
+    files = {f"folder/file_{i}.txt": _file_info(f"folder/file_{i}.txt") for i in range(20)}
+    spool_file = tmp_path / "file_info_all.jsonl"
+    filehandler = RemoteFileHandler(
+        get_all=True, user_input=((), None), token={}, project="proj", destination=tmp_path
+    )
+
+    with Mocker() as mock:
+        mock.get(DDSEndpoint.FILE_INFO_ALL, status_code=200, json={"files": files})
+        collected = dict(filehandler.iter_file_info_all(spool_file=spool_file))
+
+    assert list(collected) == [tmp_path / name for name in files]
+    info = collected[tmp_path / "folder/file_3.txt"]
+    assert info["name_in_db"] == "folder/file_3.txt"
+    assert info["path_downloaded"] == tmp_path / "folder" / "bucket_folder/file_3.txt"
+    assert not spool_file.exists()
+
+    # The totals are known once all file info has been received
+    sizes = [len(name) for name in files]
+    assert filehandler.collected["size_stored"] == sum(sizes)
+    assert filehandler.collected["size_original"] == 2 * sum(sizes)
+    assert filehandler.collected["largest"]["name_in_db"] == "folder/file_10.txt"
+
+
+def test_iter_file_info_all_stopped_early(tmp_path, monkeypatch):
+    """The spool thread should stop and the spool file be removed if the iteration is stopped."""
+
+    def endless_stream(*_, **__):
+        for i in itertools.count():
+            yield f"file_{i}.txt", _file_info(f"file_{i}.txt")
+            time.sleep(0.001)
+
+    monkeypatch.setattr(constants, "SPOOL_FLUSH_LINES", 5)
+    monkeypatch.setattr(
+        "dds_cli.file_handler_remote.dds_cli.utils.stream_json_items", endless_stream
+    )
+    spool_file = tmp_path / "file_info_all.jsonl"
+    filehandler = RemoteFileHandler(
+        get_all=True, user_input=((), None), token={}, project="proj", destination=tmp_path
+    )
+
+    remote_files = filehandler.iter_file_info_all(spool_file=spool_file)
+    assert next(remote_files)[0] == tmp_path / "file_0.txt"
+    remote_files.close()
+
+    assert not spool_file.exists()
+    assert filehandler.collected is None
+    assert not any(x.name == "dds-file-info" for x in threading.enumerate())
+
+
+def test_iter_file_info_all_error(tmp_path):
+    """An error response should be raised in the iterating thread."""
+    filehandler = RemoteFileHandler(
+        get_all=True, user_input=((), None), token={}, project="proj", destination=tmp_path
+    )
+
+    with Mocker() as mock:
+        mock.get(DDSEndpoint.FILE_INFO_ALL, status_code=403, json={"message": "No access"})
+        with pytest.raises(exceptions.DDSCLIException) as exc_info:
+            next(filehandler.iter_file_info_all(spool_file=tmp_path / "file_info_all.jsonl"))
+
+    assert "No access" in exc_info.value.args[0]
+
+
+def test_refresh_urls(tmp_path):
+    """Urls of all given files should be refreshed in one request, in place."""
+    filehandler = RemoteFileHandler(
+        get_all=True, user_input=((), None), token={}, project="proj", destination=tmp_path
+    )
+    files = [{"name_in_db": f"file_{i}", "url": "old", "url_fetched": 0} for i in range(3)]
+    new_info = {"files": {f"file_{i}": {"url": f"new_{i}"} for i in range(2)}}
+
+    with Mocker() as mock:
+        mock.get(DDSEndpoint.FILE_INFO, status_code=200, json=new_info)
+        filehandler.refresh_urls(files=files)
+
+    assert mock.call_count == 1
+    assert mock.last_request.json() == ["file_0", "file_1", "file_2"]
+    assert [x["url"] for x in files] == ["new_0", "new_1", "old"]
+    assert files[0]["url_fetched"] > 0
+    assert files[2]["url_fetched"] == 0
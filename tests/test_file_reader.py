@@ -0,0 +1,117 @@
+"""Tests for the file_reader module."""
+
+# IMPORTS ######################################################################
+
+import os
+
+import pytest
+
+from dds_cli import file_reader
+from dds_cli.file_reader import BufferPool, FileReader
+
+# TESTS ########################################################################
+
+
+def test_read_in_blocks(tmp_path):
+    """All blocks except the last should be of the read size."""
+    data = os.urandom(10000)
+    (tmp_path / "file.bin").write_bytes(data)
+
+    blocks = [bytes(x) for x in FileReader(file=tmp_path / "file.bin", read_size=4096)]
+
+    assert [len(x) for x in blocks] == [4096, 4096, 1808]
+    assert b"".join(blocks) == data
+
+
+def test_read_empty_file(tmp_path):
+    """An empty file should give no blocks."""
+    (tmp_path / "file.bin").write_bytes(b"")
+    assert list(FileReader(file=tmp_path / "file.bin", read_size=4096)) == []
+
+
+def test_buffer_reused(tmp_path):
+    """The buffer should be given back to the pool and reused by the next file."""
+    (tmp_path / "file.bin").write_bytes(b"data" * 3)
+    pool = BufferPool(max_idle=1)
+
+    first, second = (
+        [
+            x.obj
+            for x in FileReader(file=tmp_path / "file.bin", read_size=8, pool=pool)
+            if isinstance(x, memoryview)
+        ]
+        for _ in range(2)
+    )
+
+    assert first[0] is second[0]
+
+
+def test_last_block_kept_after_reuse(tmp_path):
+    """The last block should stay valid when the buffer is reused for the next file."""
+    (tmp_path / "first.bin").write_bytes(b"first___")
+    (tmp_path / "second.bin").write_bytes(b"second__")
+    pool = BufferPool(max_idle=1)
+
+    *_, last = FileReader(file=tmp_path / "first.bin", read_size=8, pool=pool)
+    list(FileReader(file=tmp_path / "second.bin", read_size=8, pool=pool))
+
+    assert last == b"first___" and isinstance(last, bytes)
+
+
+def test_buffer_not_reused_if_stopped(tmp_path):
+    """A buffer should not be reused while the consumer can still hold a view of it."""
+    (tmp_path / "file.bin").write_bytes(b"data" * 3)
+    pool = BufferPool(max_idle=1)
+
+    blocks = iter(FileReader(file=tmp_path / "file.bin", read_size=8, pool=pool))
+    block = next(blocks)
+    blocks.close()
+
+    assert bytes(block) == b"datadata"
+    assert pool.acquire(size=8) is not block.obj
+
+
+def test_buffer_pool_max_idle():
+    """No more than max_idle buffers of each size should be kept."""
+    pool = BufferPool(max_idle=1)
+    buffers = [pool.acquire(size=8) for _ in range(2)]
+    for buffer in buffers:
+        pool.release(buffer=buffer)
+
+    assert pool.acquire(size=8) is buffers[0]
+    assert pool.acquire(size=8) is not buffers[1]
+
+
+def test_missing_file_raises(tmp_path):
+    """A file which cannot be read should raise, and the buffer be given back."""
+    pool = BufferPool()
+    with pytest.raises(OSError):
+        list(FileReader(file=tmp_path / "missing.bin", read_size=8, pool=pool))
+    assert len(pool._idle[8]) == 1
+
+
+def test_segments():
+    """Blocks should be split into bytes of exactly the segment size, except the last."""
+    blocks = [memoryview(b"abcdefgh"), memoryview(b"ij")]
+    assert list(FileReader.segments(views=blocks, size=4)) == [b"abcd", b"efgh", b"ij"]
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="No posix_fadvise")
+def test_read_hints(tmp_path, monkeypatch):
+    """The file should be read sequentially and dropped from the cache behind the reader."""
+    (tmp_path / "file.bin").write_bytes(b"x" * 10)
+    advised = []
+    monkeypatch.setattr(
+        file_reader.os,
+        "posix_fadvise",
+        lambda _, offset, length, advice: advised.append((offset, length, advice)),
+    )
+
+    list(FileReader(file=tmp_path / "file.bin", read_size=4))
+
+    assert advised == [
+        (0, 0, os.POSIX_FADV_SEQUENTIAL),
+        (0, 4, os.POSIX_FADV_DONTNEED),
+        (4, 4, os.POSIX_FADV_DONTNEED),
+        (8, 2, os.POSIX_FADV_DONTNEED),
+    ]
@@ -0,0 +1,71 @@
+"""Tests for the file_records module."""
+
+# IMPORTS ######################################################################
+
+import json
+import pathlib
+
+import pytest
+
+from dds_cli.file_handler import FileHandler
+from dds_cli.file_records import DownloadRecord, FileStatus, UploadRecord
+
+# TESTS ########################################################################
+
+
+def test_upload_record_as_dict():
+    """A record should work as the dict it replaces, with paths saved as strings."""
+    info = {
+        "path_raw": pathlib.Path("/data/sample_1/reads.fastq"),
+        "subpath": pathlib.Path("sample_1"),
+        "size_raw": 10,
+        "checksum": "",
+    }
+    record = UploadRecord(info)
+    assert record == info
+    assert {**record} == info
+    assert not hasattr(record, "__dict__")
+    assert record.path_raw == "/data/sample_1/reads.fastq"
+    assert record["path_raw"] == pathlib.Path("/data/sample_1/reads.fastq")
+
+    record.update({"checksum": "abc", "project": "proj"})
+    assert record["checksum"] == "abc"
+    assert record.pop("project") == "proj"
+    assert "project" not in record
+    with pytest.raises(KeyError):
+        _ = record["salt"]
+    assert len(record) == 4
+
+
+def test_subpaths_shared():
+    """Files in the same directory should share one subpath string."""
+    first = DownloadRecord(subpath="".join(["sample", "_1"]))
+    second = DownloadRecord(subpath="".join(["sample", "_1"]))
+    assert first.subpath is second.subpath
+
+
+def test_file_status_steps():
+    """Steps should be saved as codes and shown as dicts."""
+    status = FileStatus(steps=("put", "add_file_db"))
+    assert "put" in status
+    assert "get" not in status
+    assert status["put"] == {"started": False, "done": False}
+
+    status.start("put")
+    assert status.put == FileStatus.STARTED
+    status.finish("put")
+    assert status["put"] == {"started": True, "done": True}
+
+    status["put_copy"] = {"started": True, "done": False}
+    assert status.put_copy == FileStatus.STARTED
+
+    status.update({"cancel": True, "message": "failed"})
+    assert json.loads(json.dumps(FileHandler.make_json_serializable(non_json=status))) == {
+        "cancel": True,
+        "started": False,
+        "message": "failed",
+        "failed_op": None,
+        "put": {"started": True, "done": True},
+        "put_copy": {"started": True, "done": False},
+        "add_file_db": {"started": False, "done": False},
+    }
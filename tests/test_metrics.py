@@ -0,0 +1,120 @@
+"""Tests for the metrics module."""
+
+# IMPORTS ######################################################################
+
+import concurrent.futures
+import json
+import time
+
+import pytest
+
+from dds_cli.metrics import DeliveryMetrics
+
+# TESTS ########################################################################
+
+
+def test_nested_stages_not_counted_twice():
+    """The time of a stage should not include the stages and chunks run within it."""
+    metrics = DeliveryMetrics()
+
+    def slow_chunks():
+        for _ in range(2):
+            time.sleep(0.05)
+            yield b"x" * 10
+
+    with metrics.stage(name="encrypt_filechunks"):
+        for _ in metrics.chunks(name="stream_from_file", chunks=slow_chunks()):
+            pass
+        with metrics.stage(name="put") as timer:
+            time.sleep(0.05)
+            timer.bytes = 100
+
+    stages = metrics.summary()["stages"]
+    assert stages["stream_from_file"]["bytes"] == 20
+    assert stages["stream_from_file"]["seconds"] >= 0.1
+    assert stages["put"]["bytes"] == 100
+    assert stages["put"]["seconds"] >= 0.05
+    assert stages["encrypt_filechunks"]["seconds"] < 0.05
+
+
+def test_failures_and_retries_counted():
+    """Exceptions should count as failures, and retries both per call and separately."""
+    metrics = DeliveryMetrics()
+    with pytest.raises(ValueError):
+        with metrics.stage(name="add_file_db"):
+            raise ValueError("failed")
+    with metrics.stage(name="add_file_db", retry=True):
+        pass
+    metrics.retry(name="get", count=2)
+
+    stages = metrics.summary()["stages"]
+    assert stages["add_file_db"] | {"seconds": 0, "bytes_per_second": None} == {
+        "calls": 2,
+        "failures": 1,
+        "retries": 1,
+        "bytes": 0,
+        "seconds": 0,
+        "bytes_per_second": None,
+    }
+    assert stages["get"]["calls"] == 0 and stages["get"]["retries"] == 2
+
+
+def test_concurrent_stages_counted():
+    """Stages recorded from many threads should all be counted."""
+    metrics = DeliveryMetrics()
+
+    def transfer(_):
+        with metrics.stage(name="put") as timer:
+            timer.bytes = 10
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as texec:
+        list(texec.map(transfer, range(1000)))
+
+    stages = metrics.summary()["stages"]
+    assert stages["put"]["calls"] == 1000
+    assert stages["put"]["bytes"] == 10000
+
+
+def test_prometheus_format():
+    """The metrics should have the labels, and the histogram buckets should be cumulative."""
+    metrics = DeliveryMetrics(
+        labels={"method": "put", "project": 'a"b', "missing": None}, buckets=(1, 10)
+    )
+    metrics.record(name="put", seconds=0.5, nr_bytes=5)
+    metrics.record(name="put", seconds=5)
+    metrics.record(name="put", seconds=50, failed=True)
+    text = metrics.prometheus()
+
+    assert "# TYPE dds_stage_duration_seconds histogram" in text
+    assert 'dds_stage_calls_total{method="put",project="a\\"b",stage="put"} 3' in text
+    assert 'dds_stage_failures_total{method="put",project="a\\"b",stage="put"} 1' in text
+    assert 'dds_stage_bytes_total{method="put",project="a\\"b",stage="put"} 5' in text
+    assert (
+        'dds_stage_duration_seconds_bucket{method="put",project="a\\"b",stage="put",le="1"} 1'
+        in text
+    )
+    assert (
+        'dds_stage_duration_seconds_bucket{method="put",project="a\\"b",stage="put",le="10"} 2'
+        in text
+    )
+    assert 'le="+Inf"} 3' in text
+    assert 'dds_stage_duration_seconds_count{method="put",project="a\\"b",stage="put"} 3' in text
+    assert "missing" not in text
+
+
+def test_exported_while_running_and_when_closed(tmp_path):
+    """The files should be written by the background thread, and a last time when closed."""
+    json_file, textfile = (tmp_path / "dds_metrics.json", tmp_path / "dds_metrics.prom")
+    with DeliveryMetrics(json_file=json_file, textfile=textfile, interval=0.01) as metrics:
+        assert not json_file.exists()
+        metrics.record(name="get", seconds=1, nr_bytes=10)
+        deadline = time.monotonic() + 5
+        while not textfile.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "dds_stage_calls_total" in textfile.read_text()
+        metrics.record(name="get", seconds=1, nr_bytes=10)
+
+    summary = json.loads(json_file.read_text())
+    assert summary["stages"]["get"]["calls"] == 2
+    assert summary["stages"]["get"]["bytes_per_second"] == 10
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["dds_metrics.json", "dds_metrics.prom"]
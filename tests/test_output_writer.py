@@ -0,0 +1,113 @@
+"""Tests for the output_writer module."""
+
+# IMPORTS ######################################################################
+
+import errno
+import os
+
+import pytest
+
+from dds_cli import output_writer
+from dds_cli.output_writer import OutputWriter
+
+# TESTS ########################################################################
+
+
+def test_write_buffers_and_saves_all_data(tmp_path):
+    """Chunks should be written in buffer sized blocks, and the rest when closed."""
+    outfile = tmp_path / "file.bin"
+    chunks = [bytes([i]) * 1000 for i in range(10)]
+
+    with OutputWriter(file=outfile, buffer_size=4096) as writer:
+        for chunk in chunks[:4]:
+            writer.write(chunk)
+        assert writer.written == 0
+        writer.write(chunks[4])
+        assert writer.written == 5000
+        for chunk in chunks[5:]:
+            writer.write(chunk)
+
+    assert writer.closed
+    assert outfile.read_bytes() == b"".join(chunks)
+
+
+@pytest.mark.skipif(not hasattr(os, "link"), reason="No hardlinks")
+def test_linked_file_not_changed(tmp_path):
+    """Rewriting a file should not change the files linked to it."""
+    outfile = tmp_path / "file.bin"
+    outfile.write_bytes(b"old data")
+    os.link(outfile, tmp_path / "copy.bin")
+
+    with OutputWriter(file=outfile) as writer:
+        writer.write(b"new data")
+
+    assert outfile.read_bytes() == b"new data"
+    assert (tmp_path / "copy.bin").read_bytes() == b"old data"
+
+
+def test_allocated_space_removed_if_not_written(tmp_path):
+    """A file shorter than the given size should not keep the allocated size."""
+    outfile = tmp_path / "file.bin"
+
+    with OutputWriter(file=outfile, size=10000) as writer:
+        writer.write(b"data")
+
+    assert outfile.read_bytes() == b"data"
+
+
+def test_close_twice(tmp_path):
+    """Closing an already closed writer should do nothing, e.g. when wrapped by zstd."""
+    writer = OutputWriter(file=tmp_path / "file.bin")
+    writer.write(b"data")
+    writer.close()
+    writer.close()
+    assert (tmp_path / "file.bin").read_bytes() == b"data"
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="No posix_fallocate")
+def test_allocation_not_supported_ignored(tmp_path, monkeypatch):
+    """Filesystems without support for allocation should still be written to."""
+
+    def not_supported(*_):
+        raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    monkeypatch.setattr(output_writer.os, "posix_fallocate", not_supported)
+
+    with OutputWriter(file=tmp_path / "file.bin", size=4) as writer:
+        writer.write(b"data")
+
+    assert (tmp_path / "file.bin").read_bytes() == b"data"
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="No posix_fallocate")
+def test_allocation_no_space(tmp_path, monkeypatch):
+    """Running out of space when allocating should fail directly."""
+
+    def no_space(*_):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(output_writer.os, "posix_fallocate", no_space)
+
+    with pytest.raises(OSError):
+        OutputWriter(file=tmp_path / "file.bin", size=4)
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="No posix_fadvise")
+def test_page_cache_dropped_behind_cursor(tmp_path, monkeypatch):
+    """Data more than one buffer behind the write position should be dropped from the cache."""
+    advised = []
+    monkeypatch.setattr(
+        output_writer.os,
+        "posix_fadvise",
+        lambda _, offset, length, __: advised.append((offset, length)),
+    )
+
+    monkeypatch.setattr(output_writer.constants, "WRITE_CACHE_BUFFERS", 2)
+
+    with OutputWriter(file=tmp_path / "file.bin", buffer_size=10) as writer:
+        for _ in range(4):
+            writer.write(b"x" * 10)
+        # The last two blocks are advised again, in case they were not on disk yet
+        assert advised == [(0, 10), (0, 20), (0, 30), (10, 30)]
+
+    assert advised[-1] == (0, 40)
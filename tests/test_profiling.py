@@ -0,0 +1,71 @@
+"""Tests for the profiling module."""
+
+# IMPORTS ######################################################################
+
+import concurrent.futures
+import logging
+import pstats
+import tracemalloc
+
+import pytest
+
+from dds_cli import profiling
+from dds_cli.profiling import Profiler
+
+# HELPERS ######################################################################
+
+
+def _transfer_in_thread():
+    """Work done in a transfer thread."""
+    return sum(range(10_000))
+
+
+# TESTS ########################################################################
+
+
+def test_cpu_profile_includes_threads(tmp_path, caplog):
+    """The functions run in the transfer threads should be in the saved profile."""
+    caplog.set_level(logging.INFO)
+    profiler = profiling.start(mode="cpu")
+    profiling.set_directory(directory=tmp_path)
+    profiling.phase(name="discovery")
+    profiling.phase(name="transfer")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as texec:
+        list(texec.map(lambda _: _transfer_in_thread(), range(4)))
+    profiling.phase(name="summary")
+    out_file = profiling.stop()
+
+    assert Profiler.current is None
+    assert out_file.parent == tmp_path and out_file.suffix == ".pstats"
+    functions = {x[2] for x in pstats.Stats(str(out_file)).stats}
+    assert "_transfer_in_thread" in functions
+    assert [x[0] for x in profiler.phases] == list(Profiler.PHASES)
+    assert all(x[1] >= 0 for x in profiler.phases)
+    assert all(x[2] is None or x[2] > 0 for x in profiler.phases)  # Peak RSS
+    assert "Phase 'transfer':" in caplog.text
+
+
+def test_mem_profile_peak_per_phase(tmp_path):
+    """The peak allocations of each phase should be recorded, and a snapshot saved."""
+    profiler = Profiler(mode="mem", directory=tmp_path)
+    profiler.start()
+    data = bytearray(10 * 1024 * 1024)
+    del data
+    profiler.phase(name="transfer")
+    profiler.phase(name="transfer")  # Already in the phase
+    out_file = profiler.stop()
+
+    assert not tracemalloc.is_tracing()
+    assert [x[0] for x in profiler.phases] == ["init/auth", "transfer"]
+    assert profiler.phases[0][3] >= 10 * 1024 * 1024
+    assert profiler.phases[1][3] < 10 * 1024 * 1024
+    assert tracemalloc.Snapshot.load(str(out_file)).traces is not None
+
+
+def test_not_profiled_does_nothing():
+    """Without --profile, the phases should be ignored."""
+    profiling.phase(name="transfer")
+    profiling.set_directory(directory="nowhere")
+    assert profiling.stop() is None
+    with pytest.raises(ValueError):
+        Profiler(mode="io")
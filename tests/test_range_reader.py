@@ -0,0 +1,113 @@
+"""Tests for the range_reader module."""
+
+# IMPORTS ######################################################################
+
+import logging
+import os
+
+import pytest
+
+from dds_cli import FileSegment
+from dds_cli import file_encryptor
+from dds_cli.file_compressor import Compressor
+from dds_cli.range_reader import RangeReader
+from tests.test_file_encryptor import key_pair
+
+# HELPERS ######################################################################
+
+
+def _reader(content, chunks, project_keys, compressed):
+    """Encrypt the chunks and get a RangeReader over them, with the fetched ranges."""
+    with file_encryptor.Encryptor(project_keys=project_keys) as encryptor:
+        encrypted = b"".join(encryptor.encrypt_chunks(chunks=chunks))
+        public_key = encryptor.get_public_component_hex(private_key=encryptor.my_private)
+        salt = encryptor.salt
+
+    fetched = []
+
+    def fetch(start, end):
+        fetched.append((start, end))
+        return encrypted[start:end]
+
+    reader = RangeReader(
+        info={
+            "name_in_db": "file",
+            "compressed": compressed,
+            "size_original": len(content),
+            "size_stored": len(encrypted),
+        },
+        decryptor=file_encryptor.Decryptor(
+            project_keys=project_keys, peer_public=public_key, key_salt=salt
+        ),
+        fetch=fetch,
+    )
+    return reader, fetched
+
+
+def _segments(data):
+    """Split data into segments, as read from a file."""
+    return [
+        data[i : i + FileSegment.SEGMENT_SIZE_RAW]
+        for i in range(0, len(data), FileSegment.SEGMENT_SIZE_RAW)
+    ]
+
+
+# TESTS ########################################################################
+
+
+@pytest.mark.parametrize("start,end", [(0, 10), (65530, 65540), (100000, 300000), (250000, 10**9)])
+def test_read_not_compressed(start, end):
+    """A range of a file not compressed by the DDS should only fetch the segments holding it."""
+    content = os.urandom(4 * FileSegment.SEGMENT_SIZE_RAW + 1234)
+    reader, fetched = _reader(
+        content=content, chunks=_segments(content), project_keys=key_pair(), compressed=False
+    )
+
+    assert b"".join(reader.read(start=start, end=end)) == content[start:end]
+    assert sum(x[1] - x[0] for x in fetched) <= 12 + (
+        (min(end, len(content)) - start) // FileSegment.SEGMENT_SIZE_RAW + 2
+    ) * (FileSegment.SEGMENT_SIZE_CIPHER)
+
+
+def test_read_seekable():
+    """A range of a seekable file should only fetch the frames holding it."""
+    content = os.urandom(3 * 1024 * 1024)
+    reader, fetched = _reader(
+        content=content,
+        chunks=Compressor.compress_chunks_seekable(chunks=[content]),
+        project_keys=key_pair(),
+        compressed=True,
+    )
+
+    start, end = (1024 * 1024 + 100, 1024 * 1024 + 200)
+    assert b"".join(reader.read(start=start, end=end)) == content[start:end]
+    # Nonce, seek table and one frame of about 1 MiB
+    assert sum(x[1] - x[0] for x in fetched) < 1.2 * 1024 * 1024
+
+
+def test_read_not_seekable(caplog):
+    """A range of a compressed file without seek table should be read from the start."""
+    content = b"dds" * 100000
+    reader, _ = _reader(
+        content=content,
+        chunks=Compressor.compress_chunks(chunks=[content]),
+        project_keys=key_pair(),
+        compressed=True,
+    )
+
+    with caplog.at_level(logging.WARNING):
+        assert b"".join(reader.read(start=1000, end=200000)) == content[1000:200000]
+    assert any("--seekable" in x for x in caplog.messages)
+
+
+def test_read_tampered():
+    """An altered segment should raise ValueError."""
+    content = os.urandom(2 * FileSegment.SEGMENT_SIZE_RAW)
+    reader, _ = _reader(
+        content=content, chunks=_segments(content), project_keys=key_pair(), compressed=False
+    )
+    original_fetch = reader.fetch
+    reader.fetch = lambda start, end: bytes(x ^ 1 for x in original_fetch(start=start, end=end))
+
+    with pytest.raises(ValueError):
+        b"".join(reader.read(start=0, end=10))
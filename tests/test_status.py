@@ -0,0 +1,143 @@
+"""Tests for the status module."""
+
+# IMPORTS ######################################################################
+
+import concurrent.futures
+import itertools
+import logging
+import threading
+from types import SimpleNamespace
+
+from dds_cli.custom_decorators import verify_proceed
+from dds_cli.file_records import FileStatus
+from dds_cli.status import DeliveryStatus
+
+# HELPERS ######################################################################
+
+NR_FILES = 5000
+
+
+class FakeTransfer:
+    """Runs files through verify_proceed, failing the files in fail.
+
+    Files in held wait until all files have been cancelled, as slow files would.
+    """
+
+    def __init__(self, files, fail=(), break_on_fail=False):
+        self.status = DeliveryStatus({x: FileStatus(steps=("put",)) for x in files})
+        self.fail = set(fail)
+        self.break_on_fail = break_on_fail
+        self.stop_doing = False
+        self.failure_journal = None
+        self.filehandler = SimpleNamespace(data={x: {} for x in files})
+        self.ran = []
+        self.held = set()
+        self.all_cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+        cancel_all = self.status.cancel_all
+
+        def cancel_and_notify(message):
+            cancel_all(message=message)
+            self.all_cancelled.set()
+
+        self.status.cancel_all = cancel_and_notify
+
+    @verify_proceed
+    def transfer(self, file):
+        """Save that the file ran, and fail it if it is in fail."""
+        with self._lock:
+            self.ran.append(file)
+        if file in self.held:
+            assert self.all_cancelled.wait(timeout=10)
+        if file in self.fail:
+            self.status[file]["failed_op"] = "put"
+            return False, "failed"
+        return True, ""
+
+
+def _run(transfer, files, threads=32):
+    """Run all files in a thread pool, scheduling a new file when one is done, as put and get do."""
+    results = {}
+    files_left = iter(files)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as texec:
+        futures = {
+            texec.submit(transfer.transfer, file=x): x
+            for x in itertools.islice(files_left, threads)
+        }
+        while futures:
+            done, _ = concurrent.futures.wait(
+                futures, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                results[futures.pop(future)] = future.result()
+            for file in itertools.islice(files_left, len(done)):
+                futures[texec.submit(transfer.transfer, file=file)] = file
+    return results
+
+
+# TESTS ########################################################################
+
+
+def test_state_transitions_counted(monkeypatch):
+    """Concurrent files should each end in one state, with the counts matching."""
+    monkeypatch.setattr(logging.getLogger("dds_cli.custom_decorators"), "disabled", True)
+    files = [f"file_{i}" for i in range(NR_FILES)]
+    transfer = FakeTransfer(files=files, fail=files[::7])
+
+    results = _run(transfer=transfer, files=files)
+
+    assert sorted(transfer.ran) == sorted(files)
+    assert transfer.status.counts() == {
+        "pending": 0,
+        "running": 0,
+        "succeeded": NR_FILES - len(files[::7]),
+        "cancelled": len(files[::7]),
+    }
+    for file in files:
+        assert results[file] == (file not in transfer.fail)
+        assert transfer.status[file]["cancel"] == (file in transfer.fail)
+    assert transfer.status[files[0]]["failed_op"] == "put"
+
+
+def test_break_on_fail_cancels_pending(monkeypatch):
+    """After a failure with break-on-fail, no more files should start."""
+    monkeypatch.setattr(logging.getLogger("dds_cli.custom_decorators"), "disabled", True)
+    files = [f"file_{i}" for i in range(NR_FILES)]
+    transfer = FakeTransfer(files=files, fail=[files[100]], break_on_fail=True)
+    transfer.held = set(files[101:])
+
+    results = _run(transfer=transfer, files=files, threads=16)
+
+    # Only the files which had started when the file failed ran
+    assert len(transfer.ran) <= 101 + 15
+    counts = transfer.status.counts()
+    assert counts["pending"] == counts["running"] == 0
+    assert counts["succeeded"] == len(transfer.ran) - 1
+    assert counts["cancelled"] == NR_FILES - counts["succeeded"]
+    assert sum(results.values()) == counts["succeeded"]
+
+    not_run = next(x for x in files if x not in transfer.ran)
+    assert transfer.status[not_run]["cancel"]
+    assert not transfer.status[not_run]["started"]
+    assert "break-on-fail" in transfer.status[not_run]["message"]
+    assert transfer.status[files[100]]["message"] == "failed"
+
+
+def test_removed_files_still_counted():
+    """Files removed to save memory should still be counted, and retried files restored."""
+    status = DeliveryStatus()
+    status["a"] = FileStatus(steps=("get",))
+    status["b"] = FileStatus(steps=("get",))
+    assert status.begin(file="a") and status.begin(file="b")
+    status.succeed(file="a")
+    status.cancel_one(file="b", message="failed", failed_op="get")
+    del status["a"]
+
+    assert list(status) == ["b"]
+    assert status.any_cancelled
+    assert status.counts() == {"pending": 0, "running": 0, "succeeded": 1, "cancelled": 1}
+
+    status.restore(file="b", message="retried")
+    assert not status["b"]["cancel"] and status["b"]["failed_op"] is None
+    assert status.counts()["succeeded"] == 2
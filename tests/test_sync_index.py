@@ -0,0 +1,87 @@
+"""Tests for the sync_index module."""
+
+# IMPORTS ######################################################################
+
+import hashlib
+import json
+from unittest.mock import patch
+
+from dds_cli.sync_index import SyncIndex
+
+# HELPERS ######################################################################
+
+
+def _file_info(content, name="folder/file.txt"):
+    """Remote file info as returned by FILE_INFO for the given content."""
+    return {
+        "name_in_db": name,
+        "size_original": len(content),
+        "checksum": hashlib.sha256(content).hexdigest(),
+    }
+
+
+# TESTS ########################################################################
+
+
+def test_is_up_to_date_missing_file(tmp_path):
+    """A file which does not exist locally should be downloaded."""
+    index = SyncIndex(index_file=tmp_path / "sync_index.json")
+    assert not index.is_up_to_date(file=tmp_path / "file.txt", info=_file_info(b"data"))
+
+
+def test_is_up_to_date_size_mismatch_not_hashed(tmp_path):
+    """A file with the wrong size should be downloaded without being hashed."""
+    local_file = tmp_path / "file.txt"
+    local_file.write_bytes(b"old")
+    index = SyncIndex(index_file=tmp_path / "sync_index.json")
+
+    with patch.object(SyncIndex, "generate_checksum") as mock_checksum:
+        assert not index.is_up_to_date(file=local_file, info=_file_info(b"new data"))
+    mock_checksum.assert_not_called()
+
+
+def test_is_up_to_date_checksum_mismatch(tmp_path):
+    """A file with the correct size but different content should be downloaded."""
+    local_file = tmp_path / "file.txt"
+    local_file.write_bytes(b"data")
+    index = SyncIndex(index_file=tmp_path / "sync_index.json")
+
+    assert not index.is_up_to_date(file=local_file, info=_file_info(b"atad"))
+    assert index.entries == {}
+
+
+def test_is_up_to_date_uses_saved_index(tmp_path):
+    """An unchanged file in a saved index should not be hashed again."""
+    local_file = tmp_path / "file.txt"
+    local_file.write_bytes(b"data")
+    info = _file_info(b"data")
+
+    index = SyncIndex(index_file=tmp_path / "sync_index.json")
+    assert index.is_up_to_date(file=local_file, info=info)
+    index.save()
+    assert "folder/file.txt" in json.loads((tmp_path / "sync_index.json").read_text())
+
+    reloaded = SyncIndex(index_file=tmp_path / "sync_index.json")
+    with patch.object(SyncIndex, "generate_checksum") as mock_checksum:
+        assert reloaded.is_up_to_date(file=local_file, info=info)
+    mock_checksum.assert_not_called()
+
+
+def test_is_up_to_date_remote_checksum_changed(tmp_path):
+    """An indexed file should be checked again if the remote checksum changes."""
+    local_file = tmp_path / "file.txt"
+    local_file.write_bytes(b"data")
+
+    index = SyncIndex(index_file=tmp_path / "sync_index.json")
+    index.record(file=local_file, info=_file_info(b"data"))
+
+    assert not index.is_up_to_date(file=local_file, info=_file_info(b"atad"))
+
+
+def test_corrupt_index_ignored(tmp_path):
+    """An unreadable index file should be ignored."""
+    index_file = tmp_path / "sync_index.json"
+    index_file.write_text("{not json")
+
+    index = SyncIndex(index_file=index_file)
+    assert index.entries == {}
@@ -0,0 +1,74 @@
+"""Tests for the tracing module."""
+
+# IMPORTS ######################################################################
+
+import concurrent.futures
+import json
+import threading
+
+from dds_cli.metrics import DeliveryMetrics
+from dds_cli.tracing import Tracer
+
+# TESTS ########################################################################
+
+
+def test_stages_traced_per_file_and_thread(tmp_path):
+    """Stages and chunks should be complete events with the file, in the thread they ran in."""
+    tracer = Tracer(trace_file=tmp_path / "trace.json", process_name="dds data put")
+    metrics = DeliveryMetrics(tracer=tracer)
+
+    def protect(file):
+        with metrics.stage(name="encrypt_filechunks", file=file):
+            for _ in metrics.chunks(name="stream_from_file", chunks=[b"a", b"b"], file=file):
+                pass
+        return threading.get_native_id()
+
+    files = ["file_0", "file_1", "file_2"]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as texec:
+        thread_ids = dict(zip(files, texec.map(protect, files)))
+    with metrics.stage(name="discover"):
+        pass
+
+    assert tracer.write()
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    assert trace["otherData"] == {"dropped_events": 0}
+    events = trace["traceEvents"]
+    assert events[0]["args"] == {"name": "dds data put"}
+    assert {x["tid"] for x in events if x["name"] == "thread_name"} >= set(thread_ids.values())
+
+    stages = [x for x in events if x["ph"] == "X"]
+    assert len(stages) == 7
+    for file, thread_id in thread_ids.items():
+        encrypt, stream = (
+            next(x for x in stages if x["name"] == name and x["args"] == {"file": file})
+            for name in ("encrypt_filechunks", "stream_from_file")
+        )
+        assert encrypt["tid"] == stream["tid"] == thread_id
+        # The chunks are read within the encryption
+        assert encrypt["ts"] <= stream["ts"]
+        assert stream["ts"] + stream["dur"] <= encrypt["ts"] + encrypt["dur"]
+    assert next(x for x in stages if x["name"] == "discover")["args"] == {}
+
+
+def test_ring_buffer_keeps_latest_events(tmp_path):
+    """Only the latest events should be kept, and the number dropped saved."""
+    tracer = Tracer(trace_file=tmp_path / "trace.json", max_events=10)
+    for i in range(25):
+        tracer.complete(
+            name="put", start=tracer.started + i, seconds=0.5, file=f"file_{i}", failed=i == 24
+        )
+
+    assert tracer.dropped == 15
+    assert tracer.write()
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    stages = [x for x in trace["traceEvents"] if x["ph"] == "X"]
+    assert [x["args"]["file"] for x in stages] == [f"file_{i}" for i in range(15, 25)]
+    assert stages[-1]["args"]["failed"] is True
+    assert stages[0]["ts"] == 15e6 and stages[0]["dur"] == 0.5e6
+    assert trace["otherData"] == {"dropped_events": 15}
+
+
+def test_write_failure_returns_false(tmp_path):
+    """A trace which cannot be saved should not stop the delivery."""
+    tracer = Tracer(trace_file=tmp_path / "missing" / "trace.json")
+    assert not tracer.write()
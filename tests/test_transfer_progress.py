@@ -0,0 +1,106 @@
+"""Tests for the transfer_progress module."""
+
+# IMPORTS ######################################################################
+
+import concurrent.futures
+import io
+
+from rich.console import Console
+
+from dds_cli.transfer_progress import TransferProgress
+
+# HELPERS ######################################################################
+
+
+def _progress(**kwargs):
+    """A progress which is shown in a string, not on the terminal."""
+    console = Console(file=io.StringIO(), width=100, force_terminal=True)
+    return TransferProgress(console=console, refresh_per_second=100, **kwargs)
+
+
+# TESTS ########################################################################
+
+
+def test_concurrent_advances_counted():
+    """Bytes added from many threads, also to the same task, should all be counted."""
+    progress = _progress()
+    shared = progress.add_task("shared", total=None, file="shared", step="put")
+
+    def transfer(i):
+        task = progress.add_task(f"file_{i}", total=1000, file=f"file_{i}", step="get")
+        for _ in range(100):
+            progress.advance(task, 10)
+            progress.update(shared, advance=1)
+        progress.remove_task(task)
+
+    with progress:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as texec:
+            list(texec.map(transfer, range(200)))
+
+    assert progress.tasks[0].completed == 200 * 100
+    assert progress.transferred() == 200 * 1000 + 200 * 100
+
+
+def test_steps_and_retries():
+    """Only the transfer steps should count, and a retried step only once."""
+    progress = _progress()
+    task = progress.add_task("file", total=100, file="file", step="encrypt")
+    progress.advance(task, 100)
+    assert progress.transferred() == 0
+
+    progress.reset(task, total=50, step="put")
+    progress.advance(task, 30)
+    progress.reset(task, completed=0)  # Retry
+    progress.advance(task, 50)
+    progress.reset(task, step="decrypt")
+    progress.advance(task, 100)
+    assert progress.transferred() == 50
+
+    progress.remove_task(task)
+    assert progress.transferred() == 50
+    assert progress.tasks == []
+
+
+def test_update_completed_keeps_other_threads_cells():
+    """Setting completed should not drop the cell another thread keeps advancing."""
+    progress = _progress()
+    task = progress.add_task("shared", total=None, file="shared", step="get")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as texec:
+        texec.submit(progress.advance, task, 5).result()
+        # An advance in progress in the other thread holds its cell
+        cells = list(progress.tasks[0].cells.values())
+        progress.update(task, completed=2)
+        assert progress.tasks[0].completed == 2
+
+        cells[0][0] += 3
+        texec.submit(progress.advance, task, 1).result()
+    assert progress.tasks[0].completed == 6
+
+
+def test_invisible_tasks_not_added():
+    """Tasks which are not shown should not be added, and updates of them do nothing."""
+    progress = _progress()
+    task = progress.add_task("file", total=100, visible=False, file="file", step="put")
+    assert task is None
+    progress.advance(task, 10)
+    progress.reset(task, step="get")
+    progress.remove_task(task)
+    assert progress.tasks == []
+
+
+def test_summary_and_longest_running_shown():
+    """The files done, the rate and the longest running files should be shown."""
+    progress = _progress(max_files=2)
+    with progress:
+        summary = progress.add_task("Upload", total=10)
+        for i in range(4):
+            task = progress.add_task(f"file_{i}", total=100, file=f"file_{i}", step="put")
+            progress.advance(task, 25 * i)
+        progress.advance(summary, 3)
+    shown = progress._live.console.file.getvalue()
+
+    assert "3/10 files" in shown
+    assert "/s" in shown
+    assert "file_0" in shown and "file_1" in shown and "file_3" not in shown
+    assert "+ 2 more files" in shown
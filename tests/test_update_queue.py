@@ -0,0 +1,111 @@
+"""Tests for the update_queue module."""
+
+# IMPORTS ######################################################################
+
+import threading
+
+from dds_cli import constants
+from dds_cli.update_queue import UpdateQueue
+
+# TESTS ########################################################################
+
+
+def test_flush_on_batch_size():
+    """A full batch should be flushed without waiting for the interval."""
+    flushed = threading.Event()
+    updated = []
+
+    def update_func(file):
+        updated.append(file)
+        if len(updated) == 3:
+            flushed.set()
+        return True, ""
+
+    update_queue = UpdateQueue(update_func=update_func, batch_size=3, flush_interval=3600)
+    for file in ["a", "b", "c"]:
+        update_queue.add(file)
+
+    assert flushed.wait(timeout=5)
+    assert update_queue.close() == {}
+    assert updated == ["a", "b", "c"]
+
+
+def test_batch_updated_in_parallel():
+    """The updates of a batch should be sent by several threads at once."""
+    started = threading.Barrier(3, timeout=5)
+
+    def update_func(file):
+        started.wait()  # Only passes when all three updates run at the same time
+        return True, ""
+
+    update_queue = UpdateQueue(update_func=update_func, batch_size=3, max_workers=3)
+    for file in ["a", "b", "c"]:
+        update_queue.add(file)
+
+    assert update_queue.close() == {}
+    assert not started.broken
+
+
+def test_flush_on_interval():
+    """A partial batch should be flushed once the interval has passed."""
+    flushed = threading.Event()
+
+    def update_func(file):
+        flushed.set()
+        return True, ""
+
+    update_queue = UpdateQueue(update_func=update_func, batch_size=100, flush_interval=0.01)
+    update_queue.add("a")
+
+    assert flushed.wait(timeout=5)
+    update_queue.close()
+
+
+def test_close_flushes_outstanding():
+    """Files still waiting when the queue is closed should be flushed."""
+    updated = []
+
+    def update_func(file):
+        updated.append(file)
+        return True, ""
+
+    update_queue = UpdateQueue(update_func=update_func, batch_size=100, flush_interval=3600)
+    update_queue.add("a")
+    update_queue.add("b")
+
+    assert update_queue.close() == {}
+    assert updated == ["a", "b"]
+
+
+def test_close_retries_failed(monkeypatch):
+    """Failed updates should be retried at close, and remaining failures returned."""
+    monkeypatch.setattr(constants, "DOWNLOAD_INITIAL_WAIT", 0)
+    attempts = {"a": 0, "b": 0}
+
+    def update_func(file):
+        attempts[file] += 1
+        if file == "a" and attempts[file] < 2:
+            return False, "temporary error"
+        if file == "b":
+            return False, "permanent error"
+        return True, ""
+
+    update_queue = UpdateQueue(update_func=update_func, max_retries=2)
+    update_queue.add("a")
+    update_queue.add("b")
+
+    assert update_queue.close() == {"b": "permanent error"}
+    assert attempts == {"a": 2, "b": 3}
+
+
+def test_exception_in_update_func_is_failure(monkeypatch):
+    """An exception should be recorded as a failed update, not kill the thread."""
+    monkeypatch.setattr(constants, "DOWNLOAD_INITIAL_WAIT", 0)
+
+    def update_func(file):
+        raise ValueError("boom")
+
+    update_queue = UpdateQueue(update_func=update_func, max_retries=0)
+    update_queue.add("a")
+
+    assert update_queue.close() == {"a": "boom"}
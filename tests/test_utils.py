@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from pathlib import Path
 from io import StringIO
+import json
+import logging
 import sys
 from typing import Dict, List, Tuple
 
@@ -32,6 +34,8 @@ from dds_cli.exceptions import (
     TokenExpirationMissingError,
 )
 from dds_cli.utils import (
+    LazyEscape,
+    create_download_session,
     create_table,
     delete_folder,
     format_api_response,
@@ -44,7 +48,9 @@ from dds_cli.utils import (
     perform_request,
     print_or_page,
     readable_timedelta,
+    setup_logging_to_file,
     sort_items,
+    stream_json_items,
 )
 
 sample_fully_authenticated_token = (
@@ -627,3 +633,112 @@ def test_delete_folder_folder(fs: FakeFilesystem) -> None:
     assert Path("folder").is_dir()
     delete_folder("folder")
     assert not Path("folder").is_dir()
+
+
+# create_download_session
+
+
+def test_create_download_session() -> None:
+    session = create_download_session(pool_size=8)
+    adapter = session.get_adapter("https://s3.example.com/bucket/file")
+    assert adapter is session.get_adapter("http://s3.example.com/bucket/file")
+    assert adapter._pool_maxsize == 8
+    assert adapter._pool_block is True
+    session.close()
+
+
+# stream_json_items
+
+
+def test_stream_json_items() -> None:
+    url: str = "http://localhost"
+    files: Dict = {
+        f"folder/file_{i}.txt": {"size_original": i, "subpath": "folder"} for i in range(50)
+    }
+    with Mocker() as mock:
+        mock.get(url, status_code=200, json={"message": "ok", "files": files, "after": [1, 2]})
+        items = list(stream_json_items(endpoint=url, key="files", chunk_size=7))
+
+    assert dict(items) == files
+    assert [name for name, _ in items] == list(files)
+
+
+def test_stream_json_items_key_missing() -> None:
+    url: str = "http://localhost"
+    with Mocker() as mock:
+        mock.get(url, status_code=200, json={"message": "No files"})
+        assert list(stream_json_items(endpoint=url, key="files")) == []
+
+
+def test_stream_json_items_error_response() -> None:
+    url: str = "http://localhost"
+    with Mocker() as mock:
+        mock.get(url, status_code=403, json={"message": "Insufficient credentials"})
+        with raises(DDSCLIException) as exc_info:
+            list(stream_json_items(endpoint=url, key="files", error_message="Failed"))
+
+    assert exc_info.value.args[0] == "Failed: Insufficient credentials"
+
+
+def test_stream_json_items_truncated_response() -> None:
+    url: str = "http://localhost"
+    with Mocker() as mock:
+        mock.get(url, status_code=200, text='{"files": {"a": {"size": 1}, "b": {"si')
+        with raises(ApiResponseError) as exc_info:
+            list(stream_json_items(endpoint=url, key="files"))
+
+    assert "did not return a valid JSON response" in exc_info.value.args[0]
+
+
+def test_stream_json_items_request_exception() -> None:
+    url: str = "http://localhost"
+    with Mocker() as mock:
+        mock.get(url, exc=requests.exceptions.ConnectionError)
+        with raises(ApiRequestError) as exc_info:
+            list(stream_json_items(endpoint=url, key="files"))
+
+    assert "The database seems to be down" in exc_info.value.args[0]
+
+
+# setup_logging_to_file
+
+
+def test_setup_logging_to_file_json_lines(tmp_path: Path) -> None:
+    log_file = tmp_path / "dds.log"
+    handler = setup_logging_to_file(filename=str(log_file), json_lines=True)
+    logger = logging.getLogger("dds_cli.test_queue_logging")
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    try:
+        files = ["[bold]file_0", "file_1"]
+        for file in files:
+            logger.debug("Started file '%s'", LazyEscape(Path(file)))
+        # Mutable arguments are formatted when logged, not when written
+        logger.debug("Files: %s", files)
+        files.clear()
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [x["message"] for x in entries] == [
+        "Started file '\\[bold]file_0'",
+        "Started file 'file_1'",
+        "Files: ['[bold]file_0', 'file_1']",
+    ]
+    assert entries[0]["level"] == "DEBUG"
+    assert entries[0]["logger"] == "dds_cli.test_queue_logging"
+
+
+def test_setup_logging_to_file_text(tmp_path: Path) -> None:
+    log_file = tmp_path / "dds.log"
+    handler = setup_logging_to_file(filename=str(log_file))
+    logger = logging.getLogger("dds_cli.test_queue_logging")
+    logger.addHandler(handler)
+    try:
+        logger.warning("Upload of '%s' failed", "file_0")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    assert log_file.read_text().rstrip().endswith("[WARNING]  Upload of 'file_0' failed")